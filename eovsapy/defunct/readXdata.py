@@ -1,7 +1,13 @@
 import aipy
 import numpy as np
 
-def readXdata(filename):
+def readXdata(filename, fill_uvw=False):
+    ''' Reads the cross-correlation data of the 2015 array from the IDB file
+        filename.  Returns the data array (12 x nf x 600 x 2) and the frequencies.
+        If fill_uvw is True, also returns the (12 x 600 x 3) array of uvw [ns] of
+        each baseline and time, where times missing from the file are filled in
+        with the uvw calculated by eovsa_array.uvw() for the source position.
+    '''
     ibl = np.array(
        [[0,0,1,2,0,0,0,0],
        [0,0,3,4,0,0,0,0],
@@ -18,6 +24,9 @@ def readXdata(filename):
     nf = len(data.nonzero()[0])
     freq = uv['sfreq'][data.nonzero()[0]]
     out = np.zeros((12,nf,600,2),dtype=np.complex64)
+    uvwarr = np.zeros((12,600,3))
+    blij = np.zeros((12,2),dtype=int)
+    times = np.zeros(600)
     l = -1
     tprev = 0
     for preamble, data in uv.all():
@@ -32,9 +41,24 @@ def readXdata(filename):
             tprev = t
             if l == 600:
                 break
+            times[l] = t
         if len(data.nonzero()[0]) == nf:
             out[ibl[i,j],:,l,k] = data[data.nonzero()]
-    return out, freq
+            if i < j and (ibl[i,j] > 0 or (i,j) == (0,1)):
+                uvwarr[ibl[i,j],l] = uvw
+                blij[ibl[i,j]] = i, j
+    if not fill_uvw:
+        return out, freq
+    # Fill in any missing uvw, for all baselines and times at once
+    from eovsapy.eovsa_array import ant_xyz, uvw as calc_uvw
+    from eovsapy.fasttime import eovsa_lst, jd2mjd
+    nt = l if l == 600 else l + 1
+    xyz = ant_xyz()
+    ha = eovsa_lst(jd2mjd(times[:nt])) - uv['ra']
+    uvwcalc = calc_uvw(ha, uv['dec'], xyz[blij[:,1]] - xyz[blij[:,0]])
+    missing = np.all(uvwarr[:,:nt] == 0, axis=2)
+    uvwarr[:,:nt][missing] = uvwcalc[missing]
+    return out, freq, uvwarr
 
 import copy
 from . import spectrogram_fit as sp
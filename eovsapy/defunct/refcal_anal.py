@@ -38,12 +38,21 @@
 #  2018-03-05  NK
 #    Update refcal_anal() to calculate band 4 phase from lohi scan if lohi=True,
 #    and estimate band 4 phase using the most recent lohi=True result if otherwise.
+#  2026-Oct-19  SY
+#    rd_refcal() now averages the channels within bands with util.band_avg(),
+#    for any number of bands (52 for data after 2019-Feb-22, rather than always
+#    34).  unrot_refcal() likewise works for any number of bands, and applies the corrections to all
+#    antennas and times at once.  The SNR flagging and averaging in refcal_anal()
+#    is done on all antennas, polarizations and bands at once.
+#  2026-Oct-19  SY
+#    phase_diff() now fits the delays of all antennas and polarizations at once
+#    with util.delay_fit(), and fit_blerror() fits all antennas, polarizations
+#    and bands at once by linear least squares.
 #
 from . import read_idb as ri
-from .util import Time, ant_str2list, lobe, nearest_val_idx
+from .util import Time, ant_str2list, lobe, nearest_val_idx, band_avg, delay_fit
 import numpy as np
 import matplotlib.pyplot as plt
-from glob import glob
 import matplotlib.dates as mdates
 import numpy.ma as ma
 import os
@@ -64,7 +73,7 @@ def findfiles(trange, projid='PHASECAL', srcid=None):
     srcid: String--SOURCEID in UFBD records. Can be a string or a list
     '''
     from .util import nearest_val_idx
-    import struct, time, glob, sys, socket
+    import struct, time, sys, socket
     from . import dump_tsys
     fpath = '/data1/eovsa/fits/UDB/' + trange[0].iso[:4] + '/'
     t1 = trange[0].to_datetime()
@@ -134,14 +143,31 @@ def rd_refcal(trange, projid='PHASECAL', srcid=None, quackint=180., navg=3):
        ***Output dictionary***
 
     '''
-    import struct, time, glob, sys, socket
-    from . import dbutil as db
     sclist = findfiles(trange, projid, srcid)
     scanlist = sclist['scanlist']
     srclist = sclist['srclist']
 
-    # read scans one by one
-    nscan = len(scanlist)
+    def rd_scan(scan):
+        # Read one scan and average over channels within each band.  Returns None
+        # if there are no times in the scan.
+        print('Reading scan: ' + scan)
+        out = ri.read_idb([scan], navg=navg, quackint=quackint)
+        nt = len(out['time'])
+        if nt == 0:
+            return None
+        # Number of bands is 52 for data after 2019-Feb-22, otherwise 34
+        maxnbd = 52 if out['time'][0] > 2458536.5 else 34
+        bds, vavg = band_avg(out['x'][bl2ord[:13, 13]], out['band'], axis=2)
+        maxnbd = max(maxnbd, bds[-1])
+        vs = np.zeros((15, 4, maxnbd, nt), dtype=complex)
+        fghz = np.zeros(maxnbd)
+        vs[:13, :, bds - 1] = vavg
+        fghz[bds - 1] = band_avg(out['fghz'], out['band'], nan=True)[1]
+        return out['time'], out['ha'], out['dec'], vs, fghz, bds
+
+    # read scans one by one (read_idb() is mostly Python and holds the GIL, so
+    # threads would not read them any faster)
+    results = [rd_scan(scan) for scan in scanlist]
     vis = []
     bandnames = []
     times = []
@@ -149,31 +175,17 @@ def rd_refcal(trange, projid='PHASECAL', srcid=None, quackint=180., navg=3):
     has = []
     decs = []
     good = []
-    for n, scan in enumerate(scanlist):
-        print('Reading scan: ' + scan)
-        out = ri.read_idb([scan], navg=navg, quackint=quackint)
-        nt = len(out['time'])
-        if nt == 0:
+    for n, result in enumerate(results):
+        if result is None:
             # If there are no times in the scan, skip this scan entirely
             continue
         good.append(n)
-        times.append(out['time'])
-        has.append(out['ha'])
-        decs.append(out['dec'])
-        bds, sidx = np.unique(out['band'], return_index=True)
-        nbd = len(bds)
-        eidx = np.append(sidx[1:], len(out['band']))
-        vs = np.zeros((15, 4, 34, nt), dtype=complex)
-        fghz = np.zeros(34)
-        # average over channels within each band
-        for b, bd in enumerate(bds):
-            fghz[bd - 1] = np.nanmean(out['fghz'][sidx[b]:eidx[b]])
-            for a in range(13):
-                for pl in range(4):
-                    vs[a, pl, bd - 1] = np.mean(out['x'][bl2ord[a, 13], pl, sidx[b]:eidx[b]], axis=0)
-        vis.append(vs)
-        fghzs.append(fghz)
-        bandnames.append(bds)
+        times.append(result[0])
+        has.append(result[1])
+        decs.append(result[2])
+        vis.append(result[3])
+        fghzs.append(result[4])
+        bandnames.append(result[5])
     # Keep only good scans
     gscanlist = []
     gsrclist = []
@@ -194,30 +206,34 @@ def unrot_refcal(refcal_in):
     '''
     from . import dbutil as db
     import copy
-    from . import chan_util_bc as cu
     from . import cal_header as ch
     from .stateframe import extract
     refcal = copy.deepcopy(refcal_in)
-    xml, buf = ch.read_cal(11, Time(refcal['times'][0][0], format='jd'))
+    t0 = Time(refcal['times'][0][0], format='jd')
+    if t0.mjd > 58536:
+        from . import chan_util_52 as cu
+    else:
+        from . import chan_util_bc as cu
+    maxnbd = refcal['vis'][0].shape[2]
+    xml, buf = ch.read_cal(11, t0)
     dph = extract(buf, xml['XYphase'])
     xi_rot = extract(buf, xml['Xi_Rot'])
     freq = extract(buf, xml['FGHz'])
-    freq = freq[np.where(freq != 0)]
-    band = []
-    for f in freq:
-        band.append(cu.freq2bdname(f))
-    bds, sidx = np.unique(band, return_index=True)
-    nbd = len(bds)
-    eidx = np.append(sidx[1:], len(band))
-    dxy = np.zeros((14, 34), dtype=np.float)
-    xi = np.zeros(34, dtype=np.float)
-    fghz = np.zeros(34)
-    # average dph and xi_rot frequencies within each band, to convert to 34-band representation
-    for b, bd in enumerate(bds):
-        fghz[bd - 1] = np.nanmean(freq[sidx[b]:eidx[b]])
-        xi[bd - 1] = np.nanmean(xi_rot[sidx[b]:eidx[b]])
-        for a in range(14):
-            dxy[a, bd - 1] = np.angle(np.sum(np.exp(1j * dph[a, sidx[b]:eidx[b]])))
+    good, = np.where(freq != 0)
+    freq = freq[good]
+    band = np.array(cu.freq2bdname(freq))
+    dxy = np.zeros((14, maxnbd), dtype=float)
+    xi = np.zeros(maxnbd, dtype=float)
+    fghz = np.zeros(maxnbd)
+    # average dph and xi_rot frequencies within each band, to convert to band representation
+    bds, favg = band_avg(freq, band, nan=True)
+    fghz[bds - 1] = favg
+    xi[bds - 1] = band_avg(xi_rot[good], band, nan=True)[1]
+    dxy[:, bds - 1] = np.angle(band_avg(np.exp(1j * dph[:14, good]), band, axis=1)[1])
+    # X-Y delay phase corrections, of shape (13, maxnbd, 1) to broadcast over times
+    a1 = np.exp(1j * lobe(dxy[:13] - dxy[13]))[:, :, None]
+    a2 = np.exp(1j * (-dxy[13] - xi))[None, :, None]
+    a3 = np.exp(1j * (dxy[:13] - xi + np.pi))[:, :, None]
     nscans = len(refcal['scanlist'])
     for i in range(nscans):
         # Read parallactic angles for this scan
@@ -226,26 +242,21 @@ def unrot_refcal(refcal_in):
         tchi = times.jd
         t = refcal['times'][i]
         if len(t) > 0:
-            vis = copy.deepcopy(refcal['vis'][i])
+            vis = refcal['vis'][i][:13].copy()
             idx = nearest_val_idx(t, tchi)
             pa = chi[idx]  # Parallactic angle for the times of this refcal.
             pa[:, [8, 9, 10, 12]] = 0.0
-            nt = len(idx)  # Number of times in this refcal
             # Apply X-Y delay phase correction
-            for a in range(13):
-                a1 = lobe(dxy[a] - dxy[13])
-                a2 = -dxy[13] - xi
-                a3 = dxy[a] - xi + np.pi
-                for j in range(nt):
-                    vis[a, 1, :, j] *= np.exp(1j * a1)
-                    vis[a, 2, :, j] *= np.exp(1j * a2)
-                    vis[a, 3, :, j] *= np.exp(1j * a3)
-            for j in range(nt):
-                for a in range(13):
-                    refcal['vis'][i][a, 0, :, j] = vis[a, 0, :, j] * np.cos(pa[j, a]) + vis[a, 3, :, j] * np.sin(pa[j, a])
-                    refcal['vis'][i][a, 2, :, j] = vis[a, 2, :, j] * np.cos(pa[j, a]) + vis[a, 1, :, j] * np.sin(pa[j, a])
-                    refcal['vis'][i][a, 3, :, j] = vis[a, 3, :, j] * np.cos(pa[j, a]) - vis[a, 0, :, j] * np.sin(pa[j, a])
-                    refcal['vis'][i][a, 1, :, j] = vis[a, 1, :, j] * np.cos(pa[j, a]) - vis[a, 2, :, j] * np.sin(pa[j, a])
+            vis[:, 1] *= a1
+            vis[:, 2] *= a2
+            vis[:, 3] *= a3
+            # Feed rotation, of shape (13, 1, nt) to broadcast over bands
+            cpa = np.cos(pa[:, :13]).T[:, None, :]
+            spa = np.sin(pa[:, :13]).T[:, None, :]
+            refcal['vis'][i][:13, 0] = vis[:, 0] * cpa + vis[:, 3] * spa
+            refcal['vis'][i][:13, 2] = vis[:, 2] * cpa + vis[:, 1] * spa
+            refcal['vis'][i][:13, 3] = vis[:, 3] * cpa - vis[:, 0] * spa
+            refcal['vis'][i][:13, 1] = vis[:, 1] * cpa - vis[:, 2] * spa
     return refcal
 
 
@@ -339,8 +350,8 @@ def refcal_anal(out, timerange=None, scanidx=None, minsnr=0.7, bandplt=[5, 11, 1
        bandplt: bands to show in the figure
        doplot: if True, display plots of results (default)
        ***Outputs***
-       refcal: complex array of shape (15, 2, 34) (nant, npol, nband) as the result of the reference calibration
-       flag: int array of shape (15, 2, 34). 0 is unflagged and 1 is flagged.
+       refcal: complex array of shape (15, 2, nband) (nant, npol, nband) as the result of the reference calibration
+       flag: int array of shape (15, 2, nband). 0 is unflagged and 1 is flagged.
        timestamp: midpoint of the time range used for averaging to obtain the refcal values 
     '''
     if scanidx:
@@ -391,34 +402,32 @@ def refcal_anal(out, timerange=None, scanidx=None, minsnr=0.7, bandplt=[5, 11, 1
         timeavg = times
         src = srclist[0]
     # vismean = np.nanmean(np.angle(vis),axis=3)
+    nbd = vis.shape[2]
     vis_ = np.zeros(vis.shape[:3], dtype=complex)
     flag = np.zeros(vis.shape[:3], dtype=int)
     sigma = np.zeros(vis.shape[:3]) + 1e10
     # compute standard deviation of the visibilities
     sigma_ = np.nanstd(vis, axis=3)
     # sigma = np.nanstd(np.abs(vis),axis=3)
-    # mask out records with phases > 3 sigma
-    for bd in range(34):
-        # print 'band: ',bd
-        for ant in range(13):
-            # print 'ant: ',ant
-            for pol in range(2):
-                # print 'pol: ',pol
-                amp = np.abs(vis[ant, pol, bd])
-                amp_median = np.median(np.abs(vis[ant, pol, bd]))
-                ind, = np.where(np.abs(amp - amp_median) < sigma_[ant, pol, bd])
-                snr = amp_median / sigma_[ant, pol, bd]
-                # pdb.set_trace()
-                if snr < minsnr or np.isnan(snr):
-                    flag[ant, pol, bd] = 1
-                else:
-                    if len(ind) > len(timeavg) / 2:
-                        vis_[ant, pol, bd] = np.nanmean(vis[ant, pol, bd, ind])
-                        sigma[ant, pol, bd] = np.nanstd(vis[ant, pol, bd, ind])
-                    else:
-                        vis_[ant, pol, bd] = np.nanmean(vis[ant, pol, bd])
-                        flag[ant, pol, bd] = 1
-                        # print '# of valid datapoints: ',len(ind)
+    # mask out records with amplitudes > 1 sigma from the median, for all antennas,
+    # polarizations and bands at once
+    v = vis[:13]
+    amp = np.abs(v)
+    amp_median = np.median(amp, axis=3)
+    inlier = np.abs(amp - amp_median[:, :, :, None]) < sigma_[:13, :, :, None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        snr = amp_median / sigma_[:13]
+    lowsnr = np.logical_or(snr < minsnr, np.isnan(snr))
+    enough = np.sum(inlier, axis=3) > len(timeavg) / 2
+    import warnings
+    with warnings.catch_warnings():
+        # Ignore warnings about slices with no inliers
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        vin = np.where(inlier, v, np.nan)
+        vis_[:13] = np.where(lowsnr, 0, np.where(enough, np.nanmean(vin, axis=3), np.nanmean(v, axis=3)))
+        sigma[:13] = np.where(np.logical_and(~lowsnr, enough), np.nanstd(vin, axis=3), 1e10)
+    flag[:13] = np.logical_or(lowsnr, ~enough)
+    for bd in range(nbd):
         # count how many datapoints are flagged in a given band
         nflag = np.count_nonzero(flag[:13, :, bd])
         print('{0:d} of 26 measurements are flagged due to SNR < {1:.1f} in Band {2:d}'.format(nflag, minsnr, bd + 1))
@@ -431,13 +440,13 @@ def refcal_anal(out, timerange=None, scanidx=None, minsnr=0.7, bandplt=[5, 11, 1
     
     #Calculate band 4 phases
     refcal_lohi = sql2refcal(timestamp, lohi=True)  #obtain from SQL database
-    dph = np.zeros((15,2,30))
+    dph = np.zeros((15,2,nbd-4))
     for i in range(13):
          for j in range(2):
              dph[i,j,:] = np.unwrap(lobe(np.angle(vis_)[i,j,4:] - refcal_lohi['pha'][i,j,4:]))
                  
     dphfitxxyy = np.zeros((13,2,2))
-    w = np.ones(31)
+    w = np.ones(nbd-3)
     w[0] += 99
     for i in range(13):
          for j in range(2):
@@ -463,7 +472,7 @@ def refcal_anal(out, timerange=None, scanidx=None, minsnr=0.7, bandplt=[5, 11, 1
         plt.title('source: {}'.format(srclist[scanidx[0]]))
         f3, ax3 = plt.subplots(2, 13, figsize=(12, 5))
         plt.title('source: {}'.format(srclist[scanidx[0]]))
-        allbands = np.arange(34) + 1
+        allbands = np.arange(nbd) + 1
         for ant in range(13):
             for pol in range(2):
                 ind, = np.where(flag[ant, pol, :] == 0)
@@ -471,9 +480,9 @@ def refcal_anal(out, timerange=None, scanidx=None, minsnr=0.7, bandplt=[5, 11, 1
                 if lohi == 0:
                     ax2[pol, ant].plot(4., np.unwrap(visavg['pha'])[ant, pol, 3], '.', markersize=5)  #Add band 4
                 ax2[pol, ant].set_ylim([-20, 20])
-                ax2[pol, ant].set_xlim([1, 34])
+                ax2[pol, ant].set_xlim([1, nbd])
                 ax3[pol, ant].plot(allbands[ind], visavg['amp'][ant, pol, ind], '.', markersize=5)
-                ax3[pol, ant].set_xlim([1, 34])
+                ax3[pol, ant].set_xlim([1, nbd])
                 ax3[pol, ant].set_ylim([0, 1.])
                 if ant == 0:
                     ax2[pol, ant].set_ylabel('Phase (radian)')
@@ -538,7 +547,7 @@ def refcal_anal(out, timerange=None, scanidx=None, minsnr=0.7, bandplt=[5, 11, 1
                  ax[pol,ant].plot(bandnames[1:], np.unwrap(phhi_new)[ant,pol,4:],'.')
                  ax[pol,ant].plot(bandnames[0], np.unwrap(phhi_new)[ant,pol,3],'.')                                  
                  ax[pol,ant].set_ylim([-20,20])
-                 ax[pol,ant].set_xlim([1,34])
+                 ax[pol,ant].set_xlim([1,nbd])
                  if pol == 0: ax[pol,ant].set_xticks([])
                  if ant >= 1: ax[pol,ant].set_yticks([])
         ax[1,0].set_xlabel('Band #')
@@ -655,8 +664,6 @@ def phase_diff(phacal, refcal=None, strictness=0.5, fitoffsets=False, verbose=Fa
            'phacal': Actual instance of phase calibration dictionary, containing frequency-dependent
                        amplitudes, phases, etc.
     '''
-    from scipy.optimize import curve_fit
-
     t_pha = phacal['timestamp']
     if refcal is None:
         refcal = sql2refcal(t_pha)
@@ -667,65 +674,42 @@ def phase_diff(phacal, refcal=None, strictness=0.5, fitoffsets=False, verbose=Fa
     flag_ref = refcal['flag']
     nants = 15
 
-    poff = [[], []]
-    pslope = [[], []]
-    prms = [[], []]
-    flag = [[], []]
-    for ant in range(nants):
-        if verbose: print('ant: ', ant)
+    # Arrays of shape (npol, nants)
+    poff = np.zeros((2, nants))
+    pslope = np.zeros((2, nants))
+    prms = np.zeros((2, nants))
+    flag = np.ones((2, nants), dtype=int)
+    # Fit all antennas 1-13 and both polarizations at once, weighting by the
+    # inverse variance of the phase differences, and ignoring flagged points
+    good = (flag_pha[:13, :2] == 0) & (flag_ref[:13, :2] == 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sigma = ((phacal['sigma'][:13, :2] / phacal['amp'][:13, :2]) ** 2. +
+                 (refcal['sigma'][:13, :2] / refcal['amp'][:13, :2]) ** 2.) ** 0.5
+        wgt = np.where(good, 1. / sigma ** 2, 0.)
+    fghz = phacal['fghz']
+    mbd, ph0, rms = delay_fit(fghz, dpha[:13, :2], wgt, offset=fitoffsets)
+    good &= np.isfinite(wgt) & (wgt > 0)
+    fit = np.sum(good, axis=2) > 3
+    pslope[:, :13] = np.where(fit, mbd, 0.).T
+    poff[:, :13] = np.where(fit, ph0, 0.).T
+    prms[:, :13] = np.where(fit, rms, 0.).T
+    flag[:, :13] = np.logical_not(fit).T
+    for ant in range(13):
         for pol in range(2):
-            if ant < 13:
-                if verbose: print('pol: ', pol)
-                ind, = np.where((flag_pha[ant, pol] == 0) & (flag_ref[ant, pol] == 0))
-                dpha_unw = np.unwrap(dpha[ant, pol, ind])
-                fghz = phacal['fghz'][ind]
-                if len(fghz) > 3:
-                    # Ensure that offset is close to zero, modulo 2*pi
-                    if dpha_unw[0] > np.pi: dpha_unw -= 2 * np.pi
-                    if dpha_unw[0] < -np.pi: dpha_unw += 2 * np.pi
-                sig_pha = phacal['sigma'][ant, pol, ind]
-                sig_ref = refcal['sigma'][ant, pol, ind]
-                amp_pha = phacal['amp'][ant, pol, ind]
-                amp_ref = refcal['amp'][ant, pol, ind]
-                sigma = ((sig_pha / amp_pha) ** 2. + (sig_ref / amp_ref) ** 2.) ** 0.5
-                # Do a linear fit on the residual phases
-                if len(fghz) > 3:
-                    if fitoffsets:
-                        popt, pcov = curve_fit(mbdfunc1, fghz, dpha_unw, p0=[0., 0.], sigma=sigma, absolute_sigma=False)
-                        poff[pol].append(popt[0])
-                        pslope[pol].append(popt[1])
-                        flag[pol].append(0)
-                        residuals = mbdfunc1(fghz, *popt) - dpha_unw
-                        if verbose: print('Phase offset (deg):', np.degrees(popt[0]))
-                        if verbose: print('MBD (ns):', popt[1])
-                    else:
-                        popt, pcov = curve_fit(mbdfunc0, fghz, dpha_unw, p0=[0.], sigma=sigma, absolute_sigma=False)
-                        poff[pol].append(0.0)
-                        pslope[pol].append(popt[0])
-                        flag[pol].append(0)
-                        residuals = mbdfunc0(fghz, *popt) - dpha_unw
-                        if verbose:
-                            print('Phase offset (deg): 0.0 (not fit)')
-                        if verbose:
-                            print('MBD (ns):', popt[0])
-                    rms = np.sqrt(np.dot(residuals, residuals) / len(residuals))
-                    prms[pol].append(rms)
-                    if rms > 1.0:
-                        hist, bins = np.histogram(np.abs(residuals), bins=len(residuals))
-                        bins = ma.masked_greater(bins[1:], 1.0)
-                        hist = ma.masked_array(hist, mask=bins.mask)
-                        if np.sum(hist, dtype=np.float) / np.sum(hist.data, dtype=np.float) < strictness:
-                            flag[pol][-1] = 1
-                else:
-                    poff[pol].append(0.0)
-                    pslope[pol].append(0.0)
-                    flag[pol].append(1)
-                    prms[pol].append(0.0)
-            else:
-                poff[pol].append(0.0)
-                pslope[pol].append(0.0)
-                flag[pol].append(1)
-                prms[pol].append(0.0)
+            if not fit[ant, pol]:
+                continue
+            if verbose:
+                print('ant: ', ant, 'pol: ', pol)
+                print('Phase offset (deg):', np.degrees(ph0[ant, pol]))
+                print('MBD (ns):', mbd[ant, pol])
+            if rms[ant, pol] > 1.0:
+                ind = good[ant, pol]
+                residuals = lobe(ph0[ant, pol] + 2. * np.pi * fghz[ind] * mbd[ant, pol] - dpha[ant, pol, ind])
+                hist, bins = np.histogram(np.abs(residuals), bins=len(residuals))
+                bins = ma.masked_greater(bins[1:], 1.0)
+                hist = ma.masked_array(hist, mask=bins.mask)
+                if np.sum(hist, dtype=float) / np.sum(hist.data, dtype=float) < strictness:
+                    flag[pol, ant] = 1
 
     antstr = lambda ant: ' Ant ={:6s}                 '.format(ant)
     titlestr = ' '.join(['{:12s}{:2s}'.format('rms', 'F')] * 2)
@@ -733,7 +717,7 @@ def phase_diff(phacal, refcal=None, strictness=0.5, fitoffsets=False, verbose=Fa
     caltbstr = lambda rms, flg: '{:10.5f}  {}  {:10.5f}  {} '.format(rms[0], flg[0], rms[1], flg[1])
 
     ncols = 4
-    nrows = np.int(np.ceil(nants / 4.0))
+    nrows = int(np.ceil(nants / 4.0))
     print('------------------------------------------------------------------------------------------------------------------------')
     print(('PHASECAL quality assessment (rms in degree) ----- Field = {0:10s}, Time = {1}~{2}'.format(src, phacal['t_bg'].iso[:-4],
                                                                                                      phacal['t_ed'].iso[:-4])))
@@ -970,8 +954,6 @@ def fit_blerror(out):
                      both polarizations and in all bands (1-34).  Size is 
                      [nant, npol, nband] = [13, 2, 34]
     '''
-    from scipy.optimize import curve_fit
-
     def bxyfunc(ha, poff, dbx, dby):
         # ha: hour angle
         # poff: constant phase offset
@@ -1003,14 +985,15 @@ def fit_blerror(out):
         else:
             ph = np.concatenate(ph, 3)
             nant, npol, nf, nt = ph.shape
-            dbx = np.zeros((13, 2, nf), np.float)
-            dby = np.zeros((13, 2, nf), np.float)
-            for a in range(13):
-                for pol in range(2):
-                    for f in gdbands:
-                        popt, pcov = curve_fit(bxyfunc, ha, np.unwrap(ph[a, pol, f]), p0=[0., 0., 0.], sigma=None, absolute_sigma=False)
-                        dbx[a, pol, f] = popt[1] / (np.cos(dec) * fghz[f])  # Convert to ns
-                        dby[a, pol, f] = popt[2] / (np.cos(dec) * fghz[f])  # Convert to ns
+            dbx = np.zeros((13, 2, nf), float)
+            dby = np.zeros((13, 2, nf), float)
+            # The model bxyfunc() is linear in its parameters, so fit all antennas,
+            # polarizations and bands at once by least squares on its design matrix
+            A = np.array([np.ones_like(ha), 2. * np.pi * np.cos(ha), -2. * np.pi * np.sin(ha)]).T
+            y = np.unwrap(ph[:13, :2][:, :, gdbands], axis=-1)
+            popt = np.linalg.lstsq(A, y.reshape(-1, nt).T, rcond=None)[0].reshape(3, 13, 2, len(gdbands))
+            dbx[:, :, gdbands] = popt[1] / (np.cos(dec) * fghz[gdbands])  # Convert to ns
+            dby[:, :, gdbands] = popt[2] / (np.cos(dec) * fghz[gdbands])  # Convert to ns
             dBx = np.median(np.mean(dbx[:, :, gdbands], 1), 1)
             xstd = np.std(np.mean(dbx[:, :, gdbands], 1), 1)
             dBy = np.median(np.mean(dby[:, :, gdbands], 1), 1)
@@ -0,0 +1,281 @@
+'''
+   Rotating binary log files for the stateframe and scan header records
+   written by the schedule.
+
+   BinLogWriter.log() only puts the record on a bounded queue, and returns at
+   once (dropping, and counting, the record if the queue is full), so that the
+   1-s control loop never waits on the NAS.  A background thread writes the
+   records through a buffered file, and flushes and fsyncs it in batches
+   (every sync_interval seconds).  The file name is made from a template
+   containing {date}, which is filled in with the (UT) date of each record,
+   so that a new file is started automatically at the change of date.
+
+   File format:  a 16-byte header (the magic string b'EOVSABL1', then the
+   format version and a reserved word, as little-endian uint32), followed by
+   the records, each with a 12-byte prefix of its length (uint32) and time
+   (float64, Unix seconds), both little-endian, and then the record bytes.
+
+   A companion index file (the log file name + '.idx') holds (time, byte
+   offset) pairs (float64, uint64) of the records, one every index_interval
+   seconds, so that read_records() can seek close to a given time without
+   reading the whole file.
+
+   If a write fails (e.g. the disk is full), the log and index files are cut
+   back to the end of the last complete record, so that later records are
+   never appended after a partial one.  The records lost that way (those not
+   yet synced to disk) are counted.
+'''
+#
+# History:
+#  2026-Oct-19  SY
+#    Initial version.
+#  2026-Oct-19  SY
+#    Cut the files back to the last complete record after a write error.
+#
+
+import os
+import time
+import queue
+import struct
+import threading
+import numpy
+
+magic = b'EOVSABL1'
+file_hdr = struct.Struct('<8sII')
+rec_hdr = struct.Struct('<Id')
+idx_dtype = numpy.dtype([('t', '<f8'), ('offset', '<u8')])
+
+
+class BinLogWriter():
+    ''' Writes records to rotating binary log files on a background thread.
+        template is the log file name, with {date} where the yyyymmdd (UT)
+        date of the record goes, e.g. '/nas4/Tables/stateframe/sf_{date}_v66.0.blog'.
+    '''
+    def __init__(self, template, maxqueue=600, sync_interval=10.0, index_interval=60.0):
+        self.template = template
+        self.sync_interval = sync_interval
+        self.index_interval = index_interval
+        self.queue = queue.Queue(maxqueue)
+        self.filename = None
+        self.f = None
+        self.idx = None
+        self.last_index = None
+        self.last_sync = time.time()
+        self.dirty = False
+        self.synced = 0
+        self.pending = []
+        self.nwritten = 0
+        self.nbytes = 0
+        self.ndropped = 0
+        self.nlost = 0
+        self.nerror = 0
+        self.last_error = None
+        self.thread = threading.Thread(target=self._run, name='binlog')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def log(self, data, t=None):
+        ''' Queue the record data (bytes) for writing, with time t (Unix seconds,
+            default now).  Never blocks.  Returns False if the queue was full and
+            the record was dropped.
+        '''
+        if t is None:
+            t = time.time()
+        try:
+            self.queue.put_nowait((t, bytes(data), self.template))
+            return True
+        except queue.Full:
+            self.ndropped += 1
+            return False
+
+    def set_template(self, template):
+        ''' Change the file name template (e.g. for a new version number), which
+            applies to records logged from now on.
+        '''
+        self.template = template
+
+    def stats(self):
+        ''' Returns a dictionary of the numbers of records written, bytes written,
+            records dropped (queue full), records lost (cut from the file after
+            a write error) and write errors, the last error, the number of
+            records waiting in the queue and the current file name.
+        '''
+        return {'written': self.nwritten, 'bytes': self.nbytes, 'dropped': self.ndropped,
+                'lost': self.nlost, 'errors': self.nerror, 'last_error': self.last_error,
+                'queued': self.queue.qsize(), 'filename': self.filename}
+
+    def close(self, timeout=10.0):
+        ''' Write out the queued records, fsync and close the files, and stop
+            the thread (waiting at most timeout seconds).
+        '''
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+
+    def _close_file(self):
+        for f in [self.f, self.idx]:
+            if f is not None:
+                try:
+                    f.close()
+                except (OSError, ValueError):
+                    pass
+        self.f = None
+        self.idx = None
+        self.filename = None
+
+    def _error(self, e):
+        # After a failed write or sync, close the files and cut them back to the
+        # end of the last complete record on disk, so that the next record is not
+        # appended after a partial one.  The files are reopened by the next record.
+        self.nerror += 1
+        self.last_error = repr(e)
+        filename = self.filename
+        ends = [self.synced] + self.pending
+        self._close_file()
+        self.pending = []
+        self.dirty = False
+        if filename is None:
+            return
+        try:
+            size = os.path.getsize(filename)
+            end = max([n for n in ends if n <= size] + [0])
+            self.nlost += len([n for n in ends if n > end])
+            if size > end:
+                os.truncate(filename, end)
+            # Remove index entries for records that are no longer in the file
+            idx = read_index(filename)
+            nidx = numpy.searchsorted(idx['offset'], end)
+            if os.path.getsize(filename + '.idx') > nidx * idx_dtype.itemsize:
+                os.truncate(filename + '.idx', nidx * idx_dtype.itemsize)
+        except OSError as e:
+            self.last_error = repr(e)
+
+    def _open(self, filename):
+        self._sync()
+        self._close_file()
+        folder = os.path.dirname(filename)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        new = not os.path.isfile(filename) or os.path.getsize(filename) == 0
+        self.f = open(filename, 'ab', buffering=65536)
+        self.filename = filename
+        self.synced = self.f.tell()
+        self.pending = []
+        if new:
+            self.f.write(file_hdr.pack(magic, 1, 0))
+            self.pending.append(file_hdr.size)
+            self.dirty = True
+        self.idx = open(filename + '.idx', 'ab')
+        self.last_index = None
+
+    def _write(self, t, data, template):
+        filename = template.format(date=time.strftime('%Y%m%d', time.gmtime(t)))
+        if filename != self.filename:
+            self._open(filename)
+        offset = self.f.tell()
+        if self.last_index is None or t - self.last_index >= self.index_interval:
+            self.idx.write(struct.pack('<dQ', t, offset))
+            self.last_index = t
+        # Prefix and record in one write, and note where the record ends
+        self.f.write(rec_hdr.pack(len(data), t) + data)
+        self.pending.append(offset + rec_hdr.size + len(data))
+        self.dirty = True
+        self.nwritten += 1
+        self.nbytes += rec_hdr.size + len(data)
+
+    def _sync(self):
+        if self.dirty and self.f is not None:
+            for f in [self.f, self.idx]:
+                f.flush()
+                os.fsync(f.fileno())
+            if self.pending:
+                self.synced = self.pending[-1]
+            self.pending = []
+        self.dirty = False
+        self.last_sync = time.time()
+
+    def _run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=self.sync_interval)
+            except queue.Empty:
+                item = ()
+            # Write this record and any others waiting, as one batch
+            while True:
+                if item is None:
+                    try:
+                        self._sync()
+                    except OSError as e:
+                        self._error(e)
+                    self._close_file()
+                    return
+                if item:
+                    try:
+                        self._write(*item)
+                    except OSError as e:
+                        # Lose this record (and any not yet synced), and reopen
+                        # the file for the next one
+                        self._error(e)
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            if time.time() - self.last_sync >= self.sync_interval:
+                try:
+                    self._sync()
+                except OSError as e:
+                    self._error(e)
+
+
+def is_binlog(filename):
+    ''' Returns True if filename is a binary log written by BinLogWriter (as
+        opposed to an older log of bare records).
+    '''
+    with open(filename, 'rb') as f:
+        return f.read(len(magic)) == magic
+
+
+def read_index(filename):
+    ''' Returns the index of log file filename, as a structured array with
+        fields 't' and 'offset' (empty if there is no index file).
+    '''
+    try:
+        buf = open(filename + '.idx', 'rb').read()
+    except IOError:
+        return numpy.zeros(0, idx_dtype)
+    return numpy.frombuffer(buf[:len(buf) // idx_dtype.itemsize * idx_dtype.itemsize], idx_dtype)
+
+
+def read_records(filename, trange=None):
+    ''' Generator returning (t, data) for the records of log file filename, or
+        only those with times in trange = [t0, t1) (Unix seconds, or Time()
+        objects), in which case the index is used to seek to the first one.
+        Stops at the end of the file, or at a partly written last record.
+    '''
+    if trange is not None:
+        t0, t1 = [getattr(t, 'unix', t) for t in trange]
+    with open(filename, 'rb') as f:
+        hdr = f.read(file_hdr.size)
+        if len(hdr) < file_hdr.size or hdr[:len(magic)] != magic:
+            raise ValueError(filename + ' is not a binary log file')
+        if trange is not None:
+            idx = read_index(filename)
+            i = numpy.searchsorted(idx['t'], t0, side='right') - 1
+            if i >= 0 and idx['offset'][i] < os.path.getsize(filename):
+                f.seek(int(idx['offset'][i]))
+        while True:
+            prefix = f.read(rec_hdr.size)
+            if len(prefix) < rec_hdr.size:
+                return
+            n, t = rec_hdr.unpack(prefix)
+            data = f.read(n)
+            if len(data) < n:
+                return
+            if trange is not None:
+                if t < t0:
+                    continue
+                if t >= t1:
+                    return
+            yield t, data
@@ -17,6 +17,13 @@
 #    EQ mount type).
 #  2020-11-29  DG
 #    Added '.' for path in case of path == '' when creating plot.
+#  2026-Oct-19  SY
+#    rd_calpnt() now parses the file in one pass and converts all times at once.
+#    The fit is done by lstsq on the full design matrix from design_matrix(),
+#    instead of accumulating np.matrix outer products point by point, with
+#    optional iterative rejection of outliers (nsigma) and parameter
+#    uncertainties.  Added season_mountcal() to fit the points of many files
+#    together for all antennas, reading the files in parallel.
 #
 from eovsapy.util import Time
 import numpy as np
@@ -45,41 +52,36 @@ def rd_calpnt(filename):
         return None
     nants = len(ants)
     lines = lines[1:]
+    # Split all lines, and keep only those up to the first short or malformed line
+    vals = [line[9:].split() for line in lines]
+    nvals = np.array([len(v) if len(line) >= 9 else -1 for line, v in zip(lines, vals)])
+    bad, = np.where(nvals != nants*2 + 4)
     nlines = len(lines)
-    dra = np.zeros((nants,nlines),np.float)
-    ddec = np.zeros((nants,nlines),np.float)
-    ha = []
-    dec = []
-    source = []
-    timstr = []
-    for i,line in enumerate(lines):
-        if len(line) < 9:
-            dra = dra[:,:i]
-            ddec = ddec[:,:i]
-            break
-        vals = line[9:].split()
-        if len(vals) != nants*2 + 4:
-            print('Error reading line',i+2,'of',filename)
-            dra = dra[:,:i]
-            ddec = ddec[:,:i]
-            break
-        else:
+    if len(bad) > 0:
+        nlines = bad[0]
+        if nvals[nlines] != -1:
+            print('Error reading line',nlines+2,'of',filename)
+    try:
+        arr = np.array([v[2:] for v in vals[:nlines]], dtype=float).reshape(nlines, nants*2 + 2)
+    except ValueError:
+        # Find the first line that cannot be parsed, and keep only the lines before it
+        for k in range(nlines):
             try:
-                source.append(line[:8])
-                timstr.append(vals[0]+' '+vals[1])
-                ha.append(vals[2])
-                dec.append(vals[3])
-                dra[:,i] = np.array(vals[4::2]).astype(float)
-                ddec[:,i] = np.array(vals[5::2]).astype(float)
-            except:
-                print('Error parsing line',i+2,'of',filename)
+                np.array(vals[k][2:], dtype=float)
+            except ValueError:
+                print('Error parsing line',k+2,'of',filename)
+                break
+        nlines = k
+        arr = np.array([v[2:] for v in vals[:nlines]], dtype=float).reshape(nlines, nants*2 + 2)
+    source = [line[:8] for line in lines[:nlines]]
+    timstr = [v[0]+' '+v[1] for v in vals[:nlines]]
+    dra = arr[:,2::2].T.copy()
+    ddec = arr[:,3::2].T.copy()
     # Convert HA, Dec from degrees to radians, and then convert HA to RA
-    ha = np.array(ha).astype(float)*np.pi/180.
-    dec = np.array(dec).astype(float)*np.pi/180.
+    ha = arr[:,0]*np.pi/180.
+    dec = arr[:,1]*np.pi/180.
     times = Time(timstr)
-    ra = np.zeros_like(ha)
-    for i in range(len(ha)):
-        ra[i] = eovsa_lst(times[i]) - ha[i]
+    ra = eovsa_lst(times) - ha
 
     # Read pointing parameters from SQL database at time of first observation
     params_old = np.zeros((9,15),int)
@@ -95,7 +97,38 @@ def rd_calpnt(filename):
     return {'filename':filename, 'source':source, 'time':times, 'params_old':params_old, 'ra':ra, 
             'dec':dec, 'ha':ha, 'antlist':antlist, 'dra':dra, 'ddec':ddec}
             
-def mntcal(indict):
+def design_matrix(indict):
+    ''' Returns the design matrix x [2*npt, 8] and the measured offsets y [2*npt]
+        for the pointing model of the mount type of the antenna in indict (see
+        mntcal() for the keys).  The first npt rows are for the XEL (or HA)
+        offsets and the second npt rows for the EL (or Dec) offsets, so that
+        the pointing model predicts x.dot(p) for parameters p.
+    '''
+    from numpy import cos, sin, tan  # Avoids all the np. etc.
+    npt = len(indict['az'])
+    x = np.zeros((2*npt, 8))
+    if indict['mount'] == 'AZEL':
+        el = indict['el']
+        az = indict['az']
+        x[:npt,:5] = np.array([np.ones(npt), cos(el), sin(el), cos(az)*sin(el), sin(az)*sin(el)]).T
+        x[npt:,3:] = np.array([-sin(az), cos(az), np.ones(npt), cos(el), 1./tan(el)]).T
+        y = np.concatenate((indict['dxel'], indict['d_el']))
+    elif indict['mount'] == 'EQ':
+        ha = indict['ha']
+        dec = indict['dec']
+        if indict['ant'] == 14:
+            # Special case for broken pointing model in Ant 14 [tan(ha) is calculated instead of tan(dec)]
+            tdec = tan(ha)
+        else:
+            tdec = tan(dec)
+        x[:npt,:6] = np.array([np.ones(npt), -cos(lat)*sin(ha)/cos(dec), tdec, -1./cos(dec),
+                               sin(ha)*tdec, -cos(ha)*tdec]).T
+        x[npt:,4:] = np.array([cos(ha), sin(ha), np.ones(npt), 
+                               -cos(lat)*cos(ha)*sin(dec) + sin(lat)*cos(dec)]).T
+        y = np.concatenate((-indict['dra'], indict['ddec']))   # Change sign for RA -> HA
+    return x, y
+
+def mntcal(indict, nsigma=None, niter=10):
     ''' Given an input dictionary of pointing coordinates for a single antenna,
         calculate pointing parameters according to antenna type.
         
@@ -137,7 +170,8 @@ def mntcal(indict):
           Then
               p = np.linalg.solve(a,b)
               
-          where p is the array of pointing parameters with different meanings according to mount type
+          (this is now done as a least-squares solution of the full design matrix
+          from design_matrix()), where p is the array of pointing parameters with different meanings according to mount type
               AZEL:                                          EQ:
               -------------------------------------------    -----------------------------------------
               P1 = Azimuth collimation error                 = Hour angle encoder offset
@@ -152,50 +186,43 @@ def mntcal(indict):
                    collimation error                           and collimation error
               P8 = Gravitational deflection coefficient      = Declination sag
               P9 = Residual refraction coefficient           = Not used
+
+        Optional arguments:
+          nsigma   If given, points whose total offset from the fit is more than
+                     nsigma times the rms are rejected, and the fit is repeated
+                     (up to niter times) until no more points are rejected.
+          niter    Maximum number of fits for outlier rejection.
+
+        The parameters are returned in indict['params'], their uncertainties in
+        indict['params_err'], and the mask of points used in indict['good'].
     '''
-    from numpy import cos, sin, tan  # Avoids all the np. etc.
-    mount = indict['mount']
     npt = len(indict['az'])
     nparm = 8
-    a = np.asmatrix(np.zeros((nparm,nparm))) # Matrix to create from coordinates   A#B = P
-    b = np.zeros(nparm)                      # Vector to create from measurements
-    # Do accumulation over sources
-    for i in range(npt):
-        if mount == 'AZEL':
-            el = indict['el'][i]
-            az = indict['az'][i]
-            dxel = indict['dxel'][i]
-            d_el = indict['d_el'][i]
-            elp = el   # Skip refraction correction
-            # Add these pointing results to A and B
-            x = np.array([1., np.cos(el), sin(el), cos(az)*sin(el), sin(az)*sin(el), 0., 0., 0.])
-            a += np.asmatrix(x).T * np.asmatrix(x)
-            b += dxel * x
-            x = np.array([0., 0., 0., -sin(az), cos(az), 1., cos(el), 1./tan(el)])
-            a += np.asmatrix(x).T * np.asmatrix(x)
-            b += d_el * x
-        elif mount == 'EQ':
-            ha = indict['ha'][i]
-            dec = indict['dec'][i]
-            dha = -indict['dra'][i]   # Change sign for RA -> HA
-            ddec = indict['ddec'][i]
-            if indict['ant'] == 14:
-                # Special case for broken pointing model in Ant 14 [tan(ha) is calculated instead of tan(dec)]
-                x = np.array([1, -cos(lat)*sin(ha)/cos(dec), tan(ha), -1./cos(dec), 
-                              sin(ha)*tan(ha), -cos(ha)*tan(ha), 0., 0.])
-            else:
-                x = np.array([1, -cos(lat)*sin(ha)/cos(dec), tan(dec), -1./cos(dec), 
-                              sin(ha)*tan(dec), -cos(ha)*tan(dec), 0., 0.])
-            a += np.asmatrix(x).T * np.asmatrix(x)
-            b += dha * x
-            x = np.array([0., 0., 0., 0., cos(ha), sin(ha), 1., -cos(lat)*cos(ha)*sin(dec) + sin(lat)*cos(dec)])
-            a += np.asmatrix(x).T * np.asmatrix(x)
-            b += ddec * x
-            
-    # Calculate the solution (p are best-fit parameters, P1-P9)
-    p = np.linalg.solve(a,b)
+    x, y = design_matrix(indict)
+    # Points used in the fit (both coordinates of a point are rejected together)
+    good = np.ones(npt, bool)
+    for it in range(niter):
+        use = np.concatenate((good, good))
+        p = np.linalg.lstsq(x[use], y[use], rcond=None)[0]
+        if nsigma is None:
+            break
+        resid = y - x.dot(p)
+        # Total offset of each point from the fit, compared with the rms of the good points
+        r = np.hypot(resid[:npt], resid[npt:])
+        rms = np.sqrt((r[good]**2).mean())
+        newgood = r <= nsigma*rms
+        if np.array_equal(newgood, good) or newgood.sum()*2 <= nparm:
+            break
+        good = newgood
+    # Final solution for the points kept, and parameter uncertainties from the
+    # covariance matrix, scaled by the residuals
+    use = np.concatenate((good, good))
+    p = np.linalg.lstsq(x[use], y[use], rcond=None)[0]
+    resid = y[use] - x[use].dot(p)
+    dof = max(use.sum() - nparm, 1)
+    cov = np.linalg.pinv(x[use].T.dot(x[use]))*(resid**2).sum()/dof
     # Add parameters to indict and return    
-    indict.update({'params':p}) #, 'el_r':np.array(el_r)}) # Skip refraction correction
+    indict.update({'params':p, 'params_err':np.sqrt(np.abs(np.diag(cov))), 'good':good})
     return indict
     
 def checkfit(indict):
@@ -222,59 +249,31 @@ def checkfit(indict):
     import matplotlib
     import matplotlib.pylab as plt
     import os
-    from numpy import cos, sin, tan  # Avoids all the np. etc.
     mount = indict['mount']
     npt = len(indict['az'])
     nparm = 8
     p = indict['params']
     old_p = indict['params_old']
-    fit_x = []   # Fit of horizontal offset (HA or AZ)
-    fit_y = []   # Fit of vertical offset (DEC or EL)
     # Do fit to all of the measurements using the solution for P
-    if mount == 'AZEL':
-        # AZO = P1 + P2 cos(EL') + P3 sin(EL') + P4 cos(AZ)sin(EL') + P5 sin(AZ)sin(EL')
-        # ELO = P7 + P8 cos(EL') + P9 cot(EL') - P4 sin(AZ)         + P5 cos(AZ)
-        # Note: since P6 is not used, and indexes below are 0-based, these become
-        # ELO = P[5] + P[6] cos(EL') + P[7] cot(EL') - P[3] sin(AZ) + P[4] cos(AZ)
-        for i in range(npt):
-            #elp  = indict['el_r'][i]
-            elp  = indict['el'][i]
-            az   = indict['az'][i]
-
-            xel = p[0] + p[1]*cos(elp) + p[2]*sin(elp) + p[3]*cos(az)*sin(elp) + p[4]*sin(az)*sin(elp)
-            fit_x.append(xel)
-            el = p[5] + p[6]*cos(elp) + p[7]/tan(elp) - p[3]*sin(az) + p[4]*cos(az)
-            fit_y.append(el)
-
-        # Calculate the difference between the measured offsets and the fitted ones
-        fit_x = np.array(fit_x)
-        fit_y = np.array(fit_y)
-        x_diff = indict['dxel'] - fit_x
-        y_diff = indict['d_el'] - fit_y
-    elif mount == 'EQ':
-        # HAO  = P1 - P2 cos(LAT)*sin(HA)*sec(DEC) + P3 tan(DEC) - P4 sec(DEC) + P5 sin(HA)*tan(DEC) 
-        #      - P6 cos(HA)*tan(DEC)
-        # DECO = P5 cos(HA) + P6 sin(HA) + P7 - P8 [cos(LAT)*cos(HA)*sin(DEC) - sin(LAT)*cos(DEC)]
-        #      + P10 DEC
-        for i in range(npt):
-            dec  = indict['dec'][i]
-            ha   = indict['ha'][i]
-            if indict['ant'] == 14:
-                # Special case for broken pointing model in Ant 14 [tan(ha) is calculated instead of tan(dec)]
-                dh = p[0] - p[1]*cos(lat)*sin(ha)/cos(dec) + p[2]*tan(ha) - p[3]/cos(dec) \
-                          + p[4]*sin(ha)*tan(ha) - p[5]*cos(ha)*tan(ha)
-            else:
-                dh = p[0] - p[1]*cos(lat)*sin(ha)/cos(dec) + p[2]*tan(dec) - p[3]/cos(dec) \
-                          + p[4]*sin(ha)*tan(dec) - p[5]*cos(ha)*tan(dec)
-            fit_x.append(dh)
-            dd = p[4]*cos(ha) + p[5]*sin(ha) + p[6] - p[7]*(cos(lat)*cos(ha)*sin(dec) - sin(lat)*cos(dec))
-            fit_y.append(dd)
-
-        # Calculate the difference between the measured offsets and the fitted ones
-        fit_x = np.array(fit_x)
-        fit_y = np.array(fit_y)
-        x_diff = -indict['dra'] - fit_x  # Change sign for RA -> HA
-        y_diff = indict['ddec'] - fit_y
+    #
+    # AZEL mount type:
+    # AZO = P1 + P2 cos(EL') + P3 sin(EL') + P4 cos(AZ)sin(EL') + P5 sin(AZ)sin(EL')
+    # ELO = P7 + P8 cos(EL') + P9 cot(EL') - P4 sin(AZ)         + P5 cos(AZ)
+    # Note: since P6 is not used, and indexes below are 0-based, these become
+    # ELO = P[5] + P[6] cos(EL') + P[7] cot(EL') - P[3] sin(AZ) + P[4] cos(AZ)
+    #
+    # EQ mount type:
+    # HAO  = P1 - P2 cos(LAT)*sin(HA)*sec(DEC) + P3 tan(DEC) - P4 sec(DEC) + P5 sin(HA)*tan(DEC) 
+    #      - P6 cos(HA)*tan(DEC)
+    # DECO = P5 cos(HA) + P6 sin(HA) + P7 - P8 [cos(LAT)*cos(HA)*sin(DEC) - sin(LAT)*cos(DEC)]
+    #      + P10 DEC
+    x, y = design_matrix(indict)
+    fit = x.dot(p)
+    fit_x = fit[:npt]   # Fit of horizontal offset (HA or AZ)
+    fit_y = fit[npt:]   # Fit of vertical offset (DEC or EL)
+    # Calculate the difference between the measured offsets and the fitted ones
+    x_diff = y[:npt] - fit_x
+    y_diff = y[npt:] - fit_y
 
     # Print results
     print('Solution for antenna',indict['ant'],'mount type:',indict['mount'])
@@ -422,10 +421,47 @@ def checkfit(indict):
     plt.close()
     return indict
 
-def multi_mountcal(filename, ant_str=None):
-    ''' Process an entire set of calpnt data
+def ant_points(outdict, ant):
+    ''' Returns the input dictionary for mntcal() for antenna ant (1-14) from
+        the output of rd_calpnt(), with any -99 points removed and the AZ, EL,
+        dXEL and dEL coordinates calculated for all points at once.
     '''
     from eovsapy import coord_conv as cc
+    i, = np.where(np.array(outdict['antlist']) == ant)[0]  # Index in outdict for specified ant
+    if ant in [9, 10, 11, 13, 14]:
+        # This is an equatorial mount
+        mount = 'EQ'
+    elif ant in [1, 2, 3, 4, 5, 6, 7, 8, 12]:
+        # This is an azimuth-elevation mount
+        mount = 'AZEL'
+    # Reprocess coordinates, plus remove any -99 points
+    good, = np.where(np.logical_and(outdict['dra'][i] > -90, outdict['ddec'][i] > -90))
+    dra = outdict['dra'][i,good]
+    ddec = outdict['ddec'][i,good]
+    ra = outdict['ra'][good]
+    dec = outdict['dec'][good]
+    ha = outdict['ha'][good]
+    times = outdict['time'][good]
+    params_old = outdict['params_old'][:,i]
+    # Convert RA, Dec to Az, El, and dRA, dDec to dxel and d_el.
+    # Refraction correction is not applied, pending determination of whether refraction
+    # is already accounted for in the measurements (I think it is...)
+    if len(good) == 0:
+        az = el = dxel = d_el = np.zeros(0)
+    else:
+        az, el = cc.radec2azel(ra, dec, times)
+        # Adjust coordinates (only needed for AZEL, but do for EQ, too for consistency)
+        dxel, d_el = cc.dradec2dazel(ra, dec, times, dra*dtor, ddec*dtor)
+        dxel = dxel / dtor
+        d_el = d_el / dtor
+    return {'filename':outdict['filename'],'ant':ant, 'dra':dra, 'ddec':ddec, 'dxel': dxel, 'd_el':d_el, 'ra':ra, 
+            'dec':dec, 'ha':ha, 'az':az, 'el':el, 'mount':mount, 'times':times, 
+            'params_old':params_old}
+
+def multi_mountcal(filename, ant_str=None, nsigma=None):
+    ''' Process an entire set of calpnt data.  If nsigma is given, outliers
+        are rejected in the fits (see mntcal()).
+    '''
     from eovsapy.util import ant_str2list
     
     outdict = rd_calpnt(filename)
@@ -435,51 +471,55 @@ def multi_mountcal(filename, ant_str=None):
     else:
         antlist = outdict['antlist']
     for ant in antlist:
-        #i = ant - 1
-        i, = np.where(np.array(outdict['antlist']) == ant)[0]  # Index in outdict for specified ant
-        if ant in [9, 10, 11, 13, 14]:
-            # This is an equatorial mount
-            mount = 'EQ'
-        elif ant in [1, 2, 3, 4, 5, 6, 7, 8, 12]:
-            # This is an azimuth-elevation mount
-            mount = 'AZEL'
-        # Reprocess coordinates, plus remove any -99 points
-        good, = np.where(np.logical_and(outdict['dra'][i] > -90, outdict['ddec'][i] > -90))
-        npt = len(good)
-        az = np.zeros(npt)
-        el = np.zeros(npt)
-        dxel = np.zeros(npt)
-        d_el = np.zeros(npt)
-        dra = outdict['dra'][i,good]
-        ddec = outdict['ddec'][i,good]
-        ra = outdict['ra'][good]
-        dec = outdict['dec'][good]
-        ha = outdict['ha'][good]
-        times = outdict['time'][good]
-        params_old = outdict['params_old'][:,i]
-        # el_r = []
-        for k in range(npt):
-            # Convert RA, Dec to Az, El, and dRA, dDec to dxel and d_el
-            azk, elk = cc.radec2azel(ra[k], dec[k], times[k])
-            # Apply refraction correction (assumes elevation in degrees)
-            # This is commented out, pending determination of whether refraction is already
-            # accounted for in the measurements (I think it is...)
-            #elk /= dtor  # Convert to degrees
-            #elp = elk+(1/60.)*(0.0019279 + 1.02/tan((elk + 10.3/(el+5.1))*dtor))
-            #elp *= dtor # Convert back to radians
-            #el_r.append(elp)
-            # Adjust coordinates (only needed for AZEL, but do for EQ, too for consistency)
-            dxelk, d_elk = cc.dradec2dazel(ra[k],dec[k],times[k],dra[k]*dtor,ddec[k]*dtor)
-            az[k] = azk
-            el[k] = elk
-            dxel[k] = dxelk / dtor
-            d_el[k] = d_elk / dtor
-        indict = {'filename':outdict['filename'],'ant':ant, 'dra':dra, 'ddec':ddec, 'dxel': dxel, 'd_el':d_el, 'ra':ra, 
-                  'dec':dec, 'ha':ha, 'az':az, 'el':el, 'mount':mount, 'times':times, 
-                  'params_old':params_old}
-        # indict.update({'el_r':el_r})    # Refraction-corrected elevation
-        indict = mntcal(indict)
+        indict = ant_points(outdict, ant)
+        indict = mntcal(indict, nsigma=nsigma)
         indict = checkfit(indict)
         indict_list.append(indict.copy())
     return indict_list   # Temporary
-    
+
+def season_mountcal(filenames, ant_str=None, nsigma=3., nthreads=8):
+    ''' Fit the pointing measurements in a list of calpnt files (e.g. a season
+        of observations) together, for each antenna.  The files are read in
+        parallel with nthreads threads.  Only the files whose old pointing
+        parameters for an antenna are the same as those of the last file are
+        used for that antenna, since the measured offsets are relative to them.
+        
+        Returns a dictionary, keyed by antenna number, of the mntcal() output
+        for each antenna, which includes 'params', 'params_err', 'good', and
+        'params_new' (the old parameters updated by the fit).  No plots are made.
+    '''
+    from concurrent.futures import ThreadPoolExecutor
+    from eovsapy.util import ant_str2list
+    with ThreadPoolExecutor(max_workers=nthreads) as pool:
+        outdicts = [out for out in pool.map(rd_calpnt, filenames) if out is not None]
+    if outdicts == []:
+        return {}
+    outdicts.sort(key=lambda out: out['time'][0].mjd)
+    if ant_str:
+        antlist = ant_str2list(ant_str)+1
+    else:
+        antlist = sorted(set(ant for out in outdicts for ant in out['antlist']))
+    results = {}
+    for ant in antlist:
+        pts = [ant_points(out, ant) for out in outdicts if ant in out['antlist']]
+        if pts == []:
+            continue
+        pts = [pt for pt in pts if np.array_equal(pt['params_old'], pts[-1]['params_old']) and len(pt['az']) > 0]
+        if pts == []:
+            continue
+        indict = pts[-1].copy()
+        for key in ['dra', 'ddec', 'dxel', 'd_el', 'ra', 'dec', 'ha', 'az', 'el']:
+            indict[key] = np.concatenate([pt[key] for pt in pts])
+        indict['times'] = [t for pt in pts for t in pt['times']]
+        if len(indict['az'])*2 <= 8:
+            print('Too few points to fit antenna',ant)
+            continue
+        indict = mntcal(indict, nsigma=nsigma)
+        p = indict['params']
+        if indict['mount'] == 'AZEL':
+            p = np.insert(p,5,0.0)
+        else:
+            p = np.insert(p,8,0.0)
+        indict.update({'params_new':indict['params_old'] + (p*10000).astype(int)})
+        results[ant] = indict
+    return results
@@ -70,6 +70,10 @@
 #      does almost the same thing using the FDB files.  Calling get_projects()
 #      with nosql=True also works.  The __main__ routine has some changes
 #      to avoid reading from SQL.
+#   2026-Oct-19  SY
+#      xdata_display() now finds the latest NormalObserving scan and its files
+#      with a query of the scan catalogue (scandb.py), instead of reading and
+#      concatenating two FDB files and comparing scan ID strings.
 #
 import numpy as np
 from .util import Time,get_idbdir
@@ -166,7 +170,7 @@ def flare_monitor(t):
     return ut[good],flm[good],projdict
 
 def xdata_display(t,ax=None):
-    ''' Given the time as a Time object, search the FDB file for files
+    ''' Given the time as a Time object, search the scan catalogue for files
         associated with the scan for that time and create a dynamic spectrogram
         on the axis specified by ax, or on a new plot if no ax. If the requested
         time is more than 10 minutes after the last file of that scan, returns
@@ -179,40 +183,22 @@ def xdata_display(t,ax=None):
     from . import read_idb as ri
     from . import spectrogram_fit as sp
 
-    fdb = dt.rd_fdb(t)
-    # Get files from next day, in case scan extends past current day
-    t1 = Time(t.mjd + 1,format='mjd')
-    fdb1 = dt.rd_fdb(t1)
-    # Concatenate the two days (if the second day exists)
-    if fdb1 != {}:
-        for key in list(fdb.keys()):
-            fdb[key] = np.concatenate((fdb[key],fdb1[key]))
-            
-    # Find unique scan IDs
-    scans, idx = np.unique(fdb['SCANID'],return_index=True)
+    from eovsapy import scandb
 
-    # Limit to scans in 'NormalObserving' mode
-    good, = np.where(fdb['PROJECTID'][idx] == 'NormalObserving')
-    if len(good) > 0:
-        scans = scans[good]
-    else:
+    # Find NormalObserving scans starting from the previous day up to the current time
+    scans = scandb.scanlist(Time([int(t.mjd) - 1, t.mjd],format='mjd'), project='NormalObserving')
+    if len(scans['scanid']) == 0:
         print('No NormalObserving scans found.')
         return None, None, None, None
 
-    # Find scanID that starts earlier than, but closest to, the current time
-    for i,scan in enumerate(scans):
-        print(scan)
-        dt = t - Time(time.strftime('%Y-%m-%d %H:%M:%S',time.strptime(scan,'%y%m%d%H%M%S')))
-        if dt.sec > 0.:
-            iout = i
-    scan = scans[iout]
+    # The last of these is the scanID that starts earlier than, but closest to, the current time
+    scan = scans['scanid'][-1]
 
     # Find files for this scan
-    fidx, = np.where(fdb['SCANID'] == scan)
+    files = np.array([os.path.basename(f) for f in scans['files'][-1]])
     tlevel = None
     bflag = None
-    if len(fidx) > 0:
-        files = fdb['FILE'][fidx]
+    if len(files) > 0:
         # Find out how old last file of this scan is, and proceed only if less than 20 minutes
         # earlier than the time given in t.
         try:
@@ -82,6 +82,20 @@
 #      Added a legend to each plot in prt_dla().
 #   2021-Jul-02  DG
 #      Change font size in legend in prt_dla().
+#   2026-Oct-19  SY
+#      fname2time() now parses the filename with eovsapy.fasttime.fname2mjd(),
+#      and imports Time from eovsapy.util (there is no util module here).
+#      rd_jspec() now maps the whole capture file as an array of prt_dtype()
+#      records and fills the outputs with array indexing, rather than unpacking
+#      one packet at a time.  The old version is kept as rd_jspec_loop(), for
+#      comparison in the new bench_rd_jspec().
+#      Added rd_spec_boards(), which reads the P packets of all boards from a pcap
+#      file in one pass and decodes them with array operations.  rd_spec() uses it
+#      for ptype 'P', and capture() now reads each of the eth2 and eth3 files only
+#      once (instead of once per board).
+#      Added iter_spec(), which streams a pcap file and yields blocks of spectra as
+#      accumulations are completed, and reduce_spec(), which reduces them (e.g.
+#      running mean or maximum) without holding the whole capture in memory.
 
 import numpy as np
 import pdb
@@ -251,6 +265,83 @@ def list_header(filename,ptype='P',boardID=None,verbose=False):
                                 lines.append(line)
     return lines
 
+def _pspectra(rec):
+    ''' Returns the scaled powers p and powers-squared p2 of the P packets rec
+        (array of prt_dtype(42, 898) records), each of size [npkt, 16, 4], where
+        the 16 channels of each packet are in order, and the last axis is
+        p1x, p1y, p2x, p2y.
+    '''
+    # Powers are in 8 groups, each of 2 channels of p1x,p1y,p2x,p2y
+    pI = rec['pI']['v'].reshape(-1, 8, 4, 2).transpose(0, 1, 3, 2).reshape(-1, 16, 4)
+    pQ = rec['pQ']['v'].reshape(-1, 8, 4, 2).transpose(0, 1, 3, 2).reshape(-1, 16, 4)
+    return pI/(2.**14), pQ/(2.**44)
+
+def _pspec_board(rec, nsec):
+    ''' Distributes the P packets rec (an array of prt_dtype(42, 898) records, in
+        capture order, all from one board) into an array of size [nsec*50, 4096, 8],
+        in the same way as the packet loop of rd_spec() used to: an accumulation
+        is saved (to its AccumNum slot) when the first packet (PacketNum 0) of the
+        next accumulation arrives, and the second is advanced when that next
+        AccumNum is 0.  The last accumulation in the file is not saved.
+    '''
+    outarr = np.zeros([nsec,50,4096,8],'float')
+    n = rec['PacketNum'].astype(int)
+    acc = rec['AccumNum'].astype(int)
+    # Packets at which the previous accumulation is saved
+    isave, = np.where(n[1:] == 0)
+    isave += 1
+    if len(isave) > 0:
+        # Accumulation number and second of each save
+        asave = acc[isave-1]
+        ssave = np.cumsum(acc[isave] == 0) - (acc[isave] == 0)
+        # Accumulation (segment) that each packet belongs to
+        seg = np.searchsorted(isave, np.arange(len(n)), side='right')
+        # A later save to the same [second, accum] overwrites an earlier one
+        slot = ssave*50 + asave
+        _, ilast = np.unique(slot[::-1], return_index=True)
+        good_seg = np.zeros(len(isave), bool)
+        good_seg[len(isave) - 1 - ilast] = True
+        good_seg &= ssave < nsec
+        # Within an accumulation, a later packet with the same PacketNum overwrites an earlier one
+        k, = np.where(seg < len(isave))
+        k = k[good_seg[seg[k]]]
+        key = seg[k]*65536 + n[k]
+        _, ilast = np.unique(key[::-1], return_index=True)
+        k = k[len(k) - 1 - ilast]
+        p, p2 = _pspectra(rec[k])
+        chan = n[k,None]*16 + np.arange(16)
+        isec = ssave[seg[k]][:,None]
+        a = asave[seg[k]][:,None]
+        outarr[isec, a, chan, :4] = p
+        outarr[isec, a, chan, 4:] = p2
+    sout = outarr.shape
+    outarr.shape = (sout[0]*sout[1],sout[2],sout[3])
+    return outarr
+
+def rd_spec_boards(filename, boardIDs=[0,1,4,5], verbose=False):
+    ''' Reads the P and P^2 packets of all boards in the list boardIDs from a
+        packet capture file in a single pass, and returns a dictionary of the
+        [nsec*50, 4096, 8] float arrays of each board (keyed by board ID), each
+        the same as that returned by rd_spec(filename, 'P', boardID).
+    '''
+    import dpkt
+    with open(filename,'rb') as f:
+        pcap = dpkt.pcap.Reader(f)
+        pkts = pcap.readpkts()
+    t0 = pkts[0][0]  # initial packet timestamp
+    t1 = pkts[-1][0] # final packet timestamp
+    nsec = int(t1) - int(t0) + 1
+    # Keep only the P packets, as one array of records
+    pbuf = b''.join([buf for t, buf in pkts if len(buf) == 898])
+    del pkts
+    rec = np.frombuffer(pbuf, dtype=prt_dtype(42, 898))
+    if verbose: print(len(rec),'P packets read from',filename)
+    bid = rec['BoardID']
+    out = {}
+    for boardID in boardIDs:
+        out[boardID] = _pspec_board(rec[bid == boardID], nsec)
+    return out
+
 def rd_spec(filename,ptype='P',boardID=0,nboards=2,verbose=False):
     ''' Read all spectra in a packet capture file according to ptype and board ID.
         If ptype = 'P', read P and P^2 packets only, and returns a float
@@ -273,25 +364,13 @@ def rd_spec(filename,ptype='P',boardID=0,nboards=2,verbose=False):
     '''
     import dpkt, struct
 
-    def pspectra(power):
-        p = np.array(power)
-        # idx is array([0,1, 16,17, 32,33, 48,49, 64,65, 80,81, 96,97, 112,113])
-        idx = np.array(list(zip(np.arange(0,128,16),np.arange(0,128,16)+1))).flatten()
-        # Distribute P, P2 into their spectra
-        p1x = p[idx]/(2.**14)
-        p1y = p[idx+2]/(2.**14)
-        p2x = p[idx+4]/(2.**14)
-        p2y = p[idx+6]/(2.**14)
-        P1x = p[idx+8]/(2.**44)
-        P1y = p[idx+10]/(2.**44)
-        P2x = p[idx+12]/(2.**44)
-        P2y = p[idx+14]/(2.**44)
-        return p1x,p1y,p2x,p2y,P1x,P1y,P2x,P2y
+    if ptype == 'P':
+        # P packets are decoded all at once by rd_spec_boards()
+        return rd_spec_boards(filename, [boardID], verbose)[boardID]
 
     f = open(filename,'rb')
     pcap = dpkt.pcap.Reader(f)
     hdr = '<HHHHIHHHHHHHHHHHHHH4I4Q'
-    pp2 = '8I8Q8I8Q8I8Q8I8Q8I8Q8I8Q8I8Q8I8Q'
     xfmt = '704h'
     khdr = ['HeaderLength','PacketNum','FFTShift','AccumLength','GlobalAccumNum',
             'BoardID','AccumNum','DataType','PolType','Ai','Aj','ADCOverflow',
@@ -320,17 +399,7 @@ def rd_spec(filename,ptype='P',boardID=0,nboards=2,verbose=False):
             xaccum = h['AccumNum']
             pktnum = h['PacketNum']
             t0 = a  # Initial X packet timestamp
-    if ptype is 'P':
-        outarr = np.zeros([nsec,50,4096,8],'float')
-        p1x = np.zeros(4096,'float')
-        p1y = np.zeros(4096,'float')
-        p2x = np.zeros(4096,'float')
-        p2y = np.zeros(4096,'float')
-        P1x = np.zeros(4096,'float')
-        P1y = np.zeros(4096,'float')
-        P2x = np.zeros(4096,'float')
-        P2y = np.zeros(4096,'float')
-    elif ptype is 'X':
+    if ptype is 'X':
         # In case of short capture packets, create the proper xfmt string.
         # The 130 is the 42-byte tcp packet header + 88 byte CASPER header.
         # The if statement is in case the capture buffer is not an even
@@ -352,52 +421,10 @@ def rd_spec(filename,ptype='P',boardID=0,nboards=2,verbose=False):
     for j in range(npkt):
         if verbose: print('working on packet',j,'\r', end=' ')
         t, buf = out[j]
-        if ptype is 'P' and len(buf) == 898:
-            # This is a P packet
-            header = struct.unpack(hdr,buf[42:130])
-            h = dict(list(zip(khdr,header)))
-            n = h['PacketNum']
-            if  h['BoardID'] == boardID:
-                if n == 0:
-                    # Beginning of accumulation sample, so save the old one
-                    # unless this is the first time through, indicated when a 
-                    # is an impossible number (-1)
-                    if a != -1:
-                        outarr[isec,a,:,0] = p1x
-                        outarr[isec,a,:,1] = p1y
-                        outarr[isec,a,:,2] = p2x
-                        outarr[isec,a,:,3] = p2y
-                        outarr[isec,a,:,4] = P1x
-                        outarr[isec,a,:,5] = P1y
-                        outarr[isec,a,:,6] = P2x
-                        outarr[isec,a,:,7] = P2y
-                        p1x = np.zeros(4096,'float')
-                        p1y = np.zeros(4096,'float')
-                        p2x = np.zeros(4096,'float')
-                        p2y = np.zeros(4096,'float')
-                        P1x = np.zeros(4096,'float')
-                        P1y = np.zeros(4096,'float')
-                        P2x = np.zeros(4096,'float')
-                        P2y = np.zeros(4096,'float')
-                        if h['AccumNum'] == 0: 
-                            # Beginning of a new second
-                            isec += 1
-                a = h['AccumNum']
-                power = struct.unpack(pp2,buf[-768:])
-                p1x_,p1y_,p2x_,p2y_,P1x_,P1y_,P2x_,P2y_ = pspectra(power)
-                p1x[n*16:(n+1)*16] = p1x_ 
-                p2x[n*16:(n+1)*16] = p2x_ 
-                p1y[n*16:(n+1)*16] = p1y_ 
-                p2y[n*16:(n+1)*16] = p2y_ 
-                P1x[n*16:(n+1)*16] = P1x_ 
-                P1y[n*16:(n+1)*16] = P1y_ 
-                P2x[n*16:(n+1)*16] = P2x_ 
-                P2y[n*16:(n+1)*16] = P2y_
-        elif ptype is 'X' and len(buf) > 898:
+        if ptype is 'X' and len(buf) > 898:
             # This is an X packet from the production correlator
             header = struct.unpack(hdr,buf[42:130])
             h = dict(list(zip(khdr,header)))
-            n = h['PacketNum']
             # Override AccumNum with value based on packet timestamp, since
             # AccumNum is currently messed up.
             # This assumes packets coming out at 1-s mark were accumulated in
@@ -421,16 +448,168 @@ def rd_spec(filename,ptype='P',boardID=0,nboards=2,verbose=False):
     outarr.shape = (sout[0]*sout[1],sout[2],sout[3])
     return outarr
 
+def iter_spec(filename, ptype='P', boardID=0, nblock=50, verbose=False):
+    ''' Reads a packet capture file as a stream, and yields blocks of up to nblock
+        accumulations as they are completed, so that memory use does not depend on
+        the length of the capture.  Each block is a tuple (slot, spec), where spec
+        is an array of size [m, 4096, nch] (m <= nblock accumulations) and slot is
+        the array of m accumulation slots (second*50 + accumulation number) of
+        the rows, counted from the start of the file.
+        
+        If ptype = 'P', spec holds the P and P^2 spectra of board boardID, with nch = 8
+        columns p1x, p1y, p2x, p2y, P1x, P1y, P2x, P2y, as for rd_spec().  Scattering
+        the rows into slots of an [nsec*50, 4096, 8] array gives the same result as
+        rd_spec().  If ptype = 'X', spec holds the complex X data for all baselines
+        and poln products in the packets (nch values per channel), with the
+        accumulation number calculated from the packet timestamp, as in rd_spec().
+    '''
+    import dpkt
+    if ptype not in ['P', 'X']:
+        print('Invalid ptype: must be "P" or "X"')
+        return
+    dt = prt_dtype(42, 898)
+    nch = 8
+    x1 = None
+    block = None
+    slots = []
+    pending = []
+    isec = 0
+    a = -1
+
+    def decode(pending):
+        # Decode the packets of one accumulation into a [4096, nch] spectrum.  A later
+        # packet for the same channels overwrites an earlier one.
+        if ptype == 'P':
+            rec = np.frombuffer(b''.join(pending), dtype=dt)
+            n = rec['PacketNum'].astype(int)
+            _, ilast = np.unique(n[::-1], return_index=True)
+            k = len(n) - 1 - ilast
+            p, p2 = _pspectra(rec[k])
+            spec = np.zeros((4096, nch), 'float')
+            chan = n[k,None]*16 + np.arange(16)
+            spec[chan, :4] = p
+            spec[chan, 4:] = p2
+        else:
+            raw = np.frombuffer(b''.join(pending), dtype=np.uint8).reshape(len(pending), x1)
+            ifreq = raw[:, 72:74].copy().view('<u2')[:,0]
+            xdata = raw[:, 130:x1].copy().view('<i4').reshape(len(pending), nch, 2)
+            spec = np.zeros((4096, nch), 'complex')
+            spec[ifreq] = (xdata[..., 0] + 1j*xdata[..., 1]).astype('complex64')
+        return spec
+
+    with open(filename,'rb') as f:
+        pcap = dpkt.pcap.Reader(f)
+        for t, buf in pcap:
+            if ptype == 'P':
+                if len(buf) != 898:
+                    continue
+                h = np.frombuffer(buf, dtype=dt)[0]
+                if h['BoardID'] != boardID:
+                    continue
+                save = h['PacketNum'] == 0 and a != -1
+                anew = int(h['AccumNum'])
+            else:
+                if len(buf) <= 898:
+                    continue
+                if x1 is None:
+                    # Number of complex values per channel, from the first X packet
+                    nch = (len(buf) - 130)//8
+                    x1 = 130 + nch*8
+                if len(buf) < x1:
+                    continue
+                buf = buf[:x1]
+                # Calculated accumulation number (packets coming out at the 1-s mark
+                # were accumulated in the previous 20 ms, hence -2)
+                anew = int(t*100 - 2)//2 % 50
+                save = anew != a and a != -1
+            if save:
+                if block is None:
+                    block = np.zeros((nblock, 4096, nch), 'float' if ptype == 'P' else 'complex')
+                block[len(slots)] = decode(pending)
+                slots.append(isec*50 + a)
+                pending = []
+                if (ptype == 'P' and anew == 0) or (ptype == 'X' and anew == 0 and a == 49):
+                    # Beginning of a new second
+                    isec += 1
+                if len(slots) == nblock:
+                    if verbose: print('yielding accumulations', slots[0], 'to', slots[-1])
+                    yield np.array(slots), block
+                    block = None
+                    slots = []
+            a = anew
+            pending.append(buf)
+    if ptype == 'X' and pending != []:
+        # X accumulations are complete when the file ends
+        if block is None:
+            block = np.zeros((nblock, 4096, nch), 'complex')
+        block[len(slots)] = decode(pending)
+        slots.append(isec*50 + a)
+    if slots != []:
+        yield np.array(slots), block[:len(slots)]
+
+def reduce_spec(filename, reducer='mean', ptype='P', boardID=0, nblock=50, verbose=False):
+    ''' Reduces the spectra of a packet capture file block by block, as they are
+        read by iter_spec(), without holding the full [nt, 4096, nch] array.  The
+        reducer can be 'mean' or 'max', which return the mean or maximum spectrum
+        [4096, nch] over all accumulations, or a function f(state, slot, spec) that
+        is called for each block (with state None the first time) and returns the
+        new state, which is returned at the end.
+    '''
+    if reducer == 'mean':
+        def reducer(state, slot, spec):
+            if state is None:
+                return [spec.sum(0), len(slot)]
+            state[0] += spec.sum(0)
+            state[1] += len(slot)
+            return state
+        state = reduce_spec(filename, reducer, ptype, boardID, nblock, verbose)
+        if state is None:
+            return None
+        return state[0]/state[1]
+    if reducer == 'max':
+        def reducer(state, slot, spec):
+            if state is None:
+                return spec.max(0)
+            return np.maximum(state, spec.max(0), out=state)
+    state = None
+    for slot, spec in iter_spec(filename, ptype, boardID, nblock, verbose):
+        state = reducer(state, slot, spec)
+    return state
+
 def fname2time(filename):
     ''' Parses standard filename string for date and returns it as Time() object
     '''
-    from .util import Time
-    fstem = filename.split('/')[-1]
-    fstr = fstem[3:7] + '-' + fstem[7:9] + '-' + fstem[9:11] + ' ' + fstem[11:13] + ':' + fstem[
-                                                                                          13:15] + ':' + fstem[
-                                                                                                         15:17]
-    t = Time(fstr)
-    return t
+    from eovsapy.util import Time
+    from eovsapy.fasttime import fname2mjd
+    return Time(fname2mjd([filename])[0], format='mjd')
+
+# Names of the 88-byte header fields of the correlator packets
+prt_khdr = ['HeaderLength','PacketNum','FFTShift','AccumLength','GlobalAccumNum',
+            'BoardID','AccumNum','DataType','PolType','Ai','Aj','ADCOverflow',
+            'QuantClipNum','NSubbands','iFreq','Delay0','Delay1','Delay2','Delay3',
+            'PX0','PY0','PX1','PY1','P2X0','P2Y0','P2X1','P2Y1']
+
+def prt_dtype(offset=0, itemsize=4440):
+    ''' Returns the numpy structured dtype of one correlator packet of length
+        itemsize bytes, whose 88-byte header starts at byte offset.  The default
+        is a 4440-byte record of a Jim McT (PRT) capture file, while pcap packets
+        have a 42-byte network header (offset=42), and P packets are 898 bytes.
+        The header (format '<HHHHIHHHHHHHHHHHHHH4I4Q', field names in prt_khdr) is
+        followed by either a P-packet payload of 8 groups of 8 uint32 powers and
+        8 uint64 powers-squared (fields 'pI' and 'pQ', each of shape (8, 8)), or
+        an X-packet payload of (real, imag) int32 values for the 4 polns of each
+        baseline (field 'xd', 136 x 4 x 2 for a full X packet).  The two payloads
+        overlap.
+    '''
+    fmts = ['<u2']*4 + ['<u4'] + ['<u2']*14 + ['<u4']*4 + ['<u8']*4
+    offsets = [offset + int(off) for off in np.cumsum([0] + [np.dtype(fmt).itemsize for fmt in fmts[:-1]])]
+    # Each 96-byte group of the P payload is 8I followed by 8Q
+    pgroup_I = np.dtype({'names':['v'], 'formats':[('<u4', 8)], 'offsets':[0], 'itemsize':96})
+    pgroup_Q = np.dtype({'names':['v'], 'formats':[('<u8', 8)], 'offsets':[32], 'itemsize':96})
+    names = prt_khdr + ['pI', 'pQ', 'xd']
+    fmts += [(pgroup_I, 8), (pgroup_Q, 8), ('<i4', ((itemsize - offset - 88)//32, 4, 2))]
+    offsets += [offset + 88]*3
+    return np.dtype({'names':names, 'formats':fmts, 'offsets':offsets, 'itemsize':itemsize})
 
 def rd_jspec(filename):
     ''' Read all spectra in a Jim McT capture file
@@ -445,6 +624,129 @@ def rd_jspec(filename):
           'phdr': Select power-packet header information, [16, 3, 50]
                   where the 3 values are average power X, average power Y, 
                   and overflow state.
+          'delays': Delays from the power-packet headers, [16, 2, 50]
+          
+        The whole file is mapped as an array of prt_dtype() records, and the P
+        and X packets are distributed into the output arrays all at once.  See
+        bench_rd_jspec() for a comparison with the packet-by-packet version.
+    '''
+    import os
+    t = fname2time(filename)
+    bl_order = get_bl_order(16)
+    iauto = []
+    icross = np.zeros((16,16),dtype='I')
+    for i, bl in enumerate(bl_order):
+        if bl[0] == bl[1]:
+            iauto.append(i)
+        else:
+            icross[bl[0],bl[1]] = i*4
+    iauto = np.array(iauto)
+    # Baseline index (in the packet) of each cross-correlation, in output order
+    icross = icross[icross.nonzero()]//4
+
+    outauto  = np.zeros(( 16, 4, 4096, 50),dtype='complex64')
+    outcross = np.zeros((120, 4, 4096, 50),dtype='complex64')
+    outp     = np.zeros(( 16, 2, 4096, 50),dtype='float'    )
+    outp2    = np.zeros(( 16, 2, 4096, 50),dtype='float'    )
+    outphdr  = np.zeros(( 16, 3, 50), dtype='int')
+    outdla   = np.zeros(( 16, 2, 50), dtype='int')
+    out = {'p':outp,'p2':outp2,'a':outauto,'x':outcross,'phdr':outphdr,'delays':outdla, 'time': t}
+    # Get number of packets from file size
+    npkt = os.stat(filename).st_size//4440
+    if npkt == 0:
+        return out
+    rec = np.memmap(filename, dtype=prt_dtype(), mode='r', shape=(npkt,))
+    dtype = np.asarray(rec['DataType'])
+
+    # P packets
+    ip, = np.where(dtype == 0)
+    if len(ip) > 0:
+        h = rec[ip]
+        n = h['PacketNum'].astype(int)
+        ant = h['BoardID'].astype(int)*2
+        a = h['AccumNum'].astype(int)
+        # Header information from the first packet of each accumulation
+        k, = np.where(n == 0)
+        ovfl = h['ADCOverflow'][k]
+        outphdr[ant[k],   :, a[k]] = np.array((h['PX0'][k],h['PY0'][k],ovfl)).T
+        outphdr[ant[k]+1, :, a[k]] = np.array((h['PX1'][k],h['PY1'][k],ovfl)).T
+        outdla[ ant[k],   :, a[k]] = np.array((h['Delay0'][k],h['Delay1'][k])).T
+        outdla[ ant[k]+1, :, a[k]] = np.array((h['Delay2'][k],h['Delay3'][k])).T
+        # Powers are in 8 groups, each of 2 channels of p1x,p1y,p2x,p2y.  Reorder
+        # to [packet, (p1x,p1y,p2x,p2y), channel] (16 channels per packet)
+        pI = h['pI']['v'].reshape(-1, 8, 4, 2).transpose(0, 2, 1, 3).reshape(-1, 4, 16)
+        pQ = h['pQ']['v'].reshape(-1, 8, 4, 2).transpose(0, 2, 1, 3).reshape(-1, 4, 16)
+        chan = n[:,None]*16 + np.arange(16)
+        ai = a[:,None]
+        for j, (da, pol) in enumerate([(0, 0), (0, 1), (1, 0), (1, 1)]):
+            outp[ ant[:,None]+da, pol, chan, ai] = pI[:,j]/(2.**14)
+            outp2[ant[:,None]+da, pol, chan, ai] = pQ[:,j]/(2.**44)
+
+    # X packets
+    ix, = np.where(dtype == 1)
+    if len(ix) > 0:
+        h = rec[ix]
+        a = h['AccumNum'].astype(int)
+        ifreq = h['iFreq'].astype(int)
+        xd = h['xd']
+        cxdata = np.empty(xd.shape[:-1], dtype='complex64')
+        cxdata.real = xd[..., 0]
+        cxdata.imag = xd[..., 1]
+        cxdata /= 2**6
+        outauto[ :, :, ifreq, a] = cxdata[:, iauto].transpose(1, 2, 0)
+        outcross[:, :, ifreq, a] = cxdata[:, icross].transpose(1, 2, 0)
+    del rec
+    return out
+
+def bench_rd_jspec(npkt=4000, filename=None, seed=0):
+    ''' Benchmarks rd_jspec() against the packet-by-packet rd_jspec_loop() on a
+        synthetic capture file of npkt random P and X packets (4440 bytes each),
+        written to filename (default is a temporary PRT file, which is removed
+        afterwards).  Prints the decode times and whether the outputs are
+        identical, and returns the two times [s].
+    '''
+    import os, time, tempfile
+    rng = np.random.default_rng(seed)
+    rec = np.zeros(npkt, dtype=prt_dtype())
+    raw = rec.view(np.uint8).reshape(npkt, 4440)
+    raw[:, 88:] = rng.integers(0, 256, (npkt, 4440-88), dtype=np.uint8)
+    rec['HeaderLength'] = 88
+    rec['DataType'] = rng.integers(0, 2, npkt)
+    rec['AccumNum'] = rng.integers(0, 50, npkt)
+    rec['BoardID'] = rng.integers(0, 8, npkt)
+    rec['PacketNum'] = rng.integers(0, 256, npkt)
+    rec['iFreq'] = rng.integers(0, 4096, npkt)
+    for key in ['ADCOverflow','Delay0','Delay1','Delay2','Delay3','PX0','PY0','PX1','PY1']:
+        rec[key] = rng.integers(0, 2**16, npkt)
+    # Make the (board, accumulation, packet number) and (accumulation, frequency)
+    # of each packet unique, so that the result does not depend on packet order
+    _, iu = np.unique(np.array([rec['DataType'], rec['BoardID'], rec['AccumNum'], rec['PacketNum']]), axis=1, return_index=True)
+    _, ixu = np.unique(np.array([rec['DataType'], rec['AccumNum'], rec['iFreq']]), axis=1, return_index=True)
+    keep = np.zeros(npkt, bool)
+    keep[np.intersect1d(iu, ixu)] = True
+    rec['DataType'][~keep] = 2     # Unknown packet type, which is skipped
+    tmp = filename is None
+    if tmp:
+        fd, filename = tempfile.mkstemp(prefix='PRT20190621000000')
+        os.close(fd)
+    rec.tofile(filename)
+    try:
+        t0 = time.time()
+        out1 = rd_jspec_loop(filename)
+        t1 = time.time()
+        out2 = rd_jspec(filename)
+        t2 = time.time()
+    finally:
+        if tmp:
+            os.remove(filename)
+    same = all([np.array_equal(out1[k], out2[k]) for k in ['p','p2','a','x','phdr','delays']])
+    print('rd_jspec_loop: {:.3f} s, rd_jspec: {:.3f} s for {:d} packets. Identical: {}'.format(t1-t0, t2-t1, npkt, same))
+    return t1-t0, t2-t1
+
+def rd_jspec_loop(filename):
+    ''' Read all spectra in a Jim McT capture file, one packet at a time.  This is
+        the original (slow) version of rd_jspec(), kept as a reference for
+        bench_rd_jspec().  See rd_jspec() for the output.
     '''
     import struct, os
     t = fname2time(filename)
@@ -485,7 +787,7 @@ def rd_jspec(filename):
             'QuantClipNum','NSubbands','iFreq','Delay0','Delay1','Delay2','Delay3',
             'PX0','PY0','PX1','PY1','P2X0','P2Y0','P2X1','P2Y1']
     # Get number of packets from file size
-    npkt = os.stat(filename).st_size/4440
+    npkt = os.stat(filename).st_size//4440
     outauto  = np.zeros(( 16, 4, 4096, 50),dtype='complex64')
     outcross = np.zeros((120, 4, 4096, 50),dtype='complex64')
     outp     = np.zeros(( 16, 2, 4096, 50),dtype='float'    )
@@ -688,14 +990,11 @@ def capture(filename='dump',nsec=1,ptype='P',snaplen=5000,overwrite=True):
         command = 'tcpdump -i eth3 -c '+str(153600*nsec)+' -w eth3_'+filename+'.pcap -s '+str(snaplen)
         sendcmd(command)
     if ptype == 'P':
-        out1 = rd_spec('eth2_'+filename+'.pcap',ptype=ptype,boardID=0)
-        out2 = rd_spec('eth2_'+filename+'.pcap',ptype=ptype,boardID=1)
-        out5 = rd_spec('eth2_'+filename+'.pcap',ptype=ptype,boardID=4)
-        out6 = rd_spec('eth2_'+filename+'.pcap',ptype=ptype,boardID=5)
-        out3 = rd_spec('eth3_'+filename+'.pcap',ptype=ptype,boardID=2)
-        out4 = rd_spec('eth3_'+filename+'.pcap',ptype=ptype,boardID=3)
-        out7 = rd_spec('eth3_'+filename+'.pcap',ptype=ptype,boardID=6)
-        out8 = rd_spec('eth3_'+filename+'.pcap',ptype=ptype,boardID=7)
+        # Read each interface file once for all of its boards
+        eth2 = rd_spec_boards('eth2_'+filename+'.pcap', [0,1,4,5])
+        eth3 = rd_spec_boards('eth3_'+filename+'.pcap', [2,3,6,7])
+        out1, out2, out5, out6 = [eth2[b] for b in [0,1,4,5]]
+        out3, out4, out7, out8 = [eth3[b] for b in [2,3,6,7]]
         outall=[out1,out2,out3,out4,out5,out6,out7,out8]
         nt2, nf, nif = out2.shape #captured package dimensions for interface eth2
         nt3, nf, nif = out3.shape #captured package dimensions for interface eth3
@@ -717,7 +1016,7 @@ def capture(filename='dump',nsec=1,ptype='P',snaplen=5000,overwrite=True):
             outall[i] = np.rollaxis(outall[i],2,0)
             #out = np.rollaxis(out,2,1)
             nif, nt, nf = outall[i].shape
-            outall[i].shape = (2,nif/4,2,nt,nf)
+            outall[i].shape = (2,nif//4,2,nt,nf)
         out = np.concatenate(outall,1)
         outp=out[0,:,:,:,:]
         outp2=out[1,:,:,:,:]
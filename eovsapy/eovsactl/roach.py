@@ -87,8 +87,23 @@
 #   2017-Jun-07  DG
 #       Set the extraneous 8-bit pktdla in swreg_ctrl_x to 0, since it is the 16-bit
 #       one in swreg_pkt_fft that is actually used.
-
-import corr, qdr, struct, numpy, time, copy, sys
+#   2026-Oct-19  SY
+#       Added Fleet class, which runs register reads/writes, equalizer uploads,
+#       attenuation settings, etc. on all ROACHes in parallel threads, with a
+#       per-board timeout and a report of results and errors, and FakeFpga class,
+#       an in-process stand-in for the FPGA client (with adjustable latency) for
+#       testing it.  Roach() now takes an optional fpga client.  arm(), reload()
+#       and set_eq_all() now use Fleet.
+#   2026-Oct-19  SY
+#       calc_eq() is now vectorized over antennas, polarizations and time
+#       slots, with the per-band medians done as one grouped reduction.  The
+#       original is kept as calc_eq_loop(), and bench_calc_eq() compares the
+#       two.  adj_eq_auto() connects to the ROACHes once, no longer deep-copies
+#       the data on each iteration, and passes the coefficients in use to
+#       calc_eq() (it was always using the default of 16).
+
+import corr, qdr, struct, numpy, time, copy, sys, threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import urllib.request, urllib.error, urllib.parse, subprocess
 from ftplib import FTP
 from katcp import Message
@@ -98,7 +113,7 @@ from .util import Time
 # Start of ROACH object definition
 # ========================
 class Roach():
-    def __init__(self, roach_ip=None, boffile=None):
+    def __init__(self, roach_ip=None, boffile=None, fpga=None):
 
         # Some initializations to be added to ROACH object
         self.sdev = [0]*4
@@ -129,6 +144,16 @@ class Roach():
             # Probably 'solar.pvt' was not included, so add it
             roach_ip += '.solar.pvt'
 
+        if fpga is not None:
+            # Use the supplied client (e.g. a FakeFpga()) as is, with no
+            # boffile lookup or sensor reads
+            self.fpga = fpga
+            self.roach_ip = roach_ip
+            self.boffile = boffile
+            self.ants = None
+            self.msg = 'Using supplied FPGA client'
+            return
+
         # This is the handle for communicating with ROACH
         fpga = corr.katcp_wrapper.FpgaClient(roach_ip,timeout=3)
         # Allow time for connection
@@ -1052,6 +1077,242 @@ class Roach():
                 self.fpga.write(eqname[iant,ipol],coefficients.tostring())
         self.msg = 'Success'
    
+#======= FakeFpga ========
+class FakeFpga():
+    ''' In-process stand-in for corr.katcp_wrapper.FpgaClient, for testing
+        Fleet operations (and other code that uses roach.fpga) without a
+        ROACH.  Software registers are kept in self.regs, and BRAMs (e.g.
+        the equalizer coefficients) as bytearrays in self.mem.  Every call
+        is logged in self.calls and waits for self.latency seconds, which
+        can be a number or a function of (method, name) returning one.
+        Setting self.connected to False makes every call raise an error,
+        as for a board that does not respond.
+    '''
+    def __init__(self, host='roach1.solar.pvt', latency=0.0, connected=True):
+        self.host = host
+        self.latency = latency
+        self.connected = connected
+        self.regs = {}
+        self.mem = {}
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def _call(self, method, name=None):
+        if callable(self.latency):
+            lat = self.latency(method, name)
+        else:
+            lat = self.latency
+        if lat > 0:
+            time.sleep(lat)
+        with self.lock:
+            self.calls.append((method, name))
+        if not self.connected:
+            raise RuntimeError('Request '+method+' '+str(name)+' to '+self.host+' timed out')
+
+    def is_connected(self):
+        return self.connected
+
+    def wait_connected(self, timeout=None):
+        return self.connected
+
+    def write_int(self, device_name, integer, blindwrite=False, word_offset=0):
+        self._call('write_int', device_name)
+        self.regs[device_name, word_offset] = int(integer) & 0xffffffff
+
+    def read_uint(self, device_name, word_offset=0):
+        self._call('read_uint', device_name)
+        return self.regs.get((device_name, word_offset), 0)
+
+    def read_int(self, device_name, word_offset=0):
+        self._call('read_int', device_name)
+        val = self.regs.get((device_name, word_offset), 0)
+        if val >= 2**31:
+            val -= 2**32
+        return val
+
+    def write(self, device_name, data, offset=0):
+        self._call('write', device_name)
+        with self.lock:
+            mem = self.mem.setdefault(device_name, bytearray())
+            if len(mem) < offset + len(data):
+                mem.extend(bytes(offset + len(data) - len(mem)))
+            mem[offset:offset+len(data)] = data
+
+    def read(self, device_name, size, offset=0):
+        self._call('read', device_name)
+        with self.lock:
+            mem = bytes(self.mem.get(device_name, b''))
+        buf = mem[offset:offset+size]
+        return buf + bytes(size - len(buf))
+
+    def listdev(self):
+        self._call('listdev')
+        return sorted(set([key[0] for key in self.regs]) | set(self.mem))
+
+    def est_brd_clk(self):
+        self._call('est_brd_clk')
+        return 200.0
+
+    def stop(self):
+        pass
+
+#======= Fleet ========
+class Fleet():
+    ''' Runs the same operation on a list of ROACH objects in parallel threads
+        (one per board unless nthreads is given), instead of one board after
+        the other.  Each operation returns a report dictionary:
+            'roach'   list of the roach_ip of each board
+            'result'  list of the values returned for each board (None on error)
+            'error'   list of error messages for each board (None if no error)
+            'dt'      array of the time taken for each board [s]
+            'ok'      True if there were no errors
+        A board that takes longer than timeout seconds is reported as timed
+        out (its thread is left to finish on its own, which the katcp client
+        timeout ensures), so that one hung board does not hold up the rest.
+    '''
+    def __init__(self, roach_list, timeout=10.0, nthreads=None):
+        self.roach_list = roach_list
+        self.timeout = timeout
+        self.nthreads = nthreads
+
+    def _run(self, tasks, timeout=None):
+        ''' Calls each of the functions in the list tasks (with no arguments) in
+            the thread pool, and returns the report dictionary.
+        '''
+        if timeout is None:
+            timeout = self.timeout
+        n = len(tasks)
+        names = [getattr(roach, 'roach_ip', None) or str(roach) for roach in self.roach_list]
+        result = [None]*n
+        error = [None]*n
+        tstart = [None]*n
+        dt = numpy.zeros(n)
+
+        def task(i):
+            tstart[i] = time.time()
+            try:
+                return tasks[i]()
+            finally:
+                dt[i] = time.time() - tstart[i]
+
+        nthreads = self.nthreads or max(n, 1)
+        pool = ThreadPoolExecutor(nthreads)
+        futures = dict([(pool.submit(task, i), i) for i in range(n)])
+        pending = set(futures)
+        # Boards that are queued behind hung ones cannot wait forever
+        tlast = time.time() + timeout*((n + nthreads - 1)//nthreads)
+        while pending:
+            # Each board is allowed timeout seconds from when it starts
+            now = time.time()
+            deadline = min([tstart[futures[f]] + timeout for f in pending
+                            if tstart[futures[f]] is not None] + [tlast])
+            done, pending = wait(pending, timeout=max(deadline - now, 0), return_when=FIRST_COMPLETED)
+            for f in done:
+                i = futures[f]
+                try:
+                    result[i] = f.result()
+                except Exception as e:
+                    error[i] = str(e) or type(e).__name__
+            now = time.time()
+            for f in list(pending):
+                i = futures[f]
+                if now >= tlast or (tstart[i] is not None and now >= tstart[i] + timeout):
+                    f.cancel()
+                    error[i] = 'Timed out after '+str(timeout)+' s'
+                    dt[i] = now - (tstart[i] or now)
+                    pending.discard(f)
+        pool.shutdown(wait=False)
+        ok = all([err is None for err in error])
+        return {'roach':names, 'result':result, 'error':error, 'dt':dt.copy(), 'ok':ok}
+
+    def run(self, func, *args, **kwargs):
+        ''' Calls func(roach, *args, **kwargs) for each ROACH in the list, and
+            returns the report dictionary.  A timeout keyword, if given,
+            overrides self.timeout for this call.
+        '''
+        timeout = kwargs.pop('timeout', None)
+        tasks = [(lambda roach=roach: func(roach, *args, **kwargs)) for roach in self.roach_list]
+        return self._run(tasks, timeout)
+
+    def show(self, rpt):
+        ''' Print a one-line summary of the report rpt for each board.
+        '''
+        for i in range(len(rpt['roach'])):
+            if rpt['error'][i] is None:
+                print(rpt['roach'][i], '{:7.3f} s'.format(rpt['dt'][i]), rpt['result'][i])
+            else:
+                print(rpt['roach'][i], '{:7.3f} s'.format(rpt['dt'][i]), 'Error:', rpt['error'][i])
+
+    def is_connected(self):
+        return self.run(lambda roach: roach.fpga.is_connected())
+
+    def write_int(self, name, val, offset=0):
+        ''' Write the same value val to software register name on every board.
+        '''
+        return self.run(lambda roach: roach.fpga.write_int(name, val, word_offset=offset))
+
+    def read_int(self, name, offset=0):
+        return self.run(lambda roach: roach.fpga.read_int(name, offset))
+
+    def write(self, name, data, offset=0):
+        return self.run(lambda roach: roach.fpga.write(name, data, offset))
+
+    def read(self, name, size, offset=0):
+        return self.run(lambda roach: roach.fpga.read(name, size, offset))
+
+    def load(self, boffile=None, config=True):
+        ''' Load (and normally configure) each board with boffile, or with the
+            board's own boffile if None.  The results are the roach.msg values.
+        '''
+        def load(roach):
+            roach.load(boffile=boffile or roach.boffile, config=config)
+            return roach.msg
+        return self.run(load)
+
+    def config(self):
+        def config(roach):
+            roach.config()
+            return roach.msg
+        return self.run(config)
+
+    def set_eq_array(self, co, update=False):
+        ''' Set the equalizer gains of the boards from the array co of
+            coefficients with dimensions (2*nroach, pol, band[, subband]),
+            i.e. two antennas per board in the order of the roach list.
+        '''
+        def set_eq(roach, coeff):
+            roach.set_eq_array(coeff=coeff, update=update)
+            return roach.msg
+        tasks = [(lambda roach=roach, i=i: set_eq(roach, numpy.array(co[i*2:i*2+2], dtype=complex)))
+                 for i, roach in enumerate(self.roach_list)]
+        return self._run(tasks)
+
+    def get_attn(self, sdev_target=30.0, grab=None):
+        ''' Measure the ADC levels of all boards.  The result for each board
+            is (sdev, db, dbnew), as attached to the roach object.
+        '''
+        def get_attn(roach):
+            roach.get_attn(sdev_target, grab)
+            return list(roach.sdev), list(roach.db), list(roach.dbnew)
+        return self.run(get_attn)
+
+    def set_attn(self, sdev_target=30.0, update=False):
+        ''' Set the ADC attenuation of all boards (see Roach.set_attn()).  The
+            result for each board is (sdev, db), as attached to the roach object.
+        '''
+        def set_attn(roach):
+            roach.set_attn(sdev_target, update)
+            return list(roach.sdev), list(roach.db)
+        return self.run(set_attn)
+
+def fake_fleet(n=8, latency=0.0, timeout=10.0):
+    ''' Returns a Fleet of n ROACH objects connected to FakeFpga() clients
+        with the given latency, for testing.
+    '''
+    roach_list = [Roach('roach'+str(i+1), fpga=FakeFpga('roach'+str(i+1)+'.solar.pvt', latency))
+                  for i in range(n)]
+    return Fleet(roach_list, timeout=timeout)
+
 #======= arm ========
 def arm(roach_list=None):
         ''' Arm all ROACH boards as simultaneously as possible, just
@@ -1070,9 +1331,11 @@ def arm(roach_list=None):
             return
 
         # Check connection to each board prior to arming
+        fleet = Fleet(roach_list, timeout=2.0)
+        rpt = fleet.is_connected()
         ngood = 0
-        for roach in roach_list:
-            if roach.fpga.is_connected():
+        for i,roach in enumerate(roach_list):
+            if rpt['result'][i]:
                 ngood += 1
             else:
                 print('Roach',roach.roach_ip,'not connected!')        
@@ -1085,19 +1348,22 @@ def arm(roach_list=None):
         time.sleep(1 - (time.time() % 1) + 0.1)
         # Predict future time when accumulations start
         tacc0 = Time(Time.now().iso[:19]).mjd + 2./86400.  # experience shows that arm occurs at 2nd tick
-        for roach in roach_list:
-            roach.fpga.write_int('swreg_arm',3)
+        # Arm all boards at once, rather than one after the other
+        rpt = fleet.write_int('swreg_arm',3)
         time.sleep(0.1)
-        for roach in roach_list:
-            roach.fpga.write_int('swreg_arm',0)
+        fleet.write_int('swreg_arm',0)
+        if not rpt['ok']:
+            fleet.show(rpt)
 
         # Should be armed.  Wait for next 1 PPS pulse and check result
         time.sleep(2.0)
         
         # Check if synchronized
-        for roach in roach_list:
-            sync = roach.fpga.read_int('sync')
-            if sync:
+        rpt = fleet.read_int('sync')
+        for i,roach in enumerate(roach_list):
+            if rpt['error'][i] is not None:
+                print(roach.roach_ip,'synced = unknown:',rpt['error'][i])
+            elif rpt['result'][i]:
                 print(roach.roach_ip,'synced =',True)
             else:
                 print(roach.roach_ip,'synced =',False)
@@ -1167,30 +1433,40 @@ def reload(roach_list=None,pcycle=False):
 
     # If ips is True, create ROACH objects from ip addresses
     if ips:
-        # Loop over roach list and replace ip address with ROACH object
-        for i,roach in enumerate(roach_list):
-            roach_list[i] = Roach(roach)
+        # Connect to all boards at once, and replace ip address with ROACH object
+        rpt = Fleet(roach_list, timeout=30.0).run(Roach)
+        for i,roach in enumerate(rpt['result']):
+            if roach is None:
+                print(roach_list[i],'could not create ROACH object:',rpt['error'][i])
+                return
+            roach_list[i] = roach
             print(roach_list[i].roach_ip,'boffile status',roach_list[i].msg)
 
-    # Now loop over ROACH object list to (re)load boffile
+    # Now (re)load boffile on all boards at once
+    fleet = Fleet(roach_list, timeout=120.0)
+    rpt = fleet.load()
     for i, roach in enumerate(roach_list):
-        roach.load(boffile=roach_list[i].boffile)
-        print(roach.roach_ip,'status',roach.msg)
+        print(roach.roach_ip,'status',rpt['result'][i] or rpt['error'][i])
         
     # All set, so arm the boards
     arm(roach_list)
     # Sleep for two seconds, then arm X-engine
     #time.sleep(2)
     # Take the 10 GbE cores out of reset
-    for roach in roach_list:
-        roach.fpga.write_int( 'swreg_rst', 0 )
-
-    for roach in roach_list:
-        ctrl = roach.fpga.read_int('swreg_ctrl')
-        print('SWREG_CTRL is originally:',ctrl)
-        roach.fpga.write_int('swreg_ctrl',ctrl+1)
-        ctrl = roach.fpga.read_int('swreg_ctrl')
-        print('SWREG_CTRL is now:',ctrl)
+    fleet.timeout = 10.0
+    fleet.write_int( 'swreg_rst', 0 )
+
+    def ctrl_on(roach):
+        ctrl0 = roach.fpga.read_int('swreg_ctrl')
+        roach.fpga.write_int('swreg_ctrl',ctrl0+1)
+        return ctrl0, roach.fpga.read_int('swreg_ctrl')
+    rpt = fleet.run(ctrl_on)
+    for i, roach in enumerate(roach_list):
+        if rpt['error'][i] is None:
+            print('SWREG_CTRL is originally:',rpt['result'][i][0])
+            print('SWREG_CTRL is now:',rpt['result'][i][1])
+        else:
+            print(roach.roach_ip,'SWREG_CTRL error:',rpt['error'][i])
 
     # Sleep for 2 s, then get current mcount on first roach
     time.sleep(2)
@@ -1203,12 +1479,12 @@ def reload(roach_list=None,pcycle=False):
     # Set mcount to desired start value
     mc = mcstart
     # Set mcount_start in all roaches for 16 s from now
-    for roach in roach_list:
-        roach.fpga.write_int('vacc_target_mcnt',mc)
-        roach.fpga.write_int('swreg_mcount_start',mc)
+    fleet.write_int('vacc_target_mcnt',mc)
+    fleet.write_int('swreg_mcount_start',mc)
     time.sleep(16)
+    rpt = fleet.read_int('rx_mcount_fx0',0)
     for i,roach in enumerate(roach_list):
-        print('MCount for roach',i,roach.fpga.read_int('rx_mcount_fx0',0))
+        print('MCount for roach',i,rpt['result'][i])
 
 # Helper routines that are not part of the ROACH object
 #======= rd_ini ========
@@ -1373,40 +1649,44 @@ def adj_eq_auto(niter=2,co_in=None,do_plot=False):
     import matplotlib.pyplot as plt
     if co_in is None:
         co_in = numpy.zeros((16,2,34))+16.    # initialize equalizer coefficients to 16
+    # Connect to the ROACHes once for all iterations
+    roach_list = Fleet(['roach'+str(i+1) for i in range(8)], timeout=30.0).run(Roach)['result']
+    # Neither set_eq_all() nor calc_eq() modify their inputs, so the arrays from
+    # each iteration are simply handed on to the next, without copying
     co0=co_in
-    set_eq_all(co=copy.deepcopy(co0))
+    set_eq_all(roach_list,co=co0)
     po0, ac0, fseq0 = jcap_data()
     if do_plot:
         plot_apratio(po=po0,ac=ac0,co=co0,fseq=fseq0,lineplot=True)
         plt.show()
     for i in range(niter):
         print('Iteration: '+str(i+1))
-        # adjust new equalizer coefficients
-        co1 = calc_eq(po=po0, ac=ac0, fseq=fseq0)
+        # adjust new equalizer coefficients, relative to those in use
+        co0 = calc_eq(po=po0, ac=ac0, co=co0, fseq=fseq0)
         # apply new equalizer coefficients
-        set_eq_all(co=copy.deepcopy(co1))
+        set_eq_all(roach_list,co=co0)
         # check output
-        po1, ac1, fseq1 = jcap_data()
+        po0, ac0, fseq0 = jcap_data()
         if do_plot:
-            plot_apratio(po=po1,ac=ac1,co=co1,fseq=fseq1,lineplot=True)
+            plot_apratio(po=po0,ac=ac0,co=co0,fseq=fseq0,lineplot=True)
             plt.show()
-        co0=copy.deepcopy(co1)
-        po0=copy.deepcopy(po1)
-        ac0=copy.deepcopy(ac1)
-        fseq0=copy.deepcopy(fseq1)
-    co_out=co1
-    return co_out
+    return co0
 
 def set_eq_all(roach_list=None,co=None,verbose=False):
     if roach_list is None:
-        roach_list = [Roach('roach'+str(i+1)) for i in range(8)]
+        roach_list = Fleet(['roach'+str(i+1) for i in range(8)], timeout=30.0).run(Roach)['result']
     if co is None:
         co = numpy.zeros((16,2,34))+16.
     print('setting equalizer levels for all 8 ROACHes...')
-    for i in range(8): 
-        if verbose:
-            print('roach '+str(i+1)+' is connected? ', roach_list[i].fpga.is_connected())
-        roach_list[i].set_eq_array(coeff=co[i*2:i*2+2,:,:])
+    fleet = Fleet(roach_list[:8], timeout=30.0)
+    if verbose:
+        rpt = fleet.is_connected()
+        for i in range(len(fleet.roach_list)):
+            print('roach '+str(i+1)+' is connected? ', rpt['result'][i])
+    rpt = fleet.set_eq_array(co)
+    if verbose or not rpt['ok']:
+        fleet.show(rpt)
+    return rpt
 
 def jcap_data():
     import glob,dbutil
@@ -1433,7 +1713,55 @@ def jcap_data():
     ac=out['a']
     return po, ac, fseq
 
+def _nanmedian(a):
+    ''' Median over the last axis of array a, ignoring NaNs, as numpy.nanmedian()
+        but by sorting the whole array at once (NaNs sort to the end).
+    '''
+    a = numpy.sort(a, axis=-1)
+    n = numpy.sum(~numpy.isnan(a), axis=-1)[...,None]
+    lo = numpy.take_along_axis(a, numpy.maximum((n-1)//2, 0), axis=-1)[...,0]
+    hi = numpy.take_along_axis(a, n//2, axis=-1)[...,0]
+    return numpy.where(n[...,0] > 0, (lo + hi)/2., numpy.nan)
+
 def calc_eq(po=None, ac=None, co=numpy.zeros((16,2,34))+16., fseq=None, rminmax=[0.5,2.]):
+    ''' Calculate new equalizer coefficients from the total power po [nant, npol, nchan, nt]
+        and auto-correlations ac [nant, >=npol, nchan, nt] returned by pcapture2.rd_jspec(),
+        given the coefficients co [nant, npol, 34] in use and the IF band (1-34) of each
+        time slot fseq [nt].  For each time slot, the median ratio of the (upper half of
+        the) auto-correlation to the total power, scaled by 64*co**2, is found, and
+        the coefficient for that band is doubled if the ratio is below rminmax[0], or
+        halved if it is above rminmax[1].  The new coefficient of each band is the
+        median over its time slots.  All antennas, polarizations and time slots are
+        done at once, and the per-band medians in one grouped reduction.
+    '''
+    (nant,nx,nchan,nt)=po.shape
+    nifb=34
+    ifb = numpy.asarray(fseq)[:nt] - 1
+    co_t = co[:,:,ifb]                                  # Coefficient in use in each time slot
+    # Ratios as [nant, nx, nt, nchan/2], so that the median is over the last axis
+    ratio = (abs(ac[:,:nx,2048:])/po[:,:,2048:]).transpose(0,1,3,2)/64./co_t[:,:,:,None]**2.
+    # Zero ratios are ignored, as are NaNs
+    ratio[ratio == 0] = numpy.nan
+    rmed = _nanmedian(ratio)                            # [nant, nx, nt]
+    fin = numpy.isfinite(rmed)
+    co_new = numpy.where(fin & (rmed < rminmax[0]), co_t*2., numpy.where(fin & (rmed > rminmax[1]), co_t*0.5, co_t))
+    # Gather the time slots of each band into a NaN-padded [nant, nx, nifb, nmax] array
+    band = ifb % nifb
+    order = numpy.argsort(band, kind='stable')
+    count = numpy.bincount(band, minlength=nifb)
+    start = numpy.cumsum(count) - count
+    grouped = numpy.full((nant, nx, nifb, max(count.max(), 1)), numpy.nan)
+    grouped[:, :, band[order], numpy.arange(nt) - start[band[order]]] = co_new[:, :, order]
+    co_out = numpy.array(co, dtype=float)
+    has = count > 0
+    co_out[:, :, has] = numpy.nanmedian(grouped[:, :, has], axis=3)
+    co_out[numpy.isnan(co_out)] = 16.
+    return co_out
+
+def calc_eq_loop(po=None, ac=None, co=numpy.zeros((16,2,34))+16., fseq=None, rminmax=[0.5,2.]):
+    ''' The original, loop-based version of calc_eq(), kept as a reference for
+        bench_calc_eq().
+    '''
     (nant,nx,nchan,nt)=po.shape
     nifb=34
     co_in=co
@@ -1468,6 +1796,37 @@ def calc_eq(po=None, ac=None, co=numpy.zeros((16,2,34))+16., fseq=None, rminmax=
             co_out[numpy.isnan(co_out)]=16.
     return co_out
 
+def bench_calc_eq(nt=50, seed=0):
+    ''' Benchmarks calc_eq() against calc_eq_loop() on synthetic data shaped like the
+        output of pcapture2.rd_jspec() (po [16, 2, 4096, nt], ac [16, 4, 4096, nt]),
+        with random coefficients, IF band sequence and power/auto-correlation ratios
+        (including some zero and NaN channels).  Prints the times and whether the
+        coefficients are identical, and returns the two times [s].
+    '''
+    rng = numpy.random.default_rng(seed)
+    co = 2.**rng.integers(2, 6, (16,2,34))
+    co[0,0,5] = numpy.nan
+    fseq = rng.integers(1, 35, nt)
+    fseq[:3] = 7
+    po = rng.uniform(1.e3, 2.e3, (16,2,4096,nt))
+    # Ratio of each time slot, spanning both sides of the thresholds
+    r = numpy.exp(rng.normal(0., 1., (16,2,1,nt)))
+    a = po[:,:,None]*64.*co[:,:,fseq-1][:,:,None,None,:]**2.*r[:,:,None]*rng.uniform(0.9, 1.1, (16,2,1,4096,nt))
+    ac = numpy.zeros((16,4,4096,nt), dtype='complex64')
+    ac[:,:2] = a[:,:,0]
+    ac[:,2:] = a[:,:,0]*1j
+    ac[:,:,2048:2500] = 0.
+    ac[3,1,:,4] = 0.
+    po[5,0,3000:,7] = numpy.nan
+    t0 = time.time()
+    co1 = calc_eq_loop(po=po, ac=ac, co=co, fseq=fseq)
+    t1 = time.time()
+    co2 = calc_eq(po=po, ac=ac, co=co, fseq=fseq)
+    t2 = time.time()
+    same = numpy.array_equal(co1, co2)
+    print('calc_eq_loop: {:.3f} s, calc_eq: {:.3f} s for {:d} time slots. Identical: {}'.format(t1-t0, t2-t1, nt, same))
+    return t1-t0, t2-t1
+
 def plot_apratio(po=None,ac=None,co=numpy.zeros((16,2,34))+16.,fseq=None,lineplot=False):
     import matplotlib.pylab as plt
     # compare the auto-corr packets with P packets
@@ -32,6 +32,15 @@
 #   2022-Mar-14  DG
 #     Changes to use the new Chan_Info object defined in chan_info_52 to 
 #     implement a fast FLARE mode.
+#   2026-Oct-19  SY
+#     Default Antpos is taken from the cached ant_xyz() positions, rather than
+#     creating a new eovsa_array() object on every call.
+#   2026-Oct-19  SY
+#     The scan header layout is now defined once, in sh_layout, and compiled
+#     by ScanHeaderPacker into a single struct.Struct with precomputed offsets,
+#     which fills a reusable buffer in place, and a cached XML description.
+#     Defaults are calculated only when the entry is missing.  Added
+#     bench_scan_header() to compare with packing the items one at a time.
 #
 import struct,sys
 from .sun_pos import *
@@ -43,864 +52,510 @@ from .eovsa_array import *
 from .eovsa_lst import *
 from ftplib import FTP
 
-def scan_header(sh_dict,datfile='/nas4/Tables/scanheader/scan_header.dat'):
-    '''Writes the state frame header file from the scan header dictionary 
-       created by the schedule. Returns file names datfile and xmlfile 
-       corresponding to the output files in the /tmp directory that are 
-       created by this routine and are updated at the start of each scan.  
-       The format string fmt can be used with struct.unpack() to read 
-       the data file /tmp/scan_header.dat, although that usage is not 
-       anticipated except for testing.
-
-       This routine does something sensible even if the supplied
-       dictionary sh_dict is empty (i.e. is {}).
+# Scan header layout.  Each entry is (name, dims, fmt, xml), in the order the
+# items go in the file, where name is the key of the item in the dictionary
+# returned by sh_values(), dims is the (constant) list of array dimensions
+# that precede the data as unsigned ints, fmt is the struct format of the data,
+# and xml is the item's description in the XML file.  The whole layout is
+# compiled once by ScanHeaderPacker.
+
+def _xml_scalar(tag, name):
+    return '<'+tag+'>\n<Name>'+name+'</Name>\n<Val></Val>\n</'+tag+'>\n'
+
+def _xml_string(name, n):
+    return ('<Array>\n<Name>'+name+'</Name>\n<Dimsize>'+str(n)+'</Dimsize>\n'
+            '<U8>\n<Name></Name>\n<Val></Val>\n</U8>\n</Array>\n')
+
+_katadc_xml = ('<Array>\n<Name>KatADC</Name>\n<Dimsize>8</Dimsize>\n'
+               '<Cluster>\n<Name/>\n<NumElts>6</NumElts>\n'
+               + _xml_scalar('U32','Status')
+               + _xml_scalar('SGL','Temp.adc0')
+               + _xml_scalar('SGL','Temp.adc1')
+               + _xml_scalar('SGL','Temp.ambient0')
+               + _xml_scalar('SGL','Temp.ambient1')
+               + _xml_scalar('SGL','BoardClock')
+               + '</Cluster>\n</Array>\n')
+
+_gain_dims = '<Dimsize>2</Dimsize><Dimsize>511</Dimsize><Dimsize>16</Dimsize><Dimsize>2</Dimsize>'
+
+sh_layout = [
+    ('Timestamp', [], 'd', _xml_scalar('DBL','Timestamp')),
+    ('Version', [], 'd', '<DBL>\n<Name>Version</Name>\n<Val>{version}</Val>\n</DBL>\n'),
+    ('Project', [32], '32s', _xml_string('Project',32)),
+    ('Operator', [16], '16s', _xml_string('Operator',16)),
+    ('Comments', [120], '120s', _xml_string('Comments',120)),
+    ('HVersion', [8], '8s', _xml_string('HVersion',8)),
+    ('SVersion', [8], '8s', _xml_string('SVersion',8)),
+    ('Nants', [], 'I', '<U32><Name>Nants</Name><Val></Val></U32>'),
+    ('Antlist', [16], '16I', '<Array>\n<Name>Antlist</Name>\n<Dimsize>16</Dimsize>\n'
+                             '<U32>\n<Name></Name>\n<Val></Val>\n</U32>\n</Array>\n'),
+    ('Antpos', [3,16], '48d', '<Array>\n<Name>Antpos</Name>\n<Dimsize>3</Dimsize>\n<Dimsize>16</Dimsize>'
+                              '<DBL>\n<Name></Name>\n<Val></Val>\n</DBL>\n</Array>\n'),
+    ('PrimaryBeam', [16], '16f', '<Array>\n<Name>PrimaryBeam</Name>\n<Dimsize>16</Dimsize>'
+                                 '<SGL>\n<Name></Name>\n<Val></Val>\n</SGL>\n</Array>\n'),
+    ('Mount', [16], '16i', '<Array>\n<Name>Mount</Name>\n<Dimsize>16</Dimsize>'
+                           '<I32>\n<Name></Name>\n<Val></Val>\n</I32>\n</Array>\n'),
+    ('ScanID', [12], '12s', _xml_string('ScanID',12)),
+    ('ScanType', [12], '12s', _xml_string('ScanType',12)),
+    ('SourceID', [12], '12s', _xml_string('SourceID',12)),
+    ('TrackMode', [6], '6s', _xml_string('TrackMode',6)),
+    ('Epoch', [4], '4s', _xml_string('Epoch',4)),
+    ('RA', [], 'd', _xml_scalar('DBL','RA')),
+    ('Dec', [], 'd', _xml_scalar('DBL','Dec')),
+    ('dRA', [], 'd', _xml_scalar('DBL','dRA')),
+    ('dDec', [], 'd', _xml_scalar('DBL','dDec')),
+    ('HA', [], 'd', _xml_scalar('DBL','HA')),
+    ('dHA', [], 'd', _xml_scalar('DBL','dHA')),
+    ('Ephem', [3,3], '9d', '<Array>\n<Name>Ephem</Name>\n<Dimsize>3</Dimsize>\n<Dimsize>3</Dimsize>'
+                           '<DBL>\n<Name></Name>\n<Val></Val>\n</DBL>\n</Array>\n'),
+    ('SunInfo', [3], '3f', '<Array>\n<Name>SunInfo</Name>\n<Dimsize>3</Dimsize>\n'
+                           '<SGL>\n<Name></Name>\n<Val></Val>\n</SGL>\n</Array>\n'),
+    ('SatEphem', [3,20], '60d', '<Array>\n<Name>SatEphem</Name>\n<Dimsize>3</Dimsize>\n<Dimsize>20</Dimsize>'
+                                '<DBL>\n<Name></Name>\n<Val></Val>\n</DBL>\n</Array>\n'),
+    ('Pol', [], '4i', ''.join([_xml_scalar('I32','Pol'+str(i)) for i in range(1,5)])),
+    ('UT1UTC', [], 'd', _xml_scalar('DBL','UT1UTC')),
+    ('IDBMaxFileSize', [], 'I', _xml_scalar('U32','IDBMaxFileSize')),
+    ('IDBStem', [14], '14s', _xml_string('IDBStem',14)),
+    ('IDBStart', [14], '14s', _xml_string('IDBStart',14)),
+    ('TimeAtAcc0', [], 'd', _xml_scalar('DBL','TimeAtAcc0')),
+    ('DurSpecFrame', [], 'I', _xml_scalar('U32','DurSpecFrame')),
+    ('Intval', [], 'I', _xml_scalar('U32','Intval')),
+    ('NIntval', [], 'I', _xml_scalar('U32','NIntval')),
+    ('FSeqList', [50], '50d', '<Array>\n<Name>FSeqList</Name>\n<Dimsize>50</Dimsize>'
+                              '<DBL>\n<Name></Name>\n<Val></Val>\n</DBL>\n</Array>\n'),
+    ('SubBW', [], 'd', _xml_scalar('DBL','SubBW')),
+    ('Nchan', [], 'I', _xml_scalar('U32','Nchan')),
+    ('fGHz', [511], '511d', '<Array>\n<Name>fGHz</Name>\n<Dimsize>511</Dimsize>'
+                            '<DBL>\n<Name></Name>\n<Val></Val>\n</DBL>\n</Array>\n'),
+    ('ChanWidths', [511], '511d', '<Array>\n<Name>ChanWidths</Name>\n<Dimsize>511</Dimsize>'
+                                  '<DBL>\n<Name></Name>\n<Val></Val>\n</DBL>\n</Array>\n'),
+    ('Chan2Wide', [4096,50], '204800H', '<Array>\n<Name>Chan2Wide</Name>\n<Dimsize>4096</Dimsize><Dimsize>50</Dimsize>'
+                                        '<U16>\n<Name></Name>\n<Val></Val>\n</U16>\n</Array>\n'),
+    ('Chanmask', [4096,50], '204800B', '<Array>\n<Name>Chanmask</Name>\n<Dimsize>4096</Dimsize><Dimsize>50</Dimsize>'
+                                       '<B8>\n<Name></Name>\n<Val></Val>\n</B8>\n</Array>\n'),
+    ('SKGuard', [], 'I', _xml_scalar('U32','SKGuard')),
+    ('SKMode', [], 'I', _xml_scalar('U32','SKMode')),
+    ('SKLims', [], '2d', _xml_scalar('DBL','SKLimLo') + _xml_scalar('DBL','SKLimHi')),
+    ('GainTable', [2,511,16,2], '32704d', '<Array>\n<Name>GainTable</Name>\n'+_gain_dims
+                                          +'<DBL>\n<Name></Name>\n<Val></Val>\n</DBL>\n</Array>\n'),
+    ('GainUpdate', [2,511,16,2], '32704d', '<Array>\n<Name>GainUpdate</Name>\n'+_gain_dims
+                                           +'<DBL>\n<Name></Name>\n<Val></Val>\n</DBL>\n</Array>\n'),
+    ('Attn0', [], 'I', _xml_scalar('U32','Attn0')),
+    ('AttnStep', [], 'I', _xml_scalar('U32','AttnStep')),
+    ('KatADC', [8], 'I5f'*8, _katadc_xml),
+]
+
+# Numpy types corresponding to the struct format characters
+_np_type = {'d':'<f8', 'f':'<f4', 'I':'<u4', 'i':'<i4', 'H':'<u2', 'B':'u1', 's':'u1'}
+
+class ScanHeaderPacker():
+    ''' The scan header layout sh_layout, compiled once into a single
+        (little-endian) struct.Struct, with the byte offset of each item,
+        and a reusable buffer of the full scan header length in which the
+        constant array dimensions are already filled in.  Items with a single
+        type are filled in place through numpy views of the buffer, and others
+        (KatADC) by a precompiled Struct.pack_into() at their offset.
+    '''
+    def __init__(self, layout=sh_layout):
+        self.layout = layout
+        fmt = '<'
+        self.items = []
+        for name, dims, dfmt, xml in layout:
+            fmt += 'I'*len(dims)
+            offset = struct.calcsize(fmt)
+            fmt += dfmt
+            self.items.append((name, dims, dfmt, offset))
+        self.struct = struct.Struct(fmt)
+        self.fmt = fmt
+        self.size = self.struct.size
+        self.buf = bytearray(self.size)
+        self.offsets = {}
+        self.views = []
+        for name, dims, dfmt, offset in self.items:
+            if dims != []:
+                struct.pack_into('<'+'I'*len(dims), self.buf, offset-4*len(dims), *dims)
+            self.offsets[name] = offset
+            codes = [c for c in dfmt if not c.isdigit()]
+            if len(set(codes)) == 1:
+                count = struct.calcsize('<'+dfmt)//struct.calcsize('<'+codes[0])
+                view = np.frombuffer(self.buf, _np_type[codes[0]], count, offset)
+                self.views.append((name, view, codes[0] == 's'))
+            else:
+                self.views.append((name, struct.Struct('<'+dfmt), None))
+        self.xml_cache = {}
+
+    def pack(self, values):
+        ''' Fills the buffer from the dictionary of values returned by
+            sh_values(), and returns it.  Arrays shorter than the layout
+            are zero-filled, and strings are null-padded.  The buffer is
+            reused by the next call, so write it out (or copy it) first.
+        '''
+        for name, view, isstr in self.views:
+            item = values[name]
+            if isstr is None:
+                view.pack_into(self.buf, self.offsets[name], *item)
+            elif isstr:
+                n = min(len(item), len(view))
+                view[n:] = 0
+                view[:n] = np.frombuffer(item, np.uint8, n)
+            elif view.size == 1:
+                view[0] = item
+            else:
+                item = np.asarray(item).ravel()
+                n = min(item.size, view.size)
+                view[:n] = item[:n]
+                view[n:] = 0
+        return self.buf
+
+    def unpack(self, buf):
+        ''' Returns the flat tuple of values in the scan header buffer buf
+            (for testing).
+        '''
+        return self.struct.unpack(buf)
+
+    def xml(self, version):
+        ''' Returns the XML description of the scan header for the given
+            schedule version, which is made only once for each version.
+        '''
+        key = str(version)
+        if key not in self.xml_cache:
+            self.xml_cache[key] = ('<Cluster>\n<Name>Scan_Header</Name><NumElts>54</NumElts>'
+                                   + ''.join([item[3] for item in self.layout]).replace('{version}',key)
+                                   + '</Cluster>\n')
+        return self.xml_cache[key]
+
+_packer = None
+
+def get_packer():
+    ''' Returns the ScanHeaderPacker, which is compiled on the first call.
+    '''
+    global _packer
+    if _packer is None:
+        _packer = ScanHeaderPacker()
+    return _packer
+
+def _bytes(s):
+    if isinstance(s, str):
+        return s.encode('latin-1')
+    return s
+
+def sh_values(sh_dict):
+    ''' Returns the dictionary of scan header values (keyed by the names in
+        sh_layout) from the scan header dictionary created by the schedule,
+        filling in the default for each entry that is missing.  Defaults that
+        need a calculation (ephemeris, UT1-UTC, channel info) are calculated
+        only when needed.
     '''
     dtor = pi/180.
-    xmlfile = datfile[:-4]+'.xml'
-    f = open(datfile,'wb')
-    xml = open(xmlfile,'w')
-    xml.write('<Cluster>\n')
-    xml.write('<Name>Scan_Header</Name>')
-    xml.write('<NumElts>54</NumElts>')
-
-    fmt = ''
-    buf = ''
-    
+    dt = util.Time.now()
+    v = {}
     # Scan Header Timestamp (double) [s, in LabVIEW format]
     # To be compatible with other timestamps in the stateframe, this
     # will be in LabVIEW format, which is s since 1904/01/01 (don't ask).
-    item = sh_dict.get('timestamp',0.0)
-    fmt = '<d'
-    buf = struct.pack('d',item)
-    f.write(buf)
-    xml.write('<DBL>\n')
-    xml.write('<Name>Timestamp</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</DBL>\n')
-    
+    v['Timestamp'] = sh_dict.get('timestamp',0.0)
     # Schedule version (double) [N/A]
-    # Version of the schedule/scan header stateframe.
-    item = sh_dict.get('Version',0.4)
-    fmt += 'd'
-    buf = struct.pack('d',item)
-    f.write(buf)
-    xml.write('<DBL>\n')
-    xml.write('<Name>Version</Name>\n')
-    xml.write('<Val>'+str(item)+'</Val>\n')
-    xml.write('</DBL>\n')
-
+    v['Version'] = sh_dict.get('Version',0.4)
     # Project (ascii, length 32 string)
     # Purpose of observations (correlator testing, routine observations)
-    # Project is always the first thing added, so open the file
-    # Default is 'NormalObserving'
-    item = sh_dict.get('project','NormalObserving')
-    fmt += 'I32s'
-    buf = struct.pack('I32s',32,item)
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>Project</Name>\n')
-    xml.write('<Dimsize>32</Dimsize>\n<U8>\n<Name></Name>\n<Val></Val>\n</U8>\n')
-    xml.write('</Array>\n')
-
+    v['Project'] = _bytes(sh_dict.get('project','NormalObserving'))
     # Operator (ascii, length 16 string)
-    # Default is 'Kjell Nelin'
-    item = sh_dict.get('operator','Kjell Nelin')
-    fmt += 'I16s'
-    buf = struct.pack('I16s',16,item)
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>Operator</Name>\n')
-    xml.write('<Dimsize>16</Dimsize>\n<U8>\n<Name></Name>\n<Val></Val>\n</U8>\n')
-    xml.write('</Array>\n')
-
+    v['Operator'] = _bytes(sh_dict.get('operator','Kjell Nelin'))
     # Operator comments/log (ascii, length 120 string)
-    # Default is 'None'
-    item = sh_dict.get('comments','None')
-    fmt += 'I120s'
-    buf = struct.pack('I120s',120,item)
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>Comments</Name>\n')
-    xml.write('<Dimsize>120</Dimsize>\n<U8>\n<Name></Name>\n<Val></Val>\n</U8>\n')
-    xml.write('</Array>\n')
-
-    # Version (ascii, 2 length 8 strings)
-    # Current hardware/software versions
-    # Default is 1.0.0 and 1.0.0 
+    v['Comments'] = _bytes(sh_dict.get('comments','None'))
+    # Current hardware/software versions (ascii, 2 length 8 strings)
     item = sh_dict.get('version',['1.0.0','1.0.0'])
-    fmt += 'I8sI8s'
-    buf = struct.pack('I8sI8s',8,item[0],8,item[1])
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>HVersion</Name>\n')
-    xml.write('<Dimsize>8</Dimsize>\n<U8>\n<Name></Name>\n<Val></Val>\n</U8>\n')
-    xml.write('</Array>\n')
-    xml.write('<Array>\n')
-    xml.write('<Name>SVersion</Name>\n')
-    xml.write('<Dimsize>8</Dimsize>\n<U8>\n<Name></Name>\n<Val></Val>\n</U8>\n')
-    xml.write('</Array>\n')
-
-    # Nants (unsigned integer)
-    # Number of active antennas
-    # Default is 16
-    item = sh_dict.get('nants',16)
-    fmt += 'I'
-    buf = struct.pack('I',item)
-    f.write(buf)
-    xml.write('<U32>')
-    xml.write('<Name>Nants</Name>')
-    xml.write('<Val></Val>')
-    xml.write('</U32>')
-
+    v['HVersion'] = _bytes(item[0])
+    v['SVersion'] = _bytes(item[1])
+    # Number of active antennas (unsigned integer)
+    v['Nants'] = sh_dict.get('nants',16)
     # Active antenna list (list of unsigned integers, length 16)
-    item = sh_dict.get('antlist',list(range(1,17)))
-    nants = len(item)
-    fmt += 'I16I'
-    buf = struct.pack('I',16)
-    for i in range(16):
-        buf += struct.pack('I',item[i])
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>Antlist</Name>\n')
-    xml.write('<Dimsize>16</Dimsize>\n<U32>\n<Name></Name>\n<Val></Val>\n</U32>\n')
-    xml.write('</Array>\n')
-
+    v['Antlist'] = sh_dict.get('antlist',list(range(1,17)))[:16]
     # Antpos (3 x 16 FP array) [ns]
     # Antenna equatorial coordinates
     # Default is nominal EOVSA array positions
-    item = sh_dict.get('antpos',eovsa_array())
-    fmt += '2I'
-    buf = struct.pack('2I',3,16)
-    for i in range(16):
-        p = item.ants[i].pos
-        fmt += '3d'
-        buf += struct.pack('3d',p[0],p[1],p[2])
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>Antpos</Name>\n')
-    xml.write('<Dimsize>3</Dimsize>\n<Dimsize>16</Dimsize><DBL>\n<Name></Name>\n<Val></Val>\n</DBL>\n')
-    xml.write('</Array>\n')
-
+    item = sh_dict.get('antpos')
+    if item is None:
+        pos = ant_xyz()
+    else:
+        pos = [item.ants[i].pos for i in range(16)]
+    v['Antpos'] = np.array([pos[i][:3] for i in range(16)],np.float64)
     # Pbfwhm (16-element FP array) [arcsec]
     # Primary beam FWHM at 1 GHz
     # Default is nominal primary beam for 13 2.1m dishes, 2 27m dishes, and 0.0 (bare-feed)
-    item = sh_dict.get('pbfwhm',[1.22*30*180*3600./210./pi]*13 + [1.22*30*180*3600./2700./pi]*2 + [0.0])
-    fmt += 'I'
-    buf = struct.pack('I',16)
-    fmt += '16f'
-    for i in range(16):
-        buf += struct.pack('f',item[i])
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>PrimaryBeam</Name>\n')
-    xml.write('<Dimsize>16</Dimsize><SGL>\n<Name></Name>\n<Val></Val>\n</SGL>\n')
-    xml.write('</Array>\n')
-
+    v['PrimaryBeam'] = sh_dict.get('pbfwhm',[1.22*30*180*3600./210./pi]*13 + [1.22*30*180*3600./2700./pi]*2 + [0.0])[:16]
     # Mount (16-element signed integer array)
-    # Type of antenna mounts
     # -1 = rf, 0 = bare-feed, 1 = 2m-azel, 2 = 27m-eq, 3 = 2m-eq
-    # Default is list of 13 2m-azel, 2 27m-eq, and 1 bare-feed
-    item = sh_dict.get('mount',[1]*13 + [2]*2 + [0])
-    fmt += 'I16i'
-    buf = struct.pack('I',16)
-    for i in range(16):
-        buf += struct.pack('i',item[i])
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>Mount</Name>\n')
-    xml.write('<Dimsize>16</Dimsize><I32>\n<Name></Name>\n<Val></Val>\n</I32>\n')
-    xml.write('</Array>\n')
-
-    # SCAN_ID (ascii, length 12) 
+    v['Mount'] = sh_dict.get('mount',[1]*13 + [2]*2 + [0])[:16]
+    # SCAN_ID (ascii, length 12)
     # A unique string that identifies the scan (yymmddhhmmss)
     # Default is current date/time
-    dt = util.Time.now()
-    item = sh_dict.get('scan_id',dt.iso[2:19].replace('-','').replace(':','').replace(' ',''))
-    fmt += 'I12s'
-    buf = struct.pack('I12s',12,item)
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>ScanID</Name>\n')
-    xml.write('<Dimsize>12</Dimsize>\n<U8>\n<Name></Name>\n<Val></Val>\n</U8>\n')
-    xml.write('</Array>\n')
-
-    # SCAN_TYPE (ascii, length 12)
-    # solar, calibration, etc
-    # Default is 'test'
-    item = sh_dict.get('scan_type','test')
-    fmt += 'I12s'
-    buf = struct.pack('I12s',12,item)
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>ScanType</Name>\n')
-    xml.write('<Dimsize>12</Dimsize>\n<U8>\n<Name></Name>\n<Val></Val>\n</U8>\n')
-    xml.write('</Array>\n')
-
-    # SOURCE_ID (ascii, length 12)
-    # Name of source (e.g. 3C84, Sun, 0321+123, etc.)
-    # Default is 'None'
-    item = sh_dict.get('source_id','None')
-    fmt += 'I12s'
-    buf = struct.pack('I12s',12,item)
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>SourceID</Name>\n')
-    xml.write('<Dimsize>12</Dimsize>\n<U8>\n<Name></Name>\n<Val></Val>\n</U8>\n')
-    xml.write('</Array>\n')
-
+    item = sh_dict.get('scan_id')
+    if item is None:
+        item = dt.iso[2:19].replace('-','').replace(':','').replace(' ','')
+    v['ScanID'] = _bytes(item)
+    # SCAN_TYPE (ascii, length 12) solar, calibration, etc
+    v['ScanType'] = _bytes(sh_dict.get('scan_type','test'))
+    # SOURCE_ID (ascii, length 12) name of source (e.g. 3C84, Sun, 0321+123, etc.)
+    v['SourceID'] = _bytes(sh_dict.get('source_id','None'))
     # Coordinate type (ascii, length 6)
     # 'RADEC ' => fixed, use RA, Dec;
     # 'FIXED ' => geostationary, use HA, Dec;
     # 'PLANET' => planetary, use EPHEM
     # 'SATELL' => satellite tracking, use SAT Ephem
-    # Default is 'PLANET'
-    item = sh_dict.get('track_mode','PLANET')
-    fmt += 'I6s'
-    buf = struct.pack('I6s',6,item)
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>TrackMode</Name>\n')
-    xml.write('<Dimsize>6</Dimsize>\n<U8>\n<Name></Name>\n<Val></Val>\n</U8>\n')
-    xml.write('</Array>\n')
-
-    # epoch of source coordinates (ascii, length 4)
-    # '2000' => J2000
-    # 'DATE' => current date/time
-    item = sh_dict.get('epoch','DATE')
-    fmt += 'I4s'
-    buf = struct.pack('I4s',4,item)
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>Epoch</Name>\n')
-    xml.write('<Dimsize>4</Dimsize>\n<U8>\n<Name></Name>\n<Val></Val>\n</U8>\n')
-    xml.write('</Array>\n')
-
+    v['TrackMode'] = _bytes(sh_dict.get('track_mode','PLANET'))
+    # Epoch of source coordinates (ascii, length 4)
+    # '2000' => J2000, 'DATE' => current date/time
+    v['Epoch'] = _bytes(sh_dict.get('epoch','DATE'))
     # Right Ascension (double) [radians]
     # Default is current LST
-    item = sh_dict.get('ra',eovsa_lst(dt))
-    fmt += 'd'
-    buf = struct.pack('d',item)
-    f.write(buf)
-    xml.write('<DBL>\n')
-    xml.write('<Name>RA</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</DBL>\n')
-
-    # Declination (double) [radians]
-    # Default is 0 Dec
-    item = sh_dict.get('dec',0.0)
-    fmt += 'd'
-    buf = struct.pack('d',item)
-    f.write(buf)
-    xml.write('<DBL>\n')
-    xml.write('<Name>Dec</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</DBL>\n')
-
-    # Right Ascension Offset of phase center (double) [radians]
-    # Default is 0
-    item = sh_dict.get('dra',0.0)
-    fmt += 'd'
-    buf = struct.pack('d',item)
-    f.write(buf)
-    xml.write('<DBL>\n')
-    xml.write('<Name>dRA</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</DBL>\n')
-
-    # Declination Offset of phase center (double) [radians]
-    # Default is 0
-    item = sh_dict.get('ddec',0.0)
-    fmt += 'd'
-    buf = struct.pack('d',item)
-    f.write(buf)
-    xml.write('<DBL>\n')
-    xml.write('<Name>dDec</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</DBL>\n')
-
-    # Hour angle for geostationary sources (double) [radians]
-    # Default is 0
-    item = sh_dict.get('ha',0.0)
-    fmt += 'd'
-    buf = struct.pack('d',item)
-    f.write(buf)
-    xml.write('<DBL>\n')
-    xml.write('<Name>HA</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</DBL>\n')
-
-    # Hour angle offset for geostationary sources (double) [radians]
-    # Default is 0
-    item = sh_dict.get('dha',0.0)
-    fmt += 'd'
-    buf = struct.pack('d',item)
-    f.write(buf)
-    xml.write('<DBL>\n')
-    xml.write('<Name>dHA</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</DBL>\n')
-
-    aa = eovsa_array()
-    aa.date = str(aa.date)[:11]+'00:00'  # Set date to 0 UT
-    mjd0 = aa.date + 15019.5
-
+    item = sh_dict.get('ra')
+    if item is None:
+        item = eovsa_lst(dt)
+    v['RA'] = item
+    # Declination, RA and Dec offsets of phase center, and hour angle and its
+    # offset for geostationary sources (doubles) [radians]
+    v['Dec'] = sh_dict.get('dec',0.0)
+    v['dRA'] = sh_dict.get('dra',0.0)
+    v['dDec'] = sh_dict.get('ddec',0.0)
+    v['HA'] = sh_dict.get('ha',0.0)
+    v['dHA'] = sh_dict.get('dha',0.0)
     # Ephemeris for planetary source ([T, RA, Dec] x 3, double) [mjd, radians, radians]
     # Coordinates are geocentric, times are UTC, and apparent coords must be calculated from them
     # Default is the ephemeris for the Sun for the current date
     item = sh_dict.get('ephem')
-    if item is None:
-        # Generate default ephemeris, which is that for the Sun for current date
-        item = []
+    if item is None or 'ut1-utc' not in sh_dict:
         aa = eovsa_array()
         aa.date = str(aa.date)[:11]+'00:00'  # Set date to 0 UT
         mjd0 = aa.date + 15019.5
+    if item is None:
+        # Generate default ephemeris, which is that for the Sun for current date
+        item = []
         sun = ephem.Sun()
         for i in range(3):
             sun.compute(aa)
             mjd = aa.date + 15019.5
             item.append([mjd, sun.g_ra, sun.g_dec])  # Geocentric coordinates
             aa.date += 1
-    fmt += 'II' + '3d'*3
-    buf = struct.pack('2I',3,3)
-    for i in range(3):
-        for j in range(3):
-            buf += struct.pack('d',item[i][j])
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>Ephem</Name>\n')
-    xml.write('<Dimsize>3</Dimsize>\n<Dimsize>3</Dimsize><DBL>\n<Name></Name>\n<Val></Val>\n</DBL>\n')
-    xml.write('</Array>\n')
-
-    # Calculate solar P, B0 and R (FP x 3) [radians, radians, arcsec]
+    v['Ephem'] = np.array([item[i][:3] for i in range(3)],np.float64)
+    # Solar P, B0 and R (FP x 3) [radians, radians, arcsec]
     # Item is mjd of beginning of scan
     # Default is to calculate P, B0 and R for the current date
-    item = sh_dict.get('sun_info',dt.mjd)
-    fmt += 'Ifff'
-    p, b0, r = get_pb0r(item,arcsec=True)
-    buf = struct.pack('If',3,p*dtor)
-    buf += struct.pack('f',b0*dtor)
-    buf += struct.pack('f',r)
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>SunInfo</Name>\n')
-    xml.write('<Dimsize>3</Dimsize>\n<SGL>\n<Name></Name>\n<Val></Val>\n</SGL>\n')
-    xml.write('</Array>\n')
-
+    p, b0, r = get_pb0r(sh_dict.get('sun_info',dt.mjd),arcsec=True)
+    v['SunInfo'] = [p*dtor, b0*dtor, r]
     # Satellite ephemeris data ([T, RA, Dec] x nlines, double) [mjd, radians, radians]
-    # This is tricky, since we want a fixed stateframe length, so we
-    # have to specify as many lines as the maximum we might use.  For
-    # now, set to 20 lines.
-    # Default is all zero
+    # Fixed length of 20 lines, zero-filled.  Default is all zero
     item = sh_dict.get('sat_ephem',[[0.0,0.0,0.0]]*20)
-    nlines = len(item)
-    fmt += 'II' + '3d'*20
-    buf = struct.pack('2I',3,20)
-    for i in range(nlines):
-        for j in range(3):
-            buf += struct.pack('d',item[i][j])
-    if nlines < 20:
-        for i in range(nlines,20):
-            for j in range(3):
-                buf += struct.pack('d',0.0)            
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>SatEphem</Name>\n')
-    xml.write('<Dimsize>3</Dimsize>\n<Dimsize>20</Dimsize><DBL>\n<Name></Name>\n<Val></Val>\n</DBL>\n')
-    xml.write('</Array>\n')
-    
+    v['SatEphem'] = np.array([line[:3] for line in item[:20]],np.float64)
     # Polarization list (Miriad definition) (signed int)
-    #     1: Stokes I
-    #     2: Stokes Q
-    #     3: Stokes U
-    #     4: Stokes V
-    #    -1: Circular RR
-    #    -2: Circular LL
-    #    -3: Circular RL
-    #    -4: Circular LR
-    #    -5: Linear XX
-    #    -6: Linear YY
-    #    -7: Linear XY
-    #    -8: Linear YX
+    #     1: Stokes I       2: Stokes Q       3: Stokes U      4: Stokes V
+    #    -1: Circular RR   -2: Circular LL   -3: Circular RL  -4: Circular LR
+    #    -5: Linear XX     -6: Linear YY     -7: Linear XY    -8: Linear YX
     #     0: Not used
-    # Zero-filled list of 4
-    # Default is RR, LL
-    item = sh_dict.get('pol',[-5,-6,-7,-8])
-    fmt += '4i'
-    buf = ''
-    for i in range(4):
-       buf += struct.pack('i',item[i])
-    f.write(buf)
-    xml.write('<I32>\n')
-    xml.write('<Name>Pol1</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</I32>\n')
-    xml.write('<I32>\n')
-    xml.write('<Name>Pol2</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</I32>\n')
-    xml.write('<I32>\n')
-    xml.write('<Name>Pol3</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</I32>\n')
-    xml.write('<I32>\n')
-    xml.write('<Name>Pol4</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</I32>\n')
-
+    v['Pol'] = sh_dict.get('pol',[-5,-6,-7,-8])[:4]
     # Timing offset (UT1-UTC) (double) [fraction of day]
     # Default is to read IERS bulletin and use (UT1-UTC) for current date
-    item = sh_dict.get('ut1-utc',util.UT1_UTC(mjd0))
-    fmt += 'd'
-    buf = struct.pack('d',item)
-    f.write(buf)
-    xml.write('<DBL>\n')
-    xml.write('<Name>UT1UTC</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</DBL>\n')
-
-    # Maximum IDB filesize (unsigned int) [MB]
-    # DPP will break IDB scan data into separate files none 
-    # of which will exceed this size
-    # Default is 100 (MB)
-    item = sh_dict.get('max_file_size',100)
-    fmt += 'I'
-    buf = struct.pack('I',item)
-    f.write(buf)
-    xml.write('<U32>\n')
-    xml.write('<Name>IDBMaxFileSize</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</U32>\n')
-
-    # IDB filename stem (length 14 string of form yyyymmddhhmmss)
-    # Value of item passed in is Time() object
-    # Creates IDB filename stem value from Time() object.  
-    # Filename will be extended as needed to accommodate multiple files per scan.
-    # (Note: truncated at integer second, since all times should happen at
-    # 1pps boundary)
+    item = sh_dict.get('ut1-utc')
+    if item is None:
+        item = util.UT1_UTC(mjd0)
+    v['UT1UTC'] = item
+    # Maximum IDB filesize (unsigned int) [MB].  Default is 100 (MB)
+    v['IDBMaxFileSize'] = sh_dict.get('max_file_size',100)
+    # IDB filename stem, and nominal start time of scan (length 14 strings of
+    # form yyyymmddhhmmss), from the Time() object passed in (truncated at
+    # integer second, since all times should happen at 1pps boundary)
     # Default is current date/time
     item = sh_dict.get('date2IDB_stem',dt)
-    fmt += 'I14s'
     datestr = item.iso.replace('-','').replace(' ','').replace(':','')
-    buf = struct.pack('I14s',14,datestr[:14])
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>IDBStem</Name>\n')
-    xml.write('<Dimsize>14</Dimsize>\n<U8>\n<Name></Name>\n<Val></Val>\n</U8>\n')
-    xml.write('</Array>\n')
-
-    # Nominal start time of scan (length 14 string of form yyyymmddhhmmss)
-    # (Note: truncated at integer second, since all times should happen at
-    # 1pps boundary)
-    fmt += 'I14s'
-    buf = struct.pack('I14s',14,datestr[:14])
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>IDBStart</Name>\n')
-    xml.write('<Dimsize>14</Dimsize>\n<U8>\n<Name></Name>\n<Val></Val>\n</U8>\n')
-    xml.write('</Array>\n')
-
-    # Time conversion factor (double) [mjd] 
-    # (i.e., Relates the absolute time to the accumulation number for the 
-    # packets).  This is the time of the next 1 pps after the ARM signal to 
-    # the correlator.
+    v['IDBStem'] = _bytes(datestr[:14])
+    v['IDBStart'] = v['IDBStem']
+    # Time conversion factor (double) [mjd] (i.e., Relates the absolute time
+    # to the accumulation number for the packets).  This is the time of the
+    # next 1 pps after the ARM signal to the correlator.
     # Default is current date/time, which is an error
-    item = sh_dict.get('time_at_acc0',dt)
-    fmt += 'd'
-    buf = struct.pack('d',item.mjd)
-    f.write(buf)
-    xml.write('<DBL>\n')
-    xml.write('<Name>TimeAtAcc0</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</DBL>\n')
-
-    # Duration of each spectral frame. Nominally 1 s. (unsigned int) [ms]
-    # Default is 1000 [ms]
-    item = sh_dict.get('dur_spec_frame',1000)
-    fmt += 'I'
-    buf = struct.pack('I',item)
-    f.write(buf)
-    xml.write('<U32>\n')
-    xml.write('<Name>DurSpecFrame</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</U32>\n')
-
-    # Intval Integration time (unsigned int) [ms]
-    # Default is 20 [ms]
-    item = sh_dict.get('intval',20)
-    fmt += 'I'
-    buf = struct.pack('I',item)
-    f.write(buf)
-    xml.write('<U32>\n')
-    xml.write('<Name>Intval</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</U32>\n')
-
-    # Number of integration intervals in each spectral frame. (unsigned int)
-    # Default is 50 [per second].
-    item = sh_dict.get('nintval',50)
-    fmt += 'I'
-    buf = struct.pack('I',item)
-    f.write(buf)
-    xml.write('<U32>\n')
-    xml.write('<Name>NIntval</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</U32>\n')
-
+    v['TimeAtAcc0'] = sh_dict.get('time_at_acc0',dt).mjd
+    # Duration of each spectral frame (unsigned int) [ms], integration time
+    # (unsigned int) [ms], and number of integrations in each spectral frame
+    v['DurSpecFrame'] = sh_dict.get('dur_spec_frame',1000)
+    v['Intval'] = sh_dict.get('intval',20)
+    v['NIntval'] = sh_dict.get('nintval',50)
     # List of frequencies of 600 MHz band start AFTER reversal (length 50 double) [GHz]
-    # Input is integer band number corresponding to base frequency for
-    # each integration interval, where 1 = 1 GHz, 2 = 1.5 GHz, etc.
-    # (50 unsigned ints). These are the 500 MHz IF bands.  The integer
-    # values n are converted to GHz as follows:
-    #     21 + n/2.0 is LO frequency [GHz].
-    #     LO frequency - 19.95 is frequency at low end of 600 MHz band
-    #     After reversal of bins, subtract another 0.6 GHz
-    #     Complete expression is equivalent to 0.45 + n/2.
-    # The Hittite tuning list is passed in and parsed with comma ','
+    # The Hittite tuning list (integer band numbers) is passed in and parsed
+    # with comma ',' and converted to GHz as 0.775 + n*0.325 (zero-filled to 50).
     # Default is nominal solar sequence
-    #*******This needs modification for 800 MHz clock*******
     item = sh_dict.get('fsequence',
                         '1, 2, 3, 4, 5, 6, 7, 8, 9,10,'+
                         '1, 2, 3, 4,11,12,13,14,15,16,'+
                         '1, 2, 3, 4,17,18,19,20,21,22,'+
                         '1, 2, 3, 4,23,24,25,26,27,28,'+
                         '1, 2, 3, 4,29,30,31,32,33,34')
-    # print item
     fseqlist = item.rsplit(',')
-    nintval = len(fseqlist)
-    fmt += 'I50d'
-    buf = struct.pack('I',50)
-    for n in fseqlist:
-        val = 0.775 + float(n)*0.325
-        buf += struct.pack('d',val)
-    if nintval < 50:
-        # Fewer than 50 values sent in, so zero-fill to 50
-        for n in range(nintval,50):
-            buf += struct.pack('d',0.0)
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>FSeqList</Name>\n')
-    xml.write('<Dimsize>50</Dimsize><DBL>\n<Name></Name>\n<Val></Val>\n</DBL>\n')
-    xml.write('</Array>\n')
-
-    # Subband channel width [GHz]
-    # This is fixed by the system to 0.4 GHz/4096.
-    # Default is 0.4/4096
-    item = sh_dict.get('subbw',0.4/4096)
-    fmt += 'd'
-    buf = struct.pack('d',item)
-    f.write(buf)
-    xml.write('<DBL>\n')
-    xml.write('<Name>SubBW</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</DBL>\n')
-
-    chinfo = sh_dict.get('chinfo',ci.Chan_Info())
+    v['FSeqList'] = 0.775 + np.array([float(n) for n in fseqlist])*0.325
+    # Subband channel width [GHz].  This is fixed by the system to 0.4 GHz/4096.
+    v['SubBW'] = sh_dict.get('subbw',0.4/4096)
+    # The Chan_Info object is only needed for the defaults of the channel items
+    chinfo = sh_dict.get('chinfo')
+    if chinfo is None and not {'nchan','fGHz','chan_widths','chan2wide'} <= set(sh_dict):
+        chinfo = ci.Chan_Info()
     # Number of 'wide' spectral channels (unsigned int)
-    # Default 504, max 511
-    item = sh_dict.get('nchan',chinfo.tot_scichan())
-    fmt += 'I'
-    buf = struct.pack('I',item)
-    f.write(buf)
-    xml.write('<U32>\n')
-    xml.write('<Name>Nchan</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</U32>\n')
-
-    # Wide spectral channel lower value--nominally 504 values (nchan doubles) [GHz]
-    # Default is the default set of 504 frequencies valid for solar observing 
-    # (zero-filled to 511)
+    item = sh_dict.get('nchan')
+    if item is None:
+        item = chinfo.tot_scichan()
+    v['Nchan'] = item
+    # Wide spectral channel lower value, and widths (nchan doubles, zero-filled to 511) [GHz]
+    # Defaults are the frequencies and widths valid for solar observing
     item = sh_dict.get('fGHz')
     if item is None:
         item = []
         for band in range(1,53):
             item += chinfo.start_freq(band)
-    nchan = len(item)
-    fmt += 'I511d'
-    buf = struct.pack('I',511)
-    for i in item:
-        buf += struct.pack('d',i)
-    if nchan < 511:
-        # Fewer than 511 values sent in, so zero-fill to 511
-        for n in range(nchan,511):
-            buf += struct.pack('d',0.0)        
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>fGHz</Name>\n')
-    xml.write('<Dimsize>511</Dimsize><DBL>\n<Name></Name>\n<Val></Val>\n</DBL>\n')
-    xml.write('</Array>\n')
-
-    # Wide spectral channel widths--nominally 504 values (nchan doubles) [GHz]
-    # Default is the list of widths valid for solar observing (zero-filled to 511)
+    v['fGHz'] = item
     item = sh_dict.get('chan_widths')
     if item is None:
         item = []
         for band in range(1,53):
             item += chinfo.sci_bw(band)
-    nchan = len(item)
-    fmt += 'I511d'
-    buf = struct.pack('I',511)
-    for i in item:
-        buf += struct.pack('d',i)
-    if nchan < 511:
-        # Fewer than 511 values sent in, so zero-fill to 511
-        for n in range(nchan,511):
-            buf += struct.pack('d',0.0)        
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>ChanWidths</Name>\n')
-    xml.write('<Dimsize>511</Dimsize><DBL>\n<Name></Name>\n<Val></Val>\n</DBL>\n')
-    xml.write('</Array>\n')
-    
-    # Science channel assignments (4096 x 50 array of 2-byte integers)
-    #   0             = subband is not used.  
+    v['ChanWidths'] = item
+    # Science channel assignments (4096 x 50 array of 2-byte integers, zero-filled)
+    #   0             = subband is not used.
     #   (1-500)       = science channel to assign subband.
     #   512 + (1-500) = integration should not be time-averaged.
-    # Multiple samples <512 within a spectral frame are averaged.
-    # Multiple samples >512 are not averaged and are treated
-    # as separate channels.)
-    # Restrictions: 
-    #   1. There are a maximum of 511 science channels.
-    #   2. A given subband cannot be associated with more than one
-    #      science channel. 
-    #   3. All subbands associated with a given science channel must
-    #      be in the same 20 ms integration.
+    # Default is the channel assignments for the bands in fseqlist
     item = sh_dict.get('chan2wide')
     if item is None:
-        # Create default channel assignments for the list of frequencies (bands) in fseqlist
         item = []
         for band in fseqlist:
-            ch = chinfo.chan_asmt(int(band))
-            #ch[0] = 0  # Assign first subband to purgatory (unused subband)
-            item += ch
-    nsubchan = len(item)
-    fmt += 'II204800H'
-    buf = struct.pack('2I',4096,50)
-    for i in item:
-        buf += struct.pack('H',i)
-    if nsubchan < 204800:
-        # Fewer than 4096*50 values sent in, so zero-fill to 204800
-        for n in range(nsubchan,204800):
-            buf += struct.pack('H',0)        
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>Chan2Wide</Name>\n')
-    xml.write('<Dimsize>4096</Dimsize><Dimsize>50</Dimsize><U16>\n<Name></Name>\n<Val></Val>\n</U16>\n')
-    xml.write('</Array>\n')
-
-    # Mask of RFI subbands (4096 x 50 array of 1-byte flags).   
-    #    0 = Subband is presumed contaminated
-    #    1 = otherwise
+            item += chinfo.chan_asmt(int(band))
+    v['Chan2Wide'] = item
+    # Mask of RFI subbands (4096 x 50 array of 1-byte flags, zero-filled).
+    #    0 = Subband is presumed contaminated, 1 = otherwise
     # Default is all 1 (good values)
-    item = sh_dict.get('chanmask',np.array([1]*204800,'byte'))
-    nsubchan = len(item)
-    fmt += 'II204800B'
-    buf = struct.pack('2I',4096,50)
-    buf += struct.pack(str(nsubchan)+'B',*item)
-    if nsubchan < 204800:
-        # Fewer than 4096*50 values sent in, so zero-fill to 204800
-        for n in range(nsubchan,204800):
-            buf += struct.pack('B',0)        
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>Chanmask</Name>\n')
-    xml.write('<Dimsize>4096</Dimsize><Dimsize>50</Dimsize><B8>\n<Name></Name>\n<Val></Val>\n</B8>\n')
-    xml.write('</Array>\n')
-
-    # RFI guard band (4-byte int)
-    # Number of subbands to reject adjacent to kurtosis-flagged channels.
-    #    0 = do not reject any additional subbands
-    # Default is 0
-    item = sh_dict.get('sk_guard_width',0)
-    fmt += 'I'
-    buf = struct.pack('I',item)
-    f.write(buf)
-    xml.write('<U32>\n')
-    xml.write('<Name>SKGuard</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</U32>\n')
-
-    # Spectral kurtosis strategy (4-byte int) (Details TBD.)
-    # Default 0 => Standard strategy
-    item = sh_dict.get('sk_mode',0)
-    fmt += 'I'
-    buf = struct.pack('I',item)
-    f.write(buf)
-    xml.write('<U32>\n')
-    xml.write('<Name>SKMode</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</U32>\n')
-
+    item = sh_dict.get('chanmask')
+    if item is None:
+        item = np.ones(204800,np.uint8)
+    v['Chanmask'] = np.asarray(item).astype(np.uint8)
+    # RFI guard band (number of subbands to reject adjacent to kurtosis-flagged
+    # channels) and spectral kurtosis strategy (4-byte ints)
+    v['SKGuard'] = sh_dict.get('sk_guard_width',0)
+    v['SKMode'] = sh_dict.get('sk_mode',0)
     # Kurtosis lower and upper limits (two doubles)
-    # Min, max acceptable SK thresholds
-    # Default is 0.87308624388667777, 1.1564648485565636, which are for M = 1792 
-    item = sh_dict.get('sk_lims',[0.87308624388667777,1.1564648485565636])
-    fmt += '2d'
-    buf = struct.pack('2d',item[0],item[1])
-    f.write(buf)
-    xml.write('<DBL>\n')
-    xml.write('<Name>SKLimLo</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</DBL>\n')
-    xml.write('<DBL>\n')
-    xml.write('<Name>SKLimHi</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</DBL>\n')
-
-    # Reference complex gains (511 x 16 x 2 complex array) [Jy/unit]
-    # These are time-independent values that correspond to the
-    # 'base attenuator state'  which includes the effects of the
-    # preset front-end and back-end attenuators. (Amplitude units
-    # are nominally Jy, but may be modified by attenuator and
-    # time-variable gain factors)
-    # Note that Struct has no complex format, so buffer is written
-    # with each complex value as a pair of floats, real,imag.
-    # Default 1 + 0j
-    item = sh_dict.get('gains',[1.0+0j]*16352)
-    fmt += 'IIII16352d'
-    buf = struct.pack('4I',2,511,16,2)
-    for i in item:
-        buf += struct.pack('2d',np.real(i),np.imag(i))
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>GainTable</Name>\n')
-    xml.write('<Dimsize>2</Dimsize><Dimsize>511</Dimsize><Dimsize>16</Dimsize><Dimsize>2</Dimsize><DBL>\n<Name></Name>\n<Val></Val>\n</DBL>\n')
-    xml.write('</Array>\n')
-
-    # Time variable gain factors (511 x 16 x 2 complex array) [Jy]
-    # Antenna-based complex gains corresponding to time-variable
-    # factors (presumably determined by a recent phase calibration).
-    # Defaults to 1 + 0j if not present.
-    item = sh_dict.get('gain_update',[1.0+0j]*16352)
-    fmt += 'IIII16352d'
-    buf = struct.pack('4I',2,511,16,2)
-    for i in item:
-        buf += struct.pack('2d',np.real(i),np.imag(i))
-    f.write(buf)
-    xml.write('<Array>\n')
-    xml.write('<Name>GainUpdate</Name>\n')
-    xml.write('<Dimsize>2</Dimsize><Dimsize>511</Dimsize><Dimsize>16</Dimsize><Dimsize>2</Dimsize><DBL>\n<Name></Name>\n<Val></Val>\n</DBL>\n')
-    xml.write('</Array>\n')
-
-    # Base attenuator value (4-byte int) [dB]
-    # attenuator value corresponding to the base attenuator state
-    # Default 0
-    item = sh_dict.get('attn0',0)
-    fmt += 'I'
-    buf = struct.pack('I',item)
-    f.write(buf)
-    xml.write('<U32>\n')
-    xml.write('<Name>Attn0</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</U32>\n')
-
-    # Attenuator step size (4-byte int) [dB]
-    # Nominal step size for time-dependent variable attenuation 
-    # 2-byte integer (presumably = 3 or 5 db)
-    # Default 3 [dB]
-    item = sh_dict.get('attn_step',3)
-    fmt += 'I'
-    buf = struct.pack('I',item)
-    f.write(buf)
-    xml.write('<U32>\n')
-    xml.write('<Name>AttnStep</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</U32>\n')
-
-    # Attenuator gain table (500 x 16 x 2 x N complex array) 
-    # complex gains (one for each science channel, polarization and antenna).
-    # The values are relative to the 'base' attenuator settings, which represents
-    # both the front end and back end attenuation.  Each of the N steps
-    # corresponds to 3 or 5 db increments applied to all antennas.
-    #item = sh_dict.get('attn_table')
-
-    # XML encapsulation of KatADC info (array of 8)
-    xml.write('<Array>\n')
-    xml.write('<Name>KatADC</Name>\n')
-    xml.write('<Dimsize>8</Dimsize>\n')
-    # Put array dimension into data
-    fmt += 'I'
-    buf = struct.pack('I',8)
-
-    # This is an array, but the definitions only go in once
-    # Here are the definitions for the 8 elements in the cluster
-    xml.write('<Cluster>\n')
-    xml.write('<Name/>\n')
-    xml.write('<NumElts>6</NumElts>\n')
-    xml.write('<U32>\n')
-    xml.write('<Name>Status</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</U32>\n')
-    xml.write('<SGL>\n')
-    xml.write('<Name>Temp.adc0</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</SGL>\n')
-    xml.write('<SGL>\n')
-    xml.write('<Name>Temp.adc1</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</SGL>\n')
-    xml.write('<SGL>\n')
-    xml.write('<Name>Temp.ambient0</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</SGL>\n')
-    xml.write('<SGL>\n')
-    xml.write('<Name>Temp.ambient1</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</SGL>\n')
-    xml.write('<SGL>\n')
-    xml.write('<Name>BoardClock</Name>\n')
-    xml.write('<Val></Val>\n')
-    xml.write('</SGL>\n')
-    # End KatADC Cluster
-    xml.write('</Cluster>\n')
-
-    # Get the KatADC array of dictionaries (defaults to eight empty dicts)
+    # Default is 0.87308624388667777, 1.1564648485565636, which are for M = 1792
+    v['SKLims'] = sh_dict.get('sk_lims',[0.87308624388667777,1.1564648485565636])[:2]
+    # Reference complex gains, and time variable gain factors (511 x 16 x 2
+    # complex arrays), written with each complex value as a pair of doubles,
+    # real,imag.  Default 1 + 0j
+    for name, key in [('GainTable','gains'),('GainUpdate','gain_update')]:
+        item = sh_dict.get(key)
+        if item is None:
+            item = np.ones(16352,np.complex128)
+        v[name] = np.asarray(item,np.complex128).view(np.float64)
+    # Base attenuator value, and attenuator step size (4-byte ints) [dB]
+    v['Attn0'] = sh_dict.get('attn0',0)
+    v['AttnStep'] = sh_dict.get('attn_step',3)
+    # KatADC info (array of 8 of status, 4 temperatures and board clock)
+    # Status (int) [bit list]: each bit signifies whether the corresponding sensor
+    # is nominal [0] or in error [1], in alphabetical order, msb to lsb.
+    # The temperatures are the sorted list of the other sensors.
     katadc = sh_dict.get('katadc',[{},{},{},{},{},{},{},{}])
     brd_clk = sh_dict.get('roach_brd_clk',[0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0])
-    # The actual data has to go in eight times
+    item = []
     for i in range(8):
-        # Handle case of empty dictionary
-        if katadc[i] == {}:
-            fmt += 'Iffff'
-            buf += struct.pack('I',0)
-            for j in range(4):
-                buf += struct.pack('f',0.0)
-        
+        status = 0
+        vals = []
+        for key in sorted(katadc[i].keys()):
+            if key.find('status') != -1:
+                if katadc[i][key] == 'nominal':
+                    status = status<<1
+                else:
+                    status = (status<<1) + 1
+            else:
+                vals.append(katadc[i][key])
+        item += [status] + (vals + [0.0]*4)[:4] + [brd_clk[i]]
+    v['KatADC'] = item
+    return v
+
+def pack_loop(values, layout=sh_layout):
+    ''' Packs the scan header values one number at a time with struct.pack(),
+        as was originally done, for comparison with ScanHeaderPacker.pack().
+    '''
+    buf = b''
+    for name, dims, dfmt, xml in layout:
+        for n in dims:
+            buf += struct.pack('<I',n)
+        item = values[name]
+        if dfmt[-1] == 's':
+            buf += struct.pack('<'+dfmt,item)
+        elif dfmt == 'I5f'*8:
+            for i in range(8):
+                buf += struct.pack('<I',item[i*6])
+                for j in range(5):
+                    buf += struct.pack('<f',item[i*6+j+1])
         else:
-            # Status (int) [bit list]
-            # Each bit signifies whether corresponding sensor is nominal [0] or in error [1]
-            # Order is alphabetical, msb to lsb.
-            # Default is zero
-            status = 0
-            keys = sorted(katadc[i].keys())
-            for key in keys:
-                if key.find('status') != -1:
-                    if katadc[i][key] == 'nominal':
-                        status = status<<1
-                    else:
-                        status = (status<<1) + 1
-            item = status
-            fmt += 'I'
-            buf += struct.pack('I',item)
-
-            # Just add the sorted list of sensors
-            # Default is zero
-            for key in keys:
-                if key.find('status') == -1:
-                    item = katadc[i][key]
-                    fmt += 'f'
-                    buf += struct.pack('f',item)
+            code = dfmt[-1]
+            count = int(dfmt[:-1] or 1)
+            item = list(np.ravel(item))
+            item = (item + [0]*count)[:count]
+            for i in item:
+                buf += struct.pack('<'+code,i)
+    return buf
+
+def bench_scan_header(n=100):
+    ''' Compares the time to pack a scan header (synthetic, but full size)
+        with pack_loop() (once, since it takes several seconds) and n times
+        with the compiled ScanHeaderPacker, and checks that the results are
+        identical.  Returns the throughput of each (scan headers per second).
+    '''
+    import time
+    rng = np.random.RandomState(0)
+    t = util.Time('2026-10-19 18:00:00')
+    sh_dict = {'timestamp': t.lv, 'Version': 66.0, 'scan_id': '261019180000',
+               'antlist': np.arange(16), 'ra': 1.0, 'ut1-utc': -0.1,
+               'ephem': rng.rand(3,3).tolist(), 'sun_info': t.mjd,
+               'antpos': None, 'date2IDB_stem': t, 'time_at_acc0': t,
+               'nchan': 451, 'fGHz': rng.rand(451).tolist(), 'chan_widths': rng.rand(451).tolist(),
+               'chan2wide': rng.randint(0,1024,204800).tolist(),
+               'chanmask': rng.randint(0,2,204800).astype('byte'),
+               'gains': (rng.rand(16352) + 1j*rng.rand(16352)).tolist(),
+               'katadc': [{'temp.adc0': 40.5, 'temp.adc1': 41.0, 'temp.ambient0': 30.0,
+                           'temp.ambient1': 31.5, 'temp.adc0.status': 'nominal'}]*8,
+               'roach_brd_clk': [200.0]*8}
+    sh_dict['antpos'] = type('aa',(),{'ants': [type('ant',(),{'pos': p}) for p in rng.rand(16,3)]})
+    values = sh_values(sh_dict)
+    packer = get_packer()
+    t0 = time.time()
+    buf = pack_loop(values)
+    t1 = time.time()
+    for i in range(n):
+        packer.pack(values)
+    t2 = time.time()
+    if bytes(packer.pack(values)) != buf:
+        print('Error: compiled scan header differs from the original!')
+    print('Scan header of',packer.size,'bytes')
+    print('struct.pack loop:  ',1/(t1-t0),'per s')
+    print('ScanHeaderPacker:  ',n/(t2-t1),'per s')
+    return 1/(t1-t0), n/(t2-t1)
 
-        fmt += 'f'
-        buf += struct.pack('f',brd_clk[i])
-        
-    # End KatADC Array
-    xml.write('</Array>\n')
+def scan_header(sh_dict,datfile='/nas4/Tables/scanheader/scan_header.dat'):
+    '''Writes the state frame header file from the scan header dictionary
+       created by the schedule. Returns file names datfile and xmlfile
+       corresponding to the output files in the /tmp directory that are
+       created by this routine and are updated at the start of each scan.
+       The format string fmt can be used with struct.unpack() to read
+       the data file /tmp/scan_header.dat, although that usage is not
+       anticipated except for testing.
 
-    f.write(buf)
+       This routine does something sensible even if the supplied
+       dictionary sh_dict is empty (i.e. is {}).
+    '''
+    xmlfile = datfile[:-4]+'.xml'
+    packer = get_packer()
+    values = sh_values(sh_dict)
+    f = open(datfile,'wb')
+    f.write(packer.pack(values))
     f.close()
-    xml.write('</Cluster>\n')
+    xml = open(xmlfile,'w')
+    xml.write(packer.xml(values['Version']))
     xml.close()
+    fmt = packer.fmt
 
     # Connect to ACC /parm directory and transfer scan_header files
     try:
@@ -339,9 +339,44 @@
 #      Changes to use new chan_info_52.py code to define a Chan_Info object.  The main
 #      purpose is to enable a fast FLARE mode by specifying a DWELL mode for
 #      one band specified in a dwellXX.fsq file.
+#    2026-Oct-19  SY
+#      set_uvw() now calculates the uvw of all antennas at once with the vectorized
+#      ant_uvw() of eovsa_array.py, from the cached antenna positions, instead of
+#      calling aa.gen_uvw() for each antenna every second.
+#    2026-Oct-19  SY
+#      The 1-s cadence now comes from a TickEngine (tick_engine.py) running on its
+#      own monotonic-clock thread, instead of inc_time() re-arming itself with
+#      root.after().  The work of each tick is split into a control stage (inc_time(),
+#      phase tracking, ROACHes and stateframe) and a monitor stage (tick_monitor(),
+#      weather, solar power, temperature, diagnostics), each on its own worker thread
+#      with a bounded queue, and a GUI stage (tick_gui(), clock display and schedule
+#      stepping) run in the tkinter thread by poll_gui().  Tick jitter and stage
+#      latency histograms are logged hourly and available from self.engine.stats().
+#    2026-Oct-19  SY
+#      log_stateframe() now sets up BinLogWriter objects (binlog.py) for the
+#      stateframe and scanheader logs, which write the (length- and time-prefixed)
+#      records to sf_<date>_v<ver>.blog and sh_<date>_v<ver>.blog files, with an
+#      index for seeking by time, from a background thread with batched fsync, and
+#      roll over to a new file at each change of date.  The 1-s loop only queues
+#      the records, so it never waits on the NAS.
+#    2026-Oct-19  SY
+#      The 15-s SIGALRM/SIGINT hang recovery could not work with inc_time() on a
+#      worker thread (signals go only to the main, tkinter thread), so it is
+#      replaced by a timeout on the control stage:  if a tick hangs for 15 s,
+#      wake_up() logs it and the tick engine starts a new control worker, which
+#      reconnects to the ROACHes.  The socket to the ACC now has its time-out
+#      set before connecting.  The stages now share sf_dict, sh_dict,
+#      self.sensors and self.error under self.state_lock, which is never held
+#      during network I/O.
+#    2026-Oct-19  SY
+#      The schedule commands now take self.state_lock only around their sf_dict
+#      and sh_dict updates, instead of the GUI stage holding it for the whole
+#      tick, and scan_header() is given a copy of sh_dict.  The control stage
+#      checks stage.abandoned(tick) before each ROACH, ACC or log side effect, so
+#      that a worker replaced by the watchdog does nothing more once it wakes.
 #
 
-import os, signal
+import os
 os.chdir('/home/sched/Dropbox/PythonCode/Current')
 from tkinter import *
 import tkinter.ttk
@@ -362,7 +397,6 @@ from eovsapy import chan_info_52 as ci
 from .scan_header import scan_header
 from .gen_schedule_sf import *
 from . import stateframe, stateframedef
-from aipy.phs import PointingError
 import corr, time, numpy, socket, struct, sys
 import ephem
 from eovsapy import eovsa_cat
@@ -373,6 +407,8 @@ from matplotlib.mlab import find
 from . import cal_header
 from . import pcapture2
 from .whenup import make_sched
+from .tick_engine import TickEngine
+from .binlog import BinLogWriter
 
 # Determine whether this is the master schedule (Subarray1) or controlling a second subarray
 # To run the master schedule, just type > python schedule.py
@@ -610,16 +646,16 @@ def set_uvw(aa,t,srcname):
     sf_dict['timestamp'] = sf_dict['timestamp1']  # Transfer previous timestamp (time t)
     timestamp = t.lv      # Get LabVIEW timestamp (t+1)
     sf_dict['timestamp1'] = timestamp
-    uvw = sf_dict['uvw1']                  # Prepare for next uvw (t+1)
-    # Loop over antennas to generate uvw of each relative to antenna 1 (index 0)
-    try:
-        for i in range(16):
-            uvw[i] = aa.gen_uvw(0,i,src=cat[srcname]).transpose()[0,0]
-        sf_dict['phase_tracking'] = True
-    except PointingError:
+    # Generate uvw of all antennas relative to antenna 1 (index 0) at once, from the
+    # cached antenna positions (same as aa.gen_uvw(0,i,src=cat[srcname]) for each i)
+    src1 = cat[srcname]
+    if src1.alt < 0:
         # Source is below horizon
         uvw = numpy.array([[0.0,0.0,0.0]]*16)
         sf_dict['phase_tracking'] = False
+    else:
+        uvw = ant_uvw(aa.sidereal_time() - src1.ra, src1.dec)[:,0]
+        sf_dict['phase_tracking'] = True
     # Store result for t+1 stateframe dictionary
     sf_dict['uvw1'] = uvw
     # Store corresponding delays (= -w coordinate)
@@ -673,11 +709,13 @@ class App():
         
         self.subarray_name = subarray_name # Subarray1 for master schedule, sys.argv[1] for 2nd schedule
         
-        # Define self.mypid, since this will be used by get_subarray_pid() and wake_up()
+        # Define self.mypid, since this will be used by get_subarray_pid()
         self.mypid = mypid
         
-        # Set function to handle signal alarm, if it should go off.  It is set for 15 s in inc_time().
-        signal.signal(signal.SIGALRM, self.wake_up)
+        # Lock for the state shared by the tick stages (sf_dict, sh_dict, self.sensors
+        # and self.error), which run on different threads
+        self.state_lock = threading.RLock()
+        self.roach_reconnect = False
 
         # Read ACC.ini file to get values for global variables
         # binsize, xmlpath, scdport and sfport
@@ -941,9 +979,20 @@ class App():
         self.accini['sh_file'] = None
         self.log_stateframe()
 
-        # Start the clock ticking
-        self.prev = time.time()
-        self.tmr = self.root.after(1,self.inc_time)
+        # Start the clock ticking.  The 1-s ticks come from the tick engine's own
+        # thread, which hands them to the control and monitor stages (each on its
+        # own worker thread) and to the GUI stage, which is run in this (tkinter)
+        # thread by poll_gui().  Query self.engine.stats() for the tick jitter and
+        # stage latency histograms.
+        self.srcname = None
+        self.prev = time.monotonic()
+        self.engine = TickEngine(period=1.0)
+        # If a control tick hangs for 15 s, wake_up() is called and a new control worker is started
+        self.engine.add_stage('control', self.inc_time, maxsize=2, timeout=15., on_hang=self.wake_up)
+        self.engine.add_stage('monitor', self.tick_monitor, maxsize=1)
+        self.engine.add_stage('gui', self.tick_gui, maxsize=5, worker=False)
+        self.engine.start()
+        self.tmr = self.root.after(20,self.poll_gui)
 
     #============================
     
@@ -1023,22 +1072,18 @@ class App():
                 self.roaches.pop()
 
     #============================
-    def wake_up(self, signum, frame):
-        # This is called whenever the 15-second alarm goes off, indicating the
-        # process is stuck in sk_wait.  We simply send ourselves a SIGINT (ctrl-C),
-        # which should hopefully do it, but we should also log the fact by setting
-        # a flag in the self object.
-        self.error = 'The 15-s-alarm went off!'
-        print(self.error,'Signal:',signum,'at frame',frame)
+    def wake_up(self, stage, elapsed):
+        # This is called by the tick engine (on its own thread) when a control tick
+        # has run for more than 15 s, indicating that the worker is stuck (e.g. in
+        # sk_wait).  The engine abandons that worker and starts a new one, so here we
+        # just log the fact, and have the new worker reestablish the connection to
+        # the ROACHes (and set self.fpga accordingly), to keep dla2roach() from hanging.
+        with self.state_lock:
+            self.error = 'The control stage hung for {:.0f} s!'.format(elapsed)
+        print(util.Time.now().iso,self.error,stage.last_error)
+        print(self.engine.report())
         sys.stdout.flush()
-        # Try to reestablish connection to the ROACHes, and set self.fpga accordingly
-        # This will keep dla2roach() from hanging.
-        self.connect2roach()
-        os.kill(int(self.mypid), signal.SIGINT)
-        # Kill the inc_time timer and restart it.
-        self.root.after_cancel(self.tmr)
-        self.prev = time.time()
-        self.tmr = self.root.after(1,self.inc_time)
+        self.roach_reconnect = True
 
 
     #============================
@@ -1717,22 +1762,32 @@ class App():
         sys.stdout.flush()
                 
     #============================
-    def inc_time(self):
-        global sf_dict, sh_dict
-
-        self.status.configure(state=NORMAL)
+    def poll_gui(self):
+        ''' Run the GUI stage (tick_gui()) of any ticks handed over by the tick
+            engine, which must be done here in the tkinter thread, and check
+            again in 20 ms.
+        '''
+        self.engine.drain('gui')
+        self.tmr = self.root.after(20, self.poll_gui)
 
-        # First set the timer to wake us on the next second
-        t = util.Time.now()
-        tdif = int((t.datetime.microsecond)/1000.)
-        self.root.after(1000 - tdif, self.inc_time)
-        # Update the clock
-        self.label.configure(text=t.iso[:19])
+    def inc_time(self, tick):
+        ''' Control stage of the 1-s tick, run on its own worker thread by the
+            tick engine:  phase tracking, ROACH delays and sensors, and reading,
+            logging and writing of the stateframe.
+        '''
+        global sf_dict, sh_dict
 
-        # Set an alarm for 15 seconds.  If the process hangs for more than that, we will send ourselves
-        # a SIGINT via the Callback self.wake_up(), which should recover from sk_wait hang up
-        signal.alarm(15)  # This will reset alarm if it has not gone off yet
-        tnow = time.time()
+        t = util.Time(tick['wall'],format='unix')
+        # If this worker hangs, the tick engine replaces it (see wake_up()), and newer
+        # ticks are run by the new worker.  So after anything that might hang, return
+        # before any ROACH, ACC or log side effect if this tick has been abandoned.
+        stage = tick['stage']
+
+        if self.roach_reconnect:
+            # The previous control worker hung (see wake_up()), so reconnect to the ROACHes
+            self.roach_reconnect = False
+            self.connect2roach()
+        tnow = tick['mono']
         self.telapsed = tnow - self.prev
         self.prev = tnow
         telapsed = int(self.telapsed*1000)
@@ -1742,6 +1797,11 @@ class App():
             # If elapsed time is not nominal (e.g. 990 or 1010), write it to log file.
             print(t.iso,str(int(self.telapsed*1000)))
             sys.stdout.flush() # Flush stdout (/tmp/schedule.log or /tmp/schedule_[self.subarray_name].log) so we can see this '-'.
+        if t.datetime.minute == 0 and t.datetime.second == 0:
+            # Once per hour, log the tick jitter and stage latency statistics
+            print(t.iso,'Tick statistics:')
+            print(self.engine.report())
+            sys.stdout.flush()
 
         # Attempt to read from spawned task pwr_cycle.ant_toggle() queue.  Reads up to 10
         # items at a time unless queue is empty.
@@ -1758,88 +1818,32 @@ class App():
         except:
             pass
             
-        # If this schedule is running the second subarray, confirm that Subarray1 is running; if it is not,
-        # print a warning message to the log file.
-        if self.subarray_name != 'Subarray1':
-            subarray1_pid = self.get_subarray_pid('Subarray1')
-            if subarray1_pid == -1:
-                print(util.datime().get('str'), \
-                      'Warning: The master schedule (Subarray1) is not running.  This means that antenna diagnostic ' + \
-                      'information will not be updated in the ACC stateframe and no data will be written to the SQL database.')
-                sys.stdout.flush() # Flush stdout (/tmp/schedule.log or /tmp/schedule_[self.subarray_name].log) once per second so we can see the output.
-
         # Update phase tracking (u,v,w and delays)
-        srcname = sh_dict['source_id']
-        try:
-            # Generate a Time() object at exactly the next upcoming second (time t+1)
-            t2 = util.Time.now()
-            tsec = util.Time(t2.mjd  + (1 - t2.datetime.microsecond/1000000.)/86400.,format='mjd')
-            src = self.aa.cat[srcname]        # This causes KeyError if source is not found
-        except KeyError:
-            # The current scan header source ID is not in the source catalog
-            srcname = None
-        # Debug info, simply logs that we have started this procedure
-        #sys.stdout.write('+')
-        #sys.stdout.flush() # Flush stdout (/tmp/schedule.log or /tmp/schedule_[self.subarray_name].log) so we can see this '-'.
-        set_uvw(self.aa,tsec,srcname)
+        with self.state_lock:
+            srcname = sh_dict['source_id']
+            try:
+                # Generate a Time() object at exactly the next upcoming second (time t+1)
+                t2 = util.Time.now()
+                tsec = util.Time(t2.mjd  + (1 - t2.datetime.microsecond/1000000.)/86400.,format='mjd')
+                src = self.aa.cat[srcname]        # This causes KeyError if source is not found
+            except KeyError:
+                # The current scan header source ID is not in the source catalog
+                srcname = None
+            # Debug info, simply logs that we have started this procedure
+            #sys.stdout.write('+')
+            #sys.stdout.flush() # Flush stdout (/tmp/schedule.log or /tmp/schedule_[self.subarray_name].log) so we can see this '-'.
+            set_uvw(self.aa,tsec,srcname)
         #sys.stdout.write('-')
         #sys.stdout.flush() # Flush stdout (/tmp/schedule.log or /tmp/schedule_[self.subarray_name].log) so we can see this '-'.
-        self.source.configure(text='    Source: '+(str(srcname)+'            ')[:12]
-                                  +'Phase Tracking: '
-                                  +str(bool(sf_dict['phase_tracking'])) + '    '+self.error)
-        self.error = ''
-       
+        self.srcname = srcname
+
         # Send integer delays to ROACHs - DIFFERENT FOR STARBURST
 #        if self.subarray_name == 'Starburst':
 #            starburst.roach.dla2roach(self,sh_dict,sf_dict)
 #        else:
+        if stage.abandoned(tick): return
         self.dla2roach()
-
-        # Update weather information in sf_dict (reads from OVRO weather station)
-        self.w = stateframe.weather()
-        sf_dict.update(self.w)
-        # If weather information is "stale" (older than 5 minutes), set wscram-limit to 0 to force
-        # Ant 14 to be kept stowed.
-        try:
-            tdifw = t - Time(self.w['mtSampTime'].replace('/','-'))
-            if tdifw.value > 300./86400.:
-                if self.stale is False:
-                    self.stale = True
-                    # Open socket to ACC
-                    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    try:
-                        # Send commands to update antenna trip information
-                        s.connect((self.accini['host'],self.accini['scdport']))
-                        s.send('WSCRAM-LIMIT 0 ANT14')
-                        time.sleep(0.01)
-                        s.close()
-                    except:
-                        pass
-            else:
-                if self.stale is True:
-                    self.stale = False
-                    # Open socket to ACC
-                    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    try:
-                        # Send command to update windscram limit for Ant 14
-                        s.connect((self.accini['host'],self.accini['scdport']))
-                        s.send('WSCRAM-LIMIT '+str(self.wlimit)+' ANT14')
-                        time.sleep(0.01)
-                        s.close()
-                    except:
-                        pass
-        except:
-            # The above calculation of tdif failed--probably a glitch in reading the weather, so leave state as is
-            pass
-
-        # Once per minute, update the information from the Solar Power station(s)
-        if t.datetime.second == 0:
-            # Updates first solar power station on the minute
-            self.solpwr[0] = stateframe.rd_solpwr('http://data.magnumenergy.com/MW5127')
-        if t.datetime.second == 1:
-            # Updates second solar power station one second later
-            self.solpwr[1] = stateframe.rd_solpwr('http://data.magnumenergy.com/MW5241')
-        sf_dict.update({'SolPwr':self.solpwr})
+        if stage.abandoned(tick): return
 
         # Read ROACH sensor data, but only one each minute, staggered over different times
         # since for all 8 ROACHes this can take more than 0.5 s
@@ -1849,38 +1853,12 @@ class App():
                 rnum = int(r.roach_ip[5:6])-1
                 if r.fpga:
                     r.get_sensor_dict()
-                    if r.msg == 'Success':
+                    if stage.abandoned(tick): return
+                with self.state_lock:
+                    if r.fpga and r.msg == 'Success':
                         self.sensors[rnum].update(r.sensors)
                     else:
                         self.sensors[rnum] = {}
-                else:
-                    self.sensors[rnum] = {}
-        if self.cr_temp == -99.0:
-            # Previous read returned an error, so transition to reading only once per minute
-            # until the error stops.  This avoids wasting time if the sensor goes away.
-            if t.datetime.second == 2:
-                self.cr_temp = stateframe.control_room_temp()
-        else:
-            # Previous read was okay, so go ahead and read immediately (takes about 0.01 s)
-            self.cr_temp = stateframe.control_room_temp()
-        self.sensors[0]['temp.ambient'] = self.cr_temp
-
-        # MASTER SCHEDULE ONLY: Update antenna diagnostics, but only once every 5 minutes (300 s)
-        if self.subarray_name == 'Subarray1':
-            if int(t.mjd * 86400.) % 300 == 30:
-                # Open socket to ACC
-                s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                try:
-                    # Send commands to update antenna trip information
-                    s.connect((self.accini['host'],self.accini['scdport']))
-                    s.send('UPDATEAZIMUTHDIAGNOSTICS 1')
-                    time.sleep(0.01)
-                    s.send('UPDATEELEVATIONDIAGNOSTICS 1')
-                    time.sleep(0.01)
-                    s.close()
-                except:
-                    pass
-        
         # Read ROACH delay values
         for i in range(len(self.roaches)):
             r = self.roaches[i]
@@ -1895,9 +1873,11 @@ class App():
                 delays = dict(list(zip(['dx0','dy0','dx1','dy1'],[0,0,0,0])))
             self.delays[rnum].update(delays)        
 
-        for i in range(8):
-            sf_dict['sensors'][i].update(self.sensors[i])
-            sf_dict['delays'][i].update(self.delays[i])
+        if stage.abandoned(tick): return
+        with self.state_lock:
+            for i in range(8):
+                sf_dict['sensors'][i].update(self.sensors[i])
+                sf_dict['delays'][i].update(self.delays[i])
 
 #        # STARBURST ONLY: update sf_dict with Starburst-specific monitor data
 #        if self.subarray_name == 'Starburst':
@@ -1907,13 +1887,18 @@ class App():
         # Get current stateframe (from ACC) and update sf_dict with Azimuth, Elevation, TrackFlag 
         # and parallactic angle information from it (all in degrees!)
         data, msg = stateframe.get_stateframe(self.accini)
+        if stage.abandoned(tick): return
         if msg == 'No Error':
             version = struct.unpack_from('d',data,8)[0]   # Get stateframe version from data
             if version > 0.0 and version != self.accini['version']:
                 # The version number of the stateframe data has changed, so we need to reread
                 # the ACC ini file (which will read a new stateframe.xml file and give us a new
                 # sf dictionary.
+                sf_file, sh_file = self.accini.get('sf_file'), self.accini.get('sh_file')
                 self.accini = stateframe.rd_ACCfile()
+                # Keep the log writers, but switch to file names with the new version
+                self.accini['sf_file'], self.accini['sh_file'] = sf_file, sh_file
+                self.log_stateframe()
                 # MASTER SCHEDULE ONLY: If we are connected to the SQL database, we will need to create and send
                 # a new stateframe definition
                 if self.subarray_name == 'Subarray1':
@@ -1922,14 +1907,17 @@ class App():
                         sys.stdout.write('Error loading new stateframe definition')
                         sys.stdout.flush()
             sf = self.accini['sf']
-            sf_dict.update(stateframe.azel_from_stateframe(sf,data))
+            azel = stateframe.azel_from_stateframe(sf,data)
+            with self.state_lock:
+                sf_dict.update(azel)
             # Flag unused antennas as not tracking (no!  this is just the ROACH assignments)
             # sf_dict['TrackFlag'] = (sf_dict['TrackFlag']) & (sh_dict['antlist'] != 0)
             
             # Check that 27-m antennas are not too close to Sun, and if they are, send them to stow position (using 'position' command)
             self.check_27m_sun(sf,data)
         else:
-            self.error = msg
+            with self.state_lock:
+                self.error = msg
                 
         # ************ This block commented out due to loss of SQL **************
         # # If we are connected to the SQL database, send converted stateframe (only master schedule is connected)
@@ -1944,22 +1932,18 @@ class App():
             # except:
                 # # An exception could be an error, or just that the entry was already inserted
                 # self.error = 'Err: Cannot write stateframe to SQL'
+        # Queue the stateframe for the log file (never blocks; the log writer starts
+        # a new file when the date changes)
         f = self.accini.get('sf_file',None)   
-        if f:
-            date_change = int(time.time() / 86400) > int(os.path.getctime(f.name) / 86400)
-            if date_change:
-                # Looks like the date has changed, so open a new file
-                self.log_stateframe()
-                f = self.accini.get('sf_file')
-        try:
-            f.write(data)
-        except:
-            print(Time.now().iso+' Error writing stateframe to log file')
+        if f and msg == 'No Error':
+            if not f.log(data):
+                print(Time.now().iso+' Error writing stateframe to log file (queue full)')
 
         # Create schedule part of stateframe from sf_dict
         # Subarray1 writes Weather, SolarPower, Roach whereas Subarray2/Starburst don't
         if self.subarray_name == 'Subarray1':
-            fmt, buf, sched_xmlfile = gen_schedule_sf(sf_dict)
+            with self.state_lock:
+                fmt, buf, sched_xmlfile = gen_schedule_sf(sf_dict)
 #        else:
 #            # SUBARRAY2 (OVSA) AND STARBURST: use starburst module's gen_schedule2_sf to create binary buffer to write to ACC
 #            # if it is Subarray2 (OVSA), starburst.gen_schedule2_sf writes default values for the Starburst-specific data
@@ -1970,13 +1954,14 @@ class App():
             portkey = 'scdsfport'
         else:
             portkey = 'scd2sfport'
+        if stage.abandoned(tick): return
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         try:
             # Try to connect and send schedule items of stateframe to ACC
             # Uses "schedule" command and encloses data buffer in square brackets
             time.sleep(0.01)
-            s.connect((self.accini['host'],self.accini[portkey]))
             s.settimeout(0.5)
+            s.connect((self.accini['host'],self.accini[portkey]))
             s.sendall(buf)
             time.sleep(0.02)
             s.close()
@@ -1984,8 +1969,122 @@ class App():
             print(util.datime().get('str'),'Socket time-out when writing sched stateframe to ACC')
             s.close()
         except:
-            self.error = 'Err: Cannot write sched stateframe to ACC'
+            with self.state_lock:
+                self.error = 'Err: Cannot write sched stateframe to ACC'
             
+    def tick_monitor(self, tick):
+        ''' Monitor stage of the 1-s tick, run on its own worker thread by the
+            tick engine so that slow network reads (weather station, solar power,
+            control room temperature) do not hold up the control stage.
+        '''
+        global sf_dict, sh_dict
+
+        t = util.Time(tick['wall'],format='unix')
+
+        # If this schedule is running the second subarray, confirm that Subarray1 is running; if it is not,
+        # print a warning message to the log file.
+        if self.subarray_name != 'Subarray1':
+            subarray1_pid = self.get_subarray_pid('Subarray1')
+            if subarray1_pid == -1:
+                print(util.datime().get('str'), \
+                      'Warning: The master schedule (Subarray1) is not running.  This means that antenna diagnostic ' + \
+                      'information will not be updated in the ACC stateframe and no data will be written to the SQL database.')
+                sys.stdout.flush() # Flush stdout (/tmp/schedule.log or /tmp/schedule_[self.subarray_name].log) once per second so we can see the output.
+
+        # Update weather information in sf_dict (reads from OVRO weather station)
+        self.w = stateframe.weather()
+        with self.state_lock:
+            sf_dict.update(self.w)
+        # If weather information is "stale" (older than 5 minutes), set wscram-limit to 0 to force
+        # Ant 14 to be kept stowed.
+        try:
+            tdifw = t - Time(self.w['mtSampTime'].replace('/','-'))
+            if tdifw.value > 300./86400.:
+                if self.stale is False:
+                    self.stale = True
+                    # Open socket to ACC
+                    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    try:
+                        # Send commands to update antenna trip information
+                        s.connect((self.accini['host'],self.accini['scdport']))
+                        s.send('WSCRAM-LIMIT 0 ANT14')
+                        time.sleep(0.01)
+                        s.close()
+                    except:
+                        pass
+            else:
+                if self.stale is True:
+                    self.stale = False
+                    # Open socket to ACC
+                    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    try:
+                        # Send command to update windscram limit for Ant 14
+                        s.connect((self.accini['host'],self.accini['scdport']))
+                        s.send('WSCRAM-LIMIT '+str(self.wlimit)+' ANT14')
+                        time.sleep(0.01)
+                        s.close()
+                    except:
+                        pass
+        except:
+            # The above calculation of tdif failed--probably a glitch in reading the weather, so leave state as is
+            pass
+
+        # Once per minute, update the information from the Solar Power station(s)
+        if t.datetime.second == 0:
+            # Updates first solar power station on the minute
+            self.solpwr[0] = stateframe.rd_solpwr('http://data.magnumenergy.com/MW5127')
+        if t.datetime.second == 1:
+            # Updates second solar power station one second later
+            self.solpwr[1] = stateframe.rd_solpwr('http://data.magnumenergy.com/MW5241')
+        with self.state_lock:
+            sf_dict.update({'SolPwr':self.solpwr})
+
+        if self.cr_temp == -99.0:
+            # Previous read returned an error, so transition to reading only once per minute
+            # until the error stops.  This avoids wasting time if the sensor goes away.
+            if t.datetime.second == 2:
+                self.cr_temp = stateframe.control_room_temp()
+        else:
+            # Previous read was okay, so go ahead and read immediately (takes about 0.01 s)
+            self.cr_temp = stateframe.control_room_temp()
+        with self.state_lock:
+            self.sensors[0]['temp.ambient'] = self.cr_temp
+
+        # MASTER SCHEDULE ONLY: Update antenna diagnostics, but only once every 5 minutes (300 s)
+        if self.subarray_name == 'Subarray1':
+            if int(t.mjd * 86400.) % 300 == 30:
+                # Open socket to ACC
+                s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                try:
+                    # Send commands to update antenna trip information
+                    s.connect((self.accini['host'],self.accini['scdport']))
+                    s.send('UPDATEAZIMUTHDIAGNOSTICS 1')
+                    time.sleep(0.01)
+                    s.send('UPDATEELEVATIONDIAGNOSTICS 1')
+                    time.sleep(0.01)
+                    s.close()
+                except:
+                    pass
+        
+    def tick_gui(self, tick):
+        ''' GUI stage of the 1-s tick, run in the tkinter thread by poll_gui():
+            updates the clock and source display, and steps through the schedule.
+        '''
+        t = util.Time(tick['wall'],format='unix')
+        self.status.configure(state=NORMAL)
+        # Update the clock
+        self.label.configure(text=t.iso[:19])
+        # Only the display reads and the error reset take the lock; the schedule
+        # commands take it themselves around their sf_dict and sh_dict updates,
+        # so that it is never held during ROACH, ACC or network I/O
+        with self.state_lock:
+            phase_tracking = bool(sf_dict.get('phase_tracking',False))
+            error = self.error
+            self.error = ''
+        self.source.configure(text='    Source: '+(str(self.srcname)+'            ')[:12]
+                                  +'Phase Tracking: '
+                                  +str(phase_tracking) + '    '+error)
+
         if self.Toggle == 0:
             # Schedule is in the GO state.
             # First check if the current line needs to be started or stopped
@@ -2040,36 +2139,28 @@ class App():
         #sys.stdout.flush()  # Flush stdout (/tmp/schedule.log or /tmp/schedule_[self.subarray_name].log) so we can see this '-'.
 
     def log_stateframe(self):
-        '''Called on init, or when it is time to close a log file and open 
-           a new one.  This logs both stateframe and scanheader.  This is
-           only needed if the SQL server is down.
+        '''Called on init, or when the stateframe version changes, to set up the
+           logging of both stateframe and scanheader records.  This is only
+           needed if the SQL server is down.  The records go to BinLogWriter()
+           objects (see binlog.py), which write them from a background thread
+           and start a new file at each change of date, so that logging never
+           holds up the 1-s loop.
         '''
         global sf_dict, sh_dict
-        # Create file name from date
-        # Get today's date
-        t = Time.now()
+        # Stateframe log file name template, with the current version number from accini
         v = self.accini['version']
-        logfile = '/nas4/Tables/stateframe/sf_'+t.iso[:10].replace('-','')+'_v'+str(v)+'.log'
-        if os.path.isfile(logfile):
-            # Desired file name already exists, so simply append to it
-            self.accini['sf_file'] = open(logfile,'a')
+        template = '/nas4/Tables/stateframe/sf_{date}_v'+str(v)+'.blog'
+        if self.accini.get('sf_file'):
+            self.accini['sf_file'].set_template(template)
         else:
-            # Need to open a new file, so first check if old file is open
-            if self.accini['sf_file']:
-                self.accini['sf_file'].close()
-            self.accini['sf_file'] = open(logfile,'wb')
-        # Create scanheader log filename from date
-        # Get the current version number from accini
+            self.accini['sf_file'] = BinLogWriter(template)
+        # Scanheader log file name template, with the current version number from sh_dict
         v = sh_dict['Version']
-        logfile = '/nas4/Tables/scanheader/sh_'+t.iso[:10].replace('-','')+'_v'+str(v)+'.log'
-        if os.path.isfile(logfile):
-            # Desired file name already exists, so simply append to it
-            self.accini['sh_file'] = open(logfile,'a')
+        template = '/nas4/Tables/scanheader/sh_{date}_v'+str(v)+'.blog'
+        if self.accini.get('sh_file'):
+            self.accini['sh_file'].set_template(template)
         else:
-            # Need to open a new file, so first check if old file is open
-            if self.accini['sh_file']:
-                self.accini['sh_file'].close()
-            self.accini['sh_file'] = open(logfile,'wb')
+            self.accini['sh_file'] = BinLogWriter(template)
 
 
     #============================
@@ -2097,8 +2188,9 @@ class App():
         #    dcenidx[13:15] = [14,13]
         #dlax = numpy.round((sh_dict['dlacen'][dcenidx] - sf_dict['delay'])*adc_clk + dlaoff)
         #dlay = dlax + (sh_dict['dlaceny'] - sh_dict['dlacen'])[dcenidx]
-        dlax = numpy.round((sh_dict['dlacen'] - sf_dict['delay'])*adc_clk + dlaoff)
-        dlay = dlax + (sh_dict['dlaceny'] - sh_dict['dlacen'])
+        with self.state_lock:
+            dlax = numpy.round((sh_dict['dlacen'] - sf_dict['delay'])*adc_clk + dlaoff)
+            dlay = dlax + (sh_dict['dlaceny'] - sh_dict['dlacen'])
         
         for r in self.roaches:
             if r.fpga:
@@ -2169,7 +2261,8 @@ class App():
                             print('DLASWEEP Ant',a1,'and',a2,'X and Y delay',dla)
                             
                 if r.msg != 'Success':
-                    self.error = r.msg+' '+r.roach_ip
+                    with self.state_lock:
+                        self.error = r.msg+' '+r.roach_ip
 
     #============================
     def sequence2roach(self,sequence):
@@ -2182,7 +2275,8 @@ class App():
             if r.fpga:
                 r.set_sequence(bands)
                 if r.msg != 'Success':
-                    self.error = r.msg+' '+r.roach_ip
+                    with self.state_lock:
+                        self.error = r.msg+' '+r.roach_ip
 
     #============================
     def sequence2dcmtable(self,sequence):
@@ -2251,93 +2345,100 @@ class App():
         cmds = line[20:].split()
         f2 = open(cmds[0].rstrip()+'.ctl')
         self.L2.delete(0,END)
-        # Current options for source ID
-        if cmds[0].upper() == 'SUN': 
-            sh_dict['project'] = 'NormalObserving'
-            sh_dict['source_id'] = 'Sun'
-            sh_dict['track_mode'] = 'PLANET'
-        elif cmds[0].upper() == 'SOLPNTCAL':
-            sh_dict['project'] = 'SOLPNTCAL'
-            sh_dict['source_id'] = 'Sun'
-            sh_dict['track_mode'] = 'PLANET'
-        elif cmds[0].upper()[:5] == 'FLARE':
-            sh_dict['project'] = cmds[0].upper()
-            sh_dict['source_id'] = 'Sun'
-            sh_dict['track_mode'] = 'PLANET'
-        elif cmds[0].upper() == 'PLANET':
-            sh_dict['project'] = 'PLANET'
-            sh_dict['source_id'] = cmds[1]
-            sh_dict['track_mode'] = 'PLANET'
-        elif cmds[0].upper() == 'FEATTNTEST':
-            sh_dict['project'] = 'FEATTNTEST'
-            sh_dict['source_id'] = 'Sun'
-            sh_dict['track_mode'] = 'PLANET'
-        elif cmds[0].upper() == 'PHASECAL':
-            sh_dict['project'] = 'PHASECAL'
-            sh_dict['source_id'] = cmds[1]
-            sh_dict['track_mode'] = 'RADEC '
-        elif cmds[0].upper() == 'PHASECAL_LO':
-            sh_dict['project'] = 'PHASECAL'
-            sh_dict['source_id'] = cmds[1]
-            sh_dict['track_mode'] = 'RADEC '
-        elif cmds[0][:5].upper() == 'PACAL':
-            sh_dict['project'] = 'PHASECAL'
-            sh_dict['source_id'] = cmds[1]
-            sh_dict['track_mode'] = 'RADEC '
-        elif cmds[0].upper() == 'CALPNTCAL':
-            sh_dict['project'] = 'CALPNTCAL'
-            sh_dict['source_id'] = cmds[1]
-            sh_dict['track_mode'] = 'RADEC '
-        elif cmds[0].upper() == 'STARBURST':
-            sh_dict['project'] = 'STARBURST'
-            sh_dict['source_id'] = cmds[1]
-            sh_dict['track_mode'] = 'RADEC '
-            print('Source is',cmds[1])
-        elif cmds[0].upper() == 'GEOSAT' or cmds[0].upper() == 'DELAYCAL':
-            sh_dict['project'] = 'GEOSAT'
-            sh_dict['source_id'] = cmds[1].replace('_',' ')
-            # These are geostationary satellites so far.  If/when we add
-            # moving satellite capability, track_mode for those should be 'SATELL'
-            sh_dict['track_mode'] = 'FIXED '
+        if cmds[0].upper() == 'GEOSAT' or cmds[0].upper() == 'DELAYCAL':
+            # Fetch the satellite elements before taking the state lock
             try:
                 f = urllib.request.urlopen('http://www.celestrak.com/NORAD/elements/geo.txt',timeout=20)
-                lines = f.readlines()
+                geolines = f.readlines()
                 # Convert from bytes to strings for Python3
-                lines = [line.decode('UTF-8') for line in lines]
+                geolines = [line.decode('UTF-8') for line in geolines]
             except:
                 print(util.Time.now().iso,'Connection to Celestrak timed out.')
-                sh_dict['source_id']='None'
-                lines = ['']
-            for i,line in enumerate(lines):
-                 if line.find(sh_dict['source_id']) == 0:
-                     break
-            if i < len(lines):
-                # This creates an ephem.EarthSatellite object, which does the
-                # right thing in calculating coordinates when the time in aa is updated
-                sat=ephem.readtle(lines[i],lines[i+1],lines[i+2])
-                sf_dict['geosat']=sat
-                sat.compute(self.aa)
-                # Unfortunately, aipy cannot deal with an ephem.EarthSatellite object,
-                # so this creates a fake RadioFixedBody for the current RA,Dec of the 
-                # satellite, to be added to the source catalog. This has to be updated 
-                # once per second in set_uvw()
-                geosat=aipy.amp.RadioFixedBody(sat.ra,sat.dec,name=sat.name)
-                self.aa.cat.add_srcs([geosat,geosat])
-            else:
-                print('Geosat named ',sh_dict['source_id'],'not found!')
-                sh_dict['source_id']='None'
-        else:
-            # Default project is just the first command on line (truncate to 32 chars)
-            sh_dict['project'] = cmds[0][:32]
-            print('Default project:',cmds[0][:32])
-            if len(cmds) == 1:
-                # Case of only one string on command line
-                sh_dict['source_id'] = 'None'
+                geolines = None
+        with self.state_lock:
+            # Current options for source ID
+            if cmds[0].upper() == 'SUN': 
+                sh_dict['project'] = 'NormalObserving'
+                sh_dict['source_id'] = 'Sun'
+                sh_dict['track_mode'] = 'PLANET'
+            elif cmds[0].upper() == 'SOLPNTCAL':
+                sh_dict['project'] = 'SOLPNTCAL'
+                sh_dict['source_id'] = 'Sun'
+                sh_dict['track_mode'] = 'PLANET'
+            elif cmds[0].upper()[:5] == 'FLARE':
+                sh_dict['project'] = cmds[0].upper()
+                sh_dict['source_id'] = 'Sun'
+                sh_dict['track_mode'] = 'PLANET'
+            elif cmds[0].upper() == 'PLANET':
+                sh_dict['project'] = 'PLANET'
+                sh_dict['source_id'] = cmds[1]
+                sh_dict['track_mode'] = 'PLANET'
+            elif cmds[0].upper() == 'FEATTNTEST':
+                sh_dict['project'] = 'FEATTNTEST'
+                sh_dict['source_id'] = 'Sun'
+                sh_dict['track_mode'] = 'PLANET'
+            elif cmds[0].upper() == 'PHASECAL':
+                sh_dict['project'] = 'PHASECAL'
+                sh_dict['source_id'] = cmds[1]
+                sh_dict['track_mode'] = 'RADEC '
+            elif cmds[0].upper() == 'PHASECAL_LO':
+                sh_dict['project'] = 'PHASECAL'
+                sh_dict['source_id'] = cmds[1]
+                sh_dict['track_mode'] = 'RADEC '
+            elif cmds[0][:5].upper() == 'PACAL':
+                sh_dict['project'] = 'PHASECAL'
+                sh_dict['source_id'] = cmds[1]
+                sh_dict['track_mode'] = 'RADEC '
+            elif cmds[0].upper() == 'CALPNTCAL':
+                sh_dict['project'] = 'CALPNTCAL'
+                sh_dict['source_id'] = cmds[1]
+                sh_dict['track_mode'] = 'RADEC '
+            elif cmds[0].upper() == 'STARBURST':
+                sh_dict['project'] = 'STARBURST'
+                sh_dict['source_id'] = cmds[1]
+                sh_dict['track_mode'] = 'RADEC '
+                print('Source is',cmds[1])
+            elif cmds[0].upper() == 'GEOSAT' or cmds[0].upper() == 'DELAYCAL':
+                sh_dict['project'] = 'GEOSAT'
+                sh_dict['source_id'] = cmds[1].replace('_',' ')
+                # These are geostationary satellites so far.  If/when we add
+                # moving satellite capability, track_mode for those should be 'SATELL'
+                sh_dict['track_mode'] = 'FIXED '
+                if geolines is None:
+                    sh_dict['source_id']='None'
+                    lines = ['']
+                else:
+                    lines = geolines
+                for i,line in enumerate(lines):
+                     if line.find(sh_dict['source_id']) == 0:
+                         break
+                if i < len(lines):
+                    # This creates an ephem.EarthSatellite object, which does the
+                    # right thing in calculating coordinates when the time in aa is updated
+                    sat=ephem.readtle(lines[i],lines[i+1],lines[i+2])
+                    sf_dict['geosat']=sat
+                    sat.compute(self.aa)
+                    # Unfortunately, aipy cannot deal with an ephem.EarthSatellite object,
+                    # so this creates a fake RadioFixedBody for the current RA,Dec of the 
+                    # satellite, to be added to the source catalog. This has to be updated 
+                    # once per second in set_uvw()
+                    geosat=aipy.amp.RadioFixedBody(sat.ra,sat.dec,name=sat.name)
+                    self.aa.cat.add_srcs([geosat,geosat])
+                else:
+                    print('Geosat named ',sh_dict['source_id'],'not found!')
+                    sh_dict['source_id']='None'
             else:
-                # Default source ID is second string on command line (truncate to 12 chars)
-                sh_dict['source_id'] = cmds[1][:12]
-            print('Default source:',sh_dict['source_id'])
-            sh_dict['track_mode'] = 'FIXED '        
+                # Default project is just the first command on line (truncate to 32 chars)
+                sh_dict['project'] = cmds[0][:32]
+                print('Default project:',cmds[0][:32])
+                if len(cmds) == 1:
+                    # Case of only one string on command line
+                    sh_dict['source_id'] = 'None'
+                else:
+                    # Default source ID is second string on command line (truncate to 12 chars)
+                    sh_dict['source_id'] = cmds[1][:12]
+                print('Default source:',sh_dict['source_id'])
+                sh_dict['track_mode'] = 'FIXED '        
         lines = f2.readlines()
         for ctlline in lines:
             # Check for hash mark (#) in line other than first character
@@ -2456,7 +2557,8 @@ class App():
                         mjd1 = d.get()
                         mjd2 = mjd1+1
                     if fname.upper() == 'GEOSAT_TAB':
-                        tbl = make_geosattable(sf_dict['geosat'],self.aa,mjd1,mjd2)
+                        with self.state_lock:
+                            tbl = make_geosattable(sf_dict['geosat'],self.aa,mjd1,mjd2)
                     else:
                         tbl = make_tracktable(src,self.aa,mjd1,mjd2)
                     # Write out to file with .radec extension
@@ -2580,8 +2682,9 @@ class App():
                     if delaydict == {}:
                         print(util.Time.now().iso,'ACC transfer of delay centers failed.  Delay center not updated')
                     else:
-                        sh_dict['dlacen']  = delaydict['Delaycen_ns'][:,0]
-                        sh_dict['dlaceny'] = delaydict['Delaycen_ns'][:,1]
+                        with self.state_lock:
+                            sh_dict['dlacen']  = delaydict['Delaycen_ns'][:,0]
+                            sh_dict['dlaceny'] = delaydict['Delaycen_ns'][:,1]
                     # Fetch current delay centers from SQL database, and write them to
                     # the ACC file /parm/delay_centers.txt, which is used by the dppxmp program
                     # xml, buf = cal_header.read_cal(4)
@@ -2631,20 +2734,21 @@ class App():
 
                     # We need an initial call to set_uvw() in order to set RA, Dec and HA
                     # coordinates in scan header dictionary.
-                    srcname = sh_dict['source_id']
-                    try:
-                        # Generate a Time() object at exactly the next upcoming second (time t+1)
-                        t2 = util.Time.now()
-                        tsec = util.Time(t2.mjd  + (1 - t2.datetime.microsecond/1000000.)/86400.,format='mjd')
-                        src = self.aa.cat[srcname]        # This causes KeyError if source is not found
-                    except KeyError:
-                        # The current scan header source ID is not in the source catalog
-                        srcname = None
-                    sh_dict['timestamp'] = tsec.lv
-                    if srcname is not None:
-                        set_uvw(self.aa,tsec,srcname)
-                        print('Current RA, Dec, HA:',sh_dict['ra'],sh_dict['dec'],sh_dict['ha'])
-                        sys.stdout.flush()
+                    with self.state_lock:
+                        srcname = sh_dict['source_id']
+                        try:
+                            # Generate a Time() object at exactly the next upcoming second (time t+1)
+                            t2 = util.Time.now()
+                            tsec = util.Time(t2.mjd  + (1 - t2.datetime.microsecond/1000000.)/86400.,format='mjd')
+                            src = self.aa.cat[srcname]        # This causes KeyError if source is not found
+                        except KeyError:
+                            # The current scan header source ID is not in the source catalog
+                            srcname = None
+                        sh_dict['timestamp'] = tsec.lv
+                        if srcname is not None:
+                            set_uvw(self.aa,tsec,srcname)
+                            print('Current RA, Dec, HA:',sh_dict['ra'],sh_dict['dec'],sh_dict['ha'])
+                            sys.stdout.flush()
                     # Read KATADC status registers.  This can take a long time...
                     sys.stdout.write('There are '+str(len(self.roaches))+' active ROACHes\n')
                     sys.stdout.flush()
@@ -2655,12 +2759,14 @@ class App():
                         if r.fpga:
                             r.get_katadc_dict()
                             if r.msg == 'Success':
-                                sh_dict['katadc'][rnum].update(r.katadc)                            
+                                with self.state_lock:
+                                    sh_dict['katadc'][rnum].update(r.katadc)
                                 sys.stdout.write(r.msg+'\n')
                                 sys.stdout.flush()
                             else:
                                 # In case of failure, set to empty dictionary
-                                sh_dict['katadc'][rnum] = {}
+                                with self.state_lock:
+                                    sh_dict['katadc'][rnum] = {}
                                 sys.stdout.write('Failed:'+r.msg+'\n')
                                 sys.stdout.flush()
                             # This fails, for some reason--probably just takes too long
@@ -2678,8 +2784,9 @@ class App():
                             #    sh_dict['roach_brd_clk'][rnum] = 0
                         else:
                             # In case of no communication, set to empty dictionary
-                            sh_dict['katadc'][rnum] = {}
-                            sh_dict['roach_brd_clk'][rnum] = 0                            
+                            with self.state_lock:
+                                sh_dict['katadc'][rnum] = {}
+                                sh_dict['roach_brd_clk'][rnum] = 0
                             sys.stdout.write('FPGA communication failed\n')
                             sys.stdout.flush()
                             
@@ -2693,7 +2800,10 @@ class App():
                         f = open('/tmp/acc0time.txt','r')
                         mjdacc0 = np.double(f.readline().split()[0])
                         f.close()
-                    sh_dict['time_at_acc0'] = Time(mjdacc0,format='mjd')
+                    with self.state_lock:
+                        sh_dict['time_at_acc0'] = Time(mjdacc0,format='mjd')
+                        # scan_header() transfers the files to the ACC, so hand it a copy
+                        sh_copy = dict(sh_dict)
 
 #                    if self.subarray_name == 'Starburst':
 #                        # get a dictionary with any Starburst-specific scan header data and add it to sh_dict
@@ -2702,7 +2812,7 @@ class App():
 #                        # make a copy of scan_header file including Starburst-specific data and copy it to Starburst server
 #                        starburst.write_scan_header(sh_dict,self.sh_datfile)
 #                    else: # write OVSA scan header and store on ACC
-                    scan_header(sh_dict,self.sh_datfile)
+                    scan_header(sh_copy,self.sh_datfile)
                     
                     # ************ This block commented out due to loss of SQL **************
                     # # If we are connected to the SQL database, send converted scan header
@@ -2723,30 +2833,31 @@ class App():
                             # sys.stdout.flush()
                             # self.error = 'Err: Cannot write scan header to SQL'
                     # Replaced by
-                    f2 = open(self.sh_datfile)
+                    f2 = open(self.sh_datfile,'rb')
                     data = f2.read()
                     f2.close()
                     f = self.accini.get('sh_file')
-                    try:
-                        f.write(data)
-                    except:
-                        print(Time.now().iso+' Error writing stateframe to log file')
+                    if not f.log(data):
+                        print(Time.now().iso+' Error writing scan header to log file (queue full)')
 
                     
                     if nodata == 'NODATA':
                         pass
                     else:
                         # Set scan state to on
-                        sf_dict['scan_state'] = 1
+                        with self.state_lock:
+                            sf_dict['scan_state'] = 1
                 #==== SCAN-RESTART ====
                 elif ctlline.split()[0].upper() == '$SCAN-RESTART':
                     # This command is for restarting a scan with the same setup as the
                     # previously running scan, where only the scan state must be turned on
                     # Set scan state to on
-                    sf_dict['scan_state'] = 1
+                    with self.state_lock:
+                        sf_dict['scan_state'] = 1
                 #==== SCAN-STOP ====
                 elif ctlline.split()[0].upper() == '$SCAN-STOP':
-                    sf_dict['scan_state'] = -1
+                    with self.state_lock:
+                        sf_dict['scan_state'] = -1
                 #==== PA-SWEEP ====
                 elif ctlline.split()[0].upper() == '$PA-SWEEP':
                     # Rotate 27-m focus rotation mechanism to sweep through a given angle 
@@ -2877,10 +2988,12 @@ class App():
                         rnum = int(r.roach_ip[5:6])
                         if r.msg == 'Success':
                             sdev = dict(list(zip(['sdev.adc0.h','sdev.adc0.v','sdev.adc1.h','sdev.adc1.v'],r.sdev)))
-                            sh_dict['katadc'][rnum].update(sdev)
+                            with self.state_lock:
+                                sh_dict['katadc'][rnum].update(sdev)
                         else:
                             # In case of failure, set to empty dictionary
-                            sh_dict['katadc'][rnum] = {}
+                            with self.state_lock:
+                                sh_dict['katadc'][rnum] = {}
                 #==== REWIND ====
                 elif ctlline.split()[0].upper() == '$REWIND':
                     # Get date of first line of current schedule
@@ -2963,7 +3076,8 @@ class App():
                         except:
                             antlist = ''
                         if antlist == '':
-                            self.error = '$SUBARRAY: antlist name not in ' + antlistfile
+                            with self.state_lock:
+                                self.error = '$SUBARRAY: antlist name not in ' + antlistfile
                             return
                     if self.subarray_name == 'Subarray1':
                         N = 1
@@ -3021,18 +3135,20 @@ class App():
                     if fsequence == '':
                         print('FSEQ file',cmds[1],'not successfully interpreted.')
                         # Default to allowing all channels in RFI mask
-                        sh_dict.update({'chanmask':numpy.array([1]*204800,'byte')})
+                        with self.state_lock:
+                            sh_dict.update({'chanmask':numpy.array([1]*204800,'byte')})
                     else:
-                        sh_dict.update({'fsequence':fsequence[:-1]})   # -1 removes trailing ','
                         chanmask = ci.get_chanmask(fsequence[:-1])
-                        sh_dict.update({'chanmask': chanmask})
                         # Get nominal Chan2Wide assignment, then multiply by chanmask and update it
                         fseqlist = fsequence[:-1].rsplit(',')
                         item = []
                         for band in fseqlist:
                             ch = sh_dict['chinfo'].chan_asmt(int(band))
                             item += ch
-                        sh_dict.update({'chan2wide':numpy.array(item)*sh_dict['chanmask']})
+                        with self.state_lock:
+                            sh_dict.update({'fsequence':fsequence[:-1]})   # -1 removes trailing ','
+                            sh_dict.update({'chanmask': chanmask})
+                            sh_dict.update({'chan2wide':numpy.array(item)*chanmask})
                         self.sequence2roach(fsequence[:-1])
                         self.sequence2dcmtable(fsequence[:-1])
                 elif cmds[0].upper() == 'RX-SELECT':
@@ -0,0 +1,381 @@
+'''
+   Persistent client for the ACC stateframe port.
+
+   The ACC sends the current stateframe (accini['binsize'] bytes) each time
+   it receives a 4-byte (big-endian int) request on its stateframe port.
+   StateframeClient keeps one connection open for all of these requests,
+   rather than opening a new socket for each one.  If the connection fails,
+   it is closed, and is reopened on a later request, after a backoff delay
+   that doubles (up to max_backoff seconds) on each failure, so that a
+   missing ACC does not stall the caller on every call.
+
+   read() fetches one frame on the calling thread, and returns (data, msg)
+   just like stateframe.get_stateframe(), which now uses a shared client
+   from get_client().  Alternatively, start() polls the ACC on a background
+   thread once per period, and each frame is published to the subscribers
+   and put in a ring buffer of the last nframes frames:
+
+       client = StateframeClient(accini, nframes=60)
+       client.subscribe(func)         # func(frame) is called on the poll thread
+       client.start(period=1.0)
+       ...
+       frame = client.latest()        # Or client.wait(seq) for the next one
+       client.stop()
+
+   A frame is a dictionary with keys 'seq' (frame number), 't' (time of the
+   read, Unix seconds), 'data' (bytes, or None on error), 'msg', 'timestamp'
+   (LabVIEW) and 'version' (from the first two doubles of the data), and
+   'decoded' (the result of the client's decode(data) function, if any).
+
+   If the ACC does not send the whole frame within the timeout, read() returns
+   what it did send (possibly nothing), with the message 'Incorrect stateframe
+   size returned from ACC', as the old get_stateframe() did, and the
+   connection is reopened on the next request.
+
+   FakeACC is a local server that answers requests with recorded stateframe
+   data (from a list of frames or a stateframe log file), for testing:
+
+       acc = FakeACC('/nas4/Tables/stateframe/sf_20261019_v66.0.blog')
+       client = StateframeClient(acc.accini())
+'''
+#
+# History:
+#  2026-Oct-19  SY
+#    Initial version.
+#  2026-Oct-19  SY
+#    Return a short frame on timeout, as get_stateframe() did before, and added
+#    the align option of start().
+#
+
+import time
+import struct
+import socket
+import threading
+import collections
+import socketserver
+from . import binlog
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def frame_header(data):
+    ''' Returns the (LabVIEW) timestamp and the version of the stateframe data,
+        which are the first two (little-endian) doubles.
+    '''
+    if data is None or len(data) < 16:
+        return 0.0, 0.0
+    return struct.unpack_from('<2d', data, 0)
+
+
+class StateframeClient():
+    ''' Keeps a connection to the stateframe port of the ACC given by the
+        dictionary accini (from stateframe.rd_ACCfile(), with keys 'host',
+        'sfport' and 'binsize'), and reads stateframes on it.  See the module
+        description.
+    '''
+    def __init__(self, accini, timeout=0.5, backoff=0.5, max_backoff=8.0, nframes=60, decode=None):
+        self.host = accini['host']
+        self.port = accini['sfport']
+        self.binsize = accini['binsize']
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.decode = decode
+        self.sock = None
+        self.delay = 0.0
+        self.retry_at = 0.0
+        self.lock = threading.Lock()
+        self.cond = threading.Condition()
+        self.frames = collections.deque(maxlen=nframes)
+        self.subscribers = []
+        self.seq = 0
+        self.nread = 0
+        self.nerror = 0
+        self.nconnect = 0
+        self.last_msg = None
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def update(self, accini):
+        ''' Take the stateframe size from a (re)read accini, e.g. after a
+            change of stateframe version.
+        '''
+        self.binsize = accini['binsize']
+
+    def _close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+
+    def _fail(self):
+        # Close the connection and put off the next attempt to reconnect
+        self._close()
+        self.nerror += 1
+        self.delay = min(max(self.delay * 2, self.backoff), self.max_backoff)
+        self.retry_at = time.monotonic() + self.delay
+
+    def _connect(self):
+        s = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = s
+        self.nconnect += 1
+
+    def _request(self):
+        # Send a request for stateframe 1, and read until the whole frame is in,
+        # or return what has come in by the timeout
+        self.sock.sendall(struct.pack('>i', 1))
+        buf = bytearray(self.binsize)
+        view = memoryview(buf)
+        n = 0
+        while n < self.binsize:
+            try:
+                nrecv = self.sock.recv_into(view[n:])
+            except socket.timeout:
+                print(time.strftime('%Y-%m-%d %H:%M:%S'), 'Socket time-out when reading stateframe from ACC')
+                break
+            if nrecv == 0:
+                raise ConnectionError('Connection closed by ACC')
+            n += nrecv
+        return bytes(buf[:n])
+
+    def read(self):
+        ''' Reads the current stateframe from the ACC, reconnecting first if
+            needed (and the backoff delay has expired).  Returns data and a
+            message, as stateframe.get_stateframe().
+        '''
+        with self.lock:
+            if self.sock is None:
+                if time.monotonic() < self.retry_at:
+                    return None, 'Cannot connect to port '+str(self.port)
+                try:
+                    self._connect()
+                except OSError:
+                    self._fail()
+                    return None, 'Cannot connect to port '+str(self.port)
+                fresh = True
+            else:
+                fresh = False
+            try:
+                data = self._request()
+            except OSError:
+                self._close()
+                if fresh:
+                    self._fail()
+                    return None, 'Cannot read from port '+str(self.port)
+                # An old connection may have been closed by the ACC, so try once
+                # more on a new one
+                try:
+                    self._connect()
+                    data = self._request()
+                except OSError:
+                    self._fail()
+                    return None, 'Cannot read from port '+str(self.port)
+            self.delay = 0.0
+            if len(data) != self.binsize:
+                # The rest of this frame may still arrive, so start over on a new
+                # connection next time
+                self._close()
+                self.nerror += 1
+                return data, 'Incorrect stateframe size returned from ACC'
+            self.nread += 1
+            return data, 'No Error'
+
+    def publish(self, data, msg):
+        ''' Makes a frame from data and msg, puts it in the ring buffer, and
+            calls the subscribers with it.  Returns the frame.
+        '''
+        timestamp, version = frame_header(data)
+        frame = {'t': time.time(), 'data': data, 'msg': msg,
+                 'timestamp': timestamp, 'version': version}
+        if self.decode is not None and data is not None:
+            frame['decoded'] = self.decode(data)
+        with self.cond:
+            self.seq += 1
+            frame['seq'] = self.seq
+            self.frames.append(frame)
+            self.last_msg = msg
+            self.cond.notify_all()
+        for func in list(self.subscribers):
+            try:
+                func(frame)
+            except Exception as e:
+                print(time.strftime('%Y-%m-%d %H:%M:%S'), 'Stateframe subscriber', getattr(func, '__name__', func), 'failed:', e)
+        return frame
+
+    def subscribe(self, func):
+        ''' Adds func(frame) to the functions called (on the poll thread) for
+            each new frame.
+        '''
+        self.subscribers.append(func)
+
+    def unsubscribe(self, func):
+        if func in self.subscribers:
+            self.subscribers.remove(func)
+
+    def latest(self):
+        ''' Returns the latest frame, or None if there is none yet.
+        '''
+        with self.cond:
+            if self.frames:
+                return self.frames[-1]
+        return None
+
+    def history(self, since=0):
+        ''' Returns the list of frames in the ring buffer newer than frame
+            number since.
+        '''
+        with self.cond:
+            return [frame for frame in self.frames if frame['seq'] > since]
+
+    def wait(self, since=0, timeout=None):
+        ''' Waits for a frame newer than frame number since, and returns the
+            latest frame, or None on timeout.
+        '''
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.seq > since, timeout):
+                return None
+            return self.frames[-1]
+
+    def get_stateframe(self):
+        ''' Returns data and message of the latest polled frame, in the form
+            of stateframe.get_stateframe().
+        '''
+        frame = self.latest()
+        if frame is None:
+            return None, 'No stateframe read yet'
+        return frame['data'], frame['msg']
+
+    def _poll(self, period, align):
+        if align:
+            # Wait for the first whole multiple of period (in Unix time)
+            if self.stopping.wait(period - time.time() % period):
+                return
+        t = time.monotonic()
+        while True:
+            self.publish(*self.read())
+            t += period
+            now = time.monotonic()
+            if t < now:
+                # Fell behind (e.g. slow reconnect), so skip the missed polls
+                t = now + period - (now - t) % period
+            if self.stopping.wait(t - now):
+                return
+
+    def start(self, period=1.0, align=False):
+        ''' Starts polling the ACC every period seconds on a background thread.
+            If align is True, the polls are made at whole multiples of period
+            (e.g. at the start of each second).
+        '''
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._poll, args=(period, align), name='sf_client')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self, timeout=2.0):
+        ''' Stops the poll thread, and closes the connection.
+        '''
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+        with self.lock:
+            self._close()
+
+    def stats(self):
+        ''' Returns a dictionary of the numbers of frames read, errors and
+            connections made, the current backoff delay and the last message.
+        '''
+        return {'read': self.nread, 'errors': self.nerror, 'connects': self.nconnect,
+                'backoff': self.delay, 'seq': self.seq, 'last_msg': self.last_msg,
+                'connected': self.sock is not None}
+
+
+def get_client(accini):
+    ''' Returns the shared StateframeClient for the ACC host and stateframe port
+        of accini (creating it the first time), updated with its stateframe size.
+    '''
+    key = (accini['host'], accini['sfport'])
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = StateframeClient(accini)
+            _clients[key] = client
+    client.update(accini)
+    return client
+
+
+def load_frames(filename):
+    ''' Returns the list of stateframes (bytes) recorded in filename, which is
+        either a binary log (see binlog.py) or an older file of bare records.
+    '''
+    if binlog.is_binlog(filename):
+        return [data for t, data in binlog.read_records(filename)]
+    buf = open(filename, 'rb').read()
+    recsiz = struct.unpack_from('<i', buf, 16)[0]
+    return [buf[i:i + recsiz] for i in range(0, len(buf) - recsiz + 1, recsiz)]
+
+
+class _ACCHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        acc = self.server.acc
+        n = 0
+        while True:
+            req = b''
+            while len(req) < 4:
+                chunk = self.request.recv(4 - len(req))
+                if not chunk:
+                    return
+                req += chunk
+            if acc.latency:
+                time.sleep(acc.latency)
+            self.request.sendall(acc.next_frame())
+            n += 1
+            if acc.close_after and n >= acc.close_after:
+                # Simulate an ACC that drops the connection
+                return
+
+
+class FakeACC():
+    ''' A local stand-in for the ACC stateframe port, which answers each
+        request with the next of the recorded frames (a list of bytes, or the
+        name of a stateframe log file), cycling through them.  latency (s)
+        delays each answer, and close_after closes each connection after
+        that many frames.  port=0 picks a free port.
+    '''
+    def __init__(self, frames, host='127.0.0.1', port=0, latency=0.0, close_after=None):
+        if isinstance(frames, str):
+            frames = load_frames(frames)
+        self.frames = frames
+        self.latency = latency
+        self.close_after = close_after
+        self.nserved = 0
+        self.lock = threading.Lock()
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((host, port), _ACCHandler)
+        self.server.daemon_threads = True
+        self.server.acc = self
+        self.host, self.port = self.server.server_address[:2]
+        self.thread = threading.Thread(target=self.server.serve_forever, name='fake_acc')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def next_frame(self):
+        with self.lock:
+            data = self.frames[self.nserved % len(self.frames)]
+            self.nserved += 1
+        return data
+
+    def accini(self):
+        ''' Returns an accini-like dictionary for connecting to this server.
+        '''
+        return {'host': self.host, 'sfport': self.port, 'binsize': len(self.frames[0])}
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -102,6 +102,23 @@
 #       Added Currently used CPUs to the fix packets title
 #   2021-Sep-20 OG
 #       Added check to make sure two cpus are found in the dpp section.
+#   2026-Oct-19 SY
+#       Incremental redraw:  the Listboxes are wrapped in DiffListbox, so that
+#       only rows that changed are redrawn, antenna status labels are only
+#       reconfigured when changed, and nothing is redrawn if the stateframe
+#       is unchanged.  Selected fields are kept in decimated ring buffers
+#       (FieldHistory), which are used by the Temps plot and by a new Trends
+#       section of sparklines.  The CPU time of each update is shown in a new
+#       status bar.
+#   2026-Oct-19 SY
+#       Stateframe logging now goes through a BinLogWriter (binlog.py), in the same
+#       format as the schedule's logs, and the log writer is kept when accini is
+#       reread after a version change.
+#   2026-Oct-19 SY
+#       Stateframes are now polled at the start of each second by a StateframeClient
+#       (sf_client.py) on a background thread.  inc_time() runs 0.1 s later and
+#       takes all frames polled since the last update from the client's ring
+#       buffer, so each frame is logged and added to the history exactly once.
 
 from tkinter import *
 from tkinter.ttk import *
@@ -126,6 +143,9 @@ from collections import deque
 from math import fmod, pi
 from . import antenna_control as ant_ctrl
 from eovsapy import eovsa_lst as el
+from .tick_engine import Histogram
+from .binlog import BinLogWriter
+from . import sf_client
 
 
 class App():
@@ -140,6 +160,10 @@ class App():
             self.accini['sfport'] = int(sys.argv[2])
         print('Setting host to ', self.accini['host'])
         print('Setting port to ', self.accini['sfport'])
+        # Poll the ACC at the start of each second on a background thread
+        self.sfclient = sf_client.get_client(self.accini)
+        self.sfclient.start(period=1.0, align=True)
+        self.lastseq = 0
         
         self.root = Tk()
         self.root.protocol("WM_DELETE_WINDOW", self.quit)
@@ -168,6 +192,9 @@ class App():
         self.label.pack(side=LEFT)
         self.lst_label = Label(timeframe, text='', font='Helvetica 11')
         self.lst_label.pack(side=RIGHT)
+        # Status bar, for the CPU time of the display updates
+        self.status = Label(self.root, text='', font='Helvetica 9', anchor=W)
+        self.status.pack(side=BOTTOM, fill=X)
         textframe = Frame(self.root)
         textframe.pack(expand=1, fill=BOTH)
 
@@ -230,17 +257,17 @@ class App():
                 self.Lbel[i][j].pack(side=TOP)
                 self.Lbcn[i][j] = Label(fantcn[i], text='', style='BG.TLabel')
                 self.Lbcn[i][j].pack(side=TOP)
-            self.Lbtrip.append(Listbox(fanttrip[i], selectmode=NONE, width=60,
-                                       height=26))
+            self.Lbtrip.append(DiffListbox(Listbox(fanttrip[i], selectmode=NONE, width=60,
+                                       height=26)))
             self.Lbtrip[i].pack(side=LEFT, fill=BOTH, expand=0)
-            self.Lbctrl1.append(Listbox(fantctrl[i], selectmode=NONE, width=34,
-                                        height=27, font=font2use))
+            self.Lbctrl1.append(DiffListbox(Listbox(fantctrl[i], selectmode=NONE, width=34,
+                                        height=27, font=font2use)))
             self.Lbctrl1[i].pack(side=LEFT, fill=BOTH, expand=0)
-            self.Lbctrl2.append(Listbox(fantctrl[i], selectmode=NONE, width=34,
-                                        height=27, font=font2use))
+            self.Lbctrl2.append(DiffListbox(Listbox(fantctrl[i], selectmode=NONE, width=34,
+                                        height=27, font=font2use)))
             self.Lbctrl2[i].pack(side=LEFT, fill=BOTH, expand=0)
-            self.Lbctrl3.append(Listbox(fantctrl[i], selectmode=NONE, width=34,
-                                        height=27, font=font2use))
+            self.Lbctrl3.append(DiffListbox(Listbox(fantctrl[i], selectmode=NONE, width=34,
+                                        height=27, font=font2use)))
             self.Lbctrl3[i].pack(side=LEFT, fill=BOTH, expand=0)
 
         fplot = Frame()
@@ -266,6 +293,7 @@ class App():
 
         # plot tab
         self.prevtab = None
+        self.prevanttab = None
         self.plot1 = plt.figure(1)
         self.sub_plot1 = self.plot1.add_subplot(111)
         self.sub_plot1.grid()
@@ -338,17 +366,17 @@ class App():
         # Add dropdown hierarchy starting with position 1 (entire hierarchy)
         self.add_dropdown(1)
 
-        self.L3 = Listbox(fmain, selectmode=SINGLE, width=102, height=60,
-                          font=font2use)
+        self.L3 = DiffListbox(Listbox(fmain, selectmode=SINGLE, width=102, height=60,
+                          font=font2use))
         self.L3.bind('<<ListboxSelect>>', self.toggle_heading)
         self.L3.pack(side=LEFT, fill=BOTH, expand=0)
-        self.sectionDisplayState = [1, 0, 1, 0, 1, 1, 1, 0, 1, 1]
+        self.sectionDisplayState = [1, 0, 1, 0, 1, 1, 1, 0, 1, 1, 0]
         self.colors = {'section0': '#757', 'section1': '#979',
                        'colhead': '#cfc', 'error': '#f88', 'warn': '#ff8',
                        'na': '#ddd', 'offsets': '#feb'}
 
-        self.cryoLB = Listbox(fcryo, selectmode=SINGLE, width=102, height=46,
-                          font=font2use)
+        self.cryoLB = DiffListbox(Listbox(fcryo, selectmode=SINGLE, width=102, height=46,
+                          font=font2use))
         #self.cryoLB.bind('<<ListboxSelect>>', self.toggle_heading)
         self.cryoLB.pack(side=LEFT, fill=BOTH, expand=0)
         
@@ -388,6 +416,18 @@ class App():
         # oldest record (on the left) will "age-off"
         self.que = deque([], 3600)  # Make maximum length equal to 1 h of data
 
+        # State for the incremental redraw:  the previous stateframe, the Listboxes
+        # to commit after each update, the last settings of other widgets, and the
+        # histogram of CPU time per update [ms]
+        self.prev_data = None
+        self.redraw = True
+        self.nskipped = 0
+        self.difflists = [self.L3, self.cryoLB] + self.Lbtrip + self.Lbctrl1 + self.Lbctrl2 + self.Lbctrl3
+        self.widget_state = {}
+        self.cpu_hist = Histogram()
+        # Decimated histories of selected fields, for the Temps plot and the Trends section
+        self.history = FieldHistory(self.trend_fields())
+
         # Dictionary structure to keep the saved plots
         self.saved_dict = {}
         self.saved_dict_labels = {}
@@ -471,8 +511,8 @@ class App():
             self.current_tab = None
             self.tab_change = self.nb.tab(self.nb.select(),'text')
 
-        # Start the clock ticking
-        self.root.after(1000 - int((t.datetime.microsecond)/1000.),self.inc_time)
+        # Start the clock ticking, 0.1 s after each poll of the ACC
+        self.root.after(1100 - int((t.datetime.microsecond)/1000.),self.inc_time)
         
         # Get the most recent IDB file
         self.IDBfile = getIDBfile()
@@ -484,6 +524,9 @@ class App():
         self.dppcpu = read_dpp_cpus()
         
     def quit(self):
+        self.sfclient.stop()
+        if self.accini.get('sf_file'):
+            self.accini['sf_file'].close()
         exit()
 
     #===============================
@@ -504,6 +547,36 @@ class App():
                 if w.itemcget(i,"bg") == self.colors['section0'] or w.itemcget(i,"bg") == self.colors['section1']:
                     section += 1
             self.sectionDisplayState[section] = 1 - self.sectionDisplayState[section]
+            self.redraw = True
+
+    #===============================
+    def set_widget(self, widget, **kw):
+        ''' Configures widget with the keywords kw, unless those are the same
+            as its last settings.
+        '''
+        key = str(widget)
+        if self.widget_state.get(key) != kw:
+            widget.configure(**kw)
+            self.widget_state[key] = kw
+
+    #===============================
+    def trend_fields(self):
+        ''' Returns the dictionary of stateframe fields (name: locator in the
+            stateframe dictionary) kept in the FieldHistory.
+        '''
+        sf = self.accini['sf']
+        weather = sf['Schedule']['Data']['Weather']
+        fields = {'Timestamp': sf['Timestamp'],
+                  'Ambient': weather['Temperature'],
+                  'AvgWind': weather['AvgWind'],
+                  'Pressure': weather['Pressure'],
+                  'CRTemp': sf['Schedule']['Data']['Roach'][0]['Temp.ambient'],
+                  'Cryo14': sf['FEMA']['Thermal']['SecondStageTemp']}
+        for i in range(14):
+            if i < 13:
+                fields['Laird'+str(i+1)] = sf['Antenna'][i]['Frontend']['TEC']['Temperature']
+            fields['FEM'+str(i+1)] = sf['Antenna'][i]['Frontend']['FEM']['Temperature']
+        return fields
 
     #===============================
     '''button to create a new tab from a specific saved plots.
@@ -814,7 +887,14 @@ class App():
 
 #   pos7 = self.S7.get()
 #   pos8 = self.S8.get()
-        data, msg = stf.get_stateframe(self.accini)
+        # Take the frames polled since the last update.  Each new frame is logged
+        # and added to the history, and the latest one is displayed.
+        frames = self.sfclient.history(self.lastseq)
+        if frames:
+            self.lastseq = frames[-1]['seq']
+            data, msg = frames[-1]['data'], frames[-1]['msg']
+        else:
+            data, msg = self.sfclient.get_stateframe()
 
         if msg != 'No Error':
             print(msg)
@@ -827,29 +907,38 @@ class App():
                 # The version number of the stateframe data has changed, so we need to reread
                 # the ACC ini file (which will read a new stateframe.xml file and give us a new
                 # sf dictionary.
+                sf_file = self.accini.get('sf_file')
                 self.accini = stf.rd_ACCfile()
+                self.accini['sf_file'] = sf_file
+                self.sfclient.update(self.accini)
+                self.history.set_fields(self.trend_fields())
                 version_change = True
-            # Only log or further process non-zero stateframe data
-            if version != 0.0:
+            f = self.accini.get('sf_file',None)   
+            if f and version_change:
+                # Switch to a log file name with the new version
+                self.log_stateframe()
+            for frame in frames:
+                # Only log or further process good, non-zero stateframe data
+                if frame['msg'] != 'No Error' or frame['version'] == 0.0:
+                    continue
                 # This should be a good stateframe, so add it to the que for plotting
-                self.que.append(data)
-                # If there is an open log file, write raw data to it
-                f = self.accini.get('sf_file',None)   
-                if f:
-                    date_change = int(time.time() / 86400) > int(os.path.getctime(f.name) / 86400)
-                    if version_change or date_change:
-                        # Looks like the version or date has changed, so open a new file
-                        self.log_stateframe()
-                        f = self.accini.get('sf_file')
-                    try:
-                        f.write(data)
-                    except:
-                        print(Time.now().iso+' Error writing stateframe to log file')
-        curtab = self.nb.tab(self.nb.select(),'text')
+                self.que.append(frame['data'])
+                self.history.add(frame['data'])
+                # If we are logging, queue the raw data for the log writer (which
+                # starts a new file when the date changes)
+                if f and not f.log(frame['data'], frame['t']):
+                    print(Time.now().iso+' Error writing stateframe to log file (queue full)')
+        toptab = self.nb.tab(self.nb.select(),'text')
+        curtab = toptab
+        anttab = self.nb_ant.tab(self.nb_ant.select(),'text')
+        cpu0 = time.process_time()
         if data:
-            if curtab[0:3] == 'Ant':
-                curtab = self.nb_ant.tab(self.nb_ant.select(),'text')
-                iant = int(curtab[3:])
+            if (data == self.prev_data and toptab == self.prevtab and anttab == self.prevanttab
+                    and not self.redraw):
+                # Same stateframe and tab as last time, so there is nothing to redraw
+                self.nskipped += 1
+            elif toptab[0:3] == 'Ant':
+                iant = int(anttab[3:])
                 self.update_ant(data,iant)
             elif curtab == 'Temps':
                 # If we have changed tabs, autoscale the plot
@@ -907,16 +996,29 @@ class App():
             self.L3.insert(0,'Stateframe could not be read--ACC is down?  Message: '+msg)
             self.L3.itemconfig(0,background="red",foreground='white') 
 
-        self.prevtab = curtab
+        self.prevtab = toptab
+        self.prevanttab = anttab
+        self.prev_data = data
+        self.redraw = False
+        # Put the changed rows of the Listboxes on the screen, and report the CPU time
+        nrows = 0
+        for lb in self.difflists:
+            nrows += lb.commit()
+        cpu = (time.process_time() - cpu0)*1000.
+        self.cpu_hist.add(cpu)
+        stats = self.cpu_hist.summary()
+        self.status.configure(text='Update: {:6.1f} ms CPU  (median {:.1f}, 90% {:.1f} ms)   Rows redrawn: {:3d}   Unchanged frames: {}'.format(
+                              cpu,stats['p50'],stats['p90'],nrows,self.nskipped))
 
         t = Time.now()
         self.label.configure(text=t.iso)
         self.lst_label.configure(text='  Local Sidereal Time:  '+str(el.eovsa_lst())[:8])
-        self.root.after(1000 - int((t.datetime.microsecond)/1000.),self.inc_time)
+        self.root.after(1100 - int((t.datetime.microsecond)/1000.),self.inc_time)
 
     def log_stateframe(self):
         '''Callback for when user clicks in the Log Stateframe checkbox.
-           Also called when it is time to close a log file and open a new one.
+           Also called when the stateframe version changes, to switch to a new
+           file name.  The stateframes are written by a BinLogWriter (binlog.py).
         '''
         var = self.logsf.get()
         if var:
@@ -935,23 +1037,15 @@ class App():
                         logdir = os.getcwd()
                 os.environ['SF_LOGDIR'] = logdir
             print('Stateframe logs will be written to',logdir)
-            # Create file name from date
-            # Get today's date
-            t = Time.now()
-            # Get the current version number from accini
+            # File name template, with the current version number from accini (the
+            # log writer fills in the date, and starts a new file when it changes)
             v = self.accini['version']
-            filename = 'sf_'+t.iso[:10].replace('-','')+'_v'+str(v)+'.log'
-            logfile = logdir+os.sep+filename
-            if os.path.isfile(logfile):
-                # Desired file name already exists, so simply append to it
-                self.accini['sf_file'] = open(logfile,'a')
+            template = logdir+os.sep+'sf_{date}_v'+str(v)+'.blog'
+            if self.accini.get('sf_file'):
+                self.accini['sf_file'].set_template(template)
             else:
-                # Need to open a new file, so first check if old file is open
-                if self.accini['sf_file']:
-                    self.accini['sf_file'].close()
-                #self.accini['sf_file'] = open(logfile,'wb')
-                self.accini['sf_file'] = None  # Possibly temporary override --do not log data
-        else:
+                self.accini['sf_file'] = BinLogWriter(template)
+        elif self.accini.get('sf_file'):
             self.accini['sf_file'].close()
             self.accini['sf_file'] = None
 
@@ -994,9 +1088,9 @@ class App():
         for text, color in az_stat.get(list(range(24))):
             if text:
                 if color == 'red':
-                    self.Lbaz[i][j].configure(text=text,style='BR.TLabel')
+                    self.set_widget(self.Lbaz[i][j],text=text,style='BR.TLabel')
                 else:
-                    self.Lbaz[i][j].configure(text=text,style='BG.TLabel')
+                    self.set_widget(self.Lbaz[i][j],text=text,style='BG.TLabel')
                 j += 1
         el = extract(data,ant['ElevationStatus'])
         el_stat = ElStatus(el)
@@ -1025,9 +1119,9 @@ class App():
         for text, color in el_stat.get(list(range(24))):
             if text:
                 if color == 'red':
-                    self.Lbel[i][j].configure(text=text,style='BR.TLabel')
+                    self.set_widget(self.Lbel[i][j],text=text,style='BR.TLabel')
                 else:
-                    self.Lbel[i][j].configure(text=text,style='BG.TLabel')
+                    self.set_widget(self.Lbel[i][j],text=text,style='BG.TLabel')
                 j += 1
         cs = extract(data,ant['CentralStatus'])
         cs_stat = CenStatus(cs)
@@ -1036,9 +1130,9 @@ class App():
         for text, color in cs_stat.get(list(range(32))):
             if text:
                 if color == 'red':
-                    self.Lbcn[i][j].configure(text=text,style='BR.TLabel')
+                    self.set_widget(self.Lbcn[i][j],text=text,style='BR.TLabel')
                 else:
-                    self.Lbcn[i][j].configure(text=text,style='BG.TLabel')
+                    self.set_widget(self.Lbcn[i][j],text=text,style='BG.TLabel')
                 j += 1
 
         self.Lbctrl1[i].delete(0,END)
@@ -1648,7 +1742,32 @@ class App():
             else:
                 for msg in self.dppmsg[-3:]:
                     self.L3.insert(END,msg)
-        
+
+        # ================= Section 11: Trends ===================
+        heading = 'Trends (last hour, 1-min means)'
+        if not self.sectionDisplayState[10]:
+            headline = ' '+heading+' '*(100-len(heading)-len(expand))+expand
+            self.L3.insert(END,headline)
+            self.L3.itemconfig(END,bg=self.colors['section1'],fg=self.colors['na'])
+        else:
+            headline = ' '+heading+' '*(100-len(heading)-len(collapse))+collapse
+            self.L3.insert(END,headline)
+            self.L3.itemconfig(END,bg=self.colors['section1'],fg='white')
+            trends = [('Ambient','Ambient [F]'),('AvgWind','Wind [mph]'),('Pressure','Press [mbar]'),
+                      ('CRTemp','CtrlRoom [C]'),('Cryo14','A14 Cryo [K]')]
+            for name, label in trends:
+                tm, v = self.history.get(name,level=2)
+                # Keep the last hour (60 1-min means) for the sparkline, min and max
+                v = v[-60:]
+                # Exactly zero values mean missing data
+                v = np.where(v == 0.0, np.nan, v)
+                good = np.isfinite(v)
+                if good.any():
+                    line = '{:13} {:8.2f}  {:60}  {:7.2f} {:7.2f}'.format(label,v[good][-1],sparkline(v,60),
+                                                                       np.min(v[good]),np.max(v[good]))
+                else:
+                    line = '{:13} {:>8}  {:60}  {:>7} {:>7}'.format(label,'--','','--','--')
+                self.L3.insert(END,line)
             
     def cryo_display(self,data):
         ''' Creates the CryoRX page to display Cryo Receiver information
@@ -1929,30 +2048,16 @@ class App():
     def plottemp(self):
         ''' Just a simple routine to see if I can plot something once a second...
         '''
-        sf = self.accini['sf']
-        laird = []
-        fe = []
-        for i in range(13):
-            laird.append(sf['Antenna'][i]['Frontend']['TEC'])
-            fe.append(sf['Antenna'][i]['Frontend']['FEM'])
-        fe.append(sf['Antenna'][13]['Frontend']['FEM'])  # Ant 14 ambient temperature
-        laird.append(sf['FEMA']['Thermal']['SecondStageTemp'])   # Ant 14 cyro temperature
-        windkey = sf['Schedule']['Data']['Weather']['AvgWind']
-        npts = len(self.que)
-#        daydif = (datetime.datetime(1901,1,1)-datetime.datetime(1,1,1)).days
-        temps = np.zeros((npts,14,2),dtype=np.float)
-        tm = np.zeros(npts,dtype=np.float)   # Timestamp
-        amb = np.zeros(npts,dtype=np.float)
-        wind = np.zeros(npts,dtype=np.float)
-        for i in range(npts):
-            amb[i] = extract(self.que[i],sf['Schedule']['Data']['Weather']['Temperature'])
-            tm[i] = extract(self.que[i],sf['Timestamp'])
-            for j in range(13):
-                temps[i,j,0] = extract(self.que[i],laird[j]['Temperature'])
-                temps[i,j,1] = extract(self.que[i],fe[j]['Temperature'])
-            temps[i,13,0] = extract(self.que[i],laird[13])
-            temps[i,13,1] = extract(self.que[i],fe[13]['Temperature'])
-            wind[i] = extract(self.que[i],windkey)
+        # The values come from the 1-s histories of the fields (see trend_fields())
+        tm, amb = self.history.get('Ambient')
+        npts = len(tm)
+        temps = np.zeros((npts,14,2),dtype=float)
+        for j in range(13):
+            temps[:,j,0] = self.history.get('Laird'+str(j+1))[1]
+            temps[:,j,1] = self.history.get('FEM'+str(j+1))[1]
+        temps[:,13,0] = self.history.get('Cryo14')[1]
+        temps[:,13,1] = self.history.get('FEM14')[1]
+        wind = self.history.get('AvgWind')[1]
         # Exactly zero temperatures mean missing data (except ambient on rare cold days!), so flag with NaN
         amb[np.where(amb == 0.0)[0]] = np.NaN
         amb = (amb-32)*5./9   # Convert ambient to Celcius temperature
@@ -2128,6 +2233,133 @@ class App():
             
         
 #=================================
+class DiffListbox():
+    ''' Wraps a Listbox so that a redraw, i.e. delete(0,END) followed by calls
+        to insert(END,...) and itemconfig(END,...), is only collected, and
+        commit() then changes just the rows that differ from those on the
+        screen.  Other calls go straight to the Listbox (and the next commit
+        redraws all of the rows).
+    '''
+    def __init__(self, listbox):
+        self.lb = listbox
+        self.rows = None      # Rows on the screen, as [text, options]
+        self.pending = None   # Rows of the redraw in progress
+
+    def __getattr__(self, name):
+        return getattr(self.lb, name)
+
+    def delete(self, first, last=None):
+        if first == 0 and last == END:
+            self.pending = []
+            return
+        self.commit()
+        self.lb.delete(first, last)
+        self.rows = None
+
+    def insert(self, index, *elements):
+        if self.pending is not None and index == END:
+            self.pending += [[str(e), {}] for e in elements]
+            return
+        self.commit()
+        self.lb.insert(index, *elements)
+        self.rows = None
+
+    def itemconfig(self, index, cnf=None, **kw):
+        if self.pending is not None and index == END and cnf is None:
+            for key, val in kw.items():
+                self.pending[-1][1][{'bg': 'background', 'fg': 'foreground'}.get(key, key)] = val
+            return
+        self.commit()
+        self.lb.itemconfig(index, cnf, **kw)
+        self.rows = None
+
+    def commit(self):
+        ''' Puts the collected redraw on the screen, changing only the rows that
+            differ.  Returns the number of rows written.
+        '''
+        new, self.pending = self.pending, None
+        if new is None:
+            return 0
+        if self.rows is None:
+            self.lb.delete(0, END)
+            old = []
+        else:
+            old = self.rows
+        nwritten = 0
+        for i, (text, opts) in enumerate(new):
+            if i < len(old) and old[i] == [text, opts]:
+                continue
+            if i < len(old):
+                self.lb.delete(i)
+            self.lb.insert(i, text)
+            if opts:
+                self.lb.itemconfig(i, **opts)
+            nwritten += 1
+        if len(old) > len(new):
+            self.lb.delete(len(new), END)
+        self.rows = new
+        return nwritten
+
+class FieldHistory():
+    ''' Ring-buffer histories of selected (scalar) stateframe fields, for trend
+        plots and sparklines.  fields is a dictionary of name: locator in the
+        stateframe dictionary.  Level 0 holds the last n values of each field,
+        one per frame, and level k the last n means of decim[k] frames.
+    '''
+    def __init__(self, fields, n=3600, decim=(1, 10, 60)):
+        self.names = list(fields.keys())
+        self.n = n
+        self.decim = decim
+        self.set_fields(fields)
+        nf = len(self.names)
+        self.buf = [np.full((n, nf), np.nan) for d in decim]
+        self.count = [0]*len(decim)
+        self.acc = np.zeros((len(decim), nf))
+        self.nacc = [0]*len(decim)
+
+    def set_fields(self, fields):
+        ''' Updates the locators of the fields (e.g. for a new stateframe version).
+        '''
+        self.locs = [fields[name] for name in self.names]
+
+    def add(self, data):
+        ''' Adds the values of the fields in the stateframe data.
+        '''
+        row = [extract(data,loc) for loc in self.locs]
+        for k, d in enumerate(self.decim):
+            self.acc[k] += row
+            self.nacc[k] += 1
+            if self.nacc[k] == d:
+                self.buf[k][self.count[k] % self.n] = self.acc[k]/d
+                self.count[k] += 1
+                self.acc[k] = 0.0
+                self.nacc[k] = 0
+
+    def get(self, name, level=0):
+        ''' Returns the times (the Timestamp field, in LabVIEW format) and values
+            of field name at the given level, in time order.
+        '''
+        count = self.count[level]
+        idx = np.arange(max(count - self.n, 0), count) % self.n
+        buf = self.buf[level]
+        return buf[idx, self.names.index('Timestamp')], buf[idx, self.names.index(name)]
+
+_spark = '\u2581\u2582\u2583\u2584\u2585\u2586\u2587\u2588'
+
+def sparkline(v, width=60):
+    ''' Returns a text sparkline (one block character per value) of the last
+        width values of v, scaled from their minimum to maximum.  NaNs are blank.
+    '''
+    v = np.asarray(v, dtype=float)[-width:]
+    good = np.isfinite(v)
+    if not good.any():
+        return ' '*len(v)
+    lo, hi = np.min(v[good]), np.max(v[good])
+    level = np.zeros(len(v), dtype=int)
+    if hi > lo:
+        level[good] = np.clip(((v[good] - lo)/(hi - lo)*len(_spark)).astype(int), 0, len(_spark) - 1)
+    return ''.join([_spark[l] if g else ' ' for l, g in zip(level, good)])
+
 class Status:
     def __init__(self, value, sizebytes):
         self.bits = []
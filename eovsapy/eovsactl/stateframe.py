@@ -84,11 +84,16 @@
 #   2022-Mar-07  DG
 #      Oops--"temporary" change in 2018 (4 years ago!) was never reversed.  
 #      I have taken it out now, since SQL is not working...
+#   2026-Oct-19  SY
+#      get_stateframe() now reads through a persistent connection to the ACC
+#      (StateframeClient in sf_client.py), which reconnects with a backoff,
+#      instead of opening a new socket on every call.
 
 import struct, sys
 import socket
 import urllib.request, urllib.error, urllib.parse
 from .ctlutil import send_cmds 
+from . import sf_client
 import numpy as np
 from eovsapy.read_xml2 import xml_ptrs
 import copy
@@ -370,25 +375,16 @@ def rd_stateframe(s,sf_num,n_expected):
     
 #============================
 def get_stateframe(accini):
-    '''Connects to the ACC's stateframe port and reads the
-       current stateframe data.  Returns both data and a message.
-       If the port cannot be opened, or cannot be read, data is None,
-       and an appropriate message is returned.
+    '''Reads the current stateframe data from the ACC's stateframe port.
+       Returns both data and a message.  If the port cannot be opened, or
+       cannot be read, data is None, and an appropriate message is returned.
+       If fewer than accini['binsize'] bytes arrive before the time-out, the
+       partial data are returned, with the message 'Incorrect stateframe size
+       returned from ACC'.  The connection is kept open between calls, and
+       after a failure it is reopened only after a backoff delay (see
+       sf_client.py).
     '''
-    try:
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        try:
-            s.connect((accini['host'],accini['sfport']))
-            data = rd_stateframe(s,1,accini['binsize'])
-            if len(data) == accini['binsize']:
-                return data, 'No Error'
-            else:
-                return data, 'Incorrect stateframe size returned from ACC'
-        except:
-            return None, 'Cannot read from port '+str(accini['sfport'])
-        s.close()
-    except:
-        return None, 'Cannot connect to port '+str(accini['sfport'])
+    return sf_client.get_client(accini).read()
 
 #============================
 def get_stateframefromfile(filename,f=None,recsiz=None):
@@ -22,9 +22,13 @@
 #    and delete all tables associated with it.  This is a dangerous command,
 #    so it requests confirmation from the user via the keyboard.  Also fixed
 #    bug in sfdef() that occurred when the passed-in dictionary is a scan header.
+#  2026-Oct-19  SY
+#    log2sql() and reload_deftables() also handle the .blog binary log files
+#    now written by the schedule (see binlog.py), as well as the older logs
+#    of bare records.
 #
 
-from . import stateframe
+from . import stateframe, binlog
 import struct, numpy, pyodbc, datetime
 from eovsapy import read_xml2 as rxml
 import sys, os, time, glob
@@ -565,7 +569,7 @@ def reload_deftables(tbldir='/data/eovsa/stateframe_logs'):
     if tbldir is None:
         print('Error: no directory for xml tables was provided.')
 #    files = glob.glob(os.path.join(tbldir,'*00.xml')
-    logfiles = glob.glob(os.path.join(tbldir,'*0.log'))
+    logfiles = glob.glob(os.path.join(tbldir,'*0.log')) + glob.glob(os.path.join(tbldir,'*0.blog'))
     # Update tables only for log file versions that exist
     loglist = []
     for file in logfiles:
@@ -592,8 +596,8 @@ def log2sql(log_file=None):
     if not os.path.isfile(log_file):
         print('Error: Named stateframe log file',log_file,'not found.')
         return False
-    # Log file basename is expected to be in format 'sf_yyyymmdd_vxx.0.log', 
-    # where xx is the version number
+    # Log file basename is expected to be in format 'sf_yyyymmdd_vxx.0.log' (or
+    # .blog), where xx is the version number
     basename = os.path.basename(log_file) 
     logname = basename.split('_')
     if logname[0] == 'sf':
@@ -634,12 +638,19 @@ def log2sql(log_file=None):
             pass
     
         # We now know where to start, so open log file and read to start of data
+        if binlog.is_binlog(log_file):
+            # Length- and time-prefixed records, so use the index to skip (with a
+            # minute to spare) the records before the start time
+            records = (rec for t, rec in binlog.read_records(log_file, [sftimestamp - 2082844800. - 60., numpy.inf]))
+        else:
+            records = _bare_records(log_file)
         # First need to find out record length
-        f = open(log_file,'rb')
-        buf = f.read(32)
+        buf = next(records, b'')
+        if len(buf) < 32:
+            print('Error: No complete records found in log file',log_file)
+            return False
         recsize = struct.unpack_from('i', buf, 16)[0]
         version = struct.unpack_from('d', buf, 8)[0]
-        f.close()
         if int(version) != sfver:
             print('Error: Version in file name is',sfver,'but version in file itself is',int(version))
             return False
@@ -654,24 +665,38 @@ def log2sql(log_file=None):
         sf, version = rxml.xml_ptrs(xml_file)
         brange, outlist = sfdef(sf)
         lineno = 0
-        with open(log_file,'rb') as f:
-            bufin = f.read(recsize)
-            while len(bufin) == recsize:
-                lineno += 1
-                if struct.unpack_from('d', bufin, 0)[0] >= sftimestamp:
-                    # This is new data, so write to database
-                    bufout = transmogrify(bufin, brange)
-                    try:
-                        cursor.execute('insert into fBin (Bin) values (?)',pyodbc.Binary(bufout))
-                        print('Record '+str(lineno)+' successfully written\r',end=' ')
-                        cnxn.commit()
-                    except:
-                        # An exception could be an error, or just that the entry was already inserted
-                        pass
-                bufin = f.read(recsize)
+        bufin = buf
+        while len(bufin) == recsize:
+            lineno += 1
+            if struct.unpack_from('d', bufin, 0)[0] >= sftimestamp:
+                # This is new data, so write to database
+                bufout = transmogrify(bufin, brange)
+                try:
+                    cursor.execute('insert into fBin (Bin) values (?)',pyodbc.Binary(bufout))
+                    print('Record '+str(lineno)+' successfully written\r',end=' ')
+                    cnxn.commit()
+                except:
+                    # An exception could be an error, or just that the entry was already inserted
+                    pass
+            bufin = next(records, b'')
     print('\n')
     return True
 
+def _bare_records(log_file):
+    ''' Generator returning the records of an (older) stateframe log file of
+        bare records, whose length is read from the first one.
+    '''
+    with open(log_file,'rb') as f:
+        buf = f.read(32)
+        if len(buf) < 32:
+            return
+        recsize = struct.unpack_from('i', buf, 16)[0]
+        f.seek(0)
+        bufin = f.read(recsize)
+        while len(bufin) == recsize:
+            yield bufin
+            bufin = f.read(recsize)
+
 #=============== acc2sql ===============
 def acc2sql():
     ''' This is just a test version to read the stateframe once a second from
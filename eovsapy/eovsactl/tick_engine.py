@@ -0,0 +1,488 @@
+'''
+   Tick engine for the 1-second cadence of the schedule (and other control
+   loops).  The ticks are generated on their own thread from a monotonic
+   clock, aligned to the turn of the (wall-clock) second, so that a slow
+   step no longer delays the next tick.  Each tick is handed to the queues
+   of one or more stages:
+
+       engine = TickEngine(period=1.0)
+       engine.add_stage('control', control_func, maxsize=2)
+       engine.add_stage('monitor', monitor_func, maxsize=1)
+       engine.add_stage('gui', gui_func, worker=False)   # Drained by the GUI
+       engine.start()
+       ...
+       engine.drain('gui')                              # e.g. from root.after()
+
+   Each worker stage runs func(tick) on its own thread.  Stage queues are
+   bounded, and when a stage falls behind the oldest pending tick is dropped
+   (and counted), so that the stage always works on the latest second.  A
+   stage with worker=False is not given a thread, and its queue is run by
+   whoever calls drain() (e.g. the tkinter main loop, which must do all of
+   the widget updates).
+
+   The tick is a dictionary with keys 'n' (tick number), 'deadline' and 'mono'
+   (scheduled and actual monotonic time of the tick), 'wall' (wall-clock time
+   of the tick) and 'jitter' (mono - deadline [s]).  Each stage function is
+   given its own copy of the tick, with the extra keys 'stage' (the Stage) and
+   'generation' (that of the worker running it, see below).  Histograms of the tick
+   jitter, and of the latency (run time) and queue wait of each stage, are
+   kept and returned by stats().
+
+   A worker stage can be given a timeout [s].  If one of its ticks runs for
+   longer than that (e.g. hung on a network read), the tick thread calls the
+   stage's on_hang(stage, elapsed) function (or prints a message), and starts
+   a new worker thread for the stage, which carries on with the next ticks.
+   A thread cannot be killed, so the hung one is abandoned:  if it ever
+   returns, it finishes its tick and exits.  A stage function that has side
+   effects should check stage.abandoned(tick) after anything that might hang,
+   and return at once if it is True, since newer ticks have been run by then.
+
+   For testing without a display or hardware, the engine can be given a
+   SimClock(), and run() steps it for a given number of ticks on the
+   calling thread, simulating the stage workers.  See simulate().
+'''
+#
+# History:
+#  2026-Oct-19  SY
+#    Initial version.
+#  2026-Oct-19  SY
+#    Added the stage timeout (watchdog), which replaces a hung worker thread.
+#  2026-Oct-19  SY
+#    The tick given to a stage function now carries the stage and worker
+#    generation, so that an abandoned worker can tell that it is stale.
+#
+
+import time
+import math
+import queue
+import threading
+import numpy
+
+
+class MonotonicClock():
+    ''' The real clock:  now() is the monotonic time, and wall() the time of day
+        (both in seconds).
+    '''
+    def now(self):
+        return time.monotonic()
+
+    def wall(self):
+        return time.time()
+
+    def sleep(self, dt):
+        if dt > 0:
+            time.sleep(dt)
+
+    def sleep_until(self, t, event=None):
+        ''' Sleep until monotonic time t, or until event (a threading.Event) is set.
+        '''
+        dt = t - time.monotonic()
+        if dt > 0:
+            if event is None:
+                time.sleep(dt)
+            else:
+                event.wait(dt)
+
+
+class SimClock():
+    ''' A simulated clock, whose time advances only by calls to sleep(),
+        sleep_until() or advance().  The wall-clock time is wall0 + now().  If
+        given, wake_jitter() is called at each sleep_until() and its return
+        value [s] is added to the wake-up time, to simulate a late wake-up.
+        Stage functions can call sleep() to simulate the time they take.
+    '''
+    def __init__(self, wall0=0.0, wake_jitter=None):
+        self.t = 0.0
+        self.wall0 = wall0
+        self.wake_jitter = wake_jitter
+        self.lock = threading.Lock()
+
+    def now(self):
+        return self.t
+
+    def wall(self):
+        return self.wall0 + self.t
+
+    def set(self, t):
+        with self.lock:
+            self.t = t
+
+    def advance(self, dt):
+        with self.lock:
+            self.t += max(dt, 0.0)
+
+    def sleep(self, dt):
+        self.advance(dt)
+
+    def sleep_until(self, t, event=None):
+        with self.lock:
+            self.t = max(self.t, t)
+            if self.wake_jitter:
+                self.t += max(self.wake_jitter(), 0.0)
+
+
+class Histogram():
+    ''' Counts of values [ms] in fixed bins, logarithmically spaced from 0.01 ms
+        to 100 s (values below the first edge go in the first bin, and above
+        the last edge in the last bin).  Also keeps the number, sum and
+        maximum of the values.
+    '''
+    edges = numpy.logspace(-2, 5, 71)
+
+    def __init__(self):
+        self.counts = numpy.zeros(len(self.edges) - 1, dtype=int)
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, ms):
+        i = min(max(numpy.searchsorted(self.edges, ms, side='right') - 1, 0), len(self.counts) - 1)
+        with self.lock:
+            self.counts[i] += 1
+            self.n += 1
+            self.total += ms
+            self.max = max(self.max, ms)
+
+    def percentile(self, p):
+        ''' Returns the upper edge of the bin holding the p-th percentile [ms].
+        '''
+        if self.n == 0:
+            return 0.0
+        i = numpy.searchsorted(numpy.cumsum(self.counts), p / 100. * self.n)
+        return float(self.edges[min(i + 1, len(self.edges) - 1)])
+
+    def summary(self):
+        ''' Returns a dictionary of the number, mean, maximum, 50th, 90th and
+            99th percentiles [ms], and the bin edges and counts.
+        '''
+        with self.lock:
+            return {'n': self.n, 'mean': self.total / max(self.n, 1), 'max': self.max,
+                    'p50': self.percentile(50), 'p90': self.percentile(90), 'p99': self.percentile(99),
+                    'edges': self.edges, 'counts': self.counts.copy()}
+
+
+class Stage():
+    ''' One stage of the engine:  a function called as func(tick), with its
+        bounded queue of pending ticks, its worker thread (if any) and its
+        statistics.  The stage runs only on ticks where (n - offset) is a
+        multiple of every.  If timeout is given, a worker stage whose tick runs
+        longer than that is replaced by TickEngine (see the module description).
+    '''
+    def __init__(self, name, func, maxsize=2, every=1, offset=0, worker=True, timeout=None, on_hang=None):
+        self.name = name
+        self.func = func
+        self.every = every
+        self.offset = offset
+        self.worker = worker
+        self.timeout = timeout
+        self.on_hang = on_hang
+        self.queue = queue.Queue(maxsize)
+        self.thread = None
+        self.generation = 0                 # Incremented when a hung worker is replaced
+        self.started = None                 # Start time of the tick being run (or None)
+        self.current = None                 # Number of the tick being run
+        self.nhung = 0
+        self.latency = Histogram()
+        self.wait = Histogram()
+        self.ndone = 0
+        self.ndropped = 0
+        self.nerror = 0
+        self.last_error = None
+        self.busy_until = float('-inf')     # Used only by TickEngine.run()
+
+    def put(self, tick):
+        ''' Add tick to the queue, dropping the oldest pending tick if it is full.
+        '''
+        while True:
+            try:
+                self.queue.put_nowait(tick)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.ndropped += 1
+                except queue.Empty:
+                    pass
+
+    def execute(self, tick, clock, generation=None):
+        ''' Run the stage function for tick, and record its queue wait and latency.
+            generation is that of the calling worker thread, which no longer
+            updates the watchdog state once it has been replaced.
+        '''
+        t0 = clock.now()
+        self.wait.add((t0 - tick['mono']) * 1000.)
+        current = generation is None or generation == self.generation
+        if current:
+            self.current = tick['n']
+            self.started = t0
+        if generation is None:
+            generation = self.generation
+        tick = dict(tick, stage=self, generation=generation)
+        try:
+            self.func(tick)
+        except Exception as e:
+            self.nerror += 1
+            self.last_error = 'Tick ' + str(tick['n']) + ': ' + repr(e)
+        self.latency.add((clock.now() - t0) * 1000.)
+        self.ndone += 1
+        if generation == self.generation:
+            self.started = None
+
+    def abandoned(self, tick):
+        ''' Returns True if the worker running tick (as given to the stage
+            function) has been replaced by the watchdog, so that newer ticks
+            may already have been run.
+        '''
+        return tick.get('generation', self.generation) != self.generation
+
+    def summary(self):
+        return {'latency': self.latency.summary(), 'wait': self.wait.summary(), 'done': self.ndone,
+                'dropped': self.ndropped, 'errors': self.nerror, 'hung': self.nhung,
+                'last_error': self.last_error, 'pending': self.queue.qsize()}
+
+
+class TickEngine():
+    ''' Generates ticks every period seconds on its own thread, aligned to
+        multiples of period in wall-clock time, and hands them to the stages.
+        If the engine falls more than a period behind (e.g. the process was
+        suspended), the missed ticks are skipped and counted.  If the wall
+        clock steps by more than resync seconds relative to the monotonic
+        clock, the tick phase is realigned.
+    '''
+    def __init__(self, period=1.0, clock=None, resync=0.05):
+        self.period = period
+        self.clock = clock or MonotonicClock()
+        self.resync = resync
+        self.stages = []
+        self.jitter = Histogram()
+        self.nticks = 0
+        self.nmissed = 0
+        self.nresync = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.deadline = None
+        self.offset = None
+
+    def add_stage(self, name, func, maxsize=2, every=1, offset=0, worker=True, timeout=None, on_hang=None):
+        ''' Add a stage that calls func(tick) on every tick (or on every every-th
+            tick, starting at tick offset), with a queue of maxsize pending
+            ticks.  If worker is False, the stage is run by calls to drain().
+            If timeout [s] is given, a worker whose tick runs longer than that
+            is replaced, after calling on_hang(stage, elapsed) if given.
+        '''
+        stage = Stage(name, func, maxsize, every, offset, worker, timeout, on_hang)
+        self.stages.append(stage)
+        if self.thread is not None and worker:
+            self._start_worker(stage)
+        return stage
+
+    def stage(self, name):
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise KeyError('No stage named ' + name)
+
+    def _align(self):
+        ''' Set the next deadline to the next multiple of period in wall-clock time.
+        '''
+        mono, wall = self.clock.now(), self.clock.wall()
+        self.offset = wall - mono
+        self.deadline = mono + (math.floor(wall / self.period) + 1) * self.period - wall
+
+    def _next(self):
+        ''' Wait for the next tick, and return it (or None if stop() was called).
+        '''
+        self.clock.sleep_until(self.deadline, self.stop_event)
+        if self.stop_event.is_set():
+            return None
+        mono = self.clock.now()
+        wall = self.clock.wall()
+        tick = {'n': self.nticks, 'deadline': self.deadline, 'mono': mono, 'wall': wall,
+                'jitter': mono - self.deadline}
+        self.jitter.add(abs(tick['jitter']) * 1000.)
+        self.nticks += 1
+        self.deadline += self.period
+        if mono >= self.deadline:
+            # We are more than a period late, so skip to the next future tick
+            nskip = int((mono - self.deadline) / self.period) + 1
+            self.deadline += nskip * self.period
+            self.nmissed += nskip
+        if abs((wall - mono) - self.offset) > self.resync:
+            # The wall clock has been stepped, so realign
+            self._align()
+            self.nresync += 1
+        return tick
+
+    def _dispatch(self, tick):
+        for stage in self.stages:
+            if (tick['n'] - stage.offset) % stage.every == 0:
+                stage.put(tick)
+
+    def _watch(self):
+        ''' Replace the worker of any stage whose current tick has run for longer
+            than the stage timeout.
+        '''
+        now = self.clock.now()
+        for stage in self.stages:
+            started = stage.started
+            if not stage.worker or stage.timeout is None or stage.thread is None or started is None:
+                continue
+            elapsed = now - started
+            if elapsed > stage.timeout:
+                stage.nhung += 1
+                stage.last_error = 'Tick ' + str(stage.current) + ': hung for {:.1f} s'.format(elapsed)
+                try:
+                    if stage.on_hang:
+                        stage.on_hang(stage, elapsed)
+                    else:
+                        print(time.strftime('%Y-%m-%d %H:%M:%S'), 'Stage', stage.name, stage.last_error+', restarting it')
+                except Exception as e:
+                    print('Error in on_hang() of stage', stage.name, repr(e))
+                # Abandon the hung thread, and carry on with a new one
+                stage.generation += 1
+                stage.started = None
+                self._start_worker(stage)
+
+    def _loop(self):
+        while not self.stop_event.is_set():
+            tick = self._next()
+            if tick is None:
+                break
+            self._dispatch(tick)
+            self._watch()
+
+    def _work(self, stage, generation):
+        while stage.generation == generation:
+            tick = stage.queue.get()
+            if tick is None:
+                break
+            stage.execute(tick, self.clock, generation)
+
+    def _start_worker(self, stage):
+        stage.thread = threading.Thread(target=self._work, args=(stage, stage.generation),
+                                        name='tick-' + stage.name + '-' + str(stage.generation))
+        stage.thread.daemon = True
+        stage.thread.start()
+
+    def start(self):
+        ''' Start the tick thread and the stage worker threads.
+        '''
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self._align()
+        for stage in self.stages:
+            if stage.worker:
+                self._start_worker(stage)
+        self.thread = threading.Thread(target=self._loop, name='tick-engine')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self, timeout=2.0):
+        ''' Stop the tick thread, and ask the workers to stop once they finish
+            their current tick.
+        '''
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+        for stage in self.stages:
+            if stage.thread is not None:
+                stage.put(None)
+                stage.thread.join(timeout)
+                stage.thread = None
+
+    def drain(self, name, maxitems=None):
+        ''' Run the pending ticks of stage name (normally one with worker=False)
+            on the calling thread.  Returns the number run.
+        '''
+        stage = self.stage(name)
+        n = 0
+        while maxitems is None or n < maxitems:
+            try:
+                tick = stage.queue.get_nowait()
+            except queue.Empty:
+                break
+            if tick is None:
+                break
+            stage.execute(tick, self.clock)
+            n += 1
+        return n
+
+    def _catch_up(self, stage, now):
+        ''' Simulate the worker of stage up to (simulated) time now:  run the
+            pending ticks that it would have started by then, each starting
+            when the stage became free, and then put the clock back to now.
+        '''
+        while stage.busy_until <= now:
+            try:
+                tick = stage.queue.get_nowait()
+            except queue.Empty:
+                break
+            self.clock.set(max(stage.busy_until, tick['mono']))
+            stage.execute(tick, self.clock)
+            stage.busy_until = self.clock.now()
+        self.clock.set(now)
+
+    def run(self, nticks):
+        ''' Step the engine for nticks ticks on the calling thread, with a
+            SimClock().  Each stage is simulated as if on its own thread:  the
+            time it takes (from calls to clock.sleep() in the stage function)
+            delays only its own later ticks, which queue up and are dropped
+            as they would be with a real worker.
+        '''
+        if self.deadline is None:
+            self._align()
+        for i in range(nticks):
+            now = max(self.clock.now(), self.deadline)
+            for stage in self.stages:
+                self._catch_up(stage, now)
+            tick = self._next()
+            self._dispatch(tick)
+            for stage in self.stages:
+                self._catch_up(stage, tick['mono'])
+
+    def stats(self):
+        ''' Returns a dictionary of the engine statistics:
+               'ticks'    number of ticks
+               'missed'   number of ticks skipped because the engine was late
+               'resync'   number of realignments to the wall clock
+               'jitter'   summary of the tick jitter histogram [ms]
+               'stages'   dictionary of the summary of each stage (latency and
+                             queue wait histograms [ms], and numbers of ticks
+                             done, dropped and with errors)
+        '''
+        return {'ticks': self.nticks, 'missed': self.nmissed, 'resync': self.nresync,
+                'jitter': self.jitter.summary(),
+                'stages': dict([(stage.name, stage.summary()) for stage in self.stages])}
+
+    def report(self):
+        ''' Returns a short, printable summary of stats().
+        '''
+        st = self.stats()
+        j = st['jitter']
+        lines = ['Ticks: {:d}  Missed: {:d}  Resync: {:d}  Jitter [ms] p50 {:.2f} p99 {:.2f} max {:.2f}'.format(
+                 st['ticks'], st['missed'], st['resync'], j['p50'], j['p99'], j['max'])]
+        for name, s in st['stages'].items():
+            lat = s['latency']
+            lines.append('  {:10s} done {:6d} dropped {:4d} errors {:4d} hung {:3d}  latency [ms] p50 {:.2f} p99 {:.2f} max {:.2f}'.format(
+                         name, s['done'], s['dropped'], s['errors'], s['hung'], lat['p50'], lat['p99'], lat['max']))
+        return '\n'.join(lines)
+
+
+def simulate(nticks=3600, seed=0):
+    ''' Runs a TickEngine on a SimClock() for nticks ticks, with a 'control'
+        stage taking 50-150 ms, a 'monitor' stage that takes 2.5 s once a
+        minute, and late wake-ups of up to 5 ms, then prints and returns the
+        statistics.  The slow monitor stage drops some of its own ticks, but
+        does not delay the ticks or the control stage.
+    '''
+    rng = numpy.random.default_rng(seed)
+    clock = SimClock(wall0=1.7e9 + 0.3, wake_jitter=lambda: rng.uniform(0, 0.005))
+    engine = TickEngine(period=1.0, clock=clock)
+    engine.add_stage('control', lambda tick: clock.sleep(rng.uniform(0.05, 0.15)), maxsize=2)
+    engine.add_stage('monitor', lambda tick: clock.sleep(2.5 if tick['n'] % 60 == 5 else 0.01), maxsize=1)
+    engine.run(nticks)
+    print(engine.report())
+    return engine.stats()
@@ -0,0 +1,315 @@
+'''
+   Module for a local store of ancillary data (GOES SXR light curves and
+   RSTN/Penticton quiet Sun flux densities), so that routines that need them
+   for plotting or calibration do not have to go to NOAA or SQL every time.
+
+   The store is a folder tree of small .npz files:
+       <root>/goes/<yyyy>/goes_<source>_<yyyymmdd>.npz   one file per day
+       <root>/rstn/rstn_<yyyymm>.npz                     one file per month
+   where <root> is given by the environment variable EOVSAANCDIR, or defaults
+   to /common/tmp/anc/.  Files are created and extended lazily by the routines
+   that read the data from the original sources.
+
+   check_ancdata() runs the GOES fetch/store/lookup and the RSTN store/lookup
+   against a temporary store, using canned data and no network access.
+'''
+#
+# History:
+#  2026-Oct-19  SY
+#    Initial version.  GOES days are written by rd_goes() from the NOAA json
+#    files, and RSTN days are written by rstn.rd_rstnflux() whenever it has to
+#    go to SQL, NOAA or the text archive.
+#  2026-Oct-19  SY
+#    Made the NOAA url a module variable, goes_baseurl, and added check_ancdata().
+#
+
+import os
+import datetime
+import numpy as np
+from astropy.time import Time
+
+
+def anc_root():
+    ''' Returns the root folder of the ancillary data store, which can be set
+        by the environment variable EOVSAANCDIR.
+    '''
+    root = os.getenv('EOVSAANCDIR')
+    if not root:
+        root = '/common/tmp/anc/'
+    if not root.endswith('/'):
+        root = ''.join([root, '/'])
+    return root
+
+
+def mjd2datstr(mjd):
+    ''' Returns the yyyymmdd string for the (integer) mjd.
+    '''
+    day = datetime.date(1858, 11, 17) + datetime.timedelta(days=int(np.floor(mjd)))
+    return day.strftime('%Y%m%d')
+
+
+def save_npz(filename, **arrays):
+    ''' Writes the arrays to an .npz file, via a temporary file so that a
+        partially written file is never seen by a reader.
+    '''
+    folder = os.path.dirname(filename)
+    try:
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        tmpfile = filename + '.tmp'
+        with open(tmpfile, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmpfile, filename)
+    except (IOError, OSError):
+        print('ANCDATA: Could not write', filename)
+        return False
+    return True
+
+
+def load_npz(filename):
+    ''' Reads an .npz file of the store into a dictionary, or returns None if
+        the file does not exist or cannot be read.
+    '''
+    if not os.path.exists(filename):
+        return None
+    try:
+        with np.load(filename) as npz:
+            return {k: npz[k] for k in npz.files}
+    except (IOError, OSError, ValueError):
+        print('ANCDATA: Could not read', filename)
+        return None
+
+#
+# GOES SXR light curves
+#
+
+# NOAA json files, and how far back in time (days) each one reaches
+goes_baseurl = 'https://services.swpc.noaa.gov/json/goes/'
+goes_urls = [('6-hour', 0.25), ('3-day', 3.), ('7-day', 7.)]
+
+
+def goes_file(mjd, source='primary'):
+    ''' Returns the name of the store file for the given day and GOES source
+        ('primary' or 'secondary').
+    '''
+    datstr = mjd2datstr(mjd)
+    return anc_root() + 'goes/' + datstr[:4] + '/goes_' + source + '_' + datstr + '.npz'
+
+
+def wr_goes(mjd, lo, hi, source='primary', tfetch=None):
+    ''' Merges GOES data (mjd, 1-8 A and 0.5-4 A flux arrays) into the daily
+        store files.  Samples already in the store are replaced by new ones
+        with the same time.  The time of the fetch (mjd) is saved with each
+        day, so that rd_goes() can tell whether a day can still change.
+    '''
+    if len(mjd) == 0:
+        return
+    if tfetch is None:
+        tfetch = Time.now().mjd
+    mjd = np.asarray(mjd, dtype=np.float64)
+    lo = np.asarray(lo, dtype=np.float32)
+    hi = np.asarray(hi, dtype=np.float32)
+    day = np.floor(mjd)
+    for d in np.unique(day):
+        k, = np.where(day == d)
+        filename = goes_file(d, source)
+        old = load_npz(filename)
+        if old is not None:
+            # Keep only old samples whose times are not among the new ones
+            keep = ~np.isin(np.round(old['mjd'] * 86400.), np.round(mjd[k] * 86400.))
+            t = np.concatenate((old['mjd'][keep], mjd[k]))
+            l = np.concatenate((old['lo'][keep], lo[k]))
+            h = np.concatenate((old['hi'][keep], hi[k]))
+        else:
+            t, l, h = mjd[k], lo[k], hi[k]
+        srt = np.argsort(t)
+        save_npz(filename, mjd=t[srt], lo=l[srt], hi=h[srt], tfetch=np.float64(tfetch))
+
+
+def _goes_final(store, d):
+    ''' A day in the store cannot change once it has been fetched more than an
+        hour after the end of the day.
+    '''
+    return store is not None and store['tfetch'] > d + 1 + 1. / 24
+
+
+def rd_goes(trange, source='primary', fetch=True):
+    ''' Reads GOES data for the time range given by the 2-element Time() object
+        trange from the store.  If fetch is True, days missing from the store or
+        not yet final are (re)read from the shortest NOAA json file that reaches
+        back to them, and written to the store.  With fetch False, no network
+        access is attempted.
+
+        Returns arrays of the GOES low energy (1-8 A) flux, the GOES high-energy
+        (0.5-4 A) flux, and a Time object that is the array of UT times, like
+        goes.get_goes(), or empty lists if there are no data.
+    '''
+    mjd0, mjd1 = trange[0].mjd, trange[1].mjd
+    days = np.arange(np.floor(mjd0), np.floor(mjd1) + 1)
+    if fetch:
+        stale = [d for d in days if not _goes_final(load_npz(goes_file(d, source)), d)]
+        if stale:
+            from .goes import get_goes
+            now = Time.now().mjd
+            # Use the shortest file reaching back to the first missing sample
+            reach = now - max(stale[0], mjd0)
+            for type, ndays in goes_urls:
+                if reach <= ndays:
+                    url = goes_baseurl + source + '/xrays-' + type + '.json'
+                    lo, hi, t = get_goes(url)
+                    if len(t) > 0:
+                        wr_goes(t.mjd, lo, hi, source, tfetch=now)
+                    break
+    mjd = []
+    lo = []
+    hi = []
+    for d in days:
+        store = load_npz(goes_file(d, source))
+        if store is not None:
+            mjd.append(store['mjd'])
+            lo.append(store['lo'])
+            hi.append(store['hi'])
+    if len(mjd) == 0:
+        return [], [], []
+    mjd = np.concatenate(mjd)
+    good, = np.where((mjd >= mjd0) & (mjd <= mjd1))
+    if len(good) == 0:
+        return [], [], []
+    lo = np.concatenate(lo)[good].astype(np.float64)
+    hi = np.concatenate(hi)[good].astype(np.float64)
+    return lo, hi, Time(mjd[good], format='mjd')
+
+#
+# RSTN/Penticton quiet Sun flux densities
+#
+
+def rstn_file(mjd):
+    ''' Returns the name of the store file for the month containing the day mjd.
+    '''
+    return anc_root() + 'rstn/rstn_' + mjd2datstr(mjd)[:6] + '.npz'
+
+
+def wr_rstn(data):
+    ''' Merges RSTN data into the monthly store files.  The input is either a
+        single list [Time, fghz, flux] as returned by rstn.sql2rstn() and
+        related routines (flux is a 9x7 int16 array), or a list of such lists,
+        as returned by rstn.rstnfluxfromtextarchive().
+    '''
+    if len(data) == 0:
+        return
+    if not isinstance(data[0], (list, tuple)):
+        data = [data]
+    day = np.floor(np.array([d[0].mjd for d in data])).astype(np.int32)
+    fghz = np.asarray(data[0][1], dtype=np.float32)
+    flux = np.array([d[2] for d in data], dtype=np.int16)
+    month = np.array([mjd2datstr(d)[:6] for d in day])
+    for m in np.unique(month):
+        k, = np.where(month == m)
+        filename = rstn_file(day[k[0]])
+        old = load_npz(filename)
+        if old is not None:
+            keep = ~np.isin(old['mjd'], day[k])
+            d = np.concatenate((old['mjd'][keep], day[k]))
+            f = np.concatenate((old['flux'][keep], flux[k]))
+        else:
+            d, f = day[k], flux[k]
+        srt = np.argsort(d)
+        save_npz(filename, mjd=d[srt], fghz=fghz, flux=f[srt])
+
+
+def rd_rstn(t):
+    ''' Reads the RSTN data for the date of Time() object t from the store.
+        No other sources are tried (see rstn.rd_rstnflux() for that).
+
+        Returns a list [Time, fghz, flux] in the same form as rstn.sql2rstn(),
+        where flux is a 9x7 int16 array, or None if the date is not in the store.
+    '''
+    day = int(np.floor(t.mjd))
+    store = load_npz(rstn_file(day))
+    if store is None:
+        return None
+    k = np.searchsorted(store['mjd'], day)
+    if k == len(store['mjd']) or store['mjd'][k] != day:
+        return None
+    return [Time(day, format='mjd'), store['fghz'], store['flux'][k]]
+
+
+def check_ancdata():
+    ''' Checks the store routines against a temporary store, with GOES data
+        "fetched" from canned json files (in the NOAA format, read through
+        file: urls) and canned RSTN data, so that no network access is needed.
+        Prints the result of each check, and returns True if all passed.
+    '''
+    import json
+    import shutil
+    import tempfile
+    global goes_baseurl
+    ok = True
+
+    def check(name, result):
+        print('{:50s} {}'.format(name, 'OK' if result else 'FAILED'))
+        return result
+
+    def canned_goes(folder, t, lo, hi):
+        # Writes the NOAA json files for times t (Time) and fluxes lo, hi
+        recs = []
+        for tag, l, h in zip(t.isot, lo, hi):
+            recs.append({'time_tag': tag[:19] + 'Z', 'energy': '0.1-0.8nm', 'flux': l})
+            recs.append({'time_tag': tag[:19] + 'Z', 'energy': '0.05-0.4nm', 'flux': h})
+        os.makedirs(folder + 'primary', exist_ok=True)
+        for type, ndays in goes_urls:
+            with open(folder + 'primary/xrays-' + type + '.json', 'w') as f:
+                json.dump(recs, f)
+
+    tmpdir = tempfile.mkdtemp()
+    oldroot = os.getenv('EOVSAANCDIR')
+    oldurl = goes_baseurl
+    try:
+        os.environ['EOVSAANCDIR'] = tmpdir + '/anc'
+        noaa = tmpdir + '/noaa/'
+        goes_baseurl = 'file://' + noaa
+        # One-minute GOES samples over the last two hours
+        now = np.floor(Time.now().mjd * 1440.) / 1440.
+        t = Time(now - np.arange(120)[::-1] / 1440., format='mjd')
+        lo = 1.e-6 * (1 + np.arange(120) % 7)
+        hi = lo / 10.
+        canned_goes(noaa, t, lo, hi)
+        trange = Time([t[0].mjd, t[-1].mjd], format='mjd')
+        glo, ghi, gt = rd_goes(trange)
+        ok &= check('GOES fetch from canned json', len(gt) == 120 and np.allclose(glo, lo) and np.allclose(ghi, hi))
+        ok &= check('GOES day written to store', os.path.exists(goes_file(now)))
+        # With the json file gone, the data must come from the store
+        shutil.rmtree(noaa)
+        glo, ghi, gt = rd_goes(trange, fetch=False)
+        ok &= check('GOES lookup from store', len(gt) == 120 and np.allclose(glo, lo)
+                    and np.allclose(gt.mjd, t.mjd, rtol=0, atol=0.01 / 86400))
+        sub = Time([t[30].mjd - 30. / 86400, t[59].mjd + 30. / 86400], format='mjd')
+        glo, ghi, gt = rd_goes(sub, fetch=False)
+        ok &= check('GOES lookup of part of the range', len(gt) == 30 and np.allclose(glo, lo[30:60]))
+        # A refetch with changed and later samples replaces and extends the day
+        canned_goes(noaa, t[60:], lo[60:] * 2, hi[60:] * 2)
+        glo, ghi, gt = rd_goes(trange)
+        ok &= check('GOES refetch merged into store', len(gt) == 120 and np.allclose(glo[:60], lo[:60])
+                    and np.allclose(glo[60:], lo[60:] * 2))
+        glo, ghi, gt = rd_goes(Time([now - 10, now - 9.5], format='mjd'), fetch=False)
+        ok &= check('GOES lookup of missing day', len(gt) == 0)
+        # RSTN days (9x7 int16 fluxes) in two months
+        fghz = np.array([0.245, 0.410, 0.610, 1.415, 2.695, 4.995, 8.8, 15.4, 0.0])
+        days = [Time('2026-09-30'), Time('2026-10-01'), Time('2026-10-02')]
+        data = [[d, fghz, (np.arange(63) + i).reshape(9, 7).astype(np.int16)] for i, d in enumerate(days)]
+        wr_rstn(data)
+        res = [rd_rstn(d) for d in days]
+        ok &= check('RSTN lookup from store', all([r is not None and np.array_equal(r[2], d[2])
+                                                  and np.allclose(r[1], fghz) for r, d in zip(res, data)]))
+        ok &= check('RSTN lookup of missing day', rd_rstn(Time('2026-10-03')) is None)
+        wr_rstn([days[1], fghz, np.zeros((9, 7), np.int16)])
+        ok &= check('RSTN day replaced in store', np.all(rd_rstn(days[1])[2] == 0)
+                    and np.array_equal(rd_rstn(days[2])[2], data[2][2]))
+    finally:
+        goes_baseurl = oldurl
+        if oldroot is None:
+            del os.environ['EOVSAANCDIR']
+        else:
+            os.environ['EOVSAANCDIR'] = oldroot
+        shutil.rmtree(tmpdir)
+    return bool(ok)
@@ -17,6 +17,12 @@
 #  2021-09-25  DG
 #    Change minimum length for background subtraction (tp_bgnd, etc.) to 1200
 #    and allow it to shrink further if some data are missing.
+#  2026-Oct-19  SY
+#    Moved the correction of attenuation steps out of autocorrect() into
+#    step_correct(), which finds the FEM level changes once per antenna and
+#    polarization and applies all of the corrections at once as a cumulative
+#    product over time.  The original loop is kept as step_correct_loop(), and
+#    check_step_correct() compares the two on synthetic data.
 #
 
 from . import pipeline_cal as pc
@@ -27,27 +33,123 @@ from .util import Time, nearest_val_idx, ant_str2list
 import matplotlib.pylab as plt
 from matplotlib.dates import DateFormatter
 
-def autocorrect(out,ant_str='ant1-13',brange=[0,300]):
-    nt = len(out['time'])
-    nf = len(out['fghz'])
-    pfac1 = (out['p'][:,:,:,:-1] - out['p'][:,:,:,1:])/out['p'][:,:,:,:-1]
-    trange = Time(out['time'][[0,-1]],format='jd')
-    src_lev = gc.get_fem_level(trange)   # Read FEM levels from SQL
-    # Match times with data
-    tidx = nearest_val_idx(out['time'],src_lev['times'].jd)
-    # Find attenuation changes
+def step_correct(p, hlev, vlev, flim=[0.05,0.95]):
+    ''' Correct the total power for changes of FEM attenuation level.  Where
+        the level of an antenna/polarization changes by one step between time
+        samples j and j+1, the fractional drop in power between samples k and
+        k+1, for k = j or j-1, is taken to be due to the attenuation change
+        if it is between flim[0] and flim[1], and the power at all times after
+        k is scaled to undo it.
+
+        Inputs:
+          p        total power array of size (nant, 2, nf, nt), with nant >= 13.
+                     NB: p is corrected in place.
+          hlev     FEM attenuation levels of size (13, nt), for H and V
+          vlev       polarizations, matched to the times of p
+
+        Returns:
+          p        the corrected array
+    '''
+    nt = p.shape[-1]
     for ant in range(13):
         for pol in range(2):
             if pol == 0:
-                lev = src_lev['hlev'][ant,tidx]
+                lev = hlev[ant]
             else:
-                lev = src_lev['vlev'][ant,tidx]
+                lev = vlev[ant]
+            # Find attenuation changes, and the samples k at which to look for steps
+            jump = abs(lev[:-1] - lev[1:]) == 1
+            if not jump.any():
+                continue
+            kmask = jump.copy()
+            kmask[:-1] |= jump[1:]
+            k, = np.where(kmask)
+            pk = p[ant,pol]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                pfac1 = (pk[:,k] - pk[:,k+1])/pk[:,k]
+            apfac = abs(pfac1)
+            ok = np.logical_and(apfac > flim[0], apfac < flim[1])
+            # Multiplicative step at each sample (1 where there is none), whose
+            # cumulative product over time gives the correction for later samples
+            step = np.ones((pk.shape[0], nt-1))
+            step[:,k] = np.where(ok, 1 - pfac1, 1.)
+            pk[:,1:] /= np.cumprod(step,1)
+    return p
+
+def step_correct_loop(p, hlev, vlev, flim=[0.05,0.95]):
+    ''' Original (slow) version of step_correct(), looping over antennas,
+        polarizations, frequencies and steps, which is kept for checking.
+    '''
+    nf = p.shape[2]
+    pfac1 = (p[:,:,:,:-1] - p[:,:,:,1:])/p[:,:,:,:-1]
+    for ant in range(13):
+        for pol in range(2):
+            if pol == 0:
+                lev = hlev[ant]
+            else:
+                lev = vlev[ant]
             jidx, = np.where(abs(lev[:-1] - lev[1:]) == 1)
             for freq in range(nf):
-                idx, = np.where(np.logical_and(abs(pfac1[ant,pol,freq]) > 0.05,abs(pfac1[ant,pol,freq]) < 0.95))
+                idx, = np.where(np.logical_and(abs(pfac1[ant,pol,freq]) > flim[0],abs(pfac1[ant,pol,freq]) < flim[1]))
                 for i in range(len(idx-1)):
                     if idx[i] in jidx or idx[i] in jidx-1:
-                        out['p'][ant,pol,freq,idx[i]+1:] /= (1-pfac1[ant,pol,freq,idx[i]])
+                        p[ant,pol,freq,idx[i]+1:] /= (1-pfac1[ant,pol,freq,idx[i]])
+    return p
+
+def check_step_correct(nf=100, nt=3600, nsteps=20, seed=1):
+    ''' Compare step_correct() with step_correct_loop() on a synthetic total
+        power cube of size (15, 2, nf, nt), with nsteps random FEM level changes
+        (of 2 dB per level) per antenna and polarization, some nans and some
+        non-attenuation jumps.  Prints and returns the largest relative
+        difference of the results, the median relative error of the corrected
+        power with respect to the unattenuated power, and the execution times.
+    '''
+    import time
+    rng = np.random.default_rng(seed)
+    t = np.arange(nt)
+    # Smooth positive "true" power, with a small amount of noise
+    p0 = (1000. + 200*np.sin(2*np.pi*t/nt)[None,None,None,:]
+          + 100*rng.random((15,2,nf,1)))*(1 + 0.001*rng.standard_normal((15,2,nf,nt)))
+    lev = np.zeros((15,2,nt), int) + 5
+    for ant in range(15):
+        for pol in range(2):
+            for j in np.sort(rng.choice(np.arange(10,nt-10), nsteps, replace=False)):
+                lev[ant,pol,j+1:] += rng.choice([-1,1])
+    # Power drops by 2 dB per level, with the change seen one sample early for some
+    early = rng.random((15,2,1,1)) < 0.5
+    attn = 10**(-0.2*(lev - 5))[:,:,None,:]
+    attn[:,:,:,:-1] = np.where(early, attn[:,:,:,1:], attn[:,:,:,:-1])
+    p = p0*attn
+    # Non-attenuation jumps (not at level changes), and some bad data
+    p[:,:,:,nt//2:] *= 1.5
+    p[rng.random(p.shape) < 0.001] = np.nan
+    hlev = lev[:13,0]
+    vlev = lev[:13,1]
+    t1 = time.time()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pl = step_correct_loop(p.copy(), hlev, vlev)
+    t2 = time.time()
+    pv = step_correct(p.copy(), hlev, vlev)
+    t3 = time.time()
+    if np.any(np.isfinite(pl) != np.isfinite(pv)) or not np.array_equal(pl[13:], pv[13:], equal_nan=True):
+        print('CHECK_STEP_CORRECT: Error, results do not match.')
+    diff = np.nanmax(abs(pv[:13] - pl[:13])/abs(pl[:13]))
+    p0[:,:,:,nt//2:] *= 1.5
+    # Steps next to bad data are not corrected, so use the median error
+    err = np.nanmedian(abs(pv[:13] - p0[:13])/p0[:13])
+    print('Max relative difference:', diff, ' Median relative error:', err)
+    print('Loop: {:.3f} s, vectorized: {:.3f} s'.format(t2-t1, t3-t2))
+    return {'diff':diff, 'err':err, 'tloop':t2-t1, 'tvec':t3-t2}
+
+def autocorrect(out,ant_str='ant1-13',brange=[0,300]):
+    nt = len(out['time'])
+    nf = len(out['fghz'])
+    trange = Time(out['time'][[0,-1]],format='jd')
+    src_lev = gc.get_fem_level(trange)   # Read FEM levels from SQL
+    # Match times with data
+    tidx = nearest_val_idx(out['time'],src_lev['times'].jd)
+    # Correct for attenuation changes
+    step_correct(out['p'], src_lev['hlev'][:13,tidx], src_lev['vlev'][:13,tidx])
     # Time of total power calibration is 20 UT on the date given
     tptime = Time(np.floor(trange[0].mjd) + 20./24.,format='mjd')
     calfac = pc.get_calfac(tptime)
@@ -132,6 +132,8 @@
 #    I discovered a bug in skycal_anal() where the times of SQL levels and data 
 #    power levels could be mismatched.  Now finds the common value indexes first.
 #    Argh.  Use of median() instead of nanmedian() got me again.
+#  2026-Oct-19  SY
+#    Removed the unused fname2mjd() function nested in solpntanal().
 #
 
 if __name__ == "__main__":
@@ -475,11 +477,6 @@ def solpntanal(t, udb=False, auto=False, find=True, desat=False):
         the Time() object t must be an actual SOLPNTCAL scan time.
     '''
     from copy import deepcopy
-    
-    def fname2mjd(filename):
-        fstem = filename.split('/')[-1]
-        fstr = fstem[3:7]+'-'+fstem[7:9]+'-'+fstem[9:11]+' '+fstem[11:13]+':'+fstem[13:15]+':'+fstem[15:17]
-        return Time(fstr).mjd
 
     pnt = solpnt.get_solpnt(t, find=find)
     proc = solpnt.process_solpnt(pnt)
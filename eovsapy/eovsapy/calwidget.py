@@ -47,6 +47,13 @@
 #    Handle error-return from dbutil.a14_wscram().
 #  2021-08-09  DG
 #    Change use_date() to consider an observing day as timerange 8:40 UT - 8:40 UT + 1 day
+#  2026-Oct-19  SY
+#    rd_refcal() now averages the channels within bands with util.band_avg(), and
+#    applies the X-Y phase and feed-rotation corrections to all antennas and times
+#    at once, rather than in loops.
+#  2026-Oct-19  SY
+#    phase_diff() now fits the delays of all antennas and polarizations at once
+#    with util.delay_fit().
 #
 
 import matplotlib
@@ -67,7 +74,7 @@ else:
     import tkinter as Tk
 import tkinter.ttk
 from tkinter.messagebox import askyesno, showerror
-from .util import Time, nearest_val_idx, lobe, lin_phase_fit, extract
+from .util import Time, nearest_val_idx, lobe, lin_phase_fit, extract, band_avg, delay_fit
 from . import cal_header as ch
 from . import dbutil as db
 
@@ -1083,52 +1090,30 @@ def phase_diff(phacal, refcal):
         
         2018-02-14  DG 
           Added brute-force coarse delay calculation
+        2026-10-19  SY
+          All antennas and polarizations are now fit at once by delay_fit(),
+          which does the coarse delay search by FFT, followed by a weighted fit.
     '''
-    def mbdfunc0(fghz, mbd):
-        # fghz: frequency in GHz
-        # ph0 = 0: phase offset identically set to zero (not fitted)
-        # mbd: multi-band delay associated with the phase_phacal - phase_refcal in ns
-        return 2. * np.pi * fghz * mbd
-        
-    def coarse_delay(fghz,phz):
-        # Do a coarse search of delays corresponding to phase errors ranging from -0.1 to 0.1
-        # Returns the delay value with the minimum sigma
-        #tvals = np.arange(-0.1,0.1,0.01)
-        #sigma = []
-        #for t in tvals:
-        #    sigma.append(np.std(lobe(phz - 2*np.pi*t*fghz)))
-        #return tvals[np.argmin(np.array(sigma))]
-        
-        # Replace old coarse_delay (commented code above) with new lin_phase_fit function
-        pout = lin_phase_fit(fghz,phz)
-        return pout[1]/(2*np.pi)
-        
-    from scipy.optimize import curve_fit
-    
     fghz = phacal['fghz']
     if len(fghz) != len(refcal['fghz']):
-        self.status.config(text = 'Status: Phase and Reference calibrations have different frequencies.  No action taken.')
+        print('Status: Phase and Reference calibrations have different frequencies.  No action taken.')
         return phacal
     dpha = np.angle(phacal['x'][:,:2]) - np.angle(refcal['x'][:,:2])
-    flags = np.logical_or(phacal['flags'][:,:2],refcal['flags'][:,:2]).astype(np.int)
+    flags = np.logical_or(phacal['flags'][:,:2],refcal['flags'][:,:2]).astype(int)
     amp_pc = np.abs(phacal['x'][:,:2])
     amp_rc = np.abs(refcal['x'][:,:2])
     sigma = ((phacal['sigma'][:,:2]/amp_pc)**2. + (refcal['sigma'][:,:2]/amp_rc)**2)**0.5
-    slopes = np.zeros((15,2),np.float)
-    offsets = np.zeros((15,2),np.float)
-    flag = np.zeros((15,2),np.float)
-    for ant in range(13):
-        for pol in range(2):
-            good, = np.where(flags[ant,pol] == 0)
-            if len(good) > 3:
-                x = fghz[good]
-                t = coarse_delay(x,dpha[ant,pol,good])   # Get coarse delay 
-                y = np.unwrap(lobe(dpha[ant,pol,good] - 2*np.pi*t*x))  # Correct for coarse delay
-                p, pcov = curve_fit(mbdfunc0, x, y, p0=[0.], sigma=sigma[ant,pol,good], absolute_sigma=False)
-                slopes[ant,pol] = p + t  # Add back coarse delay
-                flag[ant,pol] = 0
-            else:
-                flag[ant,pol] = 1
+    slopes = np.zeros((15,2),float)
+    offsets = np.zeros((15,2),float)
+    flag = np.ones((15,2),float)
+    # Weights are zero for flagged points
+    with np.errstate(invalid='ignore', divide='ignore'):
+        wgt = np.where(flags[:13] == 0, 1./sigma[:13]**2, 0.)
+    slopes[:13], poff, rms = delay_fit(fghz, dpha[:13], wgt, offset=False)
+    # Need more than 3 good points for a fit
+    ngood = np.sum(np.isfinite(wgt) & (wgt > 0), axis=2)
+    slopes[:13] = np.where(ngood > 3, slopes[:13], 0.)
+    flag[:13] = (ngood <= 3)
     phacal.update({'mbd':slopes, 'mbd_flag':flag, 'flags': flags, 'offsets':offsets, 'pdiff':dpha})
     return phacal
     
@@ -1179,7 +1164,6 @@ def rd_refcal(file, quackint=120., navg=3):
         bands in the file
     '''
     from .read_idb import read_idb, bl2ord
-    from copy import deepcopy
     from . import dbutil as db
     
     out = read_idb([file], navg=navg, quackint=quackint)
@@ -1195,33 +1179,26 @@ def rd_refcal(file, quackint=120., navg=3):
         maxnbd = 34
         from .chan_util_bc import freq2bdname
     vis = np.zeros((15, 4, maxnbd, nt), dtype=complex)
-    fghz = np.zeros(maxnbd)
     # average over channels within each band
-    o = out['x'][bl2ord[13,:13]]
-    for bd in bds:
-        idx = np.where(out['band'] == bd)[0]
-        fghz[bd-1] = np.nanmean(out['fghz'][idx])
-        vis[:13,:,bd-1] = np.mean(o[:, :, idx], axis=2)
+    bds, vavg = band_avg(out['x'][bl2ord[13,:13]], out['band'], axis=2)
+    vis[:13,:,bds-1] = vavg
     # Need to apply unrot to correct for feed rotation, before returning
     xml, buf = ch.read_cal(11, Time(out['time'][0],format='jd'))
     dph = extract(buf,xml['XYphase'])
     xi_rot = extract(buf,xml['Xi_Rot'])
     freq = extract(buf,xml['FGHz'])
-    freq = freq[np.where(freq !=0)]
+    good = np.where(freq != 0)[0]
+    freq = freq[good]
     
     band = np.array(freq2bdname(freq))
-    bds, sidx = np.unique(band, return_index=True)
-    nbd = len(bds)
-    eidx = np.append(sidx[1:], len(band))
-    dxy = np.zeros((14, maxnbd), dtype=np.float)
-    xi = np.zeros(maxnbd, dtype=np.float)
+    dxy = np.zeros((14, maxnbd), dtype=float)
+    xi = np.zeros(maxnbd, dtype=float)
     fghz = np.zeros(maxnbd)
     # average dph and xi_rot frequencies within each band, to convert to band representation
-    for b, bd in enumerate(bds):
-        fghz[bd - 1] = np.nanmean(freq[sidx[b]:eidx[b]])
-        xi[bd - 1] = np.nanmean(xi_rot[sidx[b]:eidx[b]])
-        for a in range(14):
-            dxy[a, bd - 1] = np.angle(np.sum(np.exp(1j * dph[a, sidx[b]:eidx[b]])))
+    bds, favg = band_avg(freq, band, nan=True)
+    fghz[bds-1] = favg
+    xi[bds-1] = band_avg(xi_rot[good], band, nan=True)[1]
+    dxy[:, bds-1] = np.angle(band_avg(np.exp(1j * dph[:14, good]), band, axis=1)[1])
     bands = np.array(freq2bdname(fghz))
     # Read parallactic angles for this scan
     trange = Time(out['time'][[0,-1]],format='jd')
@@ -1229,26 +1206,21 @@ def rd_refcal(file, quackint=120., navg=3):
     tchi = times.jd
     t = out['time']
     if len(t) > 0:
-        vis2 = deepcopy(vis)
         idx = nearest_val_idx(t, tchi)
         pa = chi[idx]  # Parallactic angle for the times of this refcal.
         pa[:, [8, 9, 10, 12]] = 0.0
-        nt = len(idx)  # Number of times in this refcal
-        # Apply X-Y delay phase correction
-        for a in range(13):
-            a1 = lobe(dxy[a] - dxy[13])
-            a2 = -dxy[13] - xi
-            a3 = dxy[a] - xi + np.pi
-            for j in range(nt):
-                vis2[a, 1, :, j] *= np.exp(1j * a1)
-                vis2[a, 2, :, j] *= np.exp(1j * a2)
-                vis2[a, 3, :, j] *= np.exp(1j * a3)
-        for j in range(nt):
-            for a in range(13):
-                vis[a, 0, :, j] = vis2[a, 0, :, j] * np.cos(pa[j, a]) + vis2[a, 3, :, j] * np.sin(pa[j, a])
-                vis[a, 2, :, j] = vis2[a, 2, :, j] * np.cos(pa[j, a]) + vis2[a, 1, :, j] * np.sin(pa[j, a])
-                vis[a, 3, :, j] = vis2[a, 3, :, j] * np.cos(pa[j, a]) - vis2[a, 0, :, j] * np.sin(pa[j, a])
-                vis[a, 1, :, j] = vis2[a, 1, :, j] * np.cos(pa[j, a]) - vis2[a, 2, :, j] * np.sin(pa[j, a])
+        # Apply X-Y delay phase correction (arrays of shape (13, maxnbd, 1), broadcast over times)
+        vis2 = vis[:13].copy()
+        vis2[:, 1] *= np.exp(1j * lobe(dxy[:13] - dxy[13]))[:, :, None]
+        vis2[:, 2] *= np.exp(1j * (-dxy[13] - xi))[None, :, None]
+        vis2[:, 3] *= np.exp(1j * (dxy[:13] - xi + np.pi))[:, :, None]
+        # Feed rotation (arrays of shape (13, 1, nt), broadcast over bands)
+        cpa = np.cos(pa[:, :13]).T[:, None, :]
+        spa = np.sin(pa[:, :13]).T[:, None, :]
+        vis[:13, 0] = vis2[:, 0] * cpa + vis2[:, 3] * spa
+        vis[:13, 2] = vis2[:, 2] * cpa + vis2[:, 1] * spa
+        vis[:13, 3] = vis2[:, 3] * cpa - vis2[:, 0] * spa
+        vis[:13, 1] = vis2[:, 1] * cpa - vis2[:, 2] * spa
     # *******
     if fghz[1] < 1.:
         fghz[1] = 1.9290   # This band is missing, but no need to set its frequency to zero...
@@ -8,6 +8,9 @@
 #      More changes to get dradec2dazel() to work.  I tested it in
 #      detail to verify it.  One change--inputs and outputs are
 #      in radians.
+#   2026-Oct-19  SY
+#      radec2azel(), azel2radec() and dradec2dazel() now also work on arrays of
+#      coordinates and a Time() array t.  Fixed the RA wrap in azel2radec().
 
 from .eovsa_lst import *
 from numpy import pi, sin, cos, arcsin, arccos, arctan2
@@ -25,8 +28,8 @@ def radec2azel(ra, dec, t):
 
     az = arctan2(-cos(dec)*sin(ha), sin(dec)*cos(lat) - cos(dec)*cos(ha)*sin(lat))
 
-    if az < 0:
-        az += 2*pi
+    # Put az in range 0 to 2*pi
+    az = az % (2*pi)
     
     return az, el#, a
     
@@ -39,8 +42,7 @@ def azel2radec(az, el, t):
     dec = arcsin(sin(el)*sin(lat) + cos(el)*cos(lat)*cos(az))
     ha = arctan2(-sin(az)*cos(el), sin(el)*cos(lat) - cos(el)*cos(az)*sin(lat))
     ra = eovsa_lst(t) - ha
-    if ra < 0:
-        ra += 2*p1
+    ra = ra % (2*pi)
     return ra, dec    
     
 def dradec2dazel(ra,dec,t,dra,ddec):
@@ -40,6 +40,9 @@
 #    is that ACQUIRE states are not displayed (they are in SQL but not fdb files).
 #  2022-03-10  DG
 #    A couple of other changes due to loss of SQL, marked with comments.
+#  2026-10-19  SY
+#    get_goes_data() now reads the requested day from the local ancillary data
+#    store (ancdata.py), which fetches from NOAA only the data not already saved.
 #
 
 if __name__ == "__main__":
@@ -57,7 +60,7 @@ from . import read_idb as ri
 from .util import Time, extract
 import numpy as np
 import glob
-from .goes import get_goes
+from .ancdata import rd_goes
 from . import dump_tsys as dt
 
 
@@ -72,20 +75,19 @@ def get_goes_data(t=None,sat_num=None):
            goes_t    GOES time array in plot_date format
            goes_data GOES 1-8 A lightcurve
         '''
-    # Can short-circuit the entire code below this block by using my goes.get_goes() routine
-    lo, hi, goes_t = get_goes()
+    if t is None:
+        t = Time(Time.now().mjd - 1,format='mjd')
+    # Can short-circuit the entire code below this block by reading the day from the
+    # local store, which is filled from NOAA (via goes.get_goes()) for recent dates
+    day = np.floor(t.mjd)
+    lo, hi, goes_t = rd_goes(Time([day, day + 1 - 1./86400],format='mjd'))
     if len(goes_t) != 0:
-        # Got the data, now isolate the requested day
-        good, = np.where(np.floor(goes_t.mjd) == np.floor(t.mjd))
-        if len(good) != 0:
-            return goes_t.plot_date,lo
+        return goes_t.plot_date,lo
                 
     from sunpy.util.config import get_and_create_download_dir
     import shutil
     from astropy.io import fits
     import urllib.request, urllib.error, urllib.parse
-    if t is None:
-        t = Time(Time.now().mjd - 1,format='mjd')
     yr = t.iso[:4]
     datstr = t.iso[:10].replace('-','')
     try:
@@ -442,7 +444,7 @@ if __name__ == "__main__":
         If the date is omitted, data are processed for the previous two UT days
           (yesterday and day-before-yesterday)
     '''
-    import glob, sys
+    import sys
     t = None
     t2 = None
     # Default parameters
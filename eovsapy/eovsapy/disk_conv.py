@@ -5,10 +5,12 @@
 #   2014-Dec-16  DG
 #     Added optional fghz input, to calculate the curve at specified
 #     frequencies.
+#   2026-Oct-19  SY
+#     Fit the convolved profiles of all frequencies at once with gausfit_batch().
 #
 import numpy as np
 from scipy.optimize import leastsq
-from .solpnt import gausfit, plt
+from .solpnt import gausfit_batch, plt
 
 def disk_conv(fghz=None,doplot=False):
     ''' Calculate nominal beam size for 2.1 m EOVSA antennas
@@ -22,15 +24,16 @@ def disk_conv(fghz=None,doplot=False):
     if fghz is None:
         fghz = np.arange(101)*17./100. + 1.
     a = 1.22*(180./np.pi)*30./(fghz*210)
-    aout = np.zeros(len(fghz),'float')
     alpha = a/(2*np.sqrt(np.log(2.)))
+    x = np.arange(-10,10.01,0.01)
+    disk = np.ones(55,'float')
+    gdisk = np.zeros((len(fghz),len(x)),'float')
     for i in range(len(fghz)):
-        x = np.arange(-10,10.01,0.01)
-        disk = np.ones(55,'float')
         g = np.exp(-(x**2)/(alpha[i]**2))
-        gdisk = np.convolve(g,disk,mode='same')
-        [A,x0,w,b],x0,y0 = gausfit(x,gdisk)
-        aout[i] = np.abs(w)*2*np.sqrt(np.log(2.))
+        gdisk[i] = np.convolve(g,disk,mode='same')
+    # Fit all frequencies at once (the smooth profiles are well sampled by every 2nd point)
+    p = gausfit_batch(x[::2],gdisk[:,::2])
+    aout = np.abs(p[:,2])*2*np.sqrt(np.log(2.))
     if doplot:
         plt.figure()
         plt.plot(fghz,a)
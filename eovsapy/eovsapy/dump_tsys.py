@@ -56,9 +56,16 @@
 #  2022-Jun-02  DG
 #    A number of changes to remove requirement of FDB files (except for
 #    specific FDB reading routines).
+#  2026-Oct-19  SY
+#    rd_fdb(), rd_ifdb() and rd_ufdb() now share rd_fdbfile(), which splits
+#    the whole file in one pass and caches the result until the file changes.
+#    get_projects_nosql() and findfile() now query the scan catalogue (scandb.py)
+#    instead of re-reading and comparing FDB string arrays.  file_list() now
+#    uses the cached per-day file index (fileindex.py) instead of globbing.
+#    findfile() converts the scan start times to Time() in one call.
 #
 
-import subprocess, time, sys, glob
+import subprocess, time, sys, glob, os
 import numpy as np
 from .util import Time
 
@@ -77,64 +84,18 @@ def file_list(trange, udb=False):
     ''' Find IDB files between the dates/times provided in trange.
         Input is a 2-element Time() object with start time trange[0] and end time trange[1]
         Returns files as a list, if found, or an empty list ([]) if not found.
+        
+        Files are looked up in the per-day manifests of fileindex.py, so the
+        data folders are only listed when their contents change.
     '''
-    # Find files corresponding to date of first time
-    fstr = trange[0].iso
+    from .fileindex import trange_files
+    # Check if second time has different date
+    mjd1, mjd2 = trange.mjd.astype('int')
+    if mjd2 - mjd1 > 1:
+        usage('Second date must differ from first by at most 1 day')
     if udb:
-        # Check for existence of /data1/UDB:
-        folder = '/data1/UDB/' + str(int(trange[0].jyear))
-        files = glob.glob(folder + '/UDB' + fstr.replace('-', '').split()[0] + '*')
-        files.sort()
-        # Check if second time has different date
-        mjd1, mjd2 = trange.mjd.astype('int')
-        if mjd2 != mjd1:
-            if (mjd2 - 1) != mjd1:
-                usage('Second date must differ from first by at most 1 day')
-            else:
-                fstr2 = trange[1].iso
-                files2 = glob.glob(folder + '/UDB' + fstr2.replace('-', '').split()[0] + '*')
-                files2.sort()
-                files += files2
-    else:
-        # Check for existence of /data1/IDB, or use /dppdata1/IDB if not found:
-        folder = '/data1/IDB'
-        if glob.glob(folder) == []:
-            folder = '/dppdata1/IDB'
-            files = glob.glob(folder + '/IDB' + fstr.replace('-', '').split()[0] + '*')
-            files.sort()
-        if files == [] or glob.glob(folder) == []:
-            datdir = trange[0].iso[:10].replace('-', '')
-            folder = '/common/archive/data1/eovsa/fits/IDB/' + datdir
-            files = glob.glob(folder + '/IDB' + fstr.replace('-', '').split()[0] + '*')
-            files.sort()
-        # Check if second time has different date
-        mjd1, mjd2 = trange.mjd.astype('int')
-        if mjd2 != mjd1:
-            if (mjd2 - 1) != mjd1:
-                usage('Second date must differ from first by at most 1 day')
-            else:
-                if folder[:22] == '/common/archive/data1/eovsa/fits/IDB/':
-                    datdir = trange[1].iso[:10].replace('-', '')
-                    folder = '/common/archive/data1/eovsa/fits/IDB/' + datdir
-                fstr2 = trange[1].iso
-                files2 = glob.glob(folder + '/IDB' + fstr2.replace('-', '').split()[0] + '*')
-                files2.sort()
-                files += files2
-
-    def fname2mjd(filename):
-        fstem = filename.split('/')[-1]
-        fstr = fstem[3:7] + '-' + fstem[7:9] + '-' + fstem[9:11] + ' ' + fstem[11:13] + ':' + fstem[
-                                                                                              13:15] + ':' + fstem[
-                                                                                                             15:17]
-        t = Time(fstr)
-        return t.mjd
-
-    filelist = []
-    for filename in files:
-        mjd = fname2mjd(filename)
-        if mjd >= trange[0].mjd and mjd < trange[1].mjd:
-            filelist.append(filename)
-    return filelist
+        return trange_files(trange, 'UDB')
+    return trange_files(trange, 'IDB')
 
 
 def dump_tsys(trange):
@@ -351,6 +312,39 @@ def rd_miriad_tsamp(trange, udb=False):
     return {'source': src, 'fghz': fghz, 'ut_mjd': utd, 'tsys': tsys}
 
 
+# Parsed FDB-type files, keyed by file name, with the (mtime, size) of the
+# file when it was parsed
+_fdbcache = {}
+
+def rd_fdbfile(filename, nlines=1):
+    ''' Read an FDB, IFDB or UFDB text file, whose first line is a header of
+        column names, followed by entries of nlines lines each.  Returns a
+        dictionary of U32 string arrays, one per column.  Malformed entries are
+        left as empty strings.  Raises IOError (OSError) if the file cannot be
+        read.
+        
+        The split file is kept in memory, so repeated calls for the same file
+        cost only a copy, unless the file has changed in the meantime.
+    '''
+    st = os.stat(filename)
+    key = (st.st_mtime, st.st_size)
+    cached = _fdbcache.get(filename)
+    if cached is None or cached[0] != key:
+        with open(filename, 'r') as f:
+            lines = f.read().splitlines()
+        names = lines[0].replace(':', '').split()
+        lines = lines[1:]
+        if nlines > 1:
+            lines = [' '.join(lines[i:i + nlines]) for i in range(0, len(lines) - nlines + 1, nlines)]
+        fields = [line.split() for line in lines]
+        good = np.array([len(field) == len(names) for field in fields], bool)
+        contents = np.zeros((len(names), len(fields)), 'U32')
+        if np.any(good):
+            contents[:, good] = np.array([field for i, field in enumerate(fields) if good[i]], 'U32').T
+        cached = (key, names, contents)
+        _fdbcache[filename] = cached
+    return dict(list(zip(cached[1], cached[2].copy())))
+
 def rd_fdb(t):
     ''' Read the FDB file for the date given in Time() object t, and return in a
         useful dictionary form.
@@ -370,22 +364,11 @@ def rd_fdb(t):
         folder = '/dppdata1/FDB'
     fdbfile = '/FDB' + t.iso[:10].replace('-', '') + '.txt'
     try:
-        f = open(folder + fdbfile, 'r')
-        lines = f.readlines()
-        f.close()
+        # Each FDB entry spans two lines
+        return rd_fdbfile(folder + fdbfile, nlines=2)
     except:
         print('Error: Could not open file', folder + fdbfile + '.')
         return {}
-    names = lines[0].replace(':', '').split()
-    contents = np.zeros((len(names), len(lines) // 2), 'U32')
-    for i in range(1, len(lines), 2):
-        try:
-            contents[:, (i - 1) // 2] = np.array(lines[i].split() + lines[i + 1].split())
-        except:
-            # If the above assignment does not work, line is malformed, so just
-            # leave as empty list
-            pass
-    return dict(list(zip(names, contents)))
 
 def rd_ifdb(t):
     ''' Read the IFDB file for the date given in Time() object t, and return in a
@@ -396,22 +379,10 @@ def rd_ifdb(t):
     folder = '/data1/IFDB/'+yy
     fdbfile = '/IFDB' + t.iso[:10].replace('-', '') + '.txt'
     try:
-        f = open(folder + fdbfile, 'r')
-        lines = f.readlines()
-        f.close()
+        return rd_fdbfile(folder + fdbfile)
     except:
         print('Error: Could not open IFDB file', folder + fdbfile + '. Will try FDB file.')
         return {}
-    names = lines[0].replace(':', '').split()
-    contents = np.zeros((len(names), len(lines)), 'U32')
-    for i in range(1, len(lines)):
-        try:
-            contents[:, i-1] = np.array(lines[i].split())
-        except:
-            # If the above assignment does not work, line is malformed, so just
-            # leave as empty list
-            pass
-    return dict(list(zip(names, contents)))
 
 def rd_ufdb(t):
     ''' Read the UFDB file for the date given in Time() object t, and return in a
@@ -420,22 +391,10 @@ def rd_ufdb(t):
     folder = '/data1/UFDB/'
     ufdbfile = t.iso[:4] + '/UFDB' + t.iso[:10].replace('-', '') + '.txt'
     try:
-        f = open(folder + ufdbfile, 'r')
-        lines = f.readlines()
-        f.close()
+        return rd_fdbfile(folder + ufdbfile)
     except:
         print('Error: Could not open file', folder + ufdbfile + '.')
         return {}
-    names = lines[0].replace(':', '').split()
-    contents = np.zeros((len(names), len(lines) - 1), 'U32')
-    for i in range(1, len(lines)):
-        try:
-            contents[:, i - 1] = np.array(lines[i].split())
-        except:
-            # If the above assignment does not work, line is malformed, so just
-            # leave as empty list
-            pass
-    return dict(list(zip(names, contents)))
 
 def get_projects(t, nosql=False):
     ''' Read all projects from SQL for the current date and return a summary
@@ -472,86 +431,52 @@ def get_projects(t, nosql=False):
     return projdict
 
 def get_projects_nosql(t):
-    ''' Read all projects from FDB file for the current date and return a summary
-        as a dictionary with keys Timestamp, Project, and EOS (another timestamp)
+    ''' Read all projects from the scan catalogue (built from the FDB files) for
+        the current date and return a summary as a dictionary with keys Timestamp,
+        Project, and EOS (another timestamp)
     '''
+    from . import scandb
     # timerange is 12 UT to 12 UT on next day, relative to the day in Time() object t
     trange = Time([int(t.mjd) + 12./24,int(t.mjd) + 36./24],format='mjd')
-    tstart = t.iso[2:10].replace('-','')+'120000'
-    t2 = Time(int(t.mjd)+1, format='mjd')
-    tend = t2.iso[2:10].replace('-','')+'120000'
-    fdb = rd_fdb(t)
-    fdb2 = rd_fdb(t2)
-    if fdb == {}:
+    scans = scandb.scanlist(trange)
+    if len(scans['scanid']) == 0:
         # No FDB file found, so return empty project dictionary
         print('No Project data [FDB file] found for the given date.')
         return {}
-    if fdb == {}:
-        pass
-    else:
-        #  Concatenate the two dicts into one
-        fdb = dict([(k, np.concatenate((fdb.get(k,[]),fdb2.get(k,[])))) for k in set(fdb)|set(fdb2)])  
-    # Get "good" indexes for times between 12 UT on date and 12 UT on next date
-    gidx, = np.where(np.logical_and(fdb['SCANID']>tstart,fdb['SCANID']<tend))        
-    scanid,idx = np.unique(fdb['SCANID'][gidx],return_index=True)
-    sidx = gidx[idx]   # Indexes into fdb for the start of each scan
-    # Get the project IDs for scans during the period
-    projdict = {'Timestamp':fdb['ST_TS'][sidx].astype(float),
-                'Project':fdb['PROJECTID'][sidx],
-                'EOS':fdb['EN_TS'][sidx].astype(float)}
+    projdict = {'Timestamp':scans['st_ts'],
+                'Project':scans['project'],
+                'EOS':scans['en_ts']}
     return projdict
 
 def findfile(trange, scantype='PHASECAL'):
-
-    from .read_idb import get_trange_files
-    t1 = str(trange[0].mjd)
-    t2 = str(trange[1].mjd)
+    ''' Find the scans of type scantype (project ID) that lie entirely within
+        the time range given by the 2-element Time() object trange, and return
+        a dictionary with keys scanlist (list of lists of file paths for each
+        scan), status (list of lists of 'done' or 'undone' for each file) and
+        tstlist (list of scan start times as Time() objects).
+    '''
+    from . import scandb
     tnow = Time.now()
 
-    projects = get_projects(trange[0])
-    if t1[:5] != t2[:5]:
-        # End day is different than start day, so read and concatenate two fdb files
-        projects2 = get_projects(trange[1])
-        if projects2 != {}:
-            for key in list(projects.keys()):
-                projects.update({key:np.append(projects[key],projects2[key])})
-
-    scanidx, = np.where(projects['Project'] == scantype)
-    tslist = Time(projects['Timestamp'][scanidx],format='lv')
-    telist = Time(projects['EOS'][scanidx],format='lv')
-        
-    k = 0         # Number of scans within timerange
-    m = 0         # Pointer to first scan within timerange
-    flist = []
-    status = []
-    tstlist = []
-    for i in range(len(tslist)):
-        if tslist[i].jd >= trange[0].jd and telist[i].jd <= trange[1].jd:
-            # Time is in range, so add it
-            k += 1
-        elif tslist[i].jd < trange[0].jd:
-            # Time is too early, so skip it
-            m += 1
+    scans = scandb.scanlist(trange, project=scantype)
+    idx, = np.where(scans['en_ts'] <= trange[1].lv)
+    k = len(idx)  # Number of scans within timerange
         
     if k == 0: 
         print('No phase calibration data within given time range')
         return None
     else: 
         print('Found',k,'scans in timerange.')
-        for i in range(k):
-            scan_trange = Time([tslist[m+i].mjd,telist[m+i].mjd],format='mjd')
-            f1 = get_trange_files(scan_trange)
-            # if fpath == '/data1/eovsa/fits/IDB/':
-            #     f2 = [fpath + f[3:11] + '/' + f for f in f1]
-            # else:
-            #     f2 = [fpath + f for f in f1]
-            flist.append(f1)
-            tstlist.append(tslist[m+i])
-            ted = telist[m+i]
+        flist = [scans['files'][i] for i in idx]
+        # Convert all start times at once, rather than one Time() per scan
+        tst = Time(scans['st_ts'][idx],format='lv')
+        tstlist = [tst[i] for i in range(k)]
+        status = []
+        for i in idx:
             # Mark all files done except possibly the last
-            fstatus = ['done']*len(f1)
+            fstatus = ['done']*len(scans['files'][i])
             # Check if last file end time is less than 10 min ago
-            if (tnow.jd - ted.jd) < (600./86400):
+            if (tnow.lv - scans['en_ts'][i]) < 600.:
                 # Current time is less than 10 min after this scan
                 fstatus[-1] = 'undone'
             status.append(fstatus)
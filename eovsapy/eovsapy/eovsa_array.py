@@ -46,15 +46,51 @@
 #      Update of Bx, By and Bz, based on 2017-Jul-03 measurements, mainly to correct ants 12 
 #      and 13 Bx and By, but also minor tweaks elsewhere.  Note that Ant 12 Bz could not be
 #      measured reliably due to large Bx, By errors, so it needs another Bz tweak.
+#   2026-Oct-19  SY
+#      Added ant_xyz(), which calculates the corrected antenna X, Y, Z positions
+#      only once, and is now used by eovsa_array().  Also added bl_xyz() and the
+#      vectorized uvw() and ant_uvw() routines, which calculate u, v, w for all
+#      baselines (or antennas) and arrays of HA and Dec at once, without aipy.
 #
 
 import aipy, ephem, numpy
 from math import cos, sin
-from .util import Vector,Time
-from numpy import pi, mat
+from .util import Time
+from numpy import pi
 
 global lat
 lat = 37.233170*numpy.pi/180       # OVSA Latitude (radians)
+mperns = 0.299792458               # Meters per nanosecond
+
+# Cached antenna X, Y, Z positions [ns] (see ant_xyz())
+_xyz = None
+
+def ant_xyz():
+    ''' Returns the (16, 3) array of antenna X, Y, Z (equatorial) positions [ns]
+        of the EOVSA antennas, including the bl_cor() corrections.  These are
+        the positions of the antennas of the eovsa_array() object.  The
+        positions are calculated on the first call, and a copy of the cached
+        array is returned thereafter.
+    '''
+    global _xyz
+    if _xyz is None:
+        # Define antenna ENU locations.  Ant 16 is the test input (0,0,0).
+        # Divide by mperns to convert m to ns.
+        ante = numpy.array([187.86, 196.15, 175.11, 197.96, 194.11, 147.42,
+                            266.83, 98.95, 20.35, 167.43, -442.00, 640.22,
+                            -329.06, -631.00, -213.00, 0.0])/mperns
+        antn = numpy.array([71.74, 75.14, 77.39, 50.25, 108.86, 35.91,
+                            67.10, 169.34, -218.49, 280.78, -138.59, -355.82,
+                            861.82, -184.00, -187.00, 0.0])/mperns
+        antu = numpy.zeros(16)
+        clat = cos(lat)
+        slat = sin(lat)
+        # Latitude rotation matrix to convert ENU to XYZ
+        latrot = numpy.array([[0, -slat, clat],[1, 0, 0],[0, clat, slat]])
+        x, y, z = numpy.dot(latrot, numpy.array([ante, antn, antu]))
+        # Apply (add) any baseline corrections
+        _xyz = numpy.array(bl_cor(x, y, z, numpy.arange(16))).T
+    return _xyz.copy()
 
 def eovsa_array():
     ''' Define EOVSA antenna array, which consists of tabulated E,N,U
@@ -63,33 +99,13 @@ def eovsa_array():
         AntennaArray object.
     '''
     global lat
-    mperns = 0.299792458  # Meters per nanosecond
-
-    # Define antenna ENU locations.  Ant 16 is the test input (0,0,0).
-    # Divide by mperns to convert m to ns.
-    ante = numpy.array([187.86, 196.15, 175.11, 197.96, 194.11, 147.42,
-                        266.83, 98.95, 20.35, 167.43, -442.00, 640.22,
-                        -329.06, -631.00, -213.00, 0.0])/mperns
-    antn = numpy.array([71.74, 75.14, 77.39, 50.25, 108.86, 35.91,
-                        67.10, 169.34, -218.49, 280.78, -138.59, -355.82,
-                        861.82, -184.00, -187.00, 0.0])/mperns
-    antu = numpy.zeros(16)
-
     lng = -118.286953*numpy.pi/180      # OVSA Longitude (radians)
     elev = 1207.0                       # OVSA Elevation (meters)
-    clat = cos(lat)
-    slat = sin(lat)
 
-    # Latitude rotation matrix to convert ENU to XYZ
-    latrot = mat([[0, -slat, clat],[1, 0, 0],[0, clat, slat]])
     f = numpy.array([1.0])
     beam = aipy.phs.Beam(f)
     ants = []
-    for i in range(16):
-        enu = Vector([ante[i], antn[i], antu[i]])
-        x, y, z = enu.rotate(latrot).get()
-        # Apply (add) any baseline corrections
-        xp, yp, zp = bl_cor(x,y,z,i) 
+    for xp, yp, zp in ant_xyz():
         ants.append(aipy.phs.Antenna(xp,yp,zp,beam))
 
     aa = aipy.phs.AntennaArray(ants=ants,location=(lat, lng, elev))
@@ -105,9 +121,44 @@ def eovsa_array():
     aa.cat = cat
     return aa
 
-def bl_cor(x, y, z, iant):
+def bl_xyz(nant=16):
+    ''' Returns the (nbl, 3) array of baseline X, Y, Z vectors [ns] (position of
+        antenna j minus that of antenna i) for the nbl = nant*(nant-1)/2 baselines
+        i < j of the first nant antennas, in the same order as util.bl2ord, and the
+        arrays of antenna indexes i and j of each baseline.
+    '''
+    i, j = numpy.triu_indices(nant, 1)
+    xyz = ant_xyz()
+    return xyz[j] - xyz[i], i, j
+
+def uvw(ha, dec, bl):
+    ''' Returns the u, v, w coordinates [same units as bl] of the baselines
+        in the (nbl, 3) array bl of X, Y, Z vectors, for the source at hour
+        angle(s) ha and declination(s) dec [radians, apparent coordinates of
+        date].  The ha and dec may be scalars or arrays of nt times.  The result
+        is an (nbl, nt, 3) array, and is the same as aipy's gen_uvw() for each
+        baseline and time (the w coordinate is the geometric delay).
+    '''
+    ha = numpy.atleast_1d(numpy.asarray(ha, dtype=float))
+    dec = numpy.atleast_1d(numpy.asarray(dec, dtype=float))
+    sh, ch = numpy.sin(ha), numpy.cos(ha)
+    sd, cd = numpy.sin(dec), numpy.cos(dec)
+    sh, ch, sd, cd = numpy.broadcast_arrays(sh, ch, sd, cd)
+    # Rotation matrix from X, Y, Z to u, v, w, for each time (nt, 3, 3)
+    rot = numpy.array([[sh, ch, numpy.zeros_like(sh)],
+                       [-sd*ch, sd*sh, cd],
+                       [cd*ch, -cd*sh, sd]]).transpose(2, 0, 1)
+    return numpy.einsum('tuk,bk->btu', rot, numpy.asarray(bl, dtype=float))
 
-    mperns = 0.299792458  # Meters per nanosecond
+def ant_uvw(ha, dec, ref=0):
+    ''' Returns the (16, nt, 3) array of u, v, w coordinates [ns] of each
+        antenna relative to antenna index ref, for the source at hour angle(s)
+        ha and declination(s) dec [radians, apparent coordinates of date].
+    '''
+    xyz = ant_xyz()
+    return uvw(ha, dec, xyz - xyz[ref])
+
+def bl_cor(x, y, z, iant):
 
     # Initial baseline corrections (based on Satellite obs. on 2016 Mar 20)
     dx = numpy.array([ 0.00, 0.08, 0.30, 0.67, 0.35, -0.13, -0.09, 0.94, -6.37, 6.51, 1.15,-12.50, 13.31,  0.0, 0.0, 0.0])
@@ -0,0 +1,125 @@
+'''
+   Vectorized ephemeris routines for EOVSA, which work on whole arrays of
+   times (mjd) at once, for scheduling and tracking calculations that would
+   otherwise step through the times one at a time with aa.set_jultime() and
+   src.compute(aa).
+
+   - LST is calculated with fasttime.eovsa_lst().
+   - The Sun's apparent RA and Dec are calculated with the (vectorized)
+     sun_pos() arithmetic.
+   - For other catalog sources, ephem is called only on a coarse (hourly)
+     grid of times, and the apparent RA and Dec are interpolated to the
+     requested times.  This is well under an arcsecond for sidereal sources,
+     and good to about 0.01 degree for the Moon.
+   - Alt and Az are calculated from HA and Dec, including the same atmospheric
+     refraction as the aipy/ephem array object (pressure for the OVRO
+     elevation, and 15 C).
+
+   The eovsa_array() and eovsa_array_with_cat() objects are created only
+   once, and are cached in this module.
+'''
+#
+# History:
+#  2026-Oct-19  SY
+#    Initial version.
+#
+
+import numpy as np
+from .fasttime import eovsa_lst
+from .sun_pos import sun_pos
+
+# OVRO latitude (radians), as in eovsa_array()
+ovro_lat = 37.233170 * np.pi / 180
+# Standard atmosphere pressure (mbar) at the OVRO elevation, and temperature (C), used by ephem
+ovro_pressure = 876.4
+ovro_temp = 15.
+
+_arrays = {}
+
+
+def get_array(cat=False):
+    ''' Returns the cached eovsa_array() object, or if cat is True, the cached
+        eovsa_array_with_cat() object.  The objects are shared, so callers
+        should set the date themselves and not modify the antennas.
+    '''
+    if cat not in _arrays:
+        if cat:
+            from .eovsa_cat import eovsa_array_with_cat
+            _arrays[cat] = eovsa_array_with_cat()
+        else:
+            from .eovsa_array import eovsa_array
+            _arrays[cat] = eovsa_array()
+    return _arrays[cat]
+
+
+def sun_radec(mjd):
+    ''' Returns the apparent RA and Dec (radians) of the Sun for the array of
+        (UT) mjds.
+    '''
+    longmed, ra, dec, l, oblt = sun_pos(np.asarray(mjd, dtype=np.float64) - 15019.5)
+    return np.radians(ra), np.radians(dec)
+
+
+def src_radec(srcname, mjd, dt=1 / 24.):
+    ''' Returns the apparent (topocentric) RA and Dec (radians) of the source
+        srcname in the catalog of get_array(cat=True), for the array of (UT)
+        mjds.  The source is computed by ephem on a grid of times with spacing
+        dt (days) covering the mjds, and interpolated.
+    '''
+    mjd = np.atleast_1d(np.asarray(mjd, dtype=np.float64))
+    if srcname == 'Sun':
+        return sun_radec(mjd)
+    aa = get_array(cat=True)
+    src = aa.cat[srcname]
+    t0 = np.floor(mjd.min() / dt) * dt
+    tgrid = np.arange(t0, mjd.max() + 2 * dt, dt)
+    ra = np.zeros(len(tgrid))
+    dec = np.zeros(len(tgrid))
+    for i, t in enumerate(tgrid):
+        aa.set_jultime(t + 2400000.5)
+        src.compute(aa)
+        ra[i] = src.ra
+        dec[i] = src.dec
+    # Interpolate RA without the 2*pi wraps, then put it back in 0 to 2*pi
+    ra = np.interp(mjd, tgrid, np.unwrap(ra)) % (2 * np.pi)
+    dec = np.interp(mjd, tgrid, dec)
+    return ra, dec
+
+
+def refraction(alt):
+    ''' Returns the atmospheric refraction (radians) to be added to the true
+        altitude alt (radians), from Bennett's formula scaled to the OVRO
+        pressure and temperature.
+    '''
+    h = np.degrees(alt)
+    h = np.clip(h, -1., 90.)
+    r = 1.02 / np.tan(np.radians(h + 10.3 / (h + 5.11))) / 60.
+    r *= (ovro_pressure / 1010.) * (283. / (273. + ovro_temp))
+    return np.radians(r)
+
+
+def hadec2altaz(ha, dec, refract=True):
+    ''' Returns the altitude and azimuth (radians, azimuth measured from North
+        through East, 0 to 2*pi) for arrays of HA and Dec (radians) at OVRO.
+    '''
+    slat, clat = np.sin(ovro_lat), np.cos(ovro_lat)
+    sdec, cdec = np.sin(dec), np.cos(dec)
+    cha = np.cos(ha)
+    alt = np.arcsin(slat * sdec + clat * cdec * cha)
+    az = np.arctan2(-cdec * np.sin(ha), clat * sdec - slat * cdec * cha) % (2 * np.pi)
+    if refract:
+        alt = alt + refraction(alt)
+    return alt, az
+
+
+def src_track(srcname, mjd, refract=True):
+    ''' Returns the position of the catalog source srcname for the array of
+        (UT) mjds, as a dictionary of arrays (all in radians) with keys
+        'lst', 'ra', 'dec', 'ha' (lst - ra, not wrapped), 'alt' and 'az'.
+    '''
+    mjd = np.atleast_1d(np.asarray(mjd, dtype=np.float64))
+    lst = eovsa_lst(mjd)
+    ra, dec = src_radec(srcname, mjd)
+    ha = lst - ra
+    alt, az = hadec2altaz(ha, dec, refract)
+    return {'lst': lst, 'ra': ra, 'dec': dec, 'ha': ha, 'alt': alt, 'az': az}
@@ -1,5 +1,9 @@
 #  2015-May-29  DG
 #    Converted from using datime() to using Time() based on astropy.
+#  2026-Oct-19  SY
+#    eovsa_lst() now uses the cached array object of eovsa_ephem.get_array()
+#    instead of creating a new eovsa_array() on every call, and accepts a
+#    Time() array, for which the LST is calculated by fasttime.eovsa_lst().
 
 ##from datime import *
 ##from Astrometry import *
@@ -61,19 +65,25 @@
 #                                     + sin(src.alt)*cos(ovsa.lat))
 #    return ha
 
-from .eovsa_array import *
 from math import pi
+import numpy as np
 from .util import Time
+from . import fasttime
+from .eovsa_ephem import get_array
 
 # New code is ridiculously simple
 def eovsa_lst(tin=None):
     ''' Input is a Time() object (or None to use current time).
         Returns local sidereal time for EOVSA. NB: Now returns LST in radians,
         not as an RA_Angle()
+        
+        If tin is an array of times, an array of LSTs (radians) is returned.
     '''
     if tin is None:
         tin = Time.now()
-    aa = eovsa_array()
+    if not tin.isscalar:
+        return fasttime.eovsa_lst(tin.mjd)
+    aa = get_array()
     aa.set_jultime(tin.jd)
     return aa.sidereal_time()
 
@@ -86,6 +96,9 @@ def eovsa_ha(src,tin=None):
     if tin is None:
         tin = Time.now()
     ha = eovsa_lst(tin) - src.ra
+    if not tin.isscalar:
+        ha = np.where(ha > pi, ha - 2*pi, ha)
+        return np.where(ha < -pi, ha + 2*pi, ha)
     if ha > pi:
         ha = ha - 2*pi
     elif ha < -pi:
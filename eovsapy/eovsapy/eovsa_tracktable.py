@@ -12,6 +12,9 @@
 #   2017-Jan-05  DG
 #      Tried to get make_tracktable work with GEOSATS, but gave up and
 #      reinstated make_geosattable()
+#   2026-Oct-19  SY
+#      Build the tables as lists of lines that are joined at the end, rather than
+#      by repeated string concatenation.
 #
 import aipy, ephem, numpy
 from . import util
@@ -42,7 +45,7 @@ def make_tracktable(srcname,aa,mjd1=None,mjd2=None,dt=1/24.):
         mjd1 = int(util.Time.now().mjd)
         mjd2 = mjd1 + 1.
     
-    tbl = ''
+    tbl = []
     mjd = mjd1 - 2*dt # start tracktable a couple time intervals early for purposes of interpolation
     aa.date = mjd - dt - 15019.5
     src.compute(aa)
@@ -70,9 +73,9 @@ def make_tracktable(srcname,aa,mjd1=None,mjd2=None,dt=1/24.):
                 aa.date = mjd - 15019.5
                 src.compute(aa)
                 msec = round((mjd % 1)*86400000.)        
-                tbl = tbl+'{:7d} {:7d} {:5d} {:8d}\n'.format(int(src.ra*1800000./pi),
+                tbl.append('{:7d} {:7d} {:5d} {:8d}\n'.format(int(src.ra*1800000./pi),
                                                      int(src.dec*1800000./pi),
-                                                     int(mjd),int(msec))
+                                                     int(mjd),int(msec)))
             # Put back current time
             mjd = mjd1
             aa.date = mjd - 15019.5  # Convert mdj to ephem's strange time base
@@ -92,9 +95,9 @@ def make_tracktable(srcname,aa,mjd1=None,mjd2=None,dt=1/24.):
                 aa.date = mjd - 15019.5
                 src.compute(aa)
                 msec = round((mjd % 1)*86400000.)        
-                tbl = tbl+'{:7d} {:7d} {:5d} {:8d}\n'.format(int(src.ra*1800000./pi),
+                tbl.append('{:7d} {:7d} {:5d} {:8d}\n'.format(int(src.ra*1800000./pi),
                                                      int(src.dec*1800000./pi),
-                                                     int(mjd),int(msec))
+                                                     int(mjd),int(msec)))
             # Put back current time
             mjd = mjd1
             aa.date = mjd - 15019.5  # Convert mdj to ephem's strange time base
@@ -105,14 +108,14 @@ def make_tracktable(srcname,aa,mjd1=None,mjd2=None,dt=1/24.):
         # angles are in units of 1/10,000 of a degree
         # times (msec) are in units of ms
         msec = round((mjd % 1)*86400.)*1000.
-        tbl = tbl+'{:7d} {:7d} {:5d} {:8d}\n'.format(int(src.ra*1800000./pi),
+        tbl.append('{:7d} {:7d} {:5d} {:8d}\n'.format(int(src.ra*1800000./pi),
                                                      int(src.dec*1800000./pi),
-                                                     int(mjd),int(msec))
+                                                     int(mjd),int(msec)))
         #print src.az,src.alt
         mjd = mjd + dt
 
     
-    return tbl
+    return ''.join(tbl)
 
 def make_geosattable(sat,aa,mjd1=None,mjd2=None,dt=1/24.):
     '''Generate a tracktable of coordinates for geosynchronous satellite contained in
@@ -133,7 +136,7 @@ def make_geosattable(sat,aa,mjd1=None,mjd2=None,dt=1/24.):
         mjd1 = int(util.Time.now().mjd)
         mjd2 = mjd1 + 1.
     
-    tbl = ''
+    tbl = []
     mjd = mjd1 - 2*dt # start tracktable a couple time intervals early for purposes of interpolation
     aa.date = mjd - dt - 15019.5
     sat.compute(aa)
@@ -157,9 +160,9 @@ def make_geosattable(sat,aa,mjd1=None,mjd2=None,dt=1/24.):
                 aa.date = mjd - 15019.5
                 sat.compute(aa)
                 msec = round((mjd % 1)*86400.)*1000.        
-                tbl = tbl+'{:7d} {:7d} {:5d} {:8d}\n'.format(int(sat.ra*1800000./pi),
+                tbl.append('{:7d} {:7d} {:5d} {:8d}\n'.format(int(sat.ra*1800000./pi),
                                                      int(sat.dec*1800000./pi),
-                                                     int(mjd),int(msec))
+                                                     int(mjd),int(msec)))
             # Put back current time
             mjd = mjd1
             aa.date = mjd - 15019.5  # Convert mdj to ephem's strange time base
@@ -179,9 +182,9 @@ def make_geosattable(sat,aa,mjd1=None,mjd2=None,dt=1/24.):
                 aa.date = mjd - 15019.5
                 sat.compute(aa)
                 msec = round((mjd % 1)*86400.)*1000.        
-                tbl = tbl+'{:7d} {:7d} {:5d} {:8d}\n'.format(int(sat.ra*1800000./pi),
+                tbl.append('{:7d} {:7d} {:5d} {:8d}\n'.format(int(sat.ra*1800000./pi),
                                                      int(sat.dec*1800000./pi),
-                                                     int(mjd),int(msec))
+                                                     int(mjd),int(msec)))
             # Put back current time
             mjd = mjd1
             aa.date = mjd - 15019.5  # Convert mdj to ephem's strange time base
@@ -193,9 +196,9 @@ def make_geosattable(sat,aa,mjd1=None,mjd2=None,dt=1/24.):
         # times (msec) are in units of ms
         msec = round((mjd % 1)*86400.)*1000.
         
-        tbl = tbl+'{:7d} {:7d} {:5d} {:8d}\n'.format(int(sat.ra*1800000./pi),
+        tbl.append('{:7d} {:7d} {:5d} {:8d}\n'.format(int(sat.ra*1800000./pi),
                                                      int(sat.dec*1800000./pi),
-                                                     int(mjd),int(msec))
+                                                     int(mjd),int(msec)))
         mjd = mjd + dt
 
-    return tbl
+    return ''.join(tbl)
@@ -0,0 +1,166 @@
+'''
+   Fast, vectorized time conversions for the hot paths of the data readers.
+
+   The astropy-based Time() class is convenient, but creating Time() objects
+   from strings or for each of many times is slow.  The routines here work on
+   whole numpy arrays at once and return plain float arrays:
+
+       str2mjd(['2017-05-15 01:02:01', ...])    ISO date/time strings to mjd
+       fname2mjd(['IDB20170515010201', ...])    IDB/UDB file names to mjd
+       jd2mjd(), mjd2jd(), lv2mjd(), mjd2lv(), jd2lv(), lv2jd()
+       eovsa_lst(mjd)                           apparent LST at OVRO (radians)
+
+   All times are UTC.  Times are only converted to Time() objects where
+   they are returned to the caller.
+'''
+#
+# History:
+#  2026-Oct-19  SY
+#    Initial version.  fname2mjd() moved here from fileindex.py.
+#
+
+import numpy as np
+
+# Offset between Julian date and modified julian date
+jd_mjd0 = 2400000.5
+# MJD of the LabVIEW epoch (1904-01-01)
+lv_mjd0 = 16480.
+# OVRO longitude (radians), as in eovsa_array()
+ovro_lon = -118.286953 * np.pi / 180
+
+
+def jd2mjd(jd):
+    ''' Julian date(s) to modified julian date(s).
+    '''
+    return np.asarray(jd, dtype=np.float64) - jd_mjd0
+
+
+def mjd2jd(mjd):
+    ''' Modified julian date(s) to Julian date(s).
+    '''
+    return np.asarray(mjd, dtype=np.float64) + jd_mjd0
+
+
+def lv2mjd(lv):
+    ''' LabVIEW timestamp(s) (seconds since 1904-01-01) to modified julian date(s).
+    '''
+    return np.asarray(lv, dtype=np.float64) / 86400. + lv_mjd0
+
+
+def mjd2lv(mjd):
+    ''' Modified julian date(s) to LabVIEW timestamp(s).
+    '''
+    return (np.asarray(mjd, dtype=np.float64) - lv_mjd0) * 86400.
+
+
+def jd2lv(jd):
+    ''' Julian date(s) to LabVIEW timestamp(s).
+    '''
+    return mjd2lv(jd2mjd(jd))
+
+
+def lv2jd(lv):
+    ''' LabVIEW timestamp(s) to Julian date(s).
+    '''
+    return mjd2jd(lv2mjd(lv))
+
+
+def civil2mjd(year, month, day):
+    ''' Returns the (integer) mjd of the (proleptic Gregorian) civil dates given
+        by integer arrays year, month and day.
+    '''
+    y = np.asarray(year, dtype=np.int64)
+    m = np.asarray(month, dtype=np.int64)
+    d = np.asarray(day, dtype=np.int64)
+    y = y - (m <= 2)
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * (m + np.where(m > 2, -3, 9)) + 2) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    # Days from 1970-01-01, plus the mjd of that date
+    return era * 146097 + doe - 719468 + 40587
+
+
+def _digits(strings, width):
+    ''' Returns the characters of an array of ASCII strings as an (n, width)
+        integer array of digit values.  Strings shorter than width are padded
+        with zeros.
+    '''
+    s = np.asarray(strings).astype('S' + str(width))
+    c = s.view(np.uint8).reshape(-1, width).astype(np.int64) - ord('0')
+    c[c == -ord('0')] = 0
+    return c
+
+
+def _number(d, i0, i1):
+    ''' Converts columns i0 to i1 (exclusive) of a digit array to integers.
+    '''
+    n = d[:, i0]
+    for i in range(i0 + 1, i1):
+        n = n * 10 + d[:, i]
+    return n
+
+
+def str2mjd(strings):
+    ''' Returns an array of modified julian dates from a list or array of
+        date/time strings of the form yyyy-mm-dd hh:mm:ss[.fff] (a 'T' in place
+        of the space, and a missing time part, are also allowed).
+    '''
+    strings = np.atleast_1d(strings)
+    if len(strings) == 0:
+        return np.array([])
+    # Room for up to 9 digits of fractional seconds
+    d = _digits(strings, 29)
+    mjd = civil2mjd(_number(d, 0, 4), _number(d, 5, 7), _number(d, 8, 10)).astype(np.float64)
+    secs = _number(d, 11, 13) * 3600 + _number(d, 14, 16) * 60 + _number(d, 17, 19)
+    frac = _number(d, 20, 29) * 1.e-9
+    return mjd + (secs + frac) / 86400.
+
+
+def fname2mjd(filenames):
+    ''' Returns an array of modified julian dates from a list or array of standard
+        IDB or UDB filenames (with or without paths), e.g. IDB20170515010201.
+        Conversion is done on the whole array at once, without astropy.
+    '''
+    stems = np.array([f.split('/')[-1][3:17] for f in filenames], 'S14')
+    if len(stems) == 0:
+        return np.array([])
+    d = _digits(stems, 14)
+    secs = _number(d, 8, 10) * 3600 + _number(d, 10, 12) * 60 + _number(d, 12, 14)
+    return civil2mjd(_number(d, 0, 4), _number(d, 4, 6), _number(d, 6, 8)) + secs / 86400.
+
+
+def gmst(mjd):
+    ''' Greenwich mean sidereal time (radians) for the UT mjd(s), from the Earth
+        rotation angle and the IAU 2006 polynomial (UT1 is taken to be UTC).
+    '''
+    du = np.asarray(mjd, dtype=np.float64) - 51544.5
+    T = du / 36525.
+    era = 2 * np.pi * ((0.7790572732640 + 0.00273781191135448 * du + du) % 1.0)
+    poly = (0.014506 + (4612.156534 + 1.3915817 * T) * T) * np.pi / (180 * 3600.)
+    return (era + poly) % (2 * np.pi)
+
+
+def eqeqx(mjd):
+    ''' Equation of the equinoxes (radians), from the leading nutation terms,
+        good to better than 0.1 s of time.
+    '''
+    T = (np.asarray(mjd, dtype=np.float64) - 51544.5) / 36525.
+    d2r = np.pi / 180
+    om = (125.04452 - 1934.136261 * T) * d2r
+    L = (280.4665 + 36000.7698 * T) * d2r
+    Lp = (218.3165 + 481267.8813 * T) * d2r
+    dpsi = -17.20 * np.sin(om) - 1.32 * np.sin(2 * L) - 0.23 * np.sin(2 * Lp) + 0.21 * np.sin(2 * om)
+    eps = (23.439291 - 0.0130042 * T) * d2r
+    return dpsi * np.cos(eps) * d2r / 3600.
+
+
+def eovsa_lst(mjd):
+    ''' Returns the apparent local sidereal time (radians, 0 to 2*pi) at OVRO for
+        the UT mjd(s), as an array (or float for scalar input).  Agrees with
+        eovsa_lst.eovsa_lst() to well under a second of time.
+    '''
+    lst = (gmst(mjd) + eqeqx(mjd) + ovro_lon) % (2 * np.pi)
+    if lst.ndim == 0:
+        return float(lst)
+    return lst
@@ -1,6 +1,41 @@
+#
+# History:
+#   2026-Oct-19  SY
+#      Added track_sim(), which generates the input data for rot_sim() for a
+#      point source tracked over a range of hour angles, using the vectorized
+#      uvw() of eovsa_array.py.
+#
 import numpy as np
 import matplotlib.pylab as plt
-from .util import bl2ord
+from .util import bl2ord, par_angle
+from .eovsa_array import ant_xyz, uvw
+from .eovsa_ephem import hadec2altaz
+
+def track_sim(ha, dec, ant1, ant2, fghz=1.0, stokes=[1,0,0,0], azel=True):
+    ''' Generates simulated data for baseline ant1-ant2 (antenna indexes) for a
+        point source with the given Stokes [I, Q, U, V] parameters, observed at
+        the array of hour angles ha [radians] and declination dec [radians], at
+        frequency fghz [GHz].  The fringe phase 2*pi*fghz*w uses the w coordinate
+        [ns] of the baseline from the vectorized eovsa_array.uvw().  If azel is
+        True, the feeds rotate with the parallactic angle, otherwise they are
+        fixed (equatorial mounts).
+        
+        Returns a dictionary with keys 'data' (4 x ntimes array of XX, XY, YX,
+        YY), 'chi1', 'chi2' and 'uvw' (ntimes x 3 [ns]), suitable as input to
+        rot_sim().
+    '''
+    ha = np.atleast_1d(ha)
+    xyz = ant_xyz()
+    w = uvw(ha, dec, [xyz[ant2] - xyz[ant1]])[0]
+    I, Q, U, V = stokes
+    pol = np.array([I + Q, U + 1j*V, U - 1j*V, I - Q])
+    data = pol[:,None]*np.exp(2j*np.pi*fghz*w[:,2])
+    if azel:
+        alt, az = hadec2altaz(ha, dec, refract=False)
+        chi = par_angle(alt, az)
+    else:
+        chi = np.zeros(len(ha))
+    return {'data':data, 'chi1':chi, 'chi2':chi, 'uvw':w}
 
 def rot_sim(indict):
     ''' Simulates effect of non-ideal feed behavior on input data for a single baseline.
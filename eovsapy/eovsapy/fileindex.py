@@ -0,0 +1,97 @@
+'''
+   Index of the IDB and UDB files on disk, for fast lookup of the files in a
+   given time range.
+
+   For each day and file type, a small manifest (.npz) holds the sorted start
+   times (mjd, from the file names) and names of the files, and the folder they
+   are in.  A manifest is rebuilt only when the modification time of its folder
+   changes, so that routines like read_idb.get_trange_files() do not have to
+   glob large folders on every call.  Manifests are kept in the fidx/ folder of
+   the ancillary data store (see ancdata.py).
+'''
+#
+# History:
+#  2026-Oct-19  SY
+#    Initial version.
+#
+
+import os
+import glob
+import numpy as np
+from .ancdata import anc_root, mjd2datstr, save_npz, load_npz
+from .fasttime import fname2mjd
+
+
+def _folders(data, datstr):
+    ''' Returns the candidate folders, in order of preference, that may hold the
+        files of type data ('IDB' or 'UDB') for the date string datstr (yyyymmdd).
+    '''
+    if data == 'UDB':
+        return ['/data1/eovsa/fits/UDB/' + datstr[:4] + '/', '/data1/UDB/' + datstr[:4] + '/']
+    from .util import get_idbdir
+    from astropy.time import Time
+    root = get_idbdir(Time(datstr[:4] + '-' + datstr[4:6] + '-' + datstr[6:]))
+    return [root + datstr + '/', root, '/data1/IDB/', '/dppdata1/IDB/',
+            '/common/archive/data1/eovsa/fits/IDB/' + datstr + '/']
+
+
+def manifest_file(day, data='IDB'):
+    ''' Returns the name of the manifest file for the (integer) mjd day.
+    '''
+    datstr = mjd2datstr(day)
+    return anc_root() + 'fidx/' + data + '/' + datstr[:4] + '/' + data + datstr + '.npz'
+
+
+def day_files(day, data='IDB'):
+    ''' Returns the sorted array of start times (mjd) and the corresponding array
+        of full paths of the files of type data ('IDB' or 'UDB') for the (integer)
+        mjd day.  The manifest of the day is used if its folder has not changed
+        since it was written, and is otherwise (re)built.
+    '''
+    datstr = mjd2datstr(day)
+    mfile = manifest_file(day, data)
+    man = load_npz(mfile)
+    if man is not None:
+        folder = str(man['folder'])
+        try:
+            if os.stat(folder).st_mtime == man['mtime']:
+                return man['mjd'], np.char.add(folder, man['name'])
+        except OSError:
+            pass
+    # Build the manifest from the first folder with files for this date
+    names = []
+    folder = ''
+    mtime = 0.
+    for folder in _folders(data, datstr):
+        if os.path.isdir(folder):
+            names = [os.path.basename(f) for f in glob.glob(folder + data + datstr + '*')]
+            if names != []:
+                mtime = os.stat(folder).st_mtime
+                break
+    if names == []:
+        # Do not save a manifest, so that the folders are searched again next time
+        return np.array([]), np.array([], 'U1')
+    names = np.array(names)
+    mjd = fname2mjd(names)
+    srt = np.argsort(mjd, kind='stable')
+    mjd, names = mjd[srt], names[srt]
+    save_npz(mfile, mjd=mjd, name=names, folder=folder, mtime=mtime)
+    return mjd, np.char.add(folder, names)
+
+
+def trange_files(trange, data='IDB'):
+    ''' Returns the list of paths of files of type data ('IDB' or 'UDB') whose
+        start times (from the file names) lie in the time range given by the
+        2-element Time() object trange (start time inclusive, end time exclusive).
+    '''
+    mjd0, mjd1 = trange[0].mjd, trange[1].mjd
+    mjd = []
+    paths = []
+    for day in range(int(mjd0), int(mjd1) + 1):
+        m, p = day_files(day, data)
+        mjd.append(m)
+        paths.append(p)
+    mjd = np.concatenate(mjd)
+    paths = np.concatenate(paths)
+    i0, i1 = np.searchsorted(mjd, [mjd0, mjd1])
+    return paths[i0:i1].tolist()
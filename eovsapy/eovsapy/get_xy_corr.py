@@ -14,9 +14,13 @@
 #     that was sometimes occurring, I changed xydelay_anal() to read the npzfiles and
 #     correct the offending scan, and then changed get_xy_corr() accordingly to take
 #     the already read-in data as input.
+#   2026-Oct-19  SY
+#     xydelay_anal() now applies the fix_tau_lo correction to all antennas and
+#     times at once, and also fits the residual X-Y delay of each antenna with
+#     util.delay_fit(), returned as keys 'xydelay' (ns) and 'xydelay_rms'.
 #
 import numpy as np
-from .util import lobe, Time, extract
+from .util import lobe, Time, extract, delay_fit
 from . import read_idb as ri
 
 def get_xy_corr(out, doplot=True):
@@ -110,13 +114,13 @@ def xydelay_anal(npzfiles, fix_tau_lo=None):
         dtau_x, dtau_y = dlatbl[14] - dlatbl[13]
         dp_x = out[icorr]['fghz']*2*np.pi*dtau_x
         dp_y = out[icorr]['fghz']*2*np.pi*dtau_y
-        nt, = out[icorr]['time'].shape
-        for i in range(nt):
-            for iant in range(13):
-                out[icorr]['x'][ri.bl2ord[iant,13],0,:,i] *= np.exp(1j*dp_x)
-                out[icorr]['x'][ri.bl2ord[iant,13],1,:,i] *= np.exp(1j*dp_y)
-                out[icorr]['x'][ri.bl2ord[iant,13],2,:,i] *= np.exp(1j*dp_y)
-                out[icorr]['x'][ri.bl2ord[iant,13],3,:,i] *= np.exp(1j*dp_x)
+        bl = ri.bl2ord[:13,13]
+        x = out[icorr]['x']
+        # Corrections of shape (nf, 1), broadcast over baselines and times
+        x[bl,0] *= np.exp(1j*dp_x)[:,None]
+        x[bl,1] *= np.exp(1j*dp_y)[:,None]
+        x[bl,2] *= np.exp(1j*dp_y)[:,None]
+        x[bl,3] *= np.exp(1j*dp_x)[:,None]
     dph_lo = get_xy_corr(out[[3,0]], doplot=False)
     dph_hi = get_xy_corr(out[[2,1]])
     fghz = np.union1d(dph_lo['fghz'],dph_hi['fghz'])
@@ -155,7 +159,12 @@ def xydelay_anal(npzfiles, fix_tau_lo=None):
     xi_rot[idx_hi] = dph_hi['xi_rot']   # Insert all high-receiver xi_rot
     xi_rot[idx_lo_not_hi] = lobe(dph_lo['xi_rot'][idx_lo_not_hi])   # For unique low-receiver frequencies, insert LO xi_rot
     ax[14].plot(fghz,xi_rot)
-    dph_hi.update({'xi_rot':xi_rot, 'xyphase':xyphase, 'fghz':fghz})
+    # Residual X-Y delay (ns) of each antenna, from the slope of the xyphase
+    xydelay, xyoff, xyrms = delay_fit(fghz, xyphase)
+    print('Residual X-Y delays (ns) [rms of fit, radians]:')
+    for i in range(14):
+        print('Ant {:2d}: {:7.3f} [{:5.2f}]'.format(i+1, xydelay[i], xyrms[i]))
+    dph_hi.update({'xi_rot':xi_rot, 'xyphase':xyphase, 'fghz':fghz, 'xydelay':xydelay, 'xydelay_rms':xyrms})
     print('Referring to the output of this routine as "xyphase,"')
     print('run cal_header.xy_phasecal2sql(xyphase) to write the SQL record.') 
     return dph_hi
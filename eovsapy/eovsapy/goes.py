@@ -12,6 +12,11 @@
 #    Initial complete version
 #  2020-05-13  DG
 #    Removed calls to EOVSA local routines
+#  2026-10-19  SY
+#    get_goes() now parses the json records with array masks instead of appending
+#    to lists, and returns only common times if the Hi and Lo arrays differ in
+#    length.  goes_std_plots() reads from the local ancillary data store (see
+#    ancdata.py), which is only topped up from NOAA with the data not yet seen.
 #
 
 if __name__ == '__main__':
@@ -96,23 +101,20 @@ def get_goes(url='https://services.swpc.noaa.gov/json/goes/primary/xrays-7-day.j
     except:
         print('http url error for',url)
         return [], [], []
-    txt = f.readline()
+    txt = f.read()
     goes = json.loads(txt)
-    goeshi = []
-    goeslo = []
-    goestime = []
-    for i in goes:
-        if i['energy'] == '0.05-0.4nm':
-            goeshi.append(i['flux'])
-            goestime.append(i['time_tag'])
-        else:
-            goeslo.append(i['flux'])
-    goeslo = np.array(goeslo)
-    goeslo[np.where(goeslo == 0.0)] = np.nan
-    goeshi = np.array(goeshi)
-    goeshi[np.where(goeshi == 0.0)] = np.nan
+    if len(goes) == 0:
+        return [], [], []
+    tag = np.array([i['time_tag'] for i in goes])
+    flux = np.array([i['flux'] for i in goes], dtype=np.float64)
+    flux[flux == 0.0] = np.nan
+    ishi = np.array([i['energy'] == '0.05-0.4nm' for i in goes])
+    # Return only times common to both energy bands
+    goestime, hidx, loidx = np.intersect1d(tag[ishi], tag[~ishi], return_indices=True)
     if len(goestime) == 0:
         return [], [], []
+    goeshi = flux[ishi][hidx]
+    goeslo = flux[~ishi][loidx]
     return goeslo, goeshi, Time(goestime)
 
 def goes_std_plots(outpath='./'):
@@ -127,16 +129,24 @@ def goes_std_plots(outpath='./'):
     types = ['3-day','6-hour']
     sources = ['primary','secondary']
     classes = ['A','B','C','M','X']
+    from .ancdata import rd_goes
     for type in types:
         f, ax = plt.subplots(1,1)
         ax.xaxis_date()
         if type == '6-hour':
             ax.xaxis.set_major_formatter(DateFormatter("%H:%M"))
+            # Set start time according to current hour
+            now = int(Time.now().mjd * 24)/24.
+            tstart = Time(now-5/24., format='mjd')
+            tend = Time(now+1/24., format='mjd')
         else:
             ax.xaxis.set_major_formatter(DateFormatter("%d-%H"))
+            # Set start time according to current date
+            today = np.floor(Time.now().mjd)
+            tstart = Time(today-2, format='mjd')
+            tend = Time(today+1, format='mjd')
         for source in sources:
-            url = 'https://services.swpc.noaa.gov/json/goes/'+source+'/xrays-'+type+'.json'
-            lo, hi, t = get_goes(url)
+            lo, hi, t = rd_goes(Time([tstart.mjd, tend.mjd], format='mjd'), source)
             if len(t) > 0:
                 if type == '3-day':
                     hi = smooth(hi,20,'blackman')[10:-9]
@@ -144,20 +154,12 @@ def goes_std_plots(outpath='./'):
                 ax.plot_date(t.plot_date,lo,'-',label='  1-8 A '+source)
                 ax.plot_date(t.plot_date,hi,'-',label='0.5-4 A '+source)
         if type == '3-day':
-            # Set start time according to current date
-            today = np.floor(Time.now().mjd)
-            tstart = Time(today-2, format='mjd')
-            tend = Time(today+1, format='mjd')
             plt.xticks(tstart.plot_date + np.arange(10)/3.)
             ax.plot((tstart.plot_date+1)*np.ones(2),[1e-9,1e-2],'k',linewidth=1)
             ax.plot((tstart.plot_date+2)*np.ones(2),[1e-9,1e-2],'k',linewidth=1)
             ax.set_xlabel('Start Date '+tstart.iso[:10]+' [DD-HH]',fontsize=14)
             ax.set_title('GOES SXR 3-Day Plot',fontsize=16)
         else:
-            # Set start time according to current hour
-            now = int(Time.now().mjd * 24)/24.
-            tstart = Time(now-5/24., format='mjd')
-            tend = Time(now+1/24., format='mjd')                
             plt.xticks(tstart.plot_date + np.arange(7)/24.)
             ax.set_xlabel(tstart.iso[:10]+' [HH:MM]',fontsize=14)
             ax.set_title('GOES SXR 6-Hour Plot',fontsize=16)
@@ -107,11 +107,14 @@
 #    A total-power calibration was done with all 14 antennas (Ant A in the subarray),
 #    which caused problems in get_calfac().  Some slight changes to get_calfac() and
 #    apply_calfac() should allow this rare case to work.
+#  2026-10-19  SY
+#    allday_udb_corr() now gets the file paths of the NormalObserving scans
+#    from the scan catalogue (scandb.py) instead of reading FDB files.
 #
 
 from . import dbutil as db
 import numpy as np
-from .util import Time, nearest_val_idx, common_val_idx, lobe, bl2ord, get_idbdir, extract, azel_from_sqldict
+from .util import Time, nearest_val_idx, common_val_idx, lobe, bl2ord, extract, azel_from_sqldict
 from . import cal_header as ch
 
 
@@ -570,10 +573,8 @@ def udb_corr(filelist, outpath='./', calibrate=False, new=True, gctime=None, att
                         applied manually in post-processing (e.g. 2017-09-10 X8 flare)          
     '''
     import sys
-    import os
     from . import udb_util as uu
     import time
-    from copy import deepcopy
     if type(filelist) is str or type(filelist) is np.string_:
         # Convert input filename to list if not already a list
         filelist = [filelist]
@@ -677,38 +678,16 @@ def allday_udb_corr(trange, outpath='./'):
         
         The output path name can be given, default is the current path.
     '''
-    from . import dump_tsys as dt
-    from .util import fname2mjd
+    from . import scandb
     if len(trange) == 1:
         mjd = int(trange.mjd)
         t0, t1 = Time([mjd+0.5,mjd+1.2],format='mjd')
     else:
         t0 = trange[0]
         t1 = trange[1]
-    fdb = dt.rd_fdb(t0)
-    flist = fdb['FILE'][np.where(fdb['PROJECTID']=='NormalObserving')]
-    if int(t1.mjd) != int(t0.mjd):
-        fdb = dt.rd_fdb(t1)
-        if fdb != {}:
-            flist2 = fdb['FILE'][np.where(fdb['PROJECTID']=='NormalObserving')]
-            flist = np.concatenate((flist,flist2))
-    mjd = fname2mjd(flist)
-    idx, = np.where(np.logical_and(mjd >= t0.mjd, mjd <= t1.mjd))
-    # Assume we are working on Pipeline, and branch according to filename prefix
-    if flist[0][:3] == 'UDB':
-        year = Time(mjd[0],format='mjd').iso[:4]
-        fdir = '/data1/eovsa/fits/UDB/'+year+'/'
-        getdate = False
-    elif flist[0][:3] == 'IDB':
-        # fdir = '/data1/eovsa/fits/IDB/'
-        fdir = get_idbdir(t=t0)
-        getdate = True
-    for i,file in enumerate(flist[idx]):
-        if getdate:
-            date = Time(mjd[idx[i]],format='mjd').iso[:10].replace('-','')
-            filename = fdir+date+'/'+file
-        else:
-            filename = fdir+file
+    # File paths of all NormalObserving scans in the time range, from the scan catalogue
+    flist = scandb.scans(Time([t0.mjd,t1.mjd],format='mjd'), project='NormalObserving')
+    for filename in flist:
         print('Processing',filename)
         try:
             udb_corr(filename, calibrate=True, outpath=outpath)
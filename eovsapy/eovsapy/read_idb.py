@@ -132,18 +132,31 @@
 #    Added an nmax parameter to read_idb() and readXdata() to override previous limitation
 #    of reading only 600 times from a file.  With the new 20-ms files there can be 30000
 #    records in a 10-min file!
+#  2026-Oct-19  SY
+#    get_trange_files() now looks up files in the cached per-day file index
+#    (fileindex.py) instead of globbing the IDB folder on every call.  This also
+#    finds the files of the second day in its own folder on the pipeline.
+#    readXdata() now calculates the LST for all times at once with the vectorized
+#    fasttime.eovsa_lst(), when the data do not have an lst variable.
+#    autocorr_desat() now interpolates eta(log P) in cached lookup tables (desat_eta()),
+#    forms the baseline corrections by indexing with antenna-pair arrays instead of a
+#    loop over baselines, and applies them in place as x*|x|**(eta-1), without the
+#    conversion to amplitude and phase.
+#    flag_sk() is split into sk_flags(), which calculates the SK in float32 and returns
+#    compact antenna-based flags (optionally bit-packed), and apply_sk_flags(), which
+#    propagates them to all baselines at once with antenna-pair index arrays.  This also
+#    fixes flagging of data with 4 polarizations.  Added flag keyword to read_idb(), to
+#    flag each file as it is read.
 #
 
 import aipy
-import os
-from .util import Time, nearest_val_idx, bl2ord, ant_str2list, common_val_idx, lobe, get_idbdir, freq2bdname, extract
-import glob
+from .util import Time, nearest_val_idx, bl2ord, ant_str2list, common_val_idx, lobe, freq2bdname, extract
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.dates import DateFormatter
 #import spectrogram_fit as sp
 #import pcapture2 as p
-from . import eovsa_lst as el
+from . import fasttime
 import copy
 #import chan_util_bc as cu
 #import chan_util_52 as cu52
@@ -417,9 +430,8 @@ def readXdata(filename, filter=False, tp_only=False, src=None, desat=False, nmax
     if len(lstarray) != 0:
         pass
     else:
-        tarray = Time(timearray,format='jd')
-        for t in tarray:
-            lstarray.append(el.eovsa_lst(t))
+        # Calculate LST for all times at once
+        lstarray = fasttime.eovsa_lst(fasttime.jd2mjd(timearray))
     ha = np.array(lstarray) - uv['ra']
     ha[np.where(ha > np.pi)] -= 2*np.pi
     ha[np.where(ha < -np.pi)] += 2*np.pi
@@ -430,42 +442,101 @@ def readXdata(filename, filter=False, tp_only=False, src=None, desat=False, nmax
         out = autocorr_desat(out)
     return out
 
+# Parameters [a, b, c, d] of the desaturation curves eta(x) = (x + d - c)/[a*erf((x-c)/b) + d],
+# where x = log10(P), for equalizer coefficient 8.0 (data prior to 2021-05-16), and for equalizer
+# coefficient 2.0 at low (A <= 300) and high (A > 300) auto-correlation amplitude A.
+desat_pars = {'eq8': [1.22552, 1.37369, 2.94536, 2.14838],
+              'eq2_low': [2.28517281, 2.64619331, 4.38657476, 2.37753165],
+              'eq2_hi': [0.88025122, 1.0221639 , 4.39845723, 2.38911615]}
+# Range and step of x = log10(P) covered by the lookup tables of eta
+desat_xrange = [-2., 10.]
+desat_dx = 1./1024
+_desat_luts = {}
+
+def desat_curve(x, name):
+    ''' Evaluates the desaturation curve eta(x) for x = log10(P) directly,
+        with the parameters desat_pars[name], or returns ones if name is 'one'.
+    '''
+    if name == 'one':
+        return np.ones_like(x)
+    from scipy.special import erf
+    a,b,c,d = desat_pars[name]
+    return (x + d - c)/(a*erf((x-c)/b) + d)
+
+def desat_lut(names):
+    ''' Returns lookup tables (value and slope) of the desaturation curves given
+        by the tuple names (see desat_curve()), as (len(names), n) float32 arrays sampled at intervals
+        of desat_dx over desat_xrange.  Tables are calculated once and cached.
+    '''
+    if names not in _desat_luts:
+        xgrid = np.arange(desat_xrange[0], desat_xrange[1] + desat_dx, desat_dx)
+        table = np.array([desat_curve(xgrid, name) for name in names])
+        slope = np.diff(table, axis=1)
+        _desat_luts[names] = (table[:,:-1].astype(np.float32), slope.astype(np.float32))
+    return _desat_luts[names]
+
+def desat_eta(x, A, mjd):
+    ''' Returns the desaturation correction eta (float32 array of the same shape
+        as x) for log power x = log10(P) and auto-correlation amplitude A, for
+        data taken at time mjd.  Prior to 2021-05-16 (equalizer coefficient 8.0),
+        eta is 1 for A < 50.  Afterwards (equalizer coefficient 2.0), separate
+        curves apply for A <= 300 and A > 300, and eta is 1 where A is NaN.
+        
+        eta is linearly interpolated in the cached lookup tables of desat_lut(),
+        which agree with the direct calculation to better than 1e-5.  Values of x
+        outside of desat_xrange (or not finite) are calculated directly.
+    '''
+    if mjd < 59350:   # 2021-05-16
+        names = ('one', 'eq8')
+        k = (~(A < 50)).astype(np.intp)
+    else:
+        # eta is 1 where A is NaN (flagged)
+        names = ('one', 'eq2_low', 'eq2_hi')
+        k = (A <= 300).astype(np.intp)
+        k[A > 300] = 2
+    table, slope = desat_lut(names)
+    u = np.asarray(x, dtype=np.float32) - np.float32(desat_xrange[0])
+    u *= np.float32(1./desat_dx)
+    out = ~((u >= 0) & (u < table.shape[1]))
+    u[out] = 0
+    i = u.astype(np.intp)
+    u -= i
+    eta = table[k, i]
+    u *= slope[k, i]
+    eta += u
+    if out.any():
+        # Direct calculation for the few points outside of the tables
+        xo = x[out]
+        ko = k[out]
+        for n, name in enumerate(names):
+            eta[out] = np.where(ko == n, desat_curve(xo, name), eta[out])
+    return eta
+
+def desat_apply(x, eta):
+    ''' Raises the amplitudes of the complex array x to the power eta in place,
+        preserving the phases, as x*|x|**(eta-1).  Zeros are left unchanged.
+        The array eta is overwritten.
+    '''
+    amp = np.abs(x)
+    eta -= 1
+    np.power(amp, eta, out=eta, where=amp > 0)
+    # Leave zeros (and NaNs) as they are
+    eta[~(amp > 0)] = 1
+    x *= eta
+
 def autocorr_desat(out):
     ''' Corrects for correlator saturation effects.  Applies a correction to 
         auto- and cross-correlation amplitudes based on total power amplitudes.
         
         Calculates the function eta = (x + d - c)/[(a*erf((x-c)/b) + d], where x = log(P),
         a,b,c,d = [1.22552, 1.37369, 2.94536, 2.14838], and erf() is the error function.
-        However, eta is set to 1 for A < 50.
+        However, eta is set to 1 for A < 50 (see desat_eta() for the curves used since
+        2021-05-16).
         
         Applies the function to autocorrelations A_i and cross-correlations xi_ij to obtain
-        A'_i = A**eta_i and xi'_ij = xi_ij**[(eta_i + eta_j)/2].
+        A'_i = A**eta_i and xi'_ij = xi_ij**[(eta_i + eta_j)/2].  The correction is applied
+        in place to out['a'] and out['x'].
     '''
-    from scipy.special import erf    
-    def eta_f(x, A):
-        ''' This is the desaturation fuction for data taken with equalizer coefficient 8.0,
-            which is data prior to 5/16/2021.
-        '''
-        a,b,c,d = [1.22552, 1.37369, 2.94536, 2.14838]  # Parameters define the invariant saturation curve
-        eta = (x + d - c)/(a*erf((x-c)/b) + d)
-        bad = np.where(A < 50)
-        eta[bad] = 1.0
-        return eta
-        
-    def eta_2(x, A):
-        ''' This is the desaturation fuction for data taken with equalizer coefficient 2.0,
-            which is data after to 5/16/2021.
-        '''
-        a1,b1,c1,d1 = [0.88025122, 1.0221639 , 4.39845723, 2.38911615]
-        a2,b2,c2,d2 = [2.28517281, 2.64619331, 4.38657476, 2.37753165]
-        hi = np.where(A > 300)
-        low = np.where(A <= 300)
-        eta = np.ones_like(x)
-        eta[hi] = (x[hi] + d1 - c1)/(a1*erf((x[hi]-c1)/b1) + d1)
-        eta[low] = (x[low] + d2 - c2)/(a2*erf((x[low]-c2)/b2) + d2)
-        return eta
-        
-    nant = 16
     # Determine required "m" value for standardized power level.  The power changes
     # depending on number of channels averaged, etc., and the SK m value keeps track
     # of all of that.
@@ -474,60 +545,33 @@ def autocorr_desat(out):
         m0 = 745472.  # Standard for most recent data (325 MHz bandwidth)
     else:
         m0 = 721536.  # Standard for earlier data (ca. 2017)
-    nf, = out['fghz'].shape
-    nt, = out['time'].shape
-    npol = 4
-    # Copy power for each polarization so modification below does not affect
-    # actual data
-    Px = out['p'][:,0]*m0/out['m'][:,0]
-    Py = out['p'][:,1]*m0/out['m'][:,0]
-#    n0 = len(np.where(out['band'] == np.max(out['band']))[0])
-#    # Modify measured power to correct for variable science-channel bandwidth
-#    for i in range(nf):
-#        bnd = out['band'][i]
-#        n = np.float(len(np.where(out['band'] == bnd)[0]))
-#        Px[:,i] *= n/n0
-#        Py[:,i] *= n/n0
-    x = np.log10(Px)
-    # Calculate correction for X pol (returns size [nant, nf, nt])
-    if mjd < 59350:  # 2021-05-16
-        eta_x = eta_f(x, abs(out['a'][:,0]))
-    else:
-        eta_x = eta_2(x, abs(out['a'][:,0]))
-
-    x = np.log10(Py)
-    # Calculate correction for Y pol (returns size [nant, nf, nt])
-    if mjd < 59350:  # 2021-05-16
-        eta_y = eta_f(x, abs(out['a'][:,1]))
-    else:
-        eta_y = eta_2(x, abs(out['a'][:,1]))
-    eta = np.zeros_like(out['x'])
-    # Loop over baselines for cross-correlation and calculate correction for 
-    # different polarization states.
-    for i in range(nant-1):
-        for j in range(i+1,nant):
-            eta[bl2ord[i,j],0] = eta_x[i]+eta_x[j]
-            eta[bl2ord[i,j],1] = eta_y[i]+eta_y[j]
-            eta[bl2ord[i,j],2] = eta_x[i]+eta_y[j]
-            eta[bl2ord[i,j],3] = eta_x[j]+eta_y[i]
-    eta = eta/2.
+    nant = out['a'].shape[0]
+    # Log of power for X and Y pol, using the X pol m value for both (size [nant, 2, nf, nt])
+    x = np.log10(out['p'][:,:2]*(m0/out['m'][:,:1]))
+    # Calculate correction for X and Y pol (size [nant, 2, nf, nt])
+    eta_xy = desat_eta(x, abs(out['a'][:,:2]), mjd)
+    del x
+    # Antenna (i) and polarization (0 = X, 1 = Y) indexes of the two inputs of each
+    # baseline (i < j, in bl2ord order) for polarizations XX, YY, XY, YX
+    bi, bj = np.triu_indices(nant, 1)
+    pol_i = [0, 1, 0, 1]
+    pol_j = [0, 1, 1, 0]
     # Correction is to log of values, so apply by raising amplitudes to eta power,
-    # but preserve the phase
-    amp = abs(out['x'])
-    pha = np.angle(out['x'])
-    amp = amp**eta
-    out['x'] = amp*np.exp(1j*pha)
-    # Repeat for auto-correlation by looping over antennas
-    # This "re-uses" eta to overwrite first nant values
-    for i in range(nant):
-        eta[i,0] = eta_x[i]
-        eta[i,1] = eta_y[i]
-        eta[i,2] = (eta_x[i] + eta_y[i])/2.
-        eta[i,3] = (eta_x[i] + eta_y[i])/2.
-    amp = abs(out['a'])
-    pha = np.angle(out['a'])
-    amp = amp**eta[:nant]
-    out['a'] = amp*np.exp(1j*pha)
+    # but preserve the phase.  Do one polarization at a time to limit memory use.
+    for k in range(out['x'].shape[1]):
+        eta = eta_xy[bi, pol_i[k]]
+        eta += eta_xy[bj, pol_j[k]]
+        eta *= 0.5
+        desat_apply(out['x'][:,k], eta)
+    # Repeat for auto-correlations, with the mean of the X and Y corrections
+    # for the XY and YX polarizations
+    for k in range(out['a'].shape[1]):
+        if k < 2:
+            eta = eta_xy[:,k].copy()
+        else:
+            eta = eta_xy[:,0] + eta_xy[:,1]
+            eta *= 0.5
+        desat_apply(out['a'][:,k], eta)
     return out
 
 def readXdatmp(filename):
@@ -699,7 +743,7 @@ def summary_plot_pcal(out,ant_str='ant1-14',ptype='phase',pol='XX-YY'):
             ax[0,j].text(0.5,1.3,polstr[j],ha='center',va='center',transform=ax[0,j].transAxes,fontsize=14)
             
         
-def read_idb(trange,navg=None, nmax=600, quackint=0.,filter=True,srcchk=True,src=None,tp_only=False, desat=False):
+def read_idb(trange,navg=None, nmax=600, quackint=0.,filter=True,srcchk=True,src=None,tp_only=False, desat=False, flag=False):
     ''' This finds the IDB files within a given time range and concatenates 
         the times into a single dictionary.  If trange is not a Time() object,
         assume that it is the list of files to read.
@@ -718,6 +762,9 @@ def read_idb(trange,navg=None, nmax=600, quackint=0.,filter=True,srcchk=True,src
                     auto & cross correlations)
           quackint  float--first time range (in seconds) to skip in the beginning of
                     each file. Default is 0., or no quack.
+          flag     boolean--if True, flags (sets to NaN) auto- and cross-correlation
+                    data with bad spectral kurtosis (see flag_sk()), file by file
+                    as they are read (before any time averaging).  Default is False.
     '''
     if type(trange) == Time:
         files = get_trange_files(trange)
@@ -738,6 +785,8 @@ def read_idb(trange,navg=None, nmax=600, quackint=0.,filter=True,srcchk=True,src
                 if srcchk and src is None:
                     # This is the first file, and we care about the source, so set source name
                     src = out['source']
+                if flag and not tp_only:
+                    out = flag_sk(out)
                 if navg:
                     # Perform time average over navg seconds. Note that this does not do the
                     # right thing over time gaps (yet)        
@@ -911,23 +960,78 @@ def read_npz(files):
     out['ha'] = np.concatenate(ha)
     return out
     
-def flag_sk(out):
-    m = out['m']
-    sk = (m+1.)/(m-1.)*(m*out['p2']/(out['p']**2) - 1)
-    u_lim = 1.5
-    l_lim = 0.7
-    sk_flag = np.logical_or(sk > u_lim,sk < l_lim)
-    nant,npol,nf,nt = m.shape
-    for i in range(nant-1):
-        for j in range(i+1,nant):
-            flags = np.logical_or(sk_flag[i],sk_flag[j])
-            out['x'][bl2ord[i,j],flags] = np.nan
-    for i in range(nant):
-        if 'meanp' in out:
-            out['meanp'][i,sk_flag[i]] = np.nan
-        out['a'][i,sk_flag[i]] = np.nan
+def sk_stat(m, p, p2):
+    ''' Returns the spectral kurtosis SK = (m+1)/(m-1)*(m*p2/p**2 - 1) as a float32
+        array, for the arrays m (number of accumulations), p (power) and p2
+        (power-squared).  The calculation is done in place in the output array,
+        and in float32, to limit memory use for large cubes.
+    '''
+    sk = np.asarray(p, dtype=np.float32).copy()
+    sk *= sk
+    np.divide(p2, sk, out=sk, casting='unsafe')
+    mf = np.asarray(m, dtype=np.float32)
+    sk *= mf
+    sk -= 1
+    fac = mf + 1
+    fac /= mf - 1
+    sk *= fac
+    return sk
+
+def sk_flags(out, u_lim=1.5, l_lim=0.7, packed=False):
+    ''' Returns the antenna-based SK flags (True = bad) for the data in the readXdata()
+        dictionary out, as a boolean array of the same shape as out['m'] (nant, 2, nf, nt),
+        or if packed is True, bit-packed along the time axis with np.packbits().  The
+        flags can be applied (later) with apply_sk_flags().
+    '''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sk = sk_stat(out['m'], out['p'], out['p2'])
+    flags = sk > u_lim
+    flags |= sk < l_lim
+    if packed:
+        return np.packbits(flags, axis=-1)
+    return flags
+
+def apply_sk_flags(out, flags):
+    ''' Sets to NaN the data in the readXdata() dictionary out that are flagged
+        in the antenna-based flags returned by sk_flags() (either bit-packed or not).
+        A baseline is flagged where either of its antennas is flagged, for the
+        corresponding polarization (X or Y) of each antenna.  The XY and YX
+        auto-correlations are flagged where either X or Y is flagged.  If present,
+        out['meanp'] is also flagged.  Arrays are modified in place.
+    '''
+    if flags.dtype == np.uint8:
+        flags = np.unpackbits(flags, axis=-1, count=out['m'].shape[-1]).astype(bool)
+    nant = flags.shape[0]
+    # Antenna and polarization (0 = X, 1 = Y) indexes of the two inputs of each
+    # baseline (i < j, in bl2ord order) for polarizations XX, YY, XY, YX
+    bi, bj = np.triu_indices(nant, 1)
+    pol_i = [0, 1, 0, 1]
+    pol_j = [0, 1, 1, 0]
+    if 'x' in out:
+        for k in range(out['x'].shape[1]):
+            f = flags[bi, pol_i[k]]
+            f |= flags[bj, pol_j[k]]
+            xk = out['x'][:,k]
+            xk[f] = np.nan
+    if 'a' in out:
+        for k in range(out['a'].shape[1]):
+            if k < 2:
+                f = flags[:,k]
+            else:
+                f = flags[:,0] | flags[:,1]
+            ak = out['a'][:,k]
+            ak[f] = np.nan
+    if 'meanp' in out:
+        out['meanp'][flags] = np.nan
     return out
 
+def flag_sk(out, u_lim=1.5, l_lim=0.7):
+    ''' Flags (sets to NaN) auto- and cross-correlation data in the readXdata()
+        dictionary out that have spectral kurtosis outside the range l_lim to
+        u_lim, e.g. due to RFI.  Returns the updated dictionary.
+    '''
+    return apply_sk_flags(out, sk_flags(out, u_lim, l_lim))
+
 #def fname2mjd(filename):
 #    fstem = filename.split('/')[-1]
 #    fstr = fstem[3:7]+'-'+fstem[7:9]+'-'+fstem[9:11]+' '+fstem[11:13]+':'+fstem[13:15]+':'+fstem[15:17]
@@ -938,48 +1042,14 @@ def get_trange_files(trange):
     #Given a timerange, this routine will take all relevant IDBfiles from
     #  that time range, put them in a list, and return that list.
     #  This function is used in get_X_data(data).
-    from .util import get_idbdir, fname2mjd
-    
-    fstr = trange[0].iso
-    # Get path to root of IDB data
-    datadir = get_idbdir(trange[0])
-
-    # Add date path if on pipeline
-    import socket
-    host = socket.gethostname()
-    if host == 'pipeline': datadir += fstr.replace('-','').split()[0]+'/'
-    # if datadir.find('eovsa') != -1: datadir += fstr.replace('-','').split()[0]+'/'
-    folder=datadir
-    try:
-        os.listdir(folder)
-    except:
-        print('Something wrong with the definition of path to root of IDB files.')
-        print('See util.get_idbdir() for details.')
-        return
-
-    files = glob.glob(folder+'IDB'+fstr.replace('-','').split()[0]+'*')
-    files.sort()
-    mjd1, mjd2 = trange.mjd.astype('int')
-    if mjd2 != mjd1:
-        if (mjd2 - 1) != mjd1:
-            usage('Second date must differ from first by at most 1 day')
-        else:
-            fstr2 = trange[1].iso
-            files2 = glob.glob(folder+'IDB'+fstr2.replace('-','').split()[0]+'*')
-            files2.sort()
-            files += files2
-
-#    def fname2mjd(filename):
-#        fstem = filename.split('/')[-1]
-#        fstr = fstem[3:7]+'-'+fstem[7:9]+'-'+fstem[9:11]+' '+fstem[11:13]+':'+fstem[13:15]+':'+fstem[15:17]
-#        t = Time(fstr)
-#        return t.mjd
+    #  Files are looked up in the per-day manifests of fileindex.py, which
+    #  are only rebuilt when the IDB folder of the day changes.
+    from .fileindex import trange_files
 
-    filelist = []
-    for filename in files:
-        mjd = fname2mjd(filename)
-        if mjd >= trange[0].mjd and mjd < trange[1].mjd:
-            filelist.append(filename)
+    filelist = trange_files(trange, 'IDB')
+    if filelist == []:
+        print('No IDB files found in the given time range.')
+        print('See util.get_idbdir() for details of the path to root of IDB files.')
     return filelist
     
 
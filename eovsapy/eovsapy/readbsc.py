@@ -41,6 +41,24 @@
 # 2021-Jul-21  OG
 #   Added statement to Skip commented out lines in filename in procedure 
 #   starobs2dxeldel  
+# 2026-Oct-19  SY
+#   The catalog files are now parsed only once, into numpy arrays cached by
+#   bsc_arrays() and bsc_names().  selectbsc() now selects the stars by HA, Dec
+#   and magnitude on whole arrays, and calculates the separation matrix by
+#   broadcasting rather than by ephem.separation() in a double loop.  The HAs
+#   in startracktable() are calculated from a single LST per time step.
+# 2026-Oct-19  SY
+#   Rewrote filter_images() to first rank the images by quick moment-based
+#   shape metrics (star_moments()), calculated in parallel by a pool of
+#   processes from memory-mapped FITS files and cached in a sidecar table in the
+#   image folder (see img_metrics()), and then to do the full Gaussian fit only
+#   for the few best candidates of each star.  Also fixed the integer peak
+#   position in star_shape(), which failed under Python 3, and the fit now
+#   subtracts the background and starts from the peak of the star.
+# 2026-Oct-19  SY
+#   fits_image() now converts only the box around the star to float, rather
+#   than the whole memory-mapped image, and star_shape() fits that box.  The
+#   result of each fit is printed only if verbose is set.
 # Must be run from Dropbox/PythonCode/Current directory
 
 from numpy import array, zeros, ones, arange, where, argsort, sort, pi, median, argmin
@@ -50,37 +68,73 @@ import datetime as dt
 from .eovsa_lst import *
 from .eovsa_array import *
 from ftplib import FTP
-
-def readbsc(filename=None):
-    ''' Read entire Bright Star Catalog and return a list of PyEphem sources
+import numpy as np
+
+_bsc_cache = {}
+
+def bsc_arrays(filename=None):
+    ''' Reads the Bright Star Catalog (only once per file, after which the cached
+        result is returned) and returns a dictionary of arrays:
+           hr     HR number of each star
+           ra     RA (J2000, radians)
+           dec    Dec (J2000, radians)
+           mag    Visual magnitude
+           db     The PyEphem database string of each star
+        or None if the file cannot be read.
     '''
-    
     if filename is None:
         from importlib_resources import files
-        from glob import glob
         filename = str(files('eovsapy').joinpath('SourceCat/BrightStarCatalog.txt'))
+    key = ('bsc', filename)
+    if key not in _bsc_cache:
+        try:
+            f = open(filename,'r')
+        except:
+            print('bsc_arrays: Could not open file',filename)
+            return None
+        # Skip two header lines
+        lines = f.readlines()[2:]
+        f.close()
+        db = ['HR'+line[1:5]+',f,'+line[6:17]+','+line[18:30]+','+line[53:57]+',2000' for line in lines]
+        # Columns of hh:mm:ss strings, as floats
+        ra = array([line[6:17].split(':') for line in lines], float)
+        dec = array([line[19:30].split(':') for line in lines], float)
+        sign = where(array([line[18] for line in lines]) == '-', -1., 1.)
+        _bsc_cache[key] = {'hr': array([int(line[1:5]) for line in lines]),
+                           'ra': (ra[:,0] + ra[:,1]/60. + ra[:,2]/3600.)*pi/12.,
+                           'dec': sign*(dec[:,0] + dec[:,1]/60. + dec[:,2]/3600.)*pi/180.,
+                           'mag': array([line[53:57] for line in lines], float),
+                           'db': db}
+    return _bsc_cache[key]
 
-    try:
-        f = open(filename,'r')
-    except:
-        print('readbsc: Could not open file',filename)
+def readbsc(filename=None):
+    ''' Read entire Bright Star Catalog and return a list of PyEphem sources
+    '''
+    bsc = bsc_arrays(filename)
+    if bsc is None:
         return None
-
-    # Read two header lines (and ignore them)
-    line = f.readline()
-    line = f.readline()
-    srcs = []
-
-    # Loop over lines in file
-    for line in f.readlines():
-        srcs.append(ephem.readdb('HR'+line[1:5]+',f,'+line[6:17]+','+line[18:30]+','+line[53:57]+',2000'))
-    f.close()
+    srcs = [ephem.readdb(db) for db in bsc['db']]
     # Do an initial compute so that name, ra, dec, etc. are accessible.  Will override with compute for
     # observer later.
     for src in srcs:
         src.compute()
 
     return srcs
+
+def wrap_ha(ha):
+    ''' Returns the hour angle(s) ha (radians) wrapped to the range -pi to pi
+    '''
+    return (ha + pi) % (2*pi) - pi
+
+def ang_sep(ra1, dec1, ra2, dec2):
+    ''' Returns the angular separation (radians) between the positions (ra1, dec1)
+        and (ra2, dec2), all in radians.  The inputs are broadcast against each
+        other, so e.g. ang_sep(ra[:,None], dec[:,None], ra, dec) is the matrix of
+        separations between all pairs of positions.
+    '''
+    # Haversine formula, which is accurate also for small separations
+    h = np.sin((dec2 - dec1)/2)**2 + np.cos(dec1)*np.cos(dec2)*np.sin((ra2 - ra1)/2)**2
+    return 2*np.arcsin(np.sqrt(np.clip(h, 0, 1)))
     
 def selectbsc(t, srcs, magrange):
     ''' Given a list of star sources, select from the list based on hour angle, 
@@ -95,40 +149,33 @@ def selectbsc(t, srcs, magrange):
     dechi  = Dec_Angle('+45:00:00','dms').radians
     maglow = magrange[0]
     maghi  = magrange[1]
-    # Make a list of good sources (those in the ranges specified)
-    sel = []
-    # Loop over sources
-    for i,src in enumerate(srcs):
-        # Make sure ha is in range -pi to pi
-        ha = eovsa_ha(src,t)
-        dec = src.dec
-        mag = float(src.mag)
-        good = (ha > halow) & (ha < hahi) & (dec > declow) & (dec < dechi) \
-            & (mag > maglow) & (mag < maghi)
-        if good:
-            sel.append(i)
+    # Coordinates of date and magnitudes of all sources, as arrays
+    ra = array([src.ra for src in srcs])
+    dec = array([src.dec for src in srcs])
+    mag = array([src.mag for src in srcs], float)
+    # HA of all sources, in range -pi to pi
+    ha = wrap_ha(eovsa_lst(t) - ra)
+    good = (ha > halow) & (ha < hahi) & (dec > declow) & (dec < dechi) \
+        & (mag > maglow) & (mag < maghi)
+    sel, = where(good)
 
     # These selected stars should be reachable by the antennas, so now check them
     # for angular separation.
     nstars = len(sel)   # Number of stars so far selected
-    widesep = zeros((nstars,nstars),bool)   # Boolean nstars x nstars array 
-    for i in range(nstars-1):
-        for j in range(i+1,nstars):
-           # True where pairs of stars are > 20 deg apart
-           widesep[i,j] = ephem.separation(srcs[sel[i]],srcs[sel[j]]) > (21.5*pi/180)
-           widesep[j,i] = widesep[i,j]
+    # Boolean nstars x nstars array, True where pairs of stars are > 21.5 deg apart
+    widesep = ang_sep(ra[sel,None], dec[sel,None], ra[sel], dec[sel]) > (21.5*pi/180)
 
     # Go through asep array row by row and mark stars for deletion with sep < 20 degrees
     idx = ones((nstars),bool)
     for i in range(nstars):
         if idx[i]:
             # Only look at rows for "True" columns
-            x = widesep[:,i]
+            x = widesep[:,i].copy()
             x[:i+1] = True  # Do not delete stars in lower part of array
             idx = idx & x
 
     # This should be a list of remaining good stars
-    ids = array(sel)[idx]
+    ids = sel[idx]
     print(len(ids),'stars selected for date/time starting at:',t.iso)
     print('Number      RA         Dec      Magnitude')   
     fmt = '{0:<4} {1:>12} {2:>12} {3:>6}'
@@ -141,48 +188,59 @@ def selectbsc(t, srcs, magrange):
 
     return ids
     
-def getbscnames(num=None, filename=None):
-    ''' Looks up the common star name for each HR number in the list given in array num
+def bsc_names(filename=None):
+    ''' Reads the common star names from the Bright Star Catalog file bsc5.dat
+        (only once per file, after which the cached result is returned), and
+        returns them as an array indexed by HR number - 1, or None if the file
+        cannot be read.
     '''
     if filename is None:
         from importlib_resources import files
-        from glob import glob
         filename = str(files('eovsapy').joinpath('SourceCat/bsc5.dat'))
+    key = ('names', filename)
+    if key not in _bsc_cache:
         try:
             f = open(filename,'r')
         except:
-            print('getbscnames: Could not open file', filename)
-            return ''
-        
+            print('bsc_names: Could not open file', filename)
+            return None
+        lines = f.readlines()
+        f.close()
+        hr = array([int(line[0:4]) for line in lines])
+        name = []
+        for line in lines:
+            n = line[4:7]
+            greek = line[7:10]
+            cnstl = line[10:14]
+            alt = line[14:24]
+            if greek == '   ':
+                # No greek letter
+                if n == '   ':
+                    # No number, so use alt
+                    name.append(alt)      # e.g. 'BD-10 6177' or 'CD-4015285'
+                else:
+                    # Number, but no greek letter
+                    name.append(n+cnstl)  # e.g. ' 80 Peg' or '108 Aqr'
+            else:
+                # Greek letter
+                name.append(greek+cnstl)    # e.g. 'Phi Peg' or 'Gam1And'
+        names = zeros(hr.max(), 'U10')
+        names[hr-1] = name
+        _bsc_cache[key] = names
+    return _bsc_cache[key]
+
+def getbscnames(num=None, filename=None):
+    ''' Looks up the common star name for each HR number in the list given in array num
+    '''
     if num is None:
         print('getbscnames: Must specify an ordered list of star numbers')
         return ''
 
-    line = '9999'
-    name = []
-    for i in range(len(num)):
-        while int(line[0:4]) != num[i]:
-           line = f.readline()
-        # This should be the line that matches the star number i
-        n = line[4:7]
-        greek = line[7:10]
-        cnstl = line[10:14]
-        alt = line[14:24]
-        if greek == '   ':
-            # No greek letter
-            if n == '   ':
-                # No number, so use alt
-                name.append(alt)      # e.g. 'BD-10 6177' or 'CD-4015285'
-            else:
-                # Number, but no greek letter
-                name.append(n+cnstl)  # e.g. ' 80 Peg' or '108 Aqr'
-        else:
-            # Greek letter
-            name.append(greek+cnstl)    # e.g. 'Phi Peg' or 'Gam1And'
-
-    f.close()
+    names = bsc_names(filename)
+    if names is None:
+        return ''
     
-    return array(name)
+    return names[array(num, int)-1]
 
 def startracktable(t, names, srcs, ids, npts=25, mount='azel',outdir='/tmp/'):
     ''' Generate an RA_Dec track table for observing this list of stars
@@ -214,12 +272,8 @@ def startracktable(t, names, srcs, ids, npts=25, mount='azel',outdir='/tmp/'):
     outfile = outdir+'startable-'+datstr+'.txt'
     o = open(outfile,'w')
     
-    ha_start = zeros(nstars)
-    # Loop over sources
-    for i in range(nstars):
-        src = srcs[ids[i]]
-        # First calculate HA
-        ha_start[i] = eovsa_ha(src,t)
+    # First calculate HA of all sources
+    ha_start = wrap_ha(eovsa_lst(t) - array([srcs[i].ra for i in ids]))
 
     # We now have nstars coordinates of date, with RA converted to an
     # initial HA.  Now we have to increment over time in steps of ha_minutes
@@ -256,13 +310,14 @@ def startracktable(t, names, srcs, ids, npts=25, mount='azel',outdir='/tmp/'):
     # Entire duration is npts pointings, or npts*dha_minutes
     while ha_minutes < dha_minutes*npts:
         # print 'HA_Minutes is',ha_minutes
+        newt = Time(t.mjd+ha_minutes*min2mjd,format='mjd')
+        ovsa.date = newt.mjd - 15019.5  # Converts MJD to ephem date
+        lst = eovsa_lst(newt)
         for i in range(j,nstars):
             nchecked += 1
-            newt = Time(t.mjd+ha_minutes*min2mjd,format='mjd')
-            ovsa.date = newt.mjd - 15019.5  # Converts MJD to ephem date
             src = srcs[ids[i]]
             src.compute(ovsa)
-            ha = eovsa_ha(src,newt)  # updates source to new time
+            ha = wrap_ha(lst - src.ra)
             dec = src.dec
             # Get Az, El
             az, el = src.az, src.alt 
@@ -435,9 +490,7 @@ def do_stars(yr, mo, da, hr, mn, npts=25, mount='azel', outdir='/tmp/'):
     srcs = readbsc()
     t = Time(dt.datetime(yr,mo,da,hr,mn),format='datetime')
     ids = selectbsc(t, srcs, [5.2,5.3])
-    num = zeros(len(ids))
-    for i,idx in enumerate(ids):
-        num[i] = int(srcs[idx].name[2:])
+    num = array([int(srcs[idx].name[2:]) for idx in ids])
     names = getbscnames(num)
 
     startracktable(t, names, srcs, ids, npts, mount, outdir=outdir)
@@ -558,8 +611,9 @@ def chkimg(p, sub, title):
     import matplotlib.pylab as plt
     from numpy import mgrid
     plt.imshow(sub)
-    y, x = mgrid[:60,:60]
-    plt.contour(p(x,y))
+    if p is not None:
+        y, x = mgrid[:60,:60]
+        plt.contour(p(x,y))
     plt.title(title)
     plt.show()
     ans = input('Image Okay [y/n] ?')
@@ -569,7 +623,62 @@ def chkimg(p, sub, title):
     else:
         return True
 
-def filter_images(startable, imgfolder, showimgs=False):
+def star_moments(filename, subsize=30):
+    ''' Reads the (memory-mapped) FITS image file filename and returns quick
+        shape metrics of the brightest star, from the moments of the
+        background-subtracted pixels above 10% of the peak in a box of
+        2*subsize pixels around the peak.  Returns [sx, sy, area, peak], where
+        sx and sy are the rms widths (pixels) in x and y and area = sx*sy, 
+        comparable to the Gaussian stddevs and area of star_shape().
+    '''
+    sub = fits_image(filename, subsize)
+    w = sub - np.median(sub)
+    peak = w.max()
+    w[w < 0.1*peak] = 0
+    tot = w.sum()
+    if peak <= 0 or tot <= 0:
+        return [9999., 9999., 9999., 0.]
+    y, x = np.mgrid[:2*subsize,:2*subsize]
+    xm = (w*x).sum()/tot
+    ym = (w*y).sum()/tot
+    sx = np.sqrt((w*(x - xm)**2).sum()/tot)
+    sy = np.sqrt((w*(y - ym)**2).sum()/tot)
+    return [sx, sy, sx*sy, peak]
+
+def img_metrics(files, cachefile=None, nproc=None):
+    ''' Returns an array of shape (nfiles, 4) of the star_moments() metrics
+        [sx, sy, area, peak] of each of the FITS image files in the list files.
+        Metrics are calculated in parallel by a pool of nproc processes (default
+        is the number of CPUs), and if cachefile is given, they are also saved in
+        that (text) table, keyed by file name, size and modification time, so
+        that only new or changed files are calculated the next time.
+    '''
+    import os
+    from concurrent.futures import ProcessPoolExecutor
+    cache = {}
+    if cachefile is not None and os.path.exists(cachefile):
+        for line in open(cachefile,'r').readlines()[1:]:
+            vals = line.split()
+            cache[tuple(vals[:3])] = [float(v) for v in vals[3:]]
+    keys = []
+    for file in files:
+        st = os.stat(file)
+        keys.append((os.path.basename(file), str(st.st_size), repr(st.st_mtime)))
+    todo = [i for i, key in enumerate(keys) if key not in cache]
+    if todo != []:
+        with ProcessPoolExecutor(max_workers=nproc) as pool:
+            results = pool.map(star_moments, [files[i] for i in todo], chunksize=8)
+            for i, result in zip(todo, results):
+                cache[keys[i]] = result
+        if cachefile is not None:
+            o = open(cachefile,'w')
+            o.write('# File  Size  Mtime  Sx  Sy  Area  Peak\n')
+            for key in sorted(cache):
+                o.write(' '.join(key)+' {:.4f} {:.4f} {:.4f} {:.2f}\n'.format(*cache[key]))
+            o.close()
+    return array([cache[key] for key in keys]).reshape(-1, 4)
+
+def filter_images(startable, imgfolder, showimgs=False, ntop=3, nproc=None):
     ''' Filters the >1000 images taken by ZWO camera down to only one
         per star.
         
@@ -579,19 +688,22 @@ def filter_images(startable, imgfolder, showimgs=False):
           imgfolder    Path to the folder containing the >1000 star images
           showimgs     Option to display each selected image and wait for 
                          confirmation.  If rejected, star is skipped.
+          ntop         Number of candidate images of each star, with the smallest
+                         moment-based areas, to be checked by a full Gaussian fit.
+          nproc        Number of processes for calculating the image metrics
+                         (default is the number of CPUs).  The metrics are cached
+                         in the file star_metrics.txt in imgfolder.
     '''
     import glob, os
-    from astropy.io import fits
-    from numpy import logical_and
+    from .fasttime import str2mjd
     if imgfolder[-1] != '/': imgfolder += '/'   # Add slash to image folder name
     fh = open(startable,'r')
     lines = fh.readlines()
     lines = lines[2:]   # Remove two header lines
-    nlines = len(lines)
-    ti = []
-    for line in lines:
-        ti.append(Time(line.strip()[-19:]).mjd)    # Time of each line in startable, in mjd
     fh.close()
+    nlines = len(lines)
+    # Time of each line in startable, in mjd
+    ti = str2mjd([line.strip()[-19:] for line in lines])
 
     files = glob.glob(imgfolder+'*.fit')
     # Simplify filenames by removing all the crap before the time.
@@ -602,11 +714,10 @@ def filter_images(startable, imgfolder, showimgs=False):
     files = glob.glob(imgfolder+'*.fit')
     files.sort()
     # Sorted list of times of star image files, in mjd
-    ftimes = []
-    for file in files:
-        fp = file[-31:-14].replace('_',' ')
-        ftimes.append(Time(fp[:13]+':'+fp[13:15]+':'+fp[15:]).mjd)
-    ftimes = array(ftimes)
+    fps = [file[-31:-14].replace('_',' ') for file in files]
+    ftimes = str2mjd([fp[:13]+':'+fp[13:15]+':'+fp[15:] for fp in fps])
+    # Quick shape metrics of all of the images
+    metrics = img_metrics(files, imgfolder+'star_metrics.txt', nproc)
     # Make new folder of date
     datstr = Time(ti[0],format='mjd').iso[:10]
     dirname = os.path.dirname(startable)
@@ -615,52 +726,85 @@ def filter_images(startable, imgfolder, showimgs=False):
     if not os.path.exists(outdir):
         os.makedirs(outdir)
     
-    
-    for i in range(len(ti)):
-        if i == 49:
+    for i in range(nlines):
+        if i == nlines-1:
             jfiles, = where(ftimes > ti[i]+30./86400)
         else:
-            jfiles, = where(logical_and(ftimes > ti[i]+30./86400,ftimes < ti[i+1]))
+            jfiles, = where((ftimes > ti[i]+30./86400) & (ftimes < ti[i+1]))
         
-        if jfiles != []:
-            jbest = jfiles[0]
+        if len(jfiles) > 0:
+            # Candidates with the smallest areas from the moments
+            cands = jfiles[argsort(metrics[jfiles,2], kind='stable')[:ntop]]
+            jbest = cands[0]
+            pbest, subbest = None, None
             prev_area = 9999.
-            for j in jfiles:
-                img = fits.getdata(files[j])
-                p, sub, area = star_shape(img)
+            for j in cands:
+                p, sub, area = star_shape(fits_image(files[j]), verbose=showimgs)
                 if area < prev_area:
                     jbest = j
+                    pbest, subbest = p, sub
                     prev_area = area
             good = True
             if showimgs:
-                img = fits.getdata(files[jbest])
                 print(jbest,':', end=' ')
-                p, sub, area = star_shape(img)
                 title = 'Star '+lines[i][4:15]+lines[i].strip()[-9:]+'/'+Time(ftimes[jbest],format='mjd').iso[10:19]
-                good = chkimg(p, sub, title)
+                if pbest is None:
+                    # No fit succeeded, so show the image around the peak without a fit
+                    subbest = fits_image(files[jbest])
+                    title += ' (no fit)'
+                good = chkimg(pbest, subbest, title)
             if good:
                 fc = files[jbest]  # Selects best file
                 os.rename(fc,outdir+'/'+os.path.basename(fc))
 
-def star_shape(img):
+def fits_image(filename, subsize=30):
+    ''' Returns the box of 2*subsize pixels around the peak of the FITS image
+        file filename (see _star_peak()) as a float array.  The image is read
+        through a memory map, and only the box is converted to float and scaled
+        by any BSCALE/BZERO (applied here, since astropy cannot memory-map
+        scaled images).
+    '''
+    from astropy.io import fits
+    hdulist = fits.open(filename, memmap=True, do_not_scale_image_data=True)
+    try:
+        img = hdulist[0].data
+        bscale = hdulist[0].header.get('BSCALE', 1.)
+        bzero = hdulist[0].header.get('BZERO', 0.)
+        ypk, xpk = _star_peak(img, subsize)
+        sub = img[ypk-subsize:ypk+subsize,xpk-subsize:xpk+subsize].astype(float)*bscale + bzero
+    finally:
+        hdulist.close()
+    return sub
+
+def _star_peak(img, subsize=30):
+    ''' Returns the (y, x) pixel location of the peak of img, excluding a border
+        of width subsize.
+    '''
+    inner = img[subsize:-subsize,subsize:-subsize]
+    ypk, xpk = np.unravel_index(np.argmax(inner), inner.shape)
+    return ypk + subsize, xpk + subsize
+
+def star_shape(sub, verbose=False):
+    ''' Fits a 2D Gaussian to the star at the center of the box sub (as returned
+        by fits_image()).  Returns the fit, sub and the area (product of the x and
+        y stddevs), or None, None, 9999. if the fit fails.  If verbose is True,
+        prints the stddevs and area of each fit.
+    '''
     from astropy.modeling import models, fitting
-    from numpy import argmax, mgrid
-    subsize = 30
-    pk = argmax(img[subsize:-subsize,subsize:-subsize])
-    xpk = pk % (1280 - 2*subsize) + subsize
-    ypk = pk/(1280 - 2*subsize) + subsize
-    sub = img[ypk-subsize:ypk+subsize,xpk-subsize:xpk+subsize]
+    from numpy import mgrid
     ny, nx = sub.shape
     fit_g = fitting.LevMarLSQFitter()
-    g_init = models.Gaussian2D(amplitude=1.0, x_mean=0., y_mean=0., x_stddev=1., y_stddev=1.)
+    # Fit the background-subtracted star, starting at the peak
+    bsub = sub - median(sub)
+    g_init = models.Gaussian2D(amplitude=bsub.max(), x_mean=nx//2, y_mean=ny//2, x_stddev=2., y_stddev=2.)
     y, x = mgrid[:ny,:nx]
     try:
-        p = fit_g(g_init,x,y,sub)
-        ax = p.x_stddev.value
-        ay = p.y_stddev.value
+        p = fit_g(g_init,x,y,bsub)
+        ax = abs(p.x_stddev.value)
+        ay = abs(p.y_stddev.value)
         area = ax*ay
-        print('{:6.2f}, {:6.2f}; {:7.2f}'.format(ax,ay,area))
+        if verbose: print('{:6.2f}, {:6.2f}; {:7.2f}'.format(ax,ay,area))
         return p, sub, area
     except:
-        print('No fit')
+        if verbose: print('No fit')
         return None, None, 9999.
@@ -34,18 +34,38 @@
 #    Fixed some problems with rstnfluxfromnoaa() no longer being defined, and
 #    rd_rstnflux now allows data to be returned from "yesterday" if current
 #    date has not been written yet.
+#  2026-Oct-19  SY
+#    rd_rstnflux() now looks first in the local ancillary data store (see
+#    ancdata.py), and saves whatever it has to get from SQL, NOAA or the text
+#    archive there.  The NOAA and archive text files are now parsed in one pass
+#    by rd_rstnblocks(), and medians are taken over whole arrays by rstn_median().
+#    Also added the missing import of TimeDelta.
 
 import urllib.request, urllib.error, urllib.parse
+import warnings
 import numpy as np
+from astropy.time import TimeDelta
 from .util import Time, extract
 from . import sun_pos
-from time import strptime
 from . import cal_header as ch
+from . import ancdata
+
+def rstn_median(flux):
+    ''' Returns the median over the last axis of an array of RSTN flux values
+        (e.g. the 9x7 int16 array of a day), ignoring missing values (-1).
+        Frequencies with no good values are returned as nan.
+    '''
+    flx = np.where(flux == -1, np.nan, np.asarray(flux, dtype=float))
+    with warnings.catch_warnings():
+        # Suppress the warning about all-nan slices
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmedian(flx, axis=-1)
 
 def rd_rstnflux(t=None,f=None,recur=False):
     ''' Reads the RSTN/Penticton quiet Sun solar flux density for the date specified
         in the Time() object t.  Reads from file handle f, if supplied, or else
-        attempts to retrieve the data from the SQL database. If this fails it
+        looks in the local ancillary data store, and then attempts to retrieve
+        the data from the SQL database. If this fails it
         will attempt to retrieve the data from NOAA if the date is within 45 days of
         today. Otherwise, defaults to archive file /common/tmp/txt/radioflux.noa.  
         Under certain conditions, the routine calls itself after setting recur to True.
@@ -55,7 +75,8 @@ def rd_rstnflux(t=None,f=None,recur=False):
         
         On failure, returns None, None
         
-        If it finds data from another source other than SQL it will update the SQL
+        If it finds data from another source other than SQL it will update the SQL.
+        Data found in SQL or elsewhere are also saved to the local store.
     '''    
 
     today = Time.now()
@@ -64,9 +85,12 @@ def rd_rstnflux(t=None,f=None,recur=False):
         
     datstr = t.datetime.strftime("%Y %b %d")
     if f is None:
+        # First try the local store, which needs neither SQL nor network
+        data = ancdata.rd_rstn(t)
+        if data is not None:
+            return data[1] * 1000, rstn_median(data[2])
         #try to get data from SQL
         data, sqlt = sql2rstn(t)
-        print(sqlt.iso)
                 
         if sqlt is None:
             # Data for this date is not in data base
@@ -83,6 +107,9 @@ def rd_rstnflux(t=None,f=None,recur=False):
                 recur = True  # Set this to prevent unneeded recursive call
         elif today.mjd - sqlt.mjd < 2:
             print("RD_RSTNFLUX: Today's flux data are not available yet--using yesterday's")
+        if data is not None:
+            # Save in the local store for next time
+            ancdata.wr_rstn(data)
 
         if recur:
             enddt = t + TimeDelta(86400.0, format='sec')
@@ -94,42 +121,19 @@ def rd_rstnflux(t=None,f=None,recur=False):
                 data=d[0]
                 sqlt = Time(np.floor(data[0].mjd)+0.125,format='mjd')
                 writerstn2sql(data, sqlt)
+                ancdata.wr_rstn(data)
     else:
-        lines = f.readlines()
+        lines = np.array(f.read().splitlines())
         f.close()
-        frq = np.zeros(9,'int')
-        flux = np.zeros(9,'float')
-        for i,line in enumerate(lines):
-            if line.find(datstr) != -1:
-                for j in range(9):
-                    dat = lines[i+j+1].split()
-                    frq[j] = int(dat.pop(0))
-                    flxarr = np.array(dat,'int')
-                    good = np.where(flxarr != -1)[0]
-                    if len(good) != 0:
-                        flux[j] = np.median(flxarr[good])
-                    else:
-                        flux[j] = np.nan
-                    break
-                   
-        if frq[0] == 0:
+        i, = np.where(np.char.find(lines, datstr) != -1)
+        if len(i) == 0:
             print('RD_RSTNFLUX: Error: Date',datstr,'not found.')
             return None, None
-        else:
-            return frq, flux
+        # The date line is followed by 9 lines of frequency and flux values
+        dat = np.loadtxt(lines[i[0]+1:i[0]+10], dtype=int, ndmin=2)
+        return dat[:,0], rstn_median(dat[:,1:])
         
-    frq = data[1] * 1000
-    arrsize = data[2].shape
-    n = arrsize[0]
-    flux = np.zeros(n,'float')
-    for j in range(n):
-        good = np.where(data[2][j] !=-1 )[0]
-        if len(good) != 0:
-            flux[j] = np.median(data[2][j][good])
-        else:
-            flux[j] = np.nan
-    
-    return frq, flux
+    return data[1] * 1000, rstn_median(data[2])
     
 def rstn2ant(frq,flux,fmhz,t=None,twometer=True):
     ''' Takes 9-element list of frequencies and corresponding flux densities from
@@ -257,6 +261,36 @@ def noaa2db(infile,outfile):
     
 freq = np.array([0.245, 0.41, 0.61, 1.415, 2.695, 2.8, 4.995, 8.8, 15.4], dtype = np.float32)
 
+months = {'Jan':1, 'Feb':2, 'Mar':3, 'Apr':4, 'May':5, 'Jun':6,
+          'Jul':7, 'Aug':8, 'Sep':9, 'Oct':10, 'Nov':11, 'Dec':12}
+
+def rd_rstnblocks(lines, datcol=0):
+    ''' Parses RSTN text (a list of non-empty lines) made up of 10-line blocks,
+        each a date line (e.g. "2020 Jun 04", starting at column datcol) followed
+        by 9 lines of frequency [MHz] and 7 flux values.  Blocks whose date line
+        cannot be read are skipped.
+        
+        Returns a Time() array of the block dates and the corresponding
+        (nblocks, 9, 7) int16 array of flux data, or None, None if no blocks
+        are found.
+    '''
+    nblk = len(lines)//10
+    if nblk == 0:
+        return None, None
+    blocks = np.array(lines[:nblk*10]).reshape(nblk, 10)
+    datestr = []
+    good = np.zeros(nblk, bool)
+    for i, line in enumerate(blocks[:,0]):
+        dat = line[datcol:].split()
+        if len(dat) == 3 and dat[1] in months:
+            datestr.append('%04d-%02d-%02d' % (int(dat[0]), months[dat[1]], int(dat[2])))
+            good[i] = True
+    if len(datestr) == 0:
+        return None, None
+    data = np.loadtxt(blocks[good,1:].ravel(), dtype=int, usecols=range(8), ndmin=2)
+    data = data.reshape(len(datestr), 9, 8)[:,:,1:].astype(np.int16)
+    return Time(datestr, out_subfmt = 'date'), data
+
 def rstnfluxfromnoaa(t):
     ''' If given date is today, attempts to read from current NOAA file, otherwise
         reads from 45day file. Fails (returns None) if date are more than 45 days ago.
@@ -301,22 +335,16 @@ def rstnfluxfrom45daynoaa(dt):
         print("No data found in ",noaa_url)
         return None
         
-    lines = lines[i+1:]
-    lines = np.array(lines)             # Converts to numpy array, for where()
-    clean_lines = lines[np.where(lines != '\n')]  # Eliminates all empty lines
-    clean_lines = [l.replace('\n','') for l in clean_lines] # Removes \n in remaining lines
-    
-    for i in range(0, len(clean_lines), 10):
-        datestr = "%04d-%02d-%02d" % (int(clean_lines[i][0:4]), strptime(clean_lines[i][5:8], '%b').tm_mon, int(clean_lines[i][9:]))
-        timestamp = Time(datestr, out_subfmt = 'date')
-        if np.floor(dt.mjd) == np.floor(timestamp.mjd):
-            data = np.zeros((9, 7), dtype = np.int16)
-            for j in range(1, 10):
-                d = clean_lines[i + j].split()
-                data[j - 1] = list(map(int, d[1:8]))
-                    
+    clean_lines = [l.strip() for l in lines[i+1:] if l.strip() != '']  # Eliminates all empty lines
+    
+    timestamp, data = rd_rstnblocks(clean_lines)
+    if timestamp is not None:
+        # Save all of the days in this file to the local store
+        ancdata.wr_rstn([[timestamp[k], freq, data[k]] for k in range(len(timestamp))])
+        k, = np.where(np.floor(timestamp.mjd) == np.floor(dt.mjd))
+        if len(k) != 0:
             print("Data successfully read from ",noaa_url," for date ",dt.iso)
-            return [timestamp, freq, data]
+            return [timestamp[k[0]], freq, data[k[0]]]
     
     print("No data found for data ",dt.iso," in ",noaa_url)
     return None
@@ -356,25 +384,16 @@ def rstnfluxfromcurrentnoaa():
         print("No data found in ",noaa_url)
         return None
 
-    lines = lines[i+1:]
-    lines = np.array(lines)             # Converts to numpy array, for where()
-    clean_lines = lines[np.where(lines != '\n')]  # Eliminates all empty lines
-    clean_lines = [l.replace('\n','') for l in clean_lines] # Removes \n in remaining lines
+    clean_lines = [l.strip() for l in lines[i+1:] if l.strip() != '']  # Eliminates all empty lines
     
-    datestr = "%04d-%02d-%02d" % (int(clean_lines[0][0:4]), strptime(clean_lines[0][5:8], '%b').tm_mon, int(clean_lines[0][9:]))
-    timestamp = Time(datestr, out_subfmt = 'date')
+    timestamp, data = rd_rstnblocks(clean_lines[:10])
     
     t = Time.now()
-    if np.floor(timestamp.mjd) != np.floor(t.mjd-1.0):
-        print("No data found for previous day (", Time(t.mjd-1.0, 'mjd', out_subfmt = 'date'), ")")
+    if timestamp is None or np.floor(timestamp[0].mjd) != np.floor(t.mjd-1.0):
+        print("No data found for previous day (", Time(t.mjd-1.0, format='mjd', out_subfmt = 'date'), ")")
         return None
-        
-    data = np.zeros((9, 7), dtype = np.int16)
-    for j in range(1, 10):
-        d = clean_lines[j].split()
-        data[j - 1] = list(map(int, d[1:8]))
     
-    return [timestamp, freq, data]
+    return [timestamp[0], freq, data[0]]
     
 def rstnfluxfromtextarchive(startdt, enddt):
     """This function extracts RSTN noon flux data from the old archive
@@ -415,22 +434,14 @@ def rstnfluxfromtextarchive(startdt, enddt):
         print("No data found in ",archfile)
         return None
         
-    lines = lines[i+1:]
-    lines = np.array(lines)             # Converts to numpy array, for where()
-    clean_lines = lines[np.where(lines != '\r\n')]  # Eliminates all empty lines
-    clean_lines = [l.replace('\r\n','') for l in clean_lines] # Removes \n in remaining lines
-    
-    for i in range(0, len(clean_lines), 10):
-        print(clean_lines[i][:17])
-        if clean_lines[i][:17] == ':Solar_Radio_Flux':
-            datestr = "%04d-%02d-%02d" % (int(clean_lines[i][19:23]), strptime(clean_lines[i][24:27], '%b').tm_mon, int(clean_lines[i][28:]))
-            timestamp = Time(datestr, out_subfmt = 'date')
-            if np.floor(timestamp.mjd) >= np.floor(startdt.mjd) and np.floor(timestamp.mjd) < np.floor(enddt.mjd):
-                fluxarr = np.zeros((9,7), dtype = np.int16)
-                for j in range(1, 10):
-                    d = clean_lines[i+j].split()
-                    fluxarr[j - 1] = list(map(int, d[1:8]))
-                data.append([timestamp, freq, fluxarr])
+    clean_lines = [l.strip() for l in lines[i+1:] if l.strip() != '']  # Eliminates all empty lines
+    
+    # Date lines start with ':Solar_Radio_Flux:', followed by the date
+    timestamp, fluxarr = rd_rstnblocks(clean_lines, datcol=18)
+    if timestamp is not None:
+        day = np.floor(timestamp.mjd)
+        k, = np.where((day >= np.floor(startdt.mjd)) & (day < np.floor(enddt.mjd)))
+        data = [[timestamp[j], freq, fluxarr[j]] for j in k]
     
     if len(data)==0:
         print("No data found in specified date range.")
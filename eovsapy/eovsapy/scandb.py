@@ -0,0 +1,220 @@
+'''
+   Scan catalogue for EOVSA IDB and UDB files.
+
+   The catalogue is an SQLite database with one row per data file, built
+   incrementally from the daily IFDB/FDB (IDB files) and UFDB (UDB files) text
+   files, and indexed by date, file start time, project and source.  A day is
+   re-read only when its text file has changed, so queries such as
+
+       scans(trange, project='PHASECAL')
+
+   return the file paths directly, without re-reading and comparing the text
+   files every time.  The database file is given by the environment variable
+   EOVSASCANDB, or defaults to scandb.sqlite in the ancillary data folder
+   (see ancdata.py).
+'''
+#
+# History:
+#  2026-Oct-19  SY
+#    Initial version.
+#
+
+import os
+import sqlite3
+import numpy as np
+from .ancdata import anc_root, mjd2datstr
+from .dump_tsys import rd_fdbfile
+
+# LabVIEW timestamp of MJD 0
+lv_mjd0 = -16480 * 86400.
+
+_schema = '''
+create table if not exists fdbfiles (data text, date text, filename text, mtime real, size integer,
+                                     primary key (data, date));
+create table if not exists files (data text, date text, file text, path text, scanid text,
+                                  source text, project text, st_ts real, en_ts real, st_mjd real);
+create index if not exists files_date on files (data, date);
+create index if not exists files_time on files (data, st_mjd);
+create index if not exists files_project on files (project, st_mjd);
+create index if not exists files_source on files (source, st_mjd);
+create index if not exists files_scan on files (scanid);
+'''
+
+
+def scandb_file():
+    ''' Returns the name of the catalogue database file.
+    '''
+    dbfile = os.getenv('EOVSASCANDB')
+    if not dbfile:
+        dbfile = anc_root() + 'scandb.sqlite'
+    return dbfile
+
+
+def connect(dbfile=None):
+    ''' Opens (and creates, if necessary) the catalogue database, and returns
+        the connection.
+    '''
+    if dbfile is None:
+        dbfile = scandb_file()
+    folder = os.path.dirname(dbfile)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    con = sqlite3.connect(dbfile, timeout=30)
+    con.executescript(_schema)
+    return con
+
+
+def fdb_filename(data, datstr):
+    ''' Returns the name of the text file listing the files of type data ('IDB'
+        or 'UDB') for the date string datstr (yyyymmdd), and the number of
+        lines per entry, or None, None if there is no such file.  For IDB files,
+        the IFDB file is used if it exists, otherwise the FDB file.
+    '''
+    if data == 'UDB':
+        candidates = [('/data1/UFDB/' + datstr[:4] + '/UFDB' + datstr + '.txt', 1)]
+    else:
+        candidates = [('/data1/IFDB/' + datstr[:4] + '/IFDB' + datstr + '.txt', 1),
+                      ('/data1/FDB/FDB' + datstr + '.txt', 2),
+                      ('/dppdata1/FDB/FDB' + datstr + '.txt', 2)]
+    for filename, nlines in candidates:
+        if os.path.exists(filename):
+            return filename, nlines
+    return None, None
+
+
+def _file_paths(files):
+    ''' Returns the full paths of the IDB or UDB files in the list files, based
+        on the root folders used on the pipeline.
+    '''
+    from .util import get_idbdir
+    from astropy.time import Time
+    paths = []
+    folders = {}
+    for file in files:
+        datstr = file[3:11]
+        key = file[:3] + datstr
+        if key not in folders:
+            if file[:3] == 'UDB':
+                folders[key] = '/data1/eovsa/fits/UDB/' + datstr[:4] + '/'
+            else:
+                root = get_idbdir(Time(datstr[:4] + '-' + datstr[4:6] + '-' + datstr[6:]))
+                if os.path.isdir(root + datstr):
+                    root += datstr + '/'
+                folders[key] = root
+        paths.append(folders[key] + file)
+    return paths
+
+
+def update(days, con=None):
+    ''' Brings the catalogue up to date for the list of (integer) mjd days,
+        re-reading only the text files that are new or have changed since they
+        were last read.  Returns the number of days (re)read.
+    '''
+    close = con is None
+    if close:
+        con = connect()
+    nread = 0
+    for day in days:
+        datstr = mjd2datstr(day)
+        for data in ['IDB', 'UDB']:
+            filename, nlines = fdb_filename(data, datstr)
+            if filename is None:
+                continue
+            st = os.stat(filename)
+            row = con.execute('select filename, mtime, size from fdbfiles where data=? and date=?',
+                              (data, datstr)).fetchone()
+            if row == (filename, st.st_mtime, st.st_size):
+                continue
+            try:
+                fdb = rd_fdbfile(filename, nlines)
+                good, = np.where(fdb['FILE'] != '')
+                files = fdb['FILE'][good]
+                st_ts = fdb['ST_TS'][good].astype(float)
+                en_ts = fdb['EN_TS'][good].astype(float)
+            except:
+                print('SCANDB: Error: Could not read', filename)
+                continue
+            n = len(good)
+            blank = np.array([''] * len(fdb['FILE']))
+            rows = list(zip([data] * n, [datstr] * n, files.tolist(), _file_paths(files),
+                            fdb.get('SCANID', blank)[good].tolist(), fdb.get('SOURCEID', blank)[good].tolist(),
+                            fdb.get('PROJECTID', blank)[good].tolist(), st_ts.tolist(), en_ts.tolist(),
+                            ((st_ts - lv_mjd0) / 86400.).tolist()))
+            with con:
+                con.execute('delete from files where data=? and date=?', (data, datstr))
+                con.executemany('insert into files values (?,?,?,?,?,?,?,?,?,?)', rows)
+                con.execute('insert or replace into fdbfiles values (?,?,?,?,?)',
+                            (data, datstr, filename, st.st_mtime, st.st_size))
+            nread += 1
+    if close:
+        con.close()
+    return nread
+
+
+def _where(trange, project, source, data):
+    ''' Returns the days covered by trange, and the where clause and its
+        parameters selecting files of type data, project and source.
+    '''
+    mjd0, mjd1 = trange[0].mjd, trange[1].mjd
+    # Include the previous day, in which a scan in progress at mjd0 may start
+    days = np.arange(int(mjd0) - 1, int(mjd1) + 1)
+    clause = 'data=? and date between ? and ?'
+    params = [data, mjd2datstr(days[0]), mjd2datstr(days[-1])]
+    if project is not None:
+        clause += ' and project=?'
+        params.append(project)
+    if source is not None:
+        clause += ' and source=?'
+        params.append(source)
+    return days, clause, params
+
+
+def scans(trange, project=None, source=None, data='IDB', refresh=True):
+    ''' Returns a list of the paths of files of type data ('IDB' or 'UDB')
+        that start in the time range given by the 2-element Time() object trange
+        (start time inclusive, end time exclusive), optionally only those of
+        the given project (e.g. 'PHASECAL') and/or source.  If refresh is
+        True, the catalogue is first brought up to date for those days.
+    '''
+    days, clause, params = _where(trange, project, source, data)
+    con = connect()
+    if refresh:
+        update(days, con)
+    cur = con.execute('select path from files where ' + clause + ' and st_mjd >= ? and st_mjd < ? order by st_mjd',
+                      params + [trange[0].mjd, trange[1].mjd])
+    paths = [row[0] for row in cur]
+    con.close()
+    return paths
+
+
+def scanlist(trange, project=None, source=None, data='IDB', refresh=True):
+    ''' Returns a summary of the scans (of the given project and/or source)
+        whose first file starts within the time range given by the 2-element
+        Time() object trange, as a dictionary with keys:
+           scanid     array of scan IDs
+           project    array of project IDs
+           source     array of source IDs
+           st_ts      array of scan start times (LabVIEW timestamp)
+           en_ts      array of scan end times (LabVIEW timestamp)
+           files      list of lists of the paths of the files of each scan
+        Scans are ordered by scan ID.
+    '''
+    days, clause, params = _where(trange, project, source, data)
+    con = connect()
+    if refresh:
+        update(days, con)
+    rows = con.execute('select scanid, project, source, min(st_ts), max(en_ts) from files where ' + clause +
+                       ' group by scanid having min(st_mjd) >= ? and min(st_mjd) < ? order by scanid',
+                       params + [trange[0].mjd, trange[1].mjd]).fetchall()
+    files = []
+    for row in rows:
+        cur = con.execute('select path from files where ' + clause + ' and scanid=? order by st_mjd',
+                          params + [row[0]])
+        files.append([r[0] for r in cur])
+    con.close()
+    if len(rows) == 0:
+        return {'scanid': np.array([], 'U32'), 'project': np.array([], 'U32'), 'source': np.array([], 'U32'),
+                'st_ts': np.array([]), 'en_ts': np.array([]), 'files': []}
+    scanid, project, source, st_ts, en_ts = list(zip(*rows))
+    return {'scanid': np.array(scanid), 'project': np.array(project), 'source': np.array(source),
+            'st_ts': np.array(st_ts), 'en_ts': np.array(en_ts), 'files': files}
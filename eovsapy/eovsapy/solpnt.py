@@ -89,6 +89,12 @@
 #      The faroff (SKYCAL) values are only needed at low frequencies and can be deleterious
 #      in some cases, so they are now set to NaN for 2.75 GHz and above (so gaussfit will 
 #      ignore them)
+#   2026-Oct-19  SY
+#      Added gausfit_batch(), which fits all profiles at once by a vectorized
+#      Levenberg-Marquardt solution.  fitall() and process_tsys() now use it for
+#      all antennas (and frequencies) together, and fitall() is no longer limited
+#      to 7 antennas.  The process_solpnt() mask and averages are now calculated
+#      without loops, and its antlist argument works again.
 #
 
 import struct, os, urllib.request, urllib.error, urllib.parse, sys
@@ -232,7 +238,7 @@ def process_solpnt(soldata,trj=None,antlist=None):
     # since the observations were taken).
     if trj:
         try:
-            trjfile = open(trj,'r')
+            trjfile = open(trj,'rb')
         except:
             print('Could not open TRJFILE',trj)
             return {}
@@ -252,23 +258,19 @@ def process_solpnt(soldata,trj=None,antlist=None):
     if antlist is None:
         antidx = list(range(len(soldata['antlist'])))
         antlist = soldata['antlist']
-    # Mask array
-    mask = np.zeros([300,len(antlist),len(trjlines)],dtype='bool')
-    # Loop over each line of solpnt
-    for i in range(300):
-        # Loop over each RAO,DECO position and calculate "good data" mask for each 
-        # desired position
-        for j in range(len(trjlines)):
-            # True if RAO and DECO matches this line
-            m = np.logical_and(soldata['rao'][i,antidx] == trjrao[j],soldata['deco'][i,antidx] == trjdeco[j])
-            # True if above AND is tracking
-            mask[i,:,j] = np.logical_and(m,soldata['trk'][i,antidx])
-    # Loop over each RAO,DECO position, and average all good HPOL and VPOL voltage data
-    hpol = np.zeros([len(antlist),len(trjlines)],dtype='float')
-    vpol = np.zeros([len(antlist),len(trjlines)],dtype='float')
-    for j in range(len(trjlines)):
-        hpol[:,j] = (soldata['hpol'][:,antidx]*mask[:,:,j]).sum(0)/mask[:,:,j].sum(0)
-        vpol[:,j] = (soldata['vpol'][:,antidx]*mask[:,:,j]).sum(0)/mask[:,:,j].sum(0)
+    else:
+        antidx = [list(soldata['antlist']).index(ant) for ant in antlist]
+    # Mask array of size [300, nant, ntrj], True where the RAO and DECO of each record
+    # match each line of the trajectory AND the antenna is tracking
+    trjrao_ = np.array(trjrao)
+    trjdeco_ = np.array(trjdeco)
+    mask = ((soldata['rao'][:300,antidx,None] == trjrao_)
+            & (soldata['deco'][:300,antidx,None] == trjdeco_)
+            & soldata['trk'][:300,antidx,None])
+    # Average all good HPOL and VPOL voltage data for each RAO,DECO position
+    nmask = mask.sum(0)
+    hpol = (soldata['hpol'][:300,antidx,None]*mask).sum(0)/nmask
+    vpol = (soldata['vpol'][:300,antidx,None]*mask).sum(0)/nmask
     # Convert the trajectory RA offsets to "cross-dec" (use of median assumes most antennas
     # are tracking the correct declination)
     ra0 = np.median(soldata['ra'])
@@ -319,6 +321,99 @@ def gausfit(X,data, bounds=None):
     #plt.plot(x,peval(x, plsq[0]), X, data, 'o')
     return popt,x,y
 
+def gausfit_batch(X, data, bounds=None, niter=100):
+    ''' Batch version of gausfit(), which fits many profiles at once.  Given
+        a set of locations X (size npts) and an array of amplitude data of
+        size [nprof, npts] (NaNs are ignored), fit each profile with a gaussian
+        plus offset, a*exp(-((x-b)/c)**2) + d, and return the fit parameters
+        as an array of size [nprof, 4].  Optional bounds is a tuple of
+        (low_bounds, high_bounds), each of size [4] or [nprof, 4].
+
+        The fit is a Levenberg-Marquardt least-squares solution done for all
+        profiles together, starting from a guess based on the peak and moments
+        of each profile, with parameters kept within the bounds.  As for
+        gausfit(), profiles with fewer than 4 good points return all zeros.
+    '''
+    X = np.asarray(X, dtype='float')
+    data = np.atleast_2d(np.asarray(data, dtype='float'))
+    nprof, npts = data.shape
+    w = ~np.isnan(data)
+    ngood = w.sum(1)
+    ok = ngood >= 4
+    y = np.where(w, data, 0.0)
+    if bounds is None:
+        lb = np.full((nprof, 4), -np.inf)
+        ub = np.full((nprof, 4), np.inf)
+    else:
+        lb = np.broadcast_to(np.asarray(bounds[0], dtype='float'), (nprof, 4)).copy()
+        ub = np.broadcast_to(np.asarray(bounds[1], dtype='float'), (nprof, 4)).copy()
+        bad = np.isnan(lb) | np.isnan(ub)
+        lb[bad] = -np.inf
+        ub[bad] = np.inf
+    popt = np.zeros((nprof, 4), dtype='float')
+    if not ok.any():
+        return popt
+    # Initial guess from the peak, minimum and second moment of each profile
+    ymin = np.where(w, data, np.inf).min(1)
+    ymax = np.where(w, data, -np.inf).max(1)
+    ymin[~ok] = 0.0
+    ymax[~ok] = 1.0
+    ypos = np.where(w, data - ymin[:, None], 0.0)
+    b0 = X[np.argmax(np.where(w, data, -np.inf), 1)]
+    wsum = ypos.sum(1)
+    wsum[wsum == 0] = 1.0
+    c0 = np.sqrt(2*(ypos*(X[None, :] - b0[:, None])**2).sum(1)/wsum)
+    c0[c0 == 0] = (X.max() - X.min())*0.1 + 1.0
+    p = np.stack((ymax - ymin, b0, c0, ymin), 1)
+    p = np.clip(p, lb, ub)
+
+    def resid_jac(p, w, y):
+        u = (X[None, :] - p[:, 1:2])/p[:, 2:3]
+        e = np.exp(-u**2)
+        ae = p[:, 0:1]*e
+        r = np.where(w, y - ae - p[:, 3:4], 0.0)
+        J = np.stack((e, 2*ae*u/p[:, 2:3], 2*ae*u**2/p[:, 2:3], np.ones_like(e)), 2)
+        J *= w[:, :, None]
+        return r, J
+
+    r, J = resid_jac(p, w, y)
+    cost = (r**2).sum(1)
+    lam = np.full(nprof, 1.e-3)
+    active, = np.where(ok)
+    for it in range(niter):
+        # Work only on the profiles that have not yet converged
+        pa, ra, Ja = p[active], r[active], J[active]
+        JTr = np.matmul(ra[:, None, :], Ja)[:, 0, :]
+        # Parameters at a bound, and pushed outwards, are held fixed for this step
+        fixed = ((pa <= lb[active]) & (JTr < 0)) | ((pa >= ub[active]) & (JTr > 0))
+        Ja = Ja*~fixed[:, None, :]
+        JTr[fixed] = 0.0
+        JTJ = np.matmul(np.swapaxes(Ja, 1, 2), Ja)
+        diag = np.einsum('nii->ni', JTJ)
+        # Marquardt scaling, with a floor to keep degenerate systems solvable
+        dscale = diag + 1.e-12*diag.max(1, keepdims=True) + 1.e-30
+        A = JTJ + (lam[active, None]*dscale)[:, :, None]*np.eye(4)
+        dp = np.linalg.solve(A, JTr[:, :, None])[:, :, 0]
+        pnew = np.clip(pa + dp, lb[active], ub[active])
+        pnew[:, 2] = np.where(pnew[:, 2] == 0, pa[:, 2], pnew[:, 2])
+        rnew, Jnew = resid_jac(pnew, w[active], y[active])
+        costnew = (rnew**2).sum(1)
+        better = costnew <= cost[active]
+        # Converged when the cost or the parameters no longer change significantly
+        small = np.all(np.abs(pnew - pa) <= 1.e-8*(np.abs(pa) + 1.e-8), 1)
+        done = better & ((cost[active] - costnew <= 1.e-10*cost[active]) | small)
+        ib = active[better]
+        p[ib] = pnew[better]
+        r[ib] = rnew[better]
+        J[ib] = Jnew[better]
+        cost[ib] = costnew[better]
+        lam[active] = np.where(better, lam[active]*0.1, lam[active]*10.)
+        active = active[~done & (lam[active] < 1.e10)]
+        if len(active) == 0:
+            break
+    popt[ok] = p[ok]
+    return popt
+
 def fitall(proc,plot=False,pp=None):
     ''' Fits SOLPNT data for all antennas contained in 
         processed data proc, returned from process_solpnt()
@@ -332,14 +427,21 @@ def fitall(proc,plot=False,pp=None):
 
     if plot:
         # row and column sharing
-        f, ax = plt.subplots(7, 2, sharex='col', sharey='row')
-        f.set_size_inches(10,14,forward=True)
+        f, ax = plt.subplots(nant, 2, sharex='col', sharey='row', squeeze=False)
+        f.set_size_inches(10,2*nant,forward=True)
         f.suptitle('Fits for SOLPNT scan at '+t.iso+' UT',fontsize=18)
         ax[0,0].set_title('RA Offset [blue=HPol, red=VPol]')
         ax[0,1].set_title('Dec Offset [blue=HPol, red=VPol]')
 
-    # Temporary statement to make this work with no more than 7 antennas.
-    if nant > 7: nant = 7
+    # Fit the HPol and VPol profiles of all antennas at once
+    xr = np.linspace(proc['rao'].min(),proc['rao'].max(),100)
+    xd = np.linspace(proc['deco'].min(),proc['deco'].max(),100)
+    praoh = gausfit_batch(proc['rao'],proc['hrao'][:nant])
+    praov = gausfit_batch(proc['rao'],proc['vrao'][:nant])
+    pdecoh = gausfit_batch(proc['deco'],proc['hdeco'][:nant])
+    pdecov = gausfit_batch(proc['deco'],proc['vdeco'][:nant])
+    def gauss(x, p):
+        return p[0]*np.exp(-((x-p[1])/p[2])**2) + p[3]
     raoh =  np.zeros(nant,dtype='float')
     decoh = np.zeros(nant,dtype='float')
     raov =  np.zeros(nant,dtype='float')
@@ -354,19 +456,19 @@ def fitall(proc,plot=False,pp=None):
     print('---- ------ ------ ------   ------ ------ ------')
     for i in range(nant):
         ant = proc['antlist'][i]
-        [A, hrao, w, b], x, y = gausfit(proc['rao'],proc['hrao'][i,:])
-        if plot: ax[i,0].plot(x,y,proc['rao'],proc['hrao'][i,:],'o',label='Hpol')
-        [A, vrao, w, b], x, y = gausfit(proc['rao'],proc['vrao'][i,:])
+        hrao = praoh[i,1]
+        if plot: ax[i,0].plot(xr,gauss(xr,praoh[i]),proc['rao'],proc['hrao'][i,:],'o',label='Hpol')
+        vrao = praov[i,1]
         if plot: 
-            ax[i,0].plot(x,y,proc['rao'],proc['vrao'][i,:],'o',label='VPol')
+            ax[i,0].plot(xr,gauss(xr,praov[i]),proc['rao'],proc['vrao'][i,:],'o',label='VPol')
             ax[i,0].text(0.05,0.8,'Ant '+str(ant+1),transform=ax[i,0].transAxes,fontsize=14)
             ax[i,0].text(0.05,0.65,'H = {:6.3f}'.format(hrao/10000.),transform=ax[i,0].transAxes)
             ax[i,0].text(0.05,0.5,'V = {:6.3f}'.format(vrao/10000.),transform=ax[i,0].transAxes)
-        [A, hdeco, w, b], x, y = gausfit(proc['deco'],proc['hdeco'][i,:])
-        if plot: ax[i,1].plot(x,y,proc['deco'],proc['hdeco'][i,:],'o',label='HPol')
-        [A, vdeco, w, b], x, y = gausfit(proc['deco'],proc['vdeco'][i,:])
+        hdeco = pdecoh[i,1]
+        if plot: ax[i,1].plot(xd,gauss(xd,pdecoh[i]),proc['deco'],proc['hdeco'][i,:],'o',label='HPol')
+        vdeco = pdecov[i,1]
         if plot: 
-            ax[i,1].plot(x,y,proc['deco'],proc['vdeco'][i,:],'o',label='VPol')
+            ax[i,1].plot(xd,gauss(xd,pdecov[i]),proc['deco'],proc['vdeco'][i,:],'o',label='VPol')
             ax[i,1].text(0.05,0.8,'Ant '+str(ant+1),transform=ax[i,1].transAxes,fontsize=14)
             ax[i,1].text(0.05,0.65,'H = {:6.3f}'.format(hdeco/10000.),transform=ax[i,1].transAxes)
             ax[i,1].text(0.05,0.5,'V = {:6.3f}'.format(vdeco/10000.),transform=ax[i,1].transAxes)
@@ -623,8 +725,6 @@ def process_tsys(otp, proc, pol=None, skycal=None):
         tsys = otp['tsys'][:,pol,:,:]
     tsys = tsys[:,:,idx2]
     hpol = np.zeros([nf,npt,nant],'float')
-    pra = np.zeros([4,nf,nant],'float')  # Array of gaussian fits
-    pdec = np.zeros([4,nf,nant],'float')  # Array of gaussian fits
     # Step through pointings, applying mask
     for ipnt in range(npt):
         for iant in range(nant):
@@ -657,36 +757,26 @@ def process_tsys(otp, proc, pol=None, skycal=None):
             # Insert faroff values corresponding to 10-degree offsets
             rao = np.concatenate((faroff,hpol[:,:13,:],faroff),1)
             deco = np.concatenate((faroff,hpol[:,13:,:],faroff),1)
-    for iant in range(nant):
-        for ifreq in range(nf):
-            ydata = rao[ifreq,:,iant]
-            allzero = len(ydata.nonzero()[0]) == 0  # True if all data are zero
-            xdata = raopts
-            ymax = np.nanmax(ydata)
-            ymin = np.nanmin(ydata)
-            yrange = ymax - ymin
-            low_bounds =  [0.1*yrange, -30000., aout[ifreq]*0.9, ymin - 0.1*yrange]
-            high_bounds = [1.0*yrange,  30000., aout[ifreq]*1.1, ymin + 0.1*yrange]    
-            if allzero:
-                high_bounds[0] = 1  # Ensure that high bounds are greater than low bounds
-                high_bounds[3] = 1
-            bounds = (low_bounds,high_bounds)
-            #if iant == 1 and ifreq == 30:
-            #    import pdb; pdb.set_trace()
-            pra[:,ifreq,iant], x, y = gausfit(xdata, ydata, bounds=bounds)
-            ydata = deco[ifreq,:,iant]
-            allzero = len(ydata.nonzero()[0]) == 0  # True if all data are zero
-            xdata = decopts
-            ymax = np.nanmax(ydata)
-            ymin = np.nanmin(ydata)
-            yrange = ymax - ymin
-            low_bounds =  [0.1*yrange, -30000., aout[ifreq]*0.9, ymin - 0.1*yrange]
-            high_bounds = [1.0*yrange,  30000., aout[ifreq]*1.1, ymin + 0.1*yrange]    
-#            low_bounds =  [0.1*np.nanmax(ydata), -30000., aout[ifreq]*0.9, np.nanmin(ydata)-0.1*np.nanmax(ydata)]
-#            high_bounds = [1.0*np.nanmax(ydata),  30000., aout[ifreq]*1.1, np.nanmin(ydata)+0.1*np.nanmax(ydata)]
-            if allzero:
-                high_bounds[0] = 1  # Ensure that high bounds are greater than low bounds
-                high_bounds[3] = 1
-            bounds = (low_bounds,high_bounds)            
-            pdec[:,ifreq,iant], x, y = gausfit(xdata, ydata, bounds=bounds)
+    def fit_bounds(ydata):
+        # Bounds for the fits of an array of profiles ydata of size [nant, nf, npts]
+        allzero = ~np.any(ydata != 0, 2)  # True if all data are zero (NaNs count as nonzero)
+        with np.errstate(invalid='ignore'):
+            ymax = np.nanmax(ydata, 2)
+            ymin = np.nanmin(ydata, 2)
+        yrange = ymax - ymin
+        width = np.broadcast_to(aout[:nf], yrange.shape)
+        low_bounds = np.stack((0.1*yrange, np.full(yrange.shape, -30000.), width*0.9, ymin - 0.1*yrange), 2)
+        high_bounds = np.stack((1.0*yrange, np.full(yrange.shape, 30000.), width*1.1, ymin + 0.1*yrange), 2)
+        # Ensure that high bounds are greater than low bounds
+        high_bounds[allzero,0] = 1
+        high_bounds[allzero,3] = 1
+        return low_bounds.reshape(-1,4), high_bounds.reshape(-1,4)
+
+    # Fit all antennas and frequencies at once.  Profiles are ordered [nant, nf, npts]
+    ydata = np.transpose(rao[:nf,:,:nant],(2,0,1))
+    p = gausfit_batch(raopts, ydata.reshape(nant*nf,-1), bounds=fit_bounds(ydata))
+    pra = np.transpose(p.reshape(nant,nf,4),(2,1,0))
+    ydata = np.transpose(deco[:nf,:,:nant],(2,0,1))
+    p = gausfit_batch(decopts, ydata.reshape(nant*nf,-1), bounds=fit_bounds(ydata))
+    pdec = np.transpose(p.reshape(nant,nf,4),(2,1,0))
     return pra, pdec, rao, deco
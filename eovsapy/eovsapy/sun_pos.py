@@ -1,11 +1,22 @@
-from math import sin, cos, pi, atan2, atan, asin, tan
+# History:
+#  2026-Oct-19  SY
+#    sun_pos() now uses numpy functions, so that dd can be an array of times.
+#
+from math import sin, cos, pi, atan, asin, tan
+import numpy as np
+
 def  sun_pos(dd):
     '''This routine is a truncated version of Newcomb's Sun and
        is designed to give apparent angular coordinates (T.E.D) to a
        precision of one second of time.
 
        Translated from SSW (IDL) routine of the same name
+
+       The input dd (days from 1900 Jan 0.5, i.e. mjd-15019.5) can be a
+       scalar or a numpy array, in which case all outputs are arrays.
     '''
+    sin, cos, atan2, asin = np.sin, np.cos, np.arctan2, np.arcsin
+    dd = np.asarray(dd, dtype=np.float64)
     dtor = pi/180.
     
     #  Form time in Julian centuries from 1900.0
@@ -70,8 +81,7 @@ def  sun_pos(dd):
     l = l/3600.0
     ra  = atan2( sin(l*dtor) * cos(oblt*dtor) , cos(l*dtor) ) / dtor
 
-    if ra < 0.0:
-        ra += 360.0
+    ra = ra % 360.0
 
     dec = asin(sin(l*dtor) * sin(oblt*dtor)) / dtor
 
@@ -21,6 +21,9 @@ ysampler) rather than (xtyys, ytsys)'''
 #                   to 2.0, necessitating a change in the saturation correction
 #                   factor in autocorr_desat().  This is applied to all data
 #                   after 2021-05-16, when the change was made.
+# sy, 2026-10-19 -- autocorr_desat() now uses the lookup-table eta of
+#                   read_idb.desat_eta(), forms the baseline corrections with
+#                   antenna-pair index arrays, and applies them in place.
 
 #needed for file creation
 import time, os
@@ -536,28 +539,11 @@ def autocorr_desat(out):
         Since 2021-05-16, the correlator equalizer coefficient changed from 8.0 to 2.0,
         necessitating a different fit function.  This one combines two fits, one for
         auto-correlation amplitudes < 300 and another for > 300.
-    '''
-    from scipy.special import erf
-    def eta_f(x, A):
-        a,b,c,d = [1.22552, 1.37369, 2.94536, 2.14838]  # Parameters define the invariant saturation curve
-        eta = (x + d - c)/(a*erf((x-c)/b) + d)
-        bad = np.where(A < 50)
-        eta[bad] = 1.0
-        return eta
-
-    def eta_2(x, A):
-        ''' This is the desaturation fuction for data taken with equalizer coefficient 2.0,
-            which is data after to 5/16/2021.
-        '''
-        a1,b1,c1,d1 = [0.88025122, 1.0221639 , 4.39845723, 2.38911615]
-        a2,b2,c2,d2 = [2.28517281, 2.64619331, 4.38657476, 2.37753165]
-        hi = np.where(A > 300)
-        low = np.where(A <= 300)
-        eta = np.ones_like(x)
-        eta[hi] = (x[hi] + d1 - c1)/(a1*erf((x[hi]-c1)/b1) + d1)
-        eta[low] = (x[low] + d2 - c2)/(a2*erf((x[low]-c2)/b2) + d2)
-        return eta
         
+        The curves are evaluated by read_idb.desat_eta() from lookup tables, and the
+        correction is applied in place to out['x'].
+    '''
+    from .read_idb import desat_eta, desat_apply
     # Determine required "m" value for standardized power level.  The power changes
     # depending on number of channels averaged, etc., and the SK m value keeps track
     # of all of that.
@@ -571,44 +557,32 @@ def autocorr_desat(out):
     nf, = out['fghz'].shape
     nt, = out['time'].shape
     npol, = out['pol'].shape
-    Px = copy.deepcopy(out['px'].reshape(nf, nant, 3, nt))
-    Py = copy.deepcopy(out['py'].reshape(nf, nant, 3, nt))
-#    n0 = len(np.where(out['band'] == np.max(out['band']))[0])
-#    # Modify measured power to correct for variable science-channel bandwidth
-#    for i in range(nf):
-#        bnd = out['band'][i]
-#        n = np.float(len(np.where(out['band'] == bnd)[0]))
-#        Px[i] *= n/n0
-#        Py[i] *= n/n0
-    Px = Px[:,:,0]*m0/Px[:,:,2]
-    Py = Py[:,:,0]*m0/Py[:,:,2]
-    
-    x = np.log10(Px)
-    # Calculate correction for X pol (returns size [nf, nant, nt])
-    if mjd < 59350:   # 2021-05-16
-        eta_x = eta_f(x, abs(out['x'][:,np.arange(120,136),0]))
-    else:
-        eta_x = eta_2(x, abs(out['x'][:,np.arange(120,136),0]))
-    x = np.log10(Py)
-    # Calculate correction for Y pol (returns size [nf, nant, nt])
-    if mjd < 59350:   # 2021-05-16
-        eta_y = eta_f(x, abs(out['x'][:,np.arange(120,136),1]))
-    else:
-        eta_y = eta_2(x, abs(out['x'][:,np.arange(120,136),1]))
-    eta = np.zeros_like(out['x'])
-    # Loop over baselines and calculate correction for different polarization states.
-    for i in range(nant):
-        for j in range(i,nant):
-            eta[:,bl2ord[i,j],0] = eta_x[:,i]+eta_x[:,j]
-            eta[:,bl2ord[i,j],1] = eta_y[:,i]+eta_y[:,j]
-            eta[:,bl2ord[i,j],2] = eta_x[:,i]+eta_y[:,j]
-            eta[:,bl2ord[i,j],3] = eta_x[:,j]+eta_y[:,i]
-    eta = eta/2.
-    #  Correction is to log of values, so apply by raising to eta power.
-    amp = abs(out['x'])
-    pha = np.angle(out['x'])
-    amp = amp**eta
-    out['x'] = amp*np.exp(1j*pha)
+    Px = out['px'].reshape(nf, nant, 3, nt)
+    Py = out['py'].reshape(nf, nant, 3, nt)
+    # Data of the complex visibilities, without the mask
+    x = np.ma.getdata(out['x'])
+    iauto = bl2ord[np.arange(nant), np.arange(nant)]
+    # Calculate correction for X and Y pol (returns size [nf, nant, nt])
+    eta_x = desat_eta(np.log10(Px[:,:,0]*m0/Px[:,:,2]), abs(x[:,iauto,0]), mjd)
+    eta_y = desat_eta(np.log10(Py[:,:,0]*m0/Py[:,:,2]), abs(x[:,iauto,1]), mjd)
+    eta_xy = [eta_x, eta_y]
+    # Antenna and polarization (0 = X, 1 = Y) indexes of the two inputs of each
+    # baseline (including autocorrelations, in bl2ord order) for polarizations
+    # XX, YY, XY, YX
+    i, j = np.triu_indices(nant)
+    bi = np.zeros(len(i), dtype=int)
+    bj = np.zeros(len(i), dtype=int)
+    bi[bl2ord[i, j]] = i
+    bj[bl2ord[i, j]] = j
+    pol_i = [0, 1, 0, 1]
+    pol_j = [0, 1, 1, 0]
+    #  Correction is to log of values, so apply by raising to eta power, one
+    #  polarization at a time.
+    for k in range(npol):
+        eta = eta_xy[pol_i[k]][:,bi]
+        eta += eta_xy[pol_j[k]][:,bj]
+        eta *= 0.5
+        desat_apply(x[:,:,k], eta)
     return out
     
 def concatXdata(x0, x):
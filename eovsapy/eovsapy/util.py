@@ -66,6 +66,23 @@
 #    or chan_util_52, depending on the date.
 #  2022-Apr-14  DG
 #    Added read_horizons() routine for getting the JPL Horizons solar ephemeris
+#  2026-Oct-19  SY
+#    get_idbdir() now keeps the parsed EOVSADBJSON file until it changes, and
+#    finds the date range by a binary search on the date strings instead of
+#    creating a Time() object for every date key on every call.
+#    fname2mjd() now uses the vectorized parser in fasttime.py rather than
+#    creating a Time() object from strings.
+#  2026-Oct-19  SY
+#    Added band_avg(), to average channels within bands for any number of
+#    bands in one call, using np.add.reduceat().
+#  2026-Oct-19  SY
+#    Added delay_fit(), a batched solver for the delays (phase slopes) and
+#    offsets of whole stacks of phase spectra, by a coarse FFT search followed
+#    by a weighted linear fit.  lin_phase_fit() now calls it.
+#  2026-Oct-19  SY
+#    lin_phase_fit() again returns the standard deviation of the residuals as
+#    its third value, rather than the rms from delay_fit(), so that the
+#    thresholds of its callers (e.g. fix_time_drift()) still apply.
 # *
 
 from . import StringUtil as su
@@ -1147,6 +1164,9 @@ def bl_list(nant=16):
 bl2ord = bl_list()
 
 
+# Parsed contents of the EOVSADBJSON file used by get_idbdir()
+_idbdir_cache = {}
+
 def get_idbdir(t=None, usejsonfile=True):
     ''' Returns the root location of IDB files for the date given in Time object t.
         If t is not supplied, returns the root location for the latest data.
@@ -1170,31 +1190,30 @@ def get_idbdir(t=None, usejsonfile=True):
         usejsonfile = False
 
     if usejsonfile:
-        import json
-        import numpy as np
-        with open(eovsajsonfile) as f:
-            eovsadb = json.load(f)
-        dbarr = []
-        datekey = list(eovsadb['EOVSADB'].keys())
-        datetobj = Time(datekey)
-        dtype = [('date', 'S10'), ('tobj', object), ('path', object)]
-        for idx, k in enumerate(datekey):
-            dbarr.append((k, datetobj[idx], eovsadb['EOVSADB'][k]))
-        dbarr = np.array(dbarr, dtype=dtype)
-        dbarrsort = np.sort(dbarr, order='tobj')
+        # The sorted date keys and paths are kept until the json file changes
+        mtime = os.stat(eovsajsonfile).st_mtime
+        if _idbdir_cache.get('key') != (eovsajsonfile, mtime):
+            import json
+            with open(eovsajsonfile) as f:
+                eovsadb = json.load(f)
+            datekey = sorted(eovsadb['EOVSADB'].keys())
+            _idbdir_cache.update({'key': (eovsajsonfile, mtime), 'date': np.array(datekey),
+                                  'path': [eovsadb['EOVSADB'][k] for k in datekey]})
+        dates = _idbdir_cache['date']
 
         if t is None:
             # Default to current time
             t = Time.now()
-        print(t.mjd, dbarrsort['tobj'][0].mjd)
-        if t.mjd < dbarrsort['tobj'][0].mjd:
+        # ISO date strings (yyyy-mm-dd) sort in time order
+        k = np.searchsorted(dates, t.iso[:10], side='right') - 1
+        if k < 0:
             print(('The date provided with t is before the time of the EOVSA first light. t is reset to {}.'.format(
-                dbarrsort[0]['date'])))
-            t = dbarrsort['tobj'][0]
+                dates[0])))
+            k = 0
         # eodate = os.getenv('EOVSADATE')
         # Default to EOVSADB2
         # envar = 'EOVSADB2'
-        datadir = dbarrsort['path'][np.where(t >= dbarrsort['tobj'])[0][-1]]
+        datadir = _idbdir_cache['path'][k]
     else:
         if t is None:
             # Default to current time
@@ -1235,27 +1254,54 @@ def freq2bdname(fghz,t=None):
     else:
         return cu34.freq2bdname(fghz)
 
+def band_avg(x, band, axis=-1, nan=False):
+    ''' Averages the array x over the channels belonging to each band, for any
+        number of bands (and any shape of the other axes) in one call.
+        
+        Inputs:
+          x         array of data (real or complex), with a channel axis.
+          band      array of the band number of each channel along axis.  The
+                       channels of a band do not have to be contiguous.
+          axis      the channel axis of x (default is the last).
+          nan       if True, NaNs are ignored in the average (like np.nanmean),
+                       otherwise they propagate (like np.mean).
+                       
+        Returns:
+          bds       the sorted array of unique band numbers
+          xavg      the array of averages, of the same shape as x except that 
+                       the channel axis has length len(bds)
+    '''
+    x = np.asarray(x)
+    band = np.asarray(band)
+    axis = axis % x.ndim
+    if np.any(band[1:] < band[:-1]):
+        srt = np.argsort(band, kind='stable')
+        band = band[srt]
+        x = np.take(x, srt, axis=axis)
+    bds, sidx = np.unique(band, return_index=True)
+    # Shape to broadcast the channel counts along axis
+    shape = [1]*x.ndim
+    shape[axis] = len(bds)
+    if nan:
+        good = ~np.isnan(x)
+        total = np.add.reduceat(np.where(good, x, 0), sidx, axis=axis)
+        cnt = np.add.reduceat(good, sidx, axis=axis)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return bds, total/cnt
+    cnt = np.diff(np.append(sidx, len(band))).reshape(shape)
+    return bds, np.add.reduceat(x, sidx, axis=axis)/cnt
+
 def fname2mjd(filename):
     ''' Get modified julian date from a standard IDB or UDB filename.
     
         Input can be a single string (filename) or a list or numpy array of filenames
         Output is a single mjd or a numpy array of mjds.
     '''
+    from .fasttime import fname2mjd as fast_fname2mjd
     if type(filename) == np.ndarray or type(filename) == list:
-        fstr = []
-        for file in filename:
-            fstem = file.split('/')[-1]
-            fstr.append(fstem[3:7] + '-' + fstem[7:9] + '-' + fstem[9:11] + ' ' + fstem[11:13] + ':' + fstem[
-                                                                                                       13:15] + ':' + fstem[
-                                                                                                                      15:17])
-        t = Time(fstr)
+        return fast_fname2mjd(filename)
     else:
-        fstem = filename.split('/')[-1]
-        fstr = fstem[3:7] + '-' + fstem[7:9] + '-' + fstem[9:11] + ' ' + fstem[11:13] + ':' + fstem[
-                                                                                              13:15] + ':' + fstem[
-                                                                                                             15:17]
-        t = Time(fstr)
-    return t.mjd
+        return fast_fname2mjd([filename])[0]
 
 def read_horizons(t0=None, dur=0.00069444, step='1m', observatory=-81):
     ''' Uses the JPL Horizons Batch API to get a dictionary of solar coordinates 
@@ -1338,6 +1384,109 @@ def read_horizons(t0=None, dur=0.00069444, step='1m', observatory=-81):
     ephem = {'time': t, 'ra': ra, 'dec': dec, 'pangle': pangle, 'b0':b0, 'rsun':rsun, 'sundist': sundist, 'lines':newlines}
     return ephem
 
+def delay_fit(f, pha, weights=None, offset=True, df=None, oversample=4):
+    ''' Fits a delay (phase slope) and phase offset to every phase spectrum in
+        an array of any shape (e.g. (nant, npol, nf)) at once.  The model is
+        pha = offset + 2*pi*f*delay, so the delay is in ns if f is in GHz.
+        
+        A coarse delay is first found from the peak of the FFT of the (weighted)
+        phasors, gridded onto a uniform frequency grid, so that large delays
+        with many phase wraps are found.  The phases, less the coarse delay,
+        are then wrapped to +/- pi and refined by a weighted linear least-squares
+        fit (done twice).
+        
+        Inputs:
+          f         array of frequencies, of length nf (does not need to be
+                       evenly spaced).
+          pha       array of phases, in radians, of shape (..., nf).  Any phases
+                       to be ignored can be flagged with Nan.
+          weights   optional array of weights broadcastable to the shape of pha
+                       (e.g. 1/sigma**2).  Points with zero or Nan weight are
+                       ignored.
+          offset    if False, the offset is not fit (identically zero).
+          df        frequency resolution of the FFT grid (default is the
+                       smallest spacing of f), which sets the largest delay
+                       found as +/- 1/(2*df).
+          oversample  the FFT length is this times the number of grid points,
+                       or more, to set the resolution of the coarse search.
+                       
+        Returns:
+          delay, offset, rms   arrays of shape pha.shape[:-1] of the delays, the
+                       phase offsets (at f = 0, in radians) and the rms of the
+                       wrapped residual phases.  Spectra with fewer than 3 good
+                       points return 0, 0 and pi.
+    '''
+    f = np.asarray(f, dtype=float)
+    pha = np.asarray(pha, dtype=float)
+    shape = pha.shape[:-1]
+    nf = len(f)
+    p = pha.reshape(-1, nf)
+    if weights is None:
+        w = np.ones_like(p)
+    else:
+        w = np.broadcast_to(np.asarray(weights, dtype=float), pha.shape).reshape(-1, nf)
+    good = np.isfinite(p) & np.isfinite(w) & (w > 0) & np.isfinite(f)
+    w = np.where(good, w, 0.)
+    p = np.where(good, p, 0.)
+    ngood = good.sum(1)
+    fgood = f[np.isfinite(f)]
+    if len(fgood) == 0:
+        fgood = np.zeros(1)
+    # Fit relative to the lowest frequency, which is better conditioned
+    f0 = fgood.min() if offset else 0.
+    x = np.where(np.isfinite(f), f - f0, 0.)
+    
+    # Coarse search, from the peak of the FFT of the gridded phasors
+    fmin = fgood.min()
+    if df is None:
+        d = np.diff(np.unique(fgood))
+        d = d[d > 0]
+        df = d.min() if len(d) > 0 else 1.
+    nbin = int(np.round((fgood.max() - fmin) / df)) + 1
+    if nbin > 65536:
+        nbin = 65536
+        df = (fgood.max() - fmin) / (nbin - 1)
+    ibin = np.clip(np.round(np.where(np.isfinite(f), f - fmin, 0.) / df).astype(int), 0, nbin - 1)
+    grid = np.zeros((len(p), nbin), dtype=complex)
+    np.add.at(grid, (slice(None), ibin), w * np.exp(1j * p))
+    nfft = 2 ** int(np.ceil(np.log2(max(oversample * nbin, 2))))
+    k = np.argmax(np.abs(np.fft.fft(grid, nfft, axis=1)), axis=1)
+    k = np.where(k > nfft // 2, k - nfft, k)
+    delay = k / (nfft * df)
+    
+    # Refinement by weighted linear fits to the wrapped residual phases
+    off = np.zeros(len(p))
+    for it in range(2):
+        r = lobe(p - off[:, None] - 2 * np.pi * delay[:, None] * x)
+        if offset:
+            # Remove the mean phase first, so that the residuals do not wrap
+            c = np.angle(np.sum(w * np.exp(1j * r), 1))
+            r = lobe(r - c[:, None])
+        else:
+            c = 0.
+        sw = w.sum(1)
+        sx = (w * x).sum(1)
+        sxx = (w * x * x).sum(1)
+        sr = (w * r).sum(1)
+        sxr = (w * x * r).sum(1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if offset:
+                det = sw * sxx - sx ** 2
+                b = (sw * sxr - sx * sr) / det
+                a = (sr - b * sx) / sw
+            else:
+                b = sxr / sxx
+                a = 0.
+        ok = (ngood >= 3) & np.isfinite(b)
+        delay = np.where(ok, delay + b / (2 * np.pi), 0.)
+        off = np.where(ok, off + c + a, 0.)
+    resid = lobe(p - off[:, None] - 2 * np.pi * delay[:, None] * x)
+    rms = np.where(ok, np.sqrt((good * resid ** 2).sum(1) / np.maximum(ngood, 1)), np.pi)
+    # Offsets at f = 0
+    off = np.where(ok, lobe(off - 2 * np.pi * delay * f0), 0.)
+    return delay.reshape(shape), off.reshape(shape), rms.reshape(shape)
+
+
 def lin_phase_fit(f, pha, doplot=False):
     ''' Given an array of frequencies and corresponding phases,
         determine the best linear fit and return the parameters
@@ -1350,35 +1499,37 @@ def lin_phase_fit(f, pha, doplot=False):
                        Note, no Nans allowed.
           pha       array of phases, in radians, corresponding to array f. 
                        Note, any phases to be ignored can be flagged with Nan.
+                       May also be an array of shape (..., len(f)), to fit many
+                       phase spectra at once.
           doplot    Optional flag--if True, opens a new plot and plots the 
                        phases and the fit.
                        
         Returns:
           Numpy 3-element array of phase-offset, phase-slope, and 
-          standard deviation of the fit
+          standard deviation of the fit (each of shape pha.shape[:-1]
+          if pha has more than one dimension)
     '''
-    if len(f) != len(pha):
-        print('Error: np.arrays not of same size:', len(f), len(pha))
+    pha = np.asarray(pha)
+    if len(f) != pha.shape[-1]:
+        print('Error: np.arrays not of same size:', len(f), pha.shape[-1])
         return None
-    dpdf = []
-    good, = np.where(np.logical_not(np.isnan(pha)))
-    if len(good) < 3:
-        # Not enough points to fit, so return zeros and a large standard deviation
-        return np.array((0, 0, np.pi))
-    f_ = f[good]
-    pha_ = pha[good]
-    for i in range(len(f_) - 1):
-        dpdf.append((pha_[i + 1] - pha_[i]) / (f_[i + 1] - f_[i]))
-    dpdf = np.array(dpdf)
-    slp = np.median(dpdf)
-    p = np.polyfit(f_, np.unwrap((pha_ - f_ * slp)), 1)
-    p[0] = p[0] + slp
-    stdev = np.std(lobe(pha_ - np.polyval(p, f_)))
+    delay, poff, rms = delay_fit(f, pha)
+    pslp = 2 * np.pi * delay
+    # Return the standard deviation of the wrapped residuals (not the rms from
+    # delay_fit()), since callers compare it with thresholds set for this value
+    res = lobe(pha - np.asarray(poff)[..., None] - np.asarray(pslp)[..., None] * np.asarray(f))
+    good = np.isfinite(res)
+    ngood = good.sum(-1)
+    res = np.where(good, res, 0.)
+    mean = res.sum(-1) / np.maximum(ngood, 1)
+    stdev = np.sqrt((np.where(good, res - mean[..., None], 0.) ** 2).sum(-1) / np.maximum(ngood, 1))
+    # Spectra with fewer than 3 good points get a large standard deviation
+    stdev = np.where(ngood < 3, np.pi, stdev)
     if doplot:
         import matplotlib.pylab as plt
         plt.plot(f, pha, '.')
-        plt.plot(f, lobe(np.polyval(p, f)))
-    return np.array((p[1], p[0], stdev))
+        plt.plot(f, lobe(poff + pslp * np.asarray(f)))
+    return np.array((poff, pslp, stdev))
 
 
 def fix_time_drift(out):
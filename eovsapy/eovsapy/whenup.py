@@ -32,10 +32,13 @@
 #    to the times of those lines.
 #  2022-03-14  DG
 #    Changes to reduce the length of PHASECALs to from 25-30 minutes to 20 minutes.
+#  2026-Oct-19  SY
+#    whenup() and sunup() now get the source positions for the whole day at once
+#    from eovsa_ephem.src_track(), instead of computing each source for each minute.
 
 import os
 from .util import Time
-from . import eovsa_cat
+from . import eovsa_ephem
 from .eovsa_visibility import *
 import numpy as np
 from astropy.time import TimeDelta
@@ -74,8 +77,6 @@ def whenup(date=None,verbose=False):
     # Add times in 1-min steps up to duration dur (hours)
     ts = t + TimeDelta(np.arange(0.,24.,1./60.)/24.,format='jd')
 
-    aa = eovsa_cat.eovsa_array_with_cat()
-
     nt = len(ts)
     ra = np.zeros((len(srclist),nt))
     ha = np.zeros((len(srclist),nt))
@@ -86,18 +87,15 @@ def whenup(date=None,verbose=False):
     teq = []
     tgap = []
     lines = []
-    for i in range(nt):
-        aa.set_jultime(ts[i].jd)    
-        lst = aa.sidereal_time()
-
-        for j,srcname in enumerate(srclist):
-            src = aa.cat[srcname.split()[0]]
-            src.compute(aa)
-            ra[j,i] = src.ra
-            ha[j,i] = lst - src.ra
-            dec[j,i] = src.dec
-            alt[j,i] = src.alt
-            az[j,i] = src.az
+    # Positions of each source for all times at once
+    mjds = mjd + np.arange(nt)/1440.
+    for j,srcname in enumerate(srclist):
+        trk = eovsa_ephem.src_track(srcname.split()[0], mjds)
+        ra[j] = trk['ra']
+        ha[j] = trk['ha']
+        dec[j] = trk['dec']
+        alt[j] = trk['alt']
+        az[j] = trk['az']
 
     ra_deg = deg(ra)
     ha_deg = deg(ha)
@@ -173,7 +171,6 @@ def sunup(daterange):
     # Use the 24-h day specified by daterange (i.e. drop the time of day)
     mjd1 = int(daterange[0].mjd)
     mjd2 = int(daterange[1].mjd)
-    aa = eovsa_cat.eovsa_array_with_cat()
     taz_rise = []
     teq_rise = []
     taz_set = []
@@ -185,19 +182,10 @@ def sunup(daterange):
         ts = t + TimeDelta(np.arange(0.,24.,1./60.)/24.,format='jd')
 
         nt = len(ts)
-        ha = np.zeros(nt)
-        alt = np.zeros(nt)
-        az = np.zeros(nt)
-        lines = []
-        for i in range(nt):
-            aa.set_jultime(ts[i].jd)    
-            lst = aa.sidereal_time()
-
-            src = aa.cat['Sun']
-            src.compute(aa)
-            ha[i] = lst - src.ra
-            alt[i] = src.alt
-            az[i] = src.az
+        trk = eovsa_ephem.src_track('Sun', mjd + np.arange(nt)/1440.)
+        ha = trk['ha']
+        alt = trk['alt']
+        az = trk['az']
 
         ha_deg = deg(ha)
         alt = deg(alt)
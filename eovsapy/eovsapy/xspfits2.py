@@ -9,11 +9,15 @@
 #  2020-01-20  DG
 #    Removed hour and minute from tp_writefits() output filename,
 #    when filestem ends with 'all_'.
+#  2026-Oct-19  SY
+#    The mjd/msec columns are now computed directly from the Julian dates,
+#    without creating a Time() object for the whole time array.
 #
 
 import time, os
 import numpy as np
 from .util import Time
+from .fasttime import jd2mjd
 from astropy.io import fits
 
 def strip_non_printable(string_in):
@@ -81,8 +85,7 @@ def daily_xsp_writefits(xdat, pdata):
     tbhdu1.name = 'SFREQ'
 
 # Split up mjd into days and msec, really intuitive syntax, thanks python
-    ut = Time(t, format='jd') #Format is for the input time
-    ut = ut.mjd
+    ut = jd2mjd(t)
     ut_int = ut.astype(np.int32)
     ut_msec = 1000.0*86400.0*(ut-ut_int)
     ut_ms1 = ut_msec.astype(np.int32)
@@ -193,8 +196,7 @@ def tp_writefits(out, med, filestem='', outpath='/data1/eovsa/fits/flares/'):
     tbhdu1.name = 'SFREQ'
 
 # Split up mjd into days and msec, really intuitive syntax, thanks python
-    ut = Time(t, format='jd') #Format is for the input time
-    ut = ut.mjd
+    ut = jd2mjd(t)
     ut_int = ut.astype(np.int32)
     ut_msec = 1000.0*86400.0*(ut-ut_int)
     ut_ms1 = ut_msec.astype(np.int32)